@@ -1,28 +1,26 @@
 """
 口の位置を下に調整してシェイプキーを再作成
 """
+import os
+import sys
+
 import bpy
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.shape_keys import ShapeKeyEngine, Y, Z
+
 obj = bpy.data.objects.get('HighQualityFaceAvatar')
 
 if obj:
     mesh = obj.data
-    vertices = mesh.vertices
     
     print("=== 口の位置を下に調整 ===\n")
     
-    # 既存のシェイプキーを削除
-    if mesh.shape_keys:
-        keys_to_remove = []
-        for key in mesh.shape_keys.key_blocks:
-            if key.name in ['Mouth_Open', 'Vowel_A', 'Vowel_I', 'Vowel_U', 'Vowel_E', 'Vowel_O', 'Smile']:
-                keys_to_remove.append(key.name)
-        
-        for key_name in keys_to_remove:
-            obj.active_shape_key_index = mesh.shape_keys.key_blocks.find(key_name)
-            bpy.ops.object.shape_key_remove()
+    engine = ShapeKeyEngine(obj)
+    bz = engine.z
     
-    basis = mesh.shape_keys.key_blocks['Basis']
+    # 既存のシェイプキーを削除
+    engine.remove_keys(['Mouth_Open', 'Vowel_A', 'Vowel_I', 'Vowel_U', 'Vowel_E', 'Vowel_O', 'Smile'])
     
     # Z座標を段階的に下げてテスト
     print("異なるZ座標でテスト用シェイプキーを作成...\n")
@@ -60,34 +58,20 @@ if obj:
     x_min, x_max = -0.15, 0.15
     
     for test in z_ranges:
-        obj.shape_key_add(name=test['name'], from_mix=False)
-        shape_key = mesh.shape_keys.key_blocks[test['name']]
+        # 指定の範囲内の頂点
+        region = engine.box(x=(x_min, x_max), y=(y_min, y_max), z=(test['z_min'], test['z_max']))
         
-        count = 0
-        upper_count = 0
-        lower_count = 0
+        # 口を開く動き
+        z_center = (test['z_min'] + test['z_max']) / 2
+        lower_half = region & (bz < z_center)  # 下半分
+        upper_half = region & ~(bz < z_center)  # 上半分
         
-        for i, v in enumerate(vertices):
-            co = basis.data[i].co
-            shape_key.data[i].co = co.copy()
-            
-            # 指定の範囲内の頂点
-            if (y_min < co.y < y_max and
-                test['z_min'] < co.z < test['z_max'] and
-                x_min < co.x < x_max):
-                
-                # 口を開く動き
-                z_center = (test['z_min'] + test['z_max']) / 2
-                if co.z < z_center:  # 下半分
-                    shape_key.data[i].co.z -= 0.06
-                    lower_count += 1
-                else:  # 上半分
-                    shape_key.data[i].co.z -= 0.02
-                    upper_count += 1
-                
-                count += 1
+        co = engine.new_coords()
+        co[lower_half, Z] -= 0.06
+        co[upper_half, Z] -= 0.02
+        engine.write_key(test['name'], co)
         
-        print(f"{test['name']}: {count}頂点（上{upper_count}/下{lower_count}） - {test['desc']}")
+        print(f"{test['name']}: {region.count}頂点（上{upper_half.count}/下{lower_half.count}） - {test['desc']}")
     
     # より細かい調整用
     print("\n\n細かい調整用テスト：")
@@ -100,28 +84,17 @@ if obj:
     ]
     
     for name, z_min, z_max, desc in fine_tests:
-        obj.shape_key_add(name=name, from_mix=False)
-        shape_key = mesh.shape_keys.key_blocks[name]
+        region = engine.box(x=(x_min, x_max), y=(y_min, y_max), z=(z_min, z_max))
+        lower_half = region & (bz < (z_min + z_max) / 2)
         
-        count = 0
-        for i, v in enumerate(vertices):
-            co = basis.data[i].co
-            shape_key.data[i].co = co.copy()
-            
-            if (y_min < co.y < y_max and
-                z_min < co.z < z_max and
-                x_min < co.x < x_max):
-                
-                # 下唇を大きく動かす
-                if co.z < (z_min + z_max) / 2:
-                    shape_key.data[i].co.z -= 0.08
-                    shape_key.data[i].co.y += 0.02
-                else:
-                    shape_key.data[i].co.z -= 0.01
-                
-                count += 1
+        co = engine.new_coords()
+        # 下唇を大きく動かす
+        co[lower_half, Z] -= 0.08
+        co[lower_half, Y] += 0.02
+        co[region & ~lower_half, Z] -= 0.01
+        engine.write_key(name, co)
         
-        print(f"{name}: {count}頂点 - {desc}")
+        print(f"{name}: {region.count}頂点 - {desc}")
     
     # 口の中心位置を特定するための参照点
     print("\n\n口の中心位置の参照：")
@@ -134,23 +107,15 @@ if obj:
     ]
     
     for name, z_min, z_max, desc in center_refs:
-        obj.shape_key_add(name=name, from_mix=False)
-        shape_key = mesh.shape_keys.key_blocks[name]
+        region = engine.box(x=(-0.1, 0.1),  # 中央のみ
+                            y=(y_min, y_max), z=(z_min, z_max))
         
-        count = 0
-        for i, v in enumerate(vertices):
-            co = basis.data[i].co
-            shape_key.data[i].co = co.copy()
-            
-            if (y_min < co.y < y_max and
-                z_min < co.z < z_max and
-                abs(co.x) < 0.1):  # 中央のみ
-                
-                # 前に少し出す
-                shape_key.data[i].co.y -= 0.05
-                count += 1
+        co = engine.new_coords()
+        # 前に少し出す
+        co[region, Y] -= 0.05
+        engine.write_key(name, co)
         
-        print(f"{name}: {count}頂点 - {desc}")
+        print(f"{name}: {region.count}頂点 - {desc}")
     
     # メッシュを更新
     mesh.update()
@@ -1,28 +1,26 @@
 """
 X軸を調整して口の位置を特定
 """
+import os
+import sys
+
 import bpy
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.shape_keys import ShapeKeyEngine, Y, Z
+
 obj = bpy.data.objects.get('HighQualityFaceAvatar')
 
 if obj:
     mesh = obj.data
-    vertices = mesh.vertices
     
     print("=== X軸（左右）を調整して口の位置を特定 ===\n")
     
-    # 既存のテストシェイプキーを削除
-    if mesh.shape_keys:
-        keys_to_remove = []
-        for key in mesh.shape_keys.key_blocks:
-            if key.name.startswith('Test_') or key.name.startswith('X_'):
-                keys_to_remove.append(key.name)
-        
-        for key_name in keys_to_remove:
-            obj.active_shape_key_index = mesh.shape_keys.key_blocks.find(key_name)
-            bpy.ops.object.shape_key_remove()
+    engine = ShapeKeyEngine(obj)
+    bx, bz = engine.x, engine.z
     
-    basis = mesh.shape_keys.key_blocks['Basis']
+    # 既存のテストシェイプキーを削除
+    engine.remove_keys(predicate=lambda name: name.startswith('Test_') or name.startswith('X_'))
     
     # X軸の範囲を変えてテスト
     print("X軸の異なる範囲でテスト：\n")
@@ -50,42 +48,34 @@ if obj:
         },
         {
             'name': 'X_Left_Side',
-            'condition': lambda x: -0.4 < x < -0.1,
+            'condition': lambda x: (-0.4 < x) & (x < -0.1),
             'desc': '左側（-0.4 < X < -0.1）'
         },
         {
             'name': 'X_Right_Side',
-            'condition': lambda x: 0.1 < x < 0.4,
+            'condition': lambda x: (0.1 < x) & (x < 0.4),
             'desc': '右側（0.1 < X < 0.4）'
         }
     ]
     
     # 口と思われる高さで、X軸の範囲を変えてテスト
     for test in x_tests:
-        obj.shape_key_add(name=test['name'], from_mix=False)
-        shape_key = mesh.shape_keys.key_blocks[test['name']]
+        # 条件：前面、口の高さ、指定のX範囲
+        if 'x_range' in test:
+            x_condition = abs(bx) < test['x_range']
+        else:
+            x_condition = test['condition'](bx)
+        
+        region = (engine.box(y=(None, -0.4),  # 前面
+                             z=(-0.25, -0.1)) &  # 口の高さ
+                  x_condition)  # X範囲
         
-        count = 0
-        for i, v in enumerate(vertices):
-            co = basis.data[i].co
-            shape_key.data[i].co = co.copy()
-            
-            # 条件：前面、口の高さ、指定のX範囲
-            x_condition = False
-            if 'x_range' in test:
-                x_condition = abs(co.x) < test['x_range']
-            else:
-                x_condition = test['condition'](co.x)
-            
-            if (co.y < -0.4 and  # 前面
-                -0.25 < co.z < -0.1 and  # 口の高さ
-                x_condition):  # X範囲
-                
-                # 前に少し出す
-                shape_key.data[i].co.y -= 0.05
-                count += 1
+        co = engine.new_coords()
+        # 前に少し出す
+        co[region, Y] -= 0.05
+        engine.write_key(test['name'], co)
         
-        print(f"{test['name']}: {count}頂点 - {test['desc']}")
+        print(f"{test['name']}: {region.count}頂点 - {test['desc']}")
     
     # 口の正確な位置を探るため、グリッドテスト
     print("\n\nグリッドテスト（詳細な位置特定）：\n")
@@ -109,23 +99,16 @@ if obj:
     ]
     
     for test in grid_tests:
-        obj.shape_key_add(name=test['name'], from_mix=False)
-        shape_key = mesh.shape_keys.key_blocks[test['name']]
+        # 中央の適度な範囲で
+        region = engine.box(x=(-0.25, 0.25),  # 中央付近
+                            y=(None, -0.4),  # 前面
+                            z=(test['z_min'], test['z_max']))  # 指定の高さ
         
-        count = 0
-        for i, v in enumerate(vertices):
-            co = basis.data[i].co
-            shape_key.data[i].co = co.copy()
-            
-            # 中央の適度な範囲で
-            if (co.y < -0.4 and  # 前面
-                test['z_min'] < co.z < test['z_max'] and  # 指定の高さ
-                abs(co.x) < 0.25):  # 中央付近
-                
-                shape_key.data[i].co.y -= 0.05
-                count += 1
+        co = engine.new_coords()
+        co[region, Y] -= 0.05
+        engine.write_key(test['name'], co)
         
-        print(f"{test['name']}: {count}頂点 - {test['desc']}")
+        print(f"{test['name']}: {region.count}頂点 - {test['desc']}")
     
     # 視覚的な確認用
     print("\n\n視覚確認用シェイプキー：")
@@ -133,25 +116,18 @@ if obj:
     # 口を開く動きのテスト（異なるX範囲）
     for x_max in [0.15, 0.2, 0.25, 0.3]:
         name = f'Mouth_Open_X{int(x_max*100)}'
-        obj.shape_key_add(name=name, from_mix=False)
-        shape_key = mesh.shape_keys.key_blocks[name]
+        region = engine.box(x=(-x_max, x_max),  # X範囲
+                            y=(None, -0.4),  # 前面
+                            z=(-0.25, -0.1))  # 口の高さ
         
-        count = 0
-        for i, v in enumerate(vertices):
-            co = basis.data[i].co
-            shape_key.data[i].co = co.copy()
-            
-            if (co.y < -0.4 and  # 前面
-                -0.25 < co.z < -0.1 and  # 口の高さ
-                abs(co.x) < x_max):  # X範囲
-                
-                # 口を開く動き
-                if co.z < -0.15:  # 下唇
-                    shape_key.data[i].co.z -= 0.06
-                    shape_key.data[i].co.y += 0.02
-                count += 1
+        co = engine.new_coords()
+        # 口を開く動き
+        lower_lip = region & (bz < -0.15)  # 下唇
+        co[lower_lip, Z] -= 0.06
+        co[lower_lip, Y] += 0.02
+        engine.write_key(name, co)
         
-        print(f"{name}: {count}頂点 - X範囲±{x_max}")
+        print(f"{name}: {region.count}頂点 - X範囲±{x_max}")
     
     # 保存
     print("\n保存中...")
@@ -1,29 +1,27 @@
 """
 Y軸を調整して口の位置を特定（X範囲±0.15で固定）
 """
+import os
+import sys
+
 import bpy
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.shape_keys import ShapeKeyEngine, Y, Z
+
 obj = bpy.data.objects.get('HighQualityFaceAvatar')
 
 if obj:
     mesh = obj.data
-    vertices = mesh.vertices
     
     print("=== Y軸（前後）を調整して口の位置を特定 ===")
     print("X範囲: ±0.15で固定\n")
     
-    # 既存のテストシェイプキーを削除
-    if mesh.shape_keys:
-        keys_to_remove = []
-        for key in mesh.shape_keys.key_blocks:
-            if key.name.startswith('Test_') or key.name.startswith('X_') or key.name.startswith('Grid_') or key.name.startswith('Mouth_Open_X') or key.name.startswith('Y_'):
-                keys_to_remove.append(key.name)
-        
-        for key_name in keys_to_remove:
-            obj.active_shape_key_index = mesh.shape_keys.key_blocks.find(key_name)
-            bpy.ops.object.shape_key_remove()
+    engine = ShapeKeyEngine(obj)
+    bz = engine.z
     
-    basis = mesh.shape_keys.key_blocks['Basis']
+    # 既存のテストシェイプキーを削除
+    engine.remove_keys(predicate=lambda name: name.startswith(('Test_', 'X_', 'Grid_', 'Mouth_Open_X', 'Y_')))
     
     # Y軸の範囲を細かく調整
     print("Y軸の異なる範囲でテスト：\n")
@@ -69,34 +67,18 @@ if obj:
     ]
     
     for test in y_tests:
-        obj.shape_key_add(name=test['name'], from_mix=False)
-        shape_key = mesh.shape_keys.key_blocks[test['name']]
+        # 条件：指定のY範囲、口の高さ、X範囲±0.15
+        region = engine.box(x=(-0.15, 0.15),  # X範囲
+                            y=(test.get('y_min'), test['y_max']),  # Y条件
+                            z=(-0.25, -0.1))  # 口の高さ
         
-        count = 0
-        for i, v in enumerate(vertices):
-            co = basis.data[i].co
-            shape_key.data[i].co = co.copy()
-            
-            # Y条件
-            y_condition = False
-            if 'y_min' in test:
-                y_condition = test['y_min'] < co.y < test['y_max']
-            else:
-                y_condition = co.y < test['y_max']
-            
-            # 条件：指定のY範囲、口の高さ、X範囲±0.15
-            if (y_condition and
-                -0.25 < co.z < -0.1 and  # 口の高さ
-                abs(co.x) < 0.15):  # X範囲
-                
-                # 口を開く動き
-                if co.z < -0.15:  # 下唇
-                    shape_key.data[i].co.z -= 0.06
-                else:  # 上唇
-                    shape_key.data[i].co.z -= 0.03
-                count += 1
+        co = engine.new_coords()
+        # 口を開く動き
+        co[region & (bz < -0.15), Z] -= 0.06  # 下唇
+        co[region & ~(bz < -0.15), Z] -= 0.03  # 上唇
+        engine.write_key(test['name'], co)
         
-        print(f"{test['name']}: {count}頂点 - {test['desc']}")
+        print(f"{test['name']}: {region.count}頂点 - {test['desc']}")
     
     # より詳細なY軸テスト
     print("\n\n詳細なY軸位置テスト：\n")
@@ -104,59 +86,43 @@ if obj:
     # 0.1刻みで細かくテスト
     for y_val in [-0.65, -0.55, -0.45, -0.35, -0.25]:
         name = f'Y_Exact_{abs(y_val)*100:.0f}'
-        obj.shape_key_add(name=name, from_mix=False)
-        shape_key = mesh.shape_keys.key_blocks[name]
+        # 特定のY値付近（±0.05の範囲）
+        region = engine.box(x=(-0.15, 0.15),
+                            y=(y_val - 0.05, y_val + 0.05),
+                            z=(-0.25, -0.1))
         
-        count = 0
-        for i, v in enumerate(vertices):
-            co = basis.data[i].co
-            shape_key.data[i].co = co.copy()
-            
-            # 特定のY値付近（±0.05の範囲）
-            if (y_val - 0.05 < co.y < y_val + 0.05 and
-                -0.25 < co.z < -0.1 and
-                abs(co.x) < 0.15):
-                
-                shape_key.data[i].co.z -= 0.05
-                shape_key.data[i].co.y -= 0.03
-                count += 1
+        co = engine.new_coords()
+        co[region, Z] -= 0.05
+        co[region, Y] -= 0.03
+        engine.write_key(name, co)
         
-        print(f"{name}: {count}頂点 - Y≈{y_val}")
+        print(f"{name}: {region.count}頂点 - Y≈{y_val}")
     
     # 最終的な口のシェイプキーテスト
     print("\n\n口の動きテスト（Y軸調整版）：")
     
     # 異なるY範囲で口を開く動き
     mouth_tests = [
-        ('Mouth_Y_Far', lambda y: y < -0.5, 'Y < -0.5'),
-        ('Mouth_Y_Mid', lambda y: -0.5 < y < -0.3, '-0.5 < Y < -0.3'),
-        ('Mouth_Y_Near', lambda y: -0.3 < y < -0.1, '-0.3 < Y < -0.1')
+        ('Mouth_Y_Far', (None, -0.5), 'Y < -0.5'),
+        ('Mouth_Y_Mid', (-0.5, -0.3), '-0.5 < Y < -0.3'),
+        ('Mouth_Y_Near', (-0.3, -0.1), '-0.3 < Y < -0.1')
     ]
     
-    for name, y_condition, desc in mouth_tests:
-        obj.shape_key_add(name=name, from_mix=False)
-        shape_key = mesh.shape_keys.key_blocks[name]
+    for name, y_range, desc in mouth_tests:
+        region = engine.box(x=(-0.15, 0.15), y=y_range, z=(-0.25, -0.1))
         
-        count = 0
-        for i, v in enumerate(vertices):
-            co = basis.data[i].co
-            shape_key.data[i].co = co.copy()
-            
-            if (y_condition(co.y) and
-                -0.25 < co.z < -0.1 and
-                abs(co.x) < 0.15):
-                
-                # 口を開く
-                if co.z < -0.18:  # 下唇
-                    shape_key.data[i].co.z -= 0.08
-                    shape_key.data[i].co.y += 0.02
-                elif co.z < -0.15:  # 口の中間
-                    shape_key.data[i].co.z -= 0.05
-                else:  # 上唇
-                    shape_key.data[i].co.z -= 0.02
-                count += 1
+        co = engine.new_coords()
+        # 口を開く
+        lower_lip = region & (bz < -0.18)  # 下唇
+        middle = region & (bz >= -0.18) & (bz < -0.15)  # 口の中間
+        upper_lip = region & (bz >= -0.15)  # 上唇
+        co[lower_lip, Z] -= 0.08
+        co[lower_lip, Y] += 0.02
+        co[middle, Z] -= 0.05
+        co[upper_lip, Z] -= 0.02
+        engine.write_key(name, co)
         
-        print(f"{name}: {count}頂点 - {desc}")
+        print(f"{name}: {region.count}頂点 - {desc}")
     
     # 保存
     print("\n保存中...")
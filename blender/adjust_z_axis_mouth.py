@@ -3,31 +3,29 @@ Z軸を調整して口の位置を特定
 X範囲: ±0.15
 Y範囲: Y < -0.5
 """
+import os
+import sys
+
 import bpy
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.shape_keys import ShapeKeyEngine, Y, Z
+
 obj = bpy.data.objects.get('HighQualityFaceAvatar')
 
 if obj:
     mesh = obj.data
-    vertices = mesh.vertices
     
     print("=== Z軸（上下）を調整して口の位置を特定 ===")
     print("固定パラメータ：")
     print("- X範囲: ±0.15")
     print("- Y範囲: Y < -0.5\n")
     
-    # 既存のシェイプキーを削除
-    if mesh.shape_keys:
-        keys_to_remove = []
-        for key in mesh.shape_keys.key_blocks:
-            if key.name != 'Basis':
-                keys_to_remove.append(key.name)
-        
-        for key_name in keys_to_remove:
-            obj.active_shape_key_index = mesh.shape_keys.key_blocks.find(key_name)
-            bpy.ops.object.shape_key_remove()
+    engine = ShapeKeyEngine(obj)
+    bz = engine.z
     
-    basis = mesh.shape_keys.key_blocks['Basis']
+    # 既存のシェイプキーを削除
+    engine.remove_keys()
     
     # Z軸の範囲を細かく調整
     print("Z軸の異なる範囲でテスト：\n")
@@ -84,48 +82,31 @@ if obj:
     ]
     
     for test in z_tests:
-        obj.shape_key_add(name=test['name'], from_mix=False)
-        shape_key = mesh.shape_keys.key_blocks[test['name']]
+        # 条件：Y < -0.5、X±0.15、指定のZ範囲
+        region = engine.box(x=(-0.15, 0.15), y=(None, -0.5), z=(test['z_min'], test['z_max']))
         
-        count = 0
-        for i, v in enumerate(vertices):
-            co = basis.data[i].co
-            shape_key.data[i].co = co.copy()
-            
-            # 条件：Y < -0.5、X±0.15、指定のZ範囲
-            if (co.y < -0.5 and
-                abs(co.x) < 0.15 and
-                test['z_min'] < co.z < test['z_max']):
-                
-                # 前に少し出す
-                shape_key.data[i].co.y -= 0.05
-                count += 1
+        co = engine.new_coords()
+        # 前に少し出す
+        co[region, Y] -= 0.05
+        engine.write_key(test['name'], co)
         
-        print(f"{test['name']}: {count}頂点 - {test['desc']}")
+        print(f"{test['name']}: {region.count}頂点 - {test['desc']}")
     
     # より詳細なZ軸テスト（0.05刻み）
     print("\n\n詳細なZ軸位置テスト（0.05刻み）：\n")
     
     for z_center in [0.1, 0.05, 0.0, -0.05, -0.1, -0.15, -0.2, -0.25, -0.3]:
         name = f'Z_Exact_{abs(z_center)*100:.0f}{"N" if z_center < 0 else "P"}'
-        obj.shape_key_add(name=name, from_mix=False)
-        shape_key = mesh.shape_keys.key_blocks[name]
+        # 特定のZ値付近（±0.025の範囲）
+        region = engine.box(x=(-0.15, 0.15), y=(None, -0.5),
+                            z=(z_center - 0.025, z_center + 0.025))
         
-        count = 0
-        for i, v in enumerate(vertices):
-            co = basis.data[i].co
-            shape_key.data[i].co = co.copy()
-            
-            # 特定のZ値付近（±0.025の範囲）
-            if (co.y < -0.5 and
-                abs(co.x) < 0.15 and
-                z_center - 0.025 < co.z < z_center + 0.025):
-                
-                shape_key.data[i].co.y -= 0.05
-                shape_key.data[i].co.z -= 0.03
-                count += 1
+        co = engine.new_coords()
+        co[region, Y] -= 0.05
+        co[region, Z] -= 0.03
+        engine.write_key(name, co)
         
-        print(f"{name}: {count}頂点 - Z≈{z_center:.2f}")
+        print(f"{name}: {region.count}頂点 - Z≈{z_center:.2f}")
     
     # 口の動きテスト（異なるZ範囲）
     print("\n\n口の動きテスト（Z軸調整版）：")
@@ -139,29 +120,17 @@ if obj:
     ]
     
     for name, z_min, z_max, desc in mouth_z_tests:
-        obj.shape_key_add(name=name, from_mix=False)
-        shape_key = mesh.shape_keys.key_blocks[name]
+        region = engine.box(x=(-0.15, 0.15), y=(None, -0.5), z=(z_min, z_max))
         
-        count = 0
-        for i, v in enumerate(vertices):
-            co = basis.data[i].co
-            shape_key.data[i].co = co.copy()
-            
-            if (co.y < -0.5 and
-                abs(co.x) < 0.15 and
-                z_min < co.z < z_max):
-                
-                # 口を開く動き
-                relative_z = (co.z - z_min) / (z_max - z_min)
-                if relative_z < 0.3:  # 下部
-                    shape_key.data[i].co.z -= 0.08
-                elif relative_z < 0.7:  # 中部
-                    shape_key.data[i].co.z -= 0.05
-                else:  # 上部
-                    shape_key.data[i].co.z -= 0.02
-                count += 1
+        co = engine.new_coords()
+        # 口を開く動き
+        relative_z = (bz - z_min) / (z_max - z_min)
+        co[region & (relative_z < 0.3), Z] -= 0.08  # 下部
+        co[region & (relative_z >= 0.3) & (relative_z < 0.7), Z] -= 0.05  # 中部
+        co[region & (relative_z >= 0.7), Z] -= 0.02  # 上部
+        engine.write_key(name, co)
         
-        print(f"{name}: {count}頂点 - {desc}")
+        print(f"{name}: {region.count}頂点 - {desc}")
     
     # 保存
     print("\n保存中...")
@@ -1,9 +1,15 @@
 """
 3次元的に顔の各部位の位置を分析
 """
+import os
+import sys
+
 import bpy
 import math
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.shape_keys import ShapeKeyEngine, Z
+
 obj = bpy.data.objects.get('HighQualityFaceAvatar')
 
 if obj:
@@ -100,63 +106,38 @@ if obj:
     # 4. 口の正確な位置を特定するためのテスト
     print("\n\n【口の位置特定テスト】")
     
-    # 既存のテストキーを削除
-    test_keys = ["Face_Front_Test", "Face_Back_Test", "Mouth_Region_Test"]
-    for key_name in test_keys:
-        if key_name in mesh.shape_keys.key_blocks:
-            obj.active_shape_key_index = mesh.shape_keys.key_blocks.find(key_name)
-            bpy.ops.object.shape_key_remove()
+    engine = ShapeKeyEngine(obj)
     
-    basis = mesh.shape_keys.key_blocks['Basis']
+    # 既存のテストキーを削除
+    engine.remove_keys(["Face_Front_Test", "Face_Back_Test", "Mouth_Region_Test"])
     
     # 顔の前面テスト（最もYが大きい領域）
-    obj.shape_key_add(name="Face_Front_Test", from_mix=False)
-    front_test = mesh.shape_keys.key_blocks["Face_Front_Test"]
-    
-    front_count = 0
-    for i, v in enumerate(vertices):
-        co = basis.data[i].co
-        front_test.data[i].co = co.copy()
-        
-        # Y > 0.5 の領域（前面の候補）
-        if co.y > 0.5 and abs(co.x) < 0.3 and -0.2 < co.z < 0.2:
-            front_test.data[i].co.z -= 0.05
-            front_count += 1
+    # Y > 0.5 の領域（前面の候補）
+    front = engine.box(x=(-0.3, 0.3), y=(0.5, None), z=(-0.2, 0.2))
+    co = engine.new_coords()
+    co[front, Z] -= 0.05
+    engine.write_key("Face_Front_Test", co)
     
-    print(f"Face_Front_Test: {front_count}頂点")
+    print(f"Face_Front_Test: {front.count}頂点")
     
     # 後頭部テスト（最もYが小さい領域）
-    obj.shape_key_add(name="Face_Back_Test", from_mix=False)
-    back_test = mesh.shape_keys.key_blocks["Face_Back_Test"]
-    
-    back_count = 0
-    for i, v in enumerate(vertices):
-        co = basis.data[i].co
-        back_test.data[i].co = co.copy()
-        
-        # Y < -0.5 の領域（後頭部の候補）
-        if co.y < -0.5 and abs(co.x) < 0.3 and -0.2 < co.z < 0.2:
-            back_test.data[i].co.z -= 0.05
-            back_count += 1
+    # Y < -0.5 の領域（後頭部の候補）
+    back = engine.box(x=(-0.3, 0.3), y=(None, -0.5), z=(-0.2, 0.2))
+    co = engine.new_coords()
+    co[back, Z] -= 0.05
+    engine.write_key("Face_Back_Test", co)
     
-    print(f"Face_Back_Test: {back_count}頂点")
+    print(f"Face_Back_Test: {back.count}頂点")
     
     # 画像から推定される口の位置でテスト
     # 顔が正面を向いているなら、Y値が大きく、Z値が0付近
-    obj.shape_key_add(name="Mouth_Region_Test", from_mix=False)
-    mouth_test = mesh.shape_keys.key_blocks["Mouth_Region_Test"]
-    
-    mouth_count = 0
-    for i, v in enumerate(vertices):
-        co = basis.data[i].co
-        mouth_test.data[i].co = co.copy()
-        
-        # 最も前面（Y最大付近）で、顔の下半分
-        if co.y > 0.4 and abs(co.x) < 0.35 and -0.1 < co.z < 0.1:
-            mouth_test.data[i].co.z -= 0.05
-            mouth_count += 1
+    # 最も前面（Y最大付近）で、顔の下半分
+    mouth = engine.box(x=(-0.35, 0.35), y=(0.4, None), z=(-0.1, 0.1))
+    co = engine.new_coords()
+    co[mouth, Z] -= 0.05
+    engine.write_key("Mouth_Region_Test", co)
     
-    print(f"Mouth_Region_Test: {mouth_count}頂点")
+    print(f"Mouth_Region_Test: {mouth.count}頂点")
     
     # 保存
     print("\n保存中...")
@@ -1,8 +1,14 @@
 """
 画像から判断して、実際の口の位置を正確に特定
 """
+import os
+import sys
+
 import bpy
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.shape_keys import ShapeKeyEngine, Y, Z
+
 obj = bpy.data.objects.get('HighQualityFaceAvatar')
 
 if obj:
@@ -49,56 +55,36 @@ if obj:
     # 新しいテスト用シェイプキーを作成
     print("\n\n正しい位置でテスト用シェイプキーを作成...")
     
+    engine = ShapeKeyEngine(obj)
+    
     # 古いテストキーを削除
-    test_keys = ["Real_Mouth_Test", "Real_Upper_Lip", "Real_Lower_Lip"]
-    for key_name in test_keys:
-        if key_name in mesh.shape_keys.key_blocks:
-            obj.active_shape_key_index = mesh.shape_keys.key_blocks.find(key_name)
-            bpy.ops.object.shape_key_remove()
+    engine.remove_keys(["Real_Mouth_Test", "Real_Upper_Lip", "Real_Lower_Lip"])
     
     # 口の実際の位置でテスト
     # 画像から判断すると、口は顔の適切な位置にある
-    basis = mesh.shape_keys.key_blocks['Basis']
-    
     # 顔の前面かつ中央付近の頂点を対象に
-    obj.shape_key_add(name="Real_Mouth_Test", from_mix=False)
-    mouth_test = mesh.shape_keys.key_blocks["Real_Mouth_Test"]
-    
-    modified = 0
-    for i, v in enumerate(vertices):
-        co = basis.data[i].co
-        mouth_test.data[i].co = co.copy()
-        
-        # 条件: 顔の前面、中央付近、適切な高さ
-        if (co.y > 0.35 and  # 前面
-            abs(co.x) < 0.4 and  # 中央付近
-            -0.1 < co.z < 0.15):  # 口の高さ（画像から推定）
-            
-            # 口を開く動き
-            mouth_test.data[i].co.z -= 0.05
-            mouth_test.data[i].co.y -= 0.02
-            modified += 1
-    
-    print(f"Real_Mouth_Test: {modified}頂点を変形")
+    # 条件: 顔の前面、中央付近、適切な高さ
+    region = engine.box(x=(-0.4, 0.4),  # 中央付近
+                        y=(0.35, None),  # 前面
+                        z=(-0.1, 0.15))  # 口の高さ（画像から推定）
+    co = engine.new_coords()
+    # 口を開く動き
+    co[region, Z] -= 0.05
+    co[region, Y] -= 0.02
+    engine.write_key("Real_Mouth_Test", co)
+    
+    print(f"Real_Mouth_Test: {region.count}頂点を変形")
     
     # 別の範囲でもテスト
-    obj.shape_key_add(name="Real_Mouth_Alt", from_mix=False)
-    mouth_alt = mesh.shape_keys.key_blocks["Real_Mouth_Alt"]
-    
-    modified = 0
-    for i, v in enumerate(vertices):
-        co = basis.data[i].co
-        mouth_alt.data[i].co = co.copy()
-        
-        # 別の条件
-        if (co.y > 0.3 and  # より広い前面
-            abs(co.x) < 0.5 and  # より広い中央
-            0.0 < co.z < 0.25):  # 少し高め
-            
-            mouth_alt.data[i].co.z -= 0.04
-            modified += 1
-    
-    print(f"Real_Mouth_Alt: {modified}頂点を変形")
+    # 別の条件
+    region = engine.box(x=(-0.5, 0.5),  # より広い中央
+                        y=(0.3, None),  # より広い前面
+                        z=(0.0, 0.25))  # 少し高め
+    co = engine.new_coords()
+    co[region, Z] -= 0.04
+    engine.write_key("Real_Mouth_Alt", co)
+    
+    print(f"Real_Mouth_Alt: {region.count}頂点を変形")
     
     # 保存
     print("\n保存中...")
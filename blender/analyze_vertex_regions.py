@@ -1,32 +1,37 @@
 """
 頂点の位置を分析して、実際の口の位置を特定
 """
+import os
+import sys
+
 import bpy
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.profiling import profile_coords
+from avatar_tools.shape_keys import X, Y, Z, read_coords
 
 obj = bpy.data.objects.get('HighQualityFaceAvatar')
 
 if obj:
     mesh = obj.data
-    vertices = mesh.vertices
     
     print("=== 頂点位置の分析 ===\n")
     
-    # Z座標の分布を調べる
-    z_coords = [v.co.z for v in vertices]
-    z_min = min(z_coords)
-    z_max = max(z_coords)
+    # 座標は一度だけ取得し、分布はまとめて計算する
+    coords = read_coords(mesh.vertices)
+    report = profile_coords(coords, bins=10)
+    z_min, z_max = report['axes']['z']['min'], report['axes']['z']['max']
     
     print(f"Z座標の範囲: {z_min:.2f} 〜 {z_max:.2f}")
     print(f"範囲: {z_max - z_min:.2f}\n")
     
     # Z座標を10段階に分けて分析
-    step = (z_max - z_min) / 10
     print("高さ別の頂点分布:")
     
-    for i in range(10):
-        z_start = z_min + i * step
-        z_end = z_min + (i + 1) * step
-        count = sum(1 for z in z_coords if z_start <= z < z_end)
+    z_hist = report['histograms']['z']
+    for i, count in enumerate(z_hist['counts']):
+        z_start, z_end = z_hist['edges'][i], z_hist['edges'][i + 1]
         
         # 推定される部位
         if i < 2:
@@ -44,55 +49,48 @@ if obj:
     
     # Y座標（前後）も確認
     print("\n前後位置の分析:")
-    y_coords = [v.co.y for v in vertices]
-    y_min = min(y_coords)
-    y_max = max(y_coords)
+    y_min, y_max = report['axes']['y']['min'], report['axes']['y']['max']
     print(f"Y座標の範囲: {y_min:.2f} 〜 {y_max:.2f}")
     
     # 口の可能性が高い領域を特定
     print("\n口の可能性が高い頂点を探索中...")
     
     # 口は通常、顔の中央下部、前方にある
-    mouth_candidates = []
-    for i, v in enumerate(vertices):
-        # 条件：中央付近、下部、前方
-        if (abs(v.co.x) < 0.5 and  # 中央付近
-            z_min + 0.3 * (z_max - z_min) < v.co.z < z_min + 0.5 * (z_max - z_min) and  # 下部
-            v.co.y > y_min + 0.7 * (y_max - y_min)):  # 前方
-            mouth_candidates.append((i, v.co))
+    # 条件：中央付近、下部、前方
+    z_range = z_max - z_min
+    mouth = ((np.abs(coords[:, X]) < 0.5) &
+             (coords[:, Z] > z_min + 0.3 * z_range) & (coords[:, Z] < z_min + 0.5 * z_range) &
+             (coords[:, Y] > y_min + 0.7 * (y_max - y_min)))
+    mouth_candidates = np.flatnonzero(mouth)
     
     print(f"口候補の頂点数: {len(mouth_candidates)}")
     
-    if mouth_candidates:
+    if len(mouth_candidates):
         # サンプルを表示
         print("\n口候補のサンプル頂点:")
-        for i, (idx, co) in enumerate(mouth_candidates[:5]):
-            print(f"  頂点{idx}: X={co.x:.2f}, Y={co.y:.2f}, Z={co.z:.2f}")
+        for idx in mouth_candidates[:5]:
+            x, y, z = coords[idx]
+            print(f"  頂点{idx}: X={x:.2f}, Y={y:.2f}, Z={z:.2f}")
         
         # 口領域の中心を計算
-        avg_x = sum(co.x for _, co in mouth_candidates) / len(mouth_candidates)
-        avg_y = sum(co.y for _, co in mouth_candidates) / len(mouth_candidates)
-        avg_z = sum(co.z for _, co in mouth_candidates) / len(mouth_candidates)
+        avg_x, avg_y, avg_z = coords[mouth_candidates].mean(axis=0)
         
-        print(f"\n推定される口の中心位置:")
+        print("\n推定される口の中心位置:")
         print(f"  X: {avg_x:.2f}")
         print(f"  Y: {avg_y:.2f}")
         print(f"  Z: {avg_z:.2f}")
         
-        print(f"\n口の変形に適したZ座標範囲:")
+        print("\n口の変形に適したZ座標範囲:")
         print(f"  {avg_z - 0.2:.2f} 〜 {avg_z + 0.1:.2f}")
     
     # 現在動いている頂点を確認
     print("\n現在のシェイプキーで動いている頂点の位置:")
-    test_key = mesh.shape_keys.key_blocks.get('Test_SimpleMove')
+    test_key = mesh.shape_keys.key_blocks.get('Test_SimpleMove') if mesh.shape_keys else None
     if test_key:
-        basis = mesh.shape_keys.key_blocks['Basis']
-        moved_z_coords = []
-        
-        for i in range(len(vertices)):
-            if (test_key.data[i].co - basis.data[i].co).length > 0.001:
-                moved_z_coords.append(basis.data[i].co.z)
+        basis = read_coords(mesh.shape_keys.key_blocks['Basis'].data)
+        moved = np.linalg.norm(read_coords(test_key.data) - basis, axis=1) > 0.001
         
-        if moved_z_coords:
-            print(f"  動いている頂点のZ座標範囲: {min(moved_z_coords):.2f} 〜 {max(moved_z_coords):.2f}")
-            print(f"  → これは首の領域です！")
\ No newline at end of file
+        if moved.any():
+            moved_z = basis[moved, Z]
+            print(f"  動いている頂点のZ座標範囲: {moved_z.min():.2f} 〜 {moved_z.max():.2f}")
+            print("  → これは首の領域です！")
@@ -1,51 +1,47 @@
 """
 解剖学的な観点から3次元で顔の構造を分析
 """
+import os
+import sys
+
 import bpy
 import math
+import mathutils
 from collections import defaultdict
 import numpy as np
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.shape_keys import read_coords, X
+from avatar_tools.symmetry import SymmetryMap
+
 obj = bpy.data.objects.get('HighQualityFaceAvatar')
 
 if obj:
     mesh = obj.data
     vertices = mesh.vertices
+    coords = read_coords(vertices)
     
     print("=== 解剖学的3次元分析 ===\n")
     
     # 1. 重心の計算
     print("【1. モデルの重心分析】")
-    center_x = sum(v.co.x for v in vertices) / len(vertices)
-    center_y = sum(v.co.y for v in vertices) / len(vertices)
-    center_z = sum(v.co.z for v in vertices) / len(vertices)
+    center_x, center_y, center_z = (float(c) for c in coords.mean(axis=0))
     
     print(f"重心座標: ({center_x:.3f}, {center_y:.3f}, {center_z:.3f})")
     
     # 2. 対称性分析（解剖学的に顔は左右対称）
     print("\n【2. 対称性分析】")
     
-    # 左右の頂点をペアリング
+    # 左右の頂点を KD-tree でペアリング（|X| <= 0.01 は中心線上とみなす）
     tolerance = 0.05
-    symmetric_pairs = 0
-    asymmetric_vertices = []
-    
-    for v in vertices:
-        if v.co.x > 0.01:  # 右側の頂点
-            # 対応する左側の頂点を探す
-            mirror_found = False
-            for u in vertices:
-                if (abs(u.co.x + v.co.x) < tolerance and 
-                    abs(u.co.y - v.co.y) < tolerance and 
-                    abs(u.co.z - v.co.z) < tolerance):
-                    symmetric_pairs += 1
-                    mirror_found = True
-                    break
-            if not mirror_found:
-                asymmetric_vertices.append(v)
-    
-    print(f"対称的な頂点ペア: {symmetric_pairs}")
-    print(f"非対称な頂点: {len(asymmetric_vertices)}")
+    symmetry = SymmetryMap.from_coords(coords, tolerance=tolerance, center_tolerance=0.01)
+    asymmetric_vertices = symmetry.unmatched
+    asymmetric_x = coords[asymmetric_vertices, X]
+    
+    print(f"対称的な頂点ペア: {len(symmetry.pairs)}")
+    print(f"中心線上の頂点: {len(symmetry.center)}")
+    print(f"非対称な頂点: {len(asymmetric_vertices)}"
+          f"（右側 {int((asymmetric_x > 0).sum())} / 左側 {int((asymmetric_x < 0).sum())}）")
     
     # 3. 表面の曲率分析（顔の凸凹）
     print("\n【3. 表面の曲率分析】")
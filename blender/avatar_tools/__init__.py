@@ -0,0 +1,10 @@
+"""
+アバター制作用の共通ライブラリ（Blender内で使用）
+
+blender/ 以下のスクリプトから次のように読み込む:
+
+    import os
+    import sys
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from avatar_tools.shape_keys import ShapeKeyEngine
+"""
@@ -0,0 +1,175 @@
+"""
+シェイプキーの変位解析
+
+全シェイプキーの座標を (キー数, 頂点数, 3) の配列に一度で読み込み、
+最大・平均変位、動く頂点数、動く領域のバウンディングボックス、
+キー同士の重なり（共通して動く頂点数）をまとめて計算する。
+結果は座標とキー名の内容ハッシュごとにメモリとディスクへ保存するため、
+同じメッシュを何度診断しても 2 回目以降は読み込みとハッシュ計算だけで済む。
+
+使用例:
+    stats = analyze_shape_keys(mesh)
+    info = stats.summary('Mouth_Open')
+    print(info['affected'], info['max'], info['bbox_min'])
+"""
+import hashlib
+import os
+import tempfile
+import warnings
+
+import numpy as np
+
+# 大きく動く頂点として保持する数
+TOP_VERTICES = 10
+
+CACHE_DIR = os.path.join(tempfile.gettempdir(), 'avatar_tools_shape_keys')
+
+_memory_cache = {}
+
+
+def read_key_coords(mesh):
+    """全シェイプキーの座標を (K, N, 3) 配列で取得（先頭は基準キー）"""
+    key = mesh.shape_keys
+    blocks = [key.reference_key] + [kb for kb in key.key_blocks if kb != key.reference_key]
+    count = len(mesh.vertices)
+    coords = np.empty((len(blocks), count * 3), dtype=np.float32)
+    for row, kb in zip(coords, blocks):
+        kb.data.foreach_get('co', row)
+    return [kb.name for kb in blocks], coords.reshape(len(blocks), count, 3)
+
+
+def mesh_digest(names, coords, threshold):
+    h = hashlib.sha1()
+    h.update('\0'.join(names).encode('utf-8'))
+    h.update(np.float32(threshold).tobytes())
+    h.update(np.ascontiguousarray(coords).tobytes())
+    return h.hexdigest()
+
+
+class ShapeKeyStats:
+    """基準キー以外の各シェイプキーの変位統計"""
+
+    FIELDS = ('max', 'mean', 'affected', 'bbox_min', 'bbox_max', 'overlap',
+              'top_vertices', 'top_displacements', 'basis_top')
+
+    def __init__(self, names, vertex_count, threshold, **arrays):
+        # names[0] は基準キー。統計はそれ以外のキーの順に並ぶ
+        self.names = list(names)
+        self.vertex_count = vertex_count
+        self.threshold = threshold
+        for field in self.FIELDS:
+            setattr(self, field, arrays[field])
+        self._index = {name: i for i, name in enumerate(self.names[1:])}
+
+    @classmethod
+    def compute(cls, names, coords, threshold=0.001):
+        """coords: (K, N, 3)、先頭が基準キー"""
+        basis = coords[0]
+        disp = np.linalg.norm(coords[1:] - basis, axis=2)           # (K-1, N)
+        moved = disp > threshold
+        affected = moved.sum(axis=1)
+        mean = np.where(moved, disp, 0.0).sum(axis=1) / np.maximum(affected, 1)
+
+        # 動く頂点の基準座標のバウンディングボックス（動かないキーは NaN）
+        masked = np.where(moved[:, :, None], basis[None], np.nan)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            bbox_min = np.nanmin(masked, axis=1)
+            bbox_max = np.nanmax(masked, axis=1)
+
+        # 重なり: キー i と j の両方で動く頂点数
+        moved_f = moved.astype(np.float32)
+        overlap = np.rint(moved_f @ moved_f.T).astype(np.int64)
+
+        # 変位の大きい頂点（全体をソートせず argpartition で上位だけ取る）
+        top = min(TOP_VERTICES, disp.shape[1])
+        top_vertices = np.argpartition(-disp, top - 1, axis=1)[:, :top]
+        order = np.argsort(-np.take_along_axis(disp, top_vertices, axis=1), axis=1)
+        top_vertices = np.take_along_axis(top_vertices, order, axis=1)
+        return cls(names, basis.shape[0], threshold,
+                   max=disp.max(axis=1),
+                   mean=mean, affected=affected, bbox_min=bbox_min, bbox_max=bbox_max,
+                   overlap=overlap, top_vertices=top_vertices,
+                   top_displacements=np.take_along_axis(disp, top_vertices, axis=1),
+                   basis_top=basis[top_vertices])
+
+    # --- 参照 ---
+
+    @property
+    def keys(self):
+        return self.names[1:]
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def summary(self, name):
+        """1 キー分の統計を辞書で返す"""
+        i = self._index[name]
+        moved = self.affected[i] > 0
+        return {
+            'name': name,
+            'affected': int(self.affected[i]),
+            'ratio': float(self.affected[i]) / max(self.vertex_count, 1),
+            'max': float(self.max[i]),
+            'mean': float(self.mean[i]),
+            'bbox_min': tuple(self.bbox_min[i].tolist()) if moved else None,
+            'bbox_max': tuple(self.bbox_max[i].tolist()) if moved else None,
+            'center': tuple(((self.bbox_min[i] + self.bbox_max[i]) / 2).tolist()) if moved else None,
+            'size': tuple((self.bbox_max[i] - self.bbox_min[i]).tolist()) if moved else None,
+            # (頂点番号, 変位, 基準座標) を変位の大きい順に
+            'top': [(int(v), float(d), tuple(co.tolist()))
+                    for v, d, co in zip(self.top_vertices[i], self.top_displacements[i], self.basis_top[i])
+                    if d > 0],
+        }
+
+    def overlapping(self, name, min_ratio=0.5):
+        """name の動く頂点の min_ratio 以上を共有するキー [(名前, 共通頂点数)]"""
+        i = self._index[name]
+        count = self.affected[i]
+        if count == 0:
+            return []
+        shared = self.overlap[i]
+        hits = np.flatnonzero(shared >= count * min_ratio)
+        return [(self.keys[j], int(shared[j])) for j in hits if j != i]
+
+    def static_keys(self):
+        """どの頂点も動かさないキーの名前"""
+        return [self.keys[i] for i in np.flatnonzero(self.affected == 0)]
+
+    # --- 保存 ---
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp.npz'
+        np.savez(tmp, names=np.array(self.names), vertex_count=self.vertex_count,
+                 threshold=self.threshold, **{field: getattr(self, field) for field in self.FIELDS})
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['names'].tolist(), int(data['vertex_count']), float(data['threshold']),
+                       **{field: data[field] for field in cls.FIELDS})
+
+
+def analyze_shape_keys(mesh, threshold=0.001, cache_dir=CACHE_DIR):
+    """
+    メッシュの全シェイプキーを解析する（内容ハッシュでキャッシュ）
+
+    cache_dir=None ならディスクには保存しない
+    """
+    names, coords = read_key_coords(mesh)
+    digest = mesh_digest(names, coords, threshold)
+    stats = _memory_cache.get(digest)
+    if stats is not None:
+        return stats
+
+    path = os.path.join(cache_dir, digest + '.npz') if cache_dir else None
+    if path and os.path.exists(path):
+        stats = ShapeKeyStats.load(path)
+    else:
+        stats = ShapeKeyStats.compute(names, coords, threshold)
+        if path:
+            stats.save(path)
+    _memory_cache[digest] = stats
+    return stats
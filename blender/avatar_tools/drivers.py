@@ -0,0 +1,177 @@
+"""
+Python を使わないドライバーの作成と検査
+
+SCRIPTED ドライバーは、式が Blender の単純式（四則演算・比較・min/max/clamp
+などの組み込み関数）に収まれば C 側で評価されるが、それ以外は依存グラフの
+更新ごとに Python インタプリタを呼ぶ。ここでは
+
+- 線形な対応（a * 変数の和 + b、範囲制限つき）は SUM / AVERAGE ドライバーと
+  F-カーブモディファイアー（Generator・Limits）で作る
+- それ以外は単純式として評価できることを確認してから SCRIPTED にする
+
+python_drivers() で、Python を必要とするドライバーを一覧できる。
+
+使用例:
+    add_driver(key_block, 'value', [transform_var('jaw', rig, 'Jaw', 'ROT_X')],
+               scale=-2.0, clamp=(0.0, 1.0))
+    add_driver(key_block, 'value', [prop_var('a', ctrl, 'vowel_a'),
+                                    prop_var('k', ctrl, 'talk_intensity')], expression='a * k')
+"""
+import ast
+
+# Blender の単純式評価器（BLI_expr_pylike_eval）で使える関数と定数
+SIMPLE_FUNCTIONS = {
+    'min', 'max', 'abs', 'fabs', 'floor', 'ceil', 'trunc', 'int',
+    'sin', 'cos', 'tan', 'asin', 'acos', 'atan', 'atan2', 'exp', 'log',
+    'sqrt', 'pow', 'fmod', 'radians', 'degrees', 'clamp', 'lerp', 'smoothstep',
+}
+SIMPLE_CONSTANTS = {'pi', 'True', 'False', 'frame'}
+
+_SIMPLE_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp,
+    ast.Call, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Mod, ast.USub, ast.UAdd, ast.Not,
+    ast.And, ast.Or, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+)
+
+
+class DriverError(Exception):
+    """単純式として評価できない式"""
+
+
+def is_simple_expression(expression, variables=()):
+    """式が Python を使わずに評価できるか（Blender の単純式の範囲か）"""
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except SyntaxError:
+        return False
+    names = set(variables) | SIMPLE_CONSTANTS
+    for node in ast.walk(tree):
+        if not isinstance(node, _SIMPLE_NODES):
+            return False
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            return False
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in SIMPLE_FUNCTIONS or node.keywords:
+                return False
+        elif isinstance(node, ast.Name) and node.id not in names and node.id not in SIMPLE_FUNCTIONS:
+            return False
+    return True
+
+
+# --- 変数 ---
+
+def prop_var(name, id_block, prop):
+    """カスタムプロパティ id_block[prop] を読む変数"""
+    return {'name': name, 'type': 'SINGLE_PROP', 'id': id_block, 'data_path': f'["{prop}"]'}
+
+
+def transform_var(name, id_block, bone, transform_type, space='LOCAL_SPACE'):
+    """ボーン（またはオブジェクト）のトランスフォームを読む変数"""
+    return {'name': name, 'type': 'TRANSFORMS', 'id': id_block, 'bone_target': bone,
+            'transform_type': transform_type, 'transform_space': space}
+
+
+def _add_variable(driver, spec):
+    var = driver.variables.new()
+    var.name = spec['name']
+    var.type = spec['type']
+    target = var.targets[0]
+    target.id = spec['id']
+    for key in ('data_path', 'bone_target', 'transform_type', 'transform_space'):
+        if key in spec and spec[key]:
+            setattr(target, key, spec[key])
+    return var
+
+
+# --- ドライバー ---
+
+def add_driver(owner, path, variables, expression=None, index=-1,
+               scale=1.0, offset=0.0, clamp=None, average=False):
+    """
+    owner.path にドライバーを追加し、F-カーブを返す
+
+    expression なし: SUM（average=True なら AVERAGE）ドライバーで
+        値 = scale * 変数の和 + offset を Generator、clamp=(min, max) を Limits で表す
+    expression あり: 単純式であることを確認して SCRIPTED にする
+    """
+    names = [spec['name'] for spec in variables]
+    if expression is not None and not is_simple_expression(expression, names):
+        raise DriverError(f"単純式として評価できません（Python が必要）: {expression}")
+
+    owner.driver_remove(path, index)
+    fcurve = owner.driver_add(path, index)
+    driver = fcurve.driver
+    for spec in variables:
+        _add_variable(driver, spec)
+
+    # driver_add が付ける既定の Generator は作り直す
+    for modifier in list(fcurve.modifiers):
+        fcurve.modifiers.remove(modifier)
+
+    if expression is not None:
+        driver.type = 'SCRIPTED'
+        driver.expression = expression
+        return fcurve
+
+    driver.type = 'AVERAGE' if average else 'SUM'
+    if scale != 1.0 or offset != 0.0:
+        generator = fcurve.modifiers.new('GENERATOR')
+        generator.mode = 'POLYNOMIAL'
+        generator.poly_order = 1
+        generator.coefficients = (offset, scale)
+    if clamp is not None:
+        limits = fcurve.modifiers.new('LIMITS')
+        low, high = clamp
+        if low is not None:
+            limits.use_min_y, limits.min_y = True, low
+        if high is not None:
+            limits.use_max_y, limits.max_y = True, high
+    return fcurve
+
+
+# --- 検査 ---
+
+def _animated_ids():
+    import bpy
+    collections = (bpy.data.objects, bpy.data.shape_keys, bpy.data.armatures,
+                   bpy.data.meshes, bpy.data.materials, bpy.data.node_groups)
+    for collection in collections:
+        for id_block in collection:
+            if id_block.animation_data is not None:
+                yield id_block
+
+
+def needs_python(driver):
+    """ドライバーの評価に Python が必要か"""
+    if driver.type != 'SCRIPTED':
+        return False
+    if driver.use_self:
+        return True
+    # Blender が判定した結果があればそれを使う
+    if hasattr(driver, 'is_simple_expression'):
+        return not driver.is_simple_expression
+    return not is_simple_expression(driver.expression, [var.name for var in driver.variables])
+
+
+def python_drivers(ids=None):
+    """Python を必要とするドライバー [(ID 名, data_path, 式)]"""
+    found = []
+    for id_block in ids if ids is not None else _animated_ids():
+        for fcurve in id_block.animation_data.drivers:
+            driver = fcurve.driver
+            if needs_python(driver):
+                found.append((id_block.name, fcurve.data_path, driver.expression))
+    return found
+
+
+def report_python_drivers(ids=None):
+    """Python を必要とするドライバーを表示し、件数を返す"""
+    found = python_drivers(ids)
+    if not found:
+        print("✓ すべてのドライバーが Python なしで評価されます")
+    else:
+        print(f"⚠️  Python で評価されるドライバー: {len(found)}件")
+        for name, path, expression in found:
+            print(f"   {name}: {path} = {expression}")
+    return len(found)
@@ -0,0 +1,101 @@
+"""
+レンダリング画像の知覚的な差分
+
+2 枚の画像（(高さ, 幅, 3 or 4) の 0〜1 配列）を
+
+- SSIM（輝度の構造的類似度、積分画像による箱型窓で計算）
+- CIE76 の色差 ΔE（L*a*b*）が知覚できる差（既定 2.3）を超える画素の割合
+
+で比べる。アンチエイリアスの揺れのような 1 画素単位の小さな差では
+落ちず、唇の形が変わったときだけ落ちるようにするため、画素値の
+完全一致ではなくこの 2 つを使う。
+
+使用例:
+    result = compare(golden, current)
+    if result['ssim'] < 0.98 or result['changed'] > 0.002:
+        write_image('diff.png', result['heatmap'])
+"""
+import numpy as np
+
+# 知覚できる最小の色差（JND）
+JND = 2.3
+
+_SRGB_TO_XYZ = np.array([[0.4124, 0.3576, 0.1805],
+                         [0.2126, 0.7152, 0.0722],
+                         [0.0193, 0.1192, 0.9505]])
+_WHITE = np.array([0.95047, 1.0, 1.08883])
+
+
+def srgb_to_lab(rgb):
+    """sRGB（0〜1）→ CIE L*a*b*"""
+    rgb = np.clip(np.asarray(rgb, dtype=np.float64)[..., :3], 0.0, 1.0)
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ _SRGB_TO_XYZ.T / _WHITE
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([116 * f[..., 1] - 16,
+                     500 * (f[..., 0] - f[..., 1]),
+                     200 * (f[..., 1] - f[..., 2])], axis=-1)
+
+
+def luminance(rgb):
+    rgb = np.asarray(rgb, dtype=np.float64)
+    return rgb[..., 0] * 0.2126 + rgb[..., 1] * 0.7152 + rgb[..., 2] * 0.0722
+
+
+def _box_mean(image, radius):
+    """(2r+1)² の箱型窓の平均（端は窓を縮める）。積分画像で O(画素数)"""
+    height, width = image.shape
+    integral = np.zeros((height + 1, width + 1))
+    integral[1:, 1:] = image.cumsum(axis=0).cumsum(axis=1)
+    ys, xs = np.arange(height), np.arange(width)
+    y0, y1 = np.clip(ys - radius, 0, height), np.clip(ys + radius + 1, 0, height)
+    x0, x1 = np.clip(xs - radius, 0, width), np.clip(xs + radius + 1, 0, width)
+    total = (integral[y1][:, x1] - integral[y0][:, x1] - integral[y1][:, x0] + integral[y0][:, x0])
+    area = (y1 - y0)[:, None] * (x1 - x0)[None, :]
+    return total / area
+
+
+def ssim_map(a, b, radius=3):
+    """輝度の SSIM マップ（値域 1 の画像用の定数）"""
+    c1, c2 = 0.01 ** 2, 0.03 ** 2
+    mu_a, mu_b = _box_mean(a, radius), _box_mean(b, radius)
+    var_a = _box_mean(a * a, radius) - mu_a ** 2
+    var_b = _box_mean(b * b, radius) - mu_b ** 2
+    cov = _box_mean(a * b, radius) - mu_a * mu_b
+    return (((2 * mu_a * mu_b + c1) * (2 * cov + c2)) /
+            ((mu_a ** 2 + mu_b ** 2 + c1) * (var_a + var_b + c2)))
+
+
+def compare(golden, current, jnd=JND, radius=3):
+    """
+    2 枚の画像を比べる
+
+    戻り値: {'ssim': 平均 SSIM, 'changed': ΔE > jnd の画素の割合,
+             'max_delta_e': 最大色差, 'heatmap': 差分の可視化 (高さ, 幅, 4)}
+    """
+    golden = np.asarray(golden, dtype=np.float64)
+    current = np.asarray(current, dtype=np.float64)
+    if golden.shape[:2] != current.shape[:2]:
+        raise ValueError(f"画像の大きさが違います: {golden.shape[:2]} != {current.shape[:2]}")
+
+    delta_e = np.linalg.norm(srgb_to_lab(golden) - srgb_to_lab(current), axis=-1)
+    changed = delta_e > jnd
+    ssim = ssim_map(luminance(golden), luminance(current), radius)
+
+    # 現在の画像を暗いグレーにし、知覚できる差を赤で重ねる
+    heatmap = np.empty(current.shape[:2] + (4,))
+    gray = luminance(current) * 0.4
+    heatmap[..., 0] = gray
+    heatmap[..., 1] = gray
+    heatmap[..., 2] = gray
+    heatmap[..., 3] = 1.0
+    strength = np.clip(delta_e / (jnd * 10), 0.0, 1.0)[changed]
+    heatmap[changed, 0] = 0.4 + 0.6 * strength
+    heatmap[changed, 1] = 0.0
+    heatmap[changed, 2] = 0.0
+    return {
+        'ssim': float(ssim.mean()),
+        'changed': float(changed.mean()),
+        'max_delta_e': float(delta_e.max()),
+        'heatmap': heatmap.astype(np.float32),
+    }
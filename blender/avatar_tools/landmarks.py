@@ -0,0 +1,370 @@
+"""
+顔のランドマーク検出（メッシュに依存しない口元の位置決め）
+
+座標の箱（y_min, y_max = -0.65, -0.54 など）をアバターごとに調べ直す代わりに、
+メッシュの形から鼻先・上唇・口裂（唇の合わせ目）・下唇・顎先・口角・顎関節を求める。
+
+1. 左右対称面（X）付近の前向き（-Y 向き）の頂点から正中の横顔プロファイルを作る
+2. 鼻先から下へプロファイルの前後の折り返し（出っ張り・くぼみ）をたどり、
+   上唇・口裂・下唇・顎先を決める
+3. 平均曲率（アンブレラ演算子）で凹んだ頂点のうち、口裂とつながる成分を
+   唇の合わせ目の線とし、その左右の端を口角とする
+
+すべて頂点・エッジ配列への演算で、数十万頂点の頭部でも1秒かからない。
+結果はランドマークごとの頂点グループ（Landmark_*）と、座標のハッシュつきの
+カスタムプロパティに保存し、メッシュが変わらない限り再計算しない。
+
+使用例:
+    marks = landmarks_for(obj)
+    mouth = engine.box(**marks.mouth_box())
+    upper_lip = mouth & (engine.z > marks['stomion'][2] + marks.lip_gap)
+"""
+import hashlib
+import json
+
+import numpy as np
+
+from .diagnostics import connected_components, read_edges
+from .regions import RegionMask, X, Y, Z
+from .shape_keys import read_coords
+
+# 表面上のランドマーク（頂点グループとして保存する）
+SURFACE_POINTS = ('nose_tip', 'upper_lip', 'stomion', 'lower_lip', 'chin',
+                  'mouth_corner_l', 'mouth_corner_r')
+# 顎関節は頭の内部にあるため位置だけを持つ
+POINTS = SURFACE_POINTS + ('jaw_pivot',)
+
+GROUP_PREFIX = 'Landmark_'
+LIP_LINE_GROUP = GROUP_PREFIX + 'LipLine'
+CACHE_PROPERTY = 'avatar_landmarks'
+
+
+class LandmarkError(Exception):
+    """メッシュからランドマークを決められない"""
+
+
+# --- 形状の統計 ---
+
+def read_normals(mesh):
+    """頂点法線を (N, 3) 配列で取得"""
+    normals = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get('normal', normals)
+    return normals.reshape(-1, 3)
+
+
+def mean_curvature(coords, normals, edges):
+    """
+    アンブレラ演算子による頂点ごとの平均曲率の近似
+
+    隣接頂点の重心へのベクトルを法線へ射影し、平均エッジ長の 2 乗で割る。
+    凸（鼻先・唇の山）が正、凹（口裂・しわ）が負。
+    """
+    count = len(coords)
+    u, v = edges[:, 0], edges[:, 1]
+    degree = np.bincount(edges.ravel(), minlength=count).astype(np.float64)
+    neighbor_sum = np.empty((count, 3))
+    for axis in (X, Y, Z):
+        neighbor_sum[:, axis] = (np.bincount(u, coords[v, axis], minlength=count) +
+                                 np.bincount(v, coords[u, axis], minlength=count))
+    lengths = np.linalg.norm(coords[u] - coords[v], axis=1)
+    mean_length = np.bincount(edges.ravel(), np.repeat(lengths, 2), minlength=count)
+
+    connected = degree > 0
+    curvature = np.zeros(count)
+    laplacian = neighbor_sum[connected] / degree[connected, None] - coords[connected]
+    mean_length = mean_length[connected] / degree[connected]
+    curvature[connected] = (-(laplacian * normals[connected]).sum(axis=1) /
+                            np.maximum(mean_length, 1e-9) ** 2)
+    return curvature
+
+
+def _turning_points(values, tol):
+    """
+    tol 以上戻った位置で確定する折り返し点 [(インデックス, 'min' / 'max')]
+
+    小さな凹凸（tol 未満）は無視する。最後の未確定の極値も含める。
+    """
+    points = []
+    lo = hi = 0
+    direction = 0
+    extreme = 0
+    for i in range(1, len(values)):
+        value = values[i]
+        if direction == 0:
+            if value > values[hi]:
+                hi = i
+            if value < values[lo]:
+                lo = i
+            if values[hi] - values[lo] > tol:
+                if hi > lo:
+                    points.append((lo, 'min'))
+                    direction, extreme = 1, hi
+                else:
+                    points.append((hi, 'max'))
+                    direction, extreme = -1, lo
+        elif direction > 0:
+            if value > values[extreme]:
+                extreme = i
+            elif values[extreme] - value > tol:
+                points.append((extreme, 'max'))
+                direction, extreme = -1, i
+        else:
+            if value < values[extreme]:
+                extreme = i
+            elif value - values[extreme] > tol:
+                points.append((extreme, 'min'))
+                direction, extreme = 1, i
+    if direction != 0:
+        points.append((extreme, 'max' if direction > 0 else 'min'))
+    return points
+
+
+def midline_profile(coords, normals, center_x, width, bins):
+    """
+    正中付近の前向きの頂点から、高さごとに最も前（-Y）の頂点を選ぶ
+
+    戻り値: 上から下へ並べた頂点インデックス
+    """
+    band = (np.abs(coords[:, X] - center_x) < width) & (normals[:, Y] < -0.2)
+    candidates = np.flatnonzero(band)
+    if len(candidates) < 8:
+        raise LandmarkError("正中付近に前向きの頂点がありません（-Y を正面とするメッシュが必要です）")
+    z = coords[candidates, Z]
+    lo, hi = z.min(), z.max()
+    slot = np.minimum(((z - lo) / max(hi - lo, 1e-9) * bins).astype(np.int64), bins - 1)
+    # 高さの区間ごとに Y が最小の頂点
+    order = np.lexsort((coords[candidates, Y], -slot))
+    slot_sorted = slot[order]
+    first = np.concatenate([[True], slot_sorted[1:] != slot_sorted[:-1]])
+    return candidates[order[first]]
+
+
+# --- 結果 ---
+
+class Landmarks:
+    """ランドマークの位置と、唇の合わせ目の頂点"""
+
+    def __init__(self, points, vertices, lip_line, center_x, digest=None):
+        self.points = {name: np.asarray(co, dtype=np.float64) for name, co in points.items()}
+        self.vertices = dict(vertices)        # 表面ランドマーク → 最寄りの頂点
+        self.lip_line = np.asarray(lip_line, dtype=np.int64)
+        self.center_x = float(center_x)
+        self.digest = digest
+
+    def __getitem__(self, name):
+        return self.points[name]
+
+    def __contains__(self, name):
+        return name in self.points
+
+    @property
+    def mouth_half_width(self):
+        """口角の中心線からの距離（左右の平均）"""
+        return float(self.points['mouth_corner_l'][X] - self.points['mouth_corner_r'][X]) / 2
+
+    @property
+    def lip_gap(self):
+        """口裂から上下の唇の中心までの距離の 1/2（上唇・下唇を分けるしきい値）"""
+        upper = self.points['upper_lip'][Z] - self.points['stomion'][Z]
+        lower = self.points['stomion'][Z] - self.points['lower_lip'][Z]
+        return float(min(upper, lower)) / 2
+
+    def mouth_box(self, scale=1.0):
+        """
+        口元の箱（engine.box / RegionMask.from_box の引数）
+
+        横は口角の 1.25 倍、縦は鼻先・顎先までの 6 割、奥行きは口裂から口の半幅まで。
+        scale で全体を拡大・縮小する。
+        """
+        stomion = self.points['stomion']
+        half_width = self.mouth_half_width * 1.25 * scale
+        above = (self.points['nose_tip'][Z] - stomion[Z]) * 0.6 * scale
+        below = (stomion[Z] - self.points['chin'][Z]) * 0.6 * scale
+        return {
+            'x': (self.center_x - half_width, self.center_x + half_width),
+            'y': (None, float(stomion[Y]) + self.mouth_half_width * scale),
+            'z': (float(stomion[Z] - below), float(stomion[Z] + above)),
+        }
+
+    def mouth_region(self, coords, scale=1.0):
+        """口元の箱の中の頂点の RegionMask"""
+        return RegionMask.from_box(coords, **self.mouth_box(scale))
+
+    def summary(self):
+        """表示用の {名前: (x, y, z)}"""
+        return {name: tuple(round(float(c), 4) for c in co) for name, co in self.points.items()}
+
+    # --- 保存 ---
+
+    def to_dict(self):
+        return {
+            'digest': self.digest,
+            'center_x': self.center_x,
+            'points': {name: co.tolist() for name, co in self.points.items()},
+            'vertices': {name: int(i) for name, i in self.vertices.items()},
+            'lip_line_count': int(len(self.lip_line)),
+        }
+
+    @classmethod
+    def from_dict(cls, data, lip_line=()):
+        return cls(data['points'], data['vertices'], lip_line, data['center_x'], data.get('digest'))
+
+
+# --- 検出 ---
+
+def detect_landmarks(coords, normals, edges):
+    """
+    座標・法線・エッジ配列からランドマークを求める
+
+    メッシュは +Z が上、-Y が正面で、ほぼ左右対称であること。
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    normals = np.asarray(normals, dtype=np.float64)
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    if len(coords) == 0 or len(edges) == 0:
+        raise LandmarkError("頂点またはエッジがありません")
+
+    lo, hi = coords.min(axis=0), coords.max(axis=0)
+    size = hi - lo
+    height = size[Z]
+    # 対称面: 外れ値に引きずられないよう 1%・99% 点の中央
+    center_x = float(np.mean(np.percentile(coords[:, X], [1, 99])))
+    edge_length = float(np.median(np.linalg.norm(coords[edges[:, 0]] - coords[edges[:, 1]], axis=1)))
+    curvature = mean_curvature(coords, normals, edges)
+
+    # 1. 正中プロファイル（上から下）
+    bins = int(np.clip(height / max(edge_length, 1e-9), 64, 512))
+    band = max(size[X] * 0.01, edge_length * 1.5)
+    profile = midline_profile(coords, normals, center_x, band, bins)
+    depth = coords[profile, Y]
+    # 一番下の 15%（首・胸）を除いて最も前に出た点が鼻先
+    usable = coords[profile, Z] > lo[Z] + height * 0.15
+    nose = int(np.flatnonzero(usable)[np.argmin(depth[usable])])
+
+    # 2. 鼻先から下へ折り返しをたどる（min = 前への出っ張り、max = くぼみ）
+    below = profile[nose:]
+    turns = _turning_points(depth[nose:], tol=height * 0.004)
+    bumps = [i for i, kind in turns if kind == 'min' and i > 0]
+    if len(bumps) >= 3:
+        upper, lower, chin = bumps[0], bumps[1], bumps[2]
+        stomion = upper + int(np.argmax(depth[nose + upper:nose + lower + 1]))
+    elif len(bumps) == 2:
+        # 上下の唇が一つの山になっている: 唇の山の中で最も凹んだ頂点を口裂とする
+        lips, chin = bumps
+        hollows = [i for i, kind in turns if kind == 'max' and i < chin]
+        start = max([i for i in hollows if i < lips], default=0)
+        end = min([i for i in hollows if i > lips], default=chin)
+        span = below[start + 1:end]
+        stomion = start + 1 + int(np.argmin(curvature[span])) if len(span) else lips
+        upper = start + 1 + int(np.argmin(depth[nose + start + 1:nose + stomion + 1]))
+        lower = stomion + int(np.argmin(depth[nose + stomion:nose + end]))
+    else:
+        raise LandmarkError("鼻先より下に唇と顎の凹凸が見つかりません")
+
+    nose_vertex = int(profile[nose])
+    stomion_vertex = int(below[stomion])
+    stomion_co = coords[stomion_vertex]
+
+    # 3. 口裂とつながる凹んだ頂点 = 唇の合わせ目の線
+    lip_height = max(coords[below[upper], Z] - coords[below[lower], Z], edge_length * 4)
+    near = ((np.abs(coords[:, Z] - stomion_co[Z]) < lip_height * 0.5) &
+            (np.abs(coords[:, X] - center_x) < size[X] * 0.3) &
+            (coords[:, Y] < stomion_co[Y] + size[Y] * 0.15))
+    if near.sum() < 3:
+        raise LandmarkError("口裂の周辺に頂点がありません")
+    concave = near & (curvature < np.percentile(curvature[near], 20))
+    concave[stomion_vertex] = True
+    labels, _ = connected_components(len(coords), edges, concave)
+    lip_line = np.flatnonzero(labels == labels[stomion_vertex])
+
+    offsets = coords[lip_line, X] - center_x
+    half_width = (offsets.max() - offsets.min()) / 2
+    if half_width < edge_length * 2:
+        raise LandmarkError("口角を検出できません（唇の合わせ目の線が短すぎます）")
+    # 左右の端を平均して対称にする
+    left = coords[lip_line[np.argmax(offsets)]]
+    right = coords[lip_line[np.argmin(offsets)]]
+    corner_y = (left[Y] + right[Y]) / 2
+    corner_z = (left[Z] + right[Z]) / 2
+
+    points = {
+        'nose_tip': coords[nose_vertex],
+        'upper_lip': coords[below[upper]],
+        'stomion': stomion_co,
+        'lower_lip': coords[below[lower]],
+        'chin': coords[below[chin]],
+        'mouth_corner_l': (center_x + half_width, corner_y, corner_z),
+        'mouth_corner_r': (center_x - half_width, corner_y, corner_z),
+        # 顎関節: 鼻先の高さで、鼻先から後頭部までの奥行きの中央（解剖学的な目安）
+        'jaw_pivot': (center_x, (coords[nose_vertex, Y] + hi[Y]) / 2, coords[nose_vertex, Z]),
+    }
+    vertices = {
+        'nose_tip': nose_vertex,
+        'upper_lip': int(below[upper]),
+        'stomion': stomion_vertex,
+        'lower_lip': int(below[lower]),
+        'chin': int(below[chin]),
+    }
+    for name in ('mouth_corner_l', 'mouth_corner_r'):
+        target = np.asarray(points[name])
+        vertices[name] = int(lip_line[np.argmin(((coords[lip_line] - target) ** 2).sum(axis=1))])
+    return Landmarks(points, vertices, lip_line, center_x)
+
+
+# --- キャッシュ（頂点グループ + カスタムプロパティ） ---
+
+def _group_name(name):
+    return GROUP_PREFIX + ''.join(part.capitalize() for part in name.split('_'))
+
+
+def mesh_digest(coords, edges):
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(coords, dtype=np.float32).tobytes())
+    h.update(np.ascontiguousarray(edges, dtype=np.int64).tobytes())
+    return h.hexdigest()
+
+
+def write_groups(obj, marks):
+    """ランドマークを頂点グループに書き込む（既存の Landmark_* は作り直す）"""
+    for group in [g for g in obj.vertex_groups if g.name.startswith(GROUP_PREFIX)]:
+        obj.vertex_groups.remove(group)
+    for name, index in marks.vertices.items():
+        obj.vertex_groups.new(name=_group_name(name)).add([index], 1.0, 'REPLACE')
+    obj.vertex_groups.new(name=LIP_LINE_GROUP).add(marks.lip_line.tolist(), 1.0, 'REPLACE')
+
+
+def _cached(obj, digest):
+    raw = obj.get(CACHE_PROPERTY)
+    if not raw:
+        return None
+    try:
+        data = json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+    names = {_group_name(name) for name in data.get('vertices', {})} | {LIP_LINE_GROUP}
+    if data.get('digest') != digest or not all(name in obj.vertex_groups for name in names):
+        return None
+    return data
+
+
+def landmarks_for(obj, force=False):
+    """
+    オブジェクトのランドマーク（メッシュが前回と同じならキャッシュから読む）
+
+    キャッシュから読んだ場合、唇の合わせ目は頂点グループ Landmark_LipLine を
+    RegionMask.from_vertex_group で参照する（lip_line 配列は空）。
+    """
+    mesh = obj.data
+    coords = read_coords(mesh.vertices)
+    edges = read_edges(mesh)
+    digest = mesh_digest(coords, edges)
+    if not force:
+        data = _cached(obj, digest)
+        if data is not None:
+            return Landmarks.from_dict(data)
+
+    marks = detect_landmarks(coords, read_normals(mesh), edges)
+    marks.digest = digest
+    write_groups(obj, marks)
+    obj[CACHE_PROPERTY] = json.dumps(marks.to_dict())
+    return marks
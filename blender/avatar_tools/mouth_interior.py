@@ -0,0 +1,376 @@
+"""
+口腔内（歯列・歯肉・口蓋・舌）のプロシージャル生成
+
+上下の歯列をパラメトリックな歯列弓（放物線）に沿って並べ、歯 1 本ごとの
+プリミティブ操作やオブジェクトを作らずに、歯の雛形（8 頂点の柱）を
+NumPy で一度に変換して配置する。歯肉・口蓋・舌も同じ弓から作り、
+すべてを 1 つのメッシュ（MouthInterior）にまとめる。
+
+- マテリアルは名前で共有する（TeethMaterial / GumMaterial / TongueMaterial）。
+  GLB ではマテリアルごとに 1 プリミティブ、オブジェクトは 1 つになる
+- 下の歯・下の歯肉・舌は頂点グループ Jaw、上側は Jaw の親ボーン（Head）に
+  ウェイト 1.0 で割り当て、アーマチュアモディファイアーで顎に追従させる
+
+寸法は口角の幅（ランドマーク）から決める。単位 u は「口の半幅を 25mm と
+みなしたときの 1mm」で、アバターの大きさによらず同じ比率になる。
+
+使用例:
+    marks = landmarks_for(face_obj)
+    obj = build_mouth_interior(face_obj, marks, armature=bpy.data.objects.get('FaceRig'))
+"""
+import numpy as np
+
+from .regions import X, Y, Z
+
+OBJECT_NAME = 'MouthInterior'
+# 以前のスクリプトが作っていた口腔内オブジェクト（作り直すときに削除する）
+LEGACY_OBJECTS = ('UpperTeeth', 'LowerTeeth', 'Tongue', 'Palate', OBJECT_NAME)
+
+JAW_BONE = 'Jaw'
+
+# 名前 → (ベースカラー, 粗さ)
+MATERIALS = {
+    'TeethMaterial': ((0.95, 0.95, 0.9, 1.0), 0.3),
+    'GumMaterial': ((0.75, 0.38, 0.4, 1.0), 0.6),
+    'TongueMaterial': ((0.8, 0.4, 0.4, 1.0), 0.7),
+}
+TEETH, GUM, TONGUE = range(3)
+
+# 中切歯から第二大臼歯までの片側 7 本（幅・唇舌方向の厚み・歯冠の高さ。単位 u）
+UPPER_TEETH = np.array([
+    (8.5, 7.0, 10.5), (6.5, 6.0, 9.0), (7.5, 8.0, 10.0),
+    (7.0, 9.0, 8.5), (6.5, 9.0, 7.5), (10.0, 11.0, 7.5), (9.0, 10.5, 7.0),
+])
+LOWER_TEETH = np.array([
+    (5.0, 6.0, 9.0), (5.5, 6.0, 9.5), (7.0, 7.5, 11.0),
+    (7.0, 8.0, 8.5), (7.0, 8.5, 8.0), (11.0, 10.5, 7.5), (10.5, 10.0, 7.0),
+])
+
+# 歯の雛形: 歯肉側 (0〜3) と切縁側 (4〜7)、各 4 隅 (幅方向, 厚み方向)
+_CORNERS = np.array([(-0.5, -0.5), (0.5, -0.5), (0.5, 0.5), (-0.5, 0.5)])
+_BOX_FACES = np.array([(0, 3, 2, 1), (4, 5, 6, 7), (0, 1, 5, 4),
+                       (1, 2, 6, 5), (2, 3, 7, 6), (3, 0, 4, 7)])
+
+
+class MouthInteriorError(Exception):
+    """口腔内を生成できない（アーマチュアの構成が想定と違うなど）"""
+
+
+# --- 歯列弓 ---
+
+class Arch:
+    """
+    歯列弓 y = front + depth * (x / half_width)²（前が -Y、奥が +Y）
+
+    弧長と x の対応を細かく表にしておき、弧長で位置を指定できるようにする。
+    """
+
+    def __init__(self, half_width, depth, front_y, samples=512):
+        self.half_width = float(half_width)
+        self.depth = float(depth)
+        self.front_y = float(front_y)
+        xs = np.linspace(0.0, self.half_width * 2.0, samples)
+        ys = self._y(xs)
+        self._xs = xs
+        self._arc = np.concatenate([[0.0], np.cumsum(np.hypot(np.diff(xs), np.diff(ys)))])
+
+    def _y(self, x):
+        return self.front_y + self.depth * (x / self.half_width) ** 2
+
+    def at(self, s):
+        """正中から弧長 s（負なら右側 -X）の点と単位接線（+X 向き）"""
+        s = np.asarray(s, dtype=np.float64)
+        x = np.sign(s) * np.interp(np.abs(s), self._arc, self._xs)
+        points = np.stack([x, self._y(x)], axis=-1)
+        tangents = np.stack([np.ones_like(x), 2.0 * self.depth * x / self.half_width ** 2], axis=-1)
+        tangents /= np.linalg.norm(tangents, axis=-1, keepdims=True)
+        return points, tangents
+
+    def x_at(self, y):
+        """奥行き y での弓の半幅"""
+        return self.half_width * np.sqrt(np.clip((np.asarray(y) - self.front_y) / self.depth, 0.0, None))
+
+
+def _normals(tangents):
+    """接線を +Z 回りに 90° 回した向き（弓の内側＝舌側）"""
+    return np.stack([-tangents[..., 1], tangents[..., 0]], axis=-1)
+
+
+def tooth_layout(teeth, count=7):
+    """片側 count 本の歯の (弧長の中心, 幅, 厚み, 高さ)（単位 u）。左右を並べて返す"""
+    teeth = np.asarray(teeth, dtype=np.float64)[:count]
+    centers = np.cumsum(teeth[:, 0]) - teeth[:, 0] / 2
+    side = np.column_stack([centers, teeth])
+    mirrored = side[::-1].copy()
+    mirrored[:, 0] *= -1
+    return np.concatenate([mirrored, side])
+
+
+# --- 部品 ---
+
+def teeth_geometry(arch, layout, gum_z, direction, unit, crown_taper=0.85):
+    """
+    歯列の頂点 (T*8, 3) と四角形 (T*6, 4)
+
+    gum_z: 歯肉の線の高さ、direction: 歯冠の向き（上の歯は -1、下の歯は +1）
+    """
+    s, width, thickness, height = (layout[:, i] for i in range(4))
+    points, tangents = arch.at(s * unit)
+    normals = _normals(tangents)
+    # 前歯は切縁を薄く、臼歯は咬合面を広く
+    edge = np.where(thickness < 8.0, 0.35, 0.8)
+
+    count = len(layout)
+    verts = np.empty((count, 8, 3))
+    for half, (scale_w, scale_t, z) in enumerate((
+            (np.ones(count), np.ones(count), np.full(count, gum_z)),
+            (np.full(count, crown_taper), edge, gum_z + direction * height * unit))):
+        along = _CORNERS[None, :, 0] * (width * scale_w * unit)[:, None]
+        across = _CORNERS[None, :, 1] * (thickness * scale_t * unit)[:, None]
+        verts[:, half * 4:half * 4 + 4, X] = points[:, None, 0] + along * tangents[:, None, 0] + across * normals[:, None, 0]
+        verts[:, half * 4:half * 4 + 4, Y] = points[:, None, 1] + along * tangents[:, None, 1] + across * normals[:, None, 1]
+        verts[:, half * 4:half * 4 + 4, Z] = z[:, None]
+    faces = _BOX_FACES[None, :, :] + (np.arange(count) * 8)[:, None, None]
+    if direction < 0:
+        # 歯肉側が上になるため面の向きを反転
+        faces = faces[:, :, ::-1]
+    return verts.reshape(-1, 3), faces.reshape(-1, 4)
+
+
+def _strip_faces(rows, columns):
+    """rows × columns の格子を四角形で張る"""
+    r, c = np.meshgrid(np.arange(rows - 1), np.arange(columns - 1), indexing='ij')
+    a = (r * columns + c).ravel()
+    return np.stack([a, a + 1, a + columns + 1, a + columns], axis=1)
+
+
+def gum_geometry(arch, layout, gum_z, direction, unit, height=4.0, margin=1.5, samples=48):
+    """歯の付け根を覆う歯肉の帯（断面は唇側・上端 2 点・舌側の 4 点）"""
+    s_max = np.abs(layout[:, 0]).max() + layout[0, 1] / 2
+    s = np.linspace(-s_max, s_max, samples)
+    points, tangents = arch.at(s * unit)
+    normals = _normals(tangents)
+    side = layout[layout[:, 0] > 0]
+    half = (np.interp(np.abs(s), side[:, 0], side[:, 2]) / 2 + margin) * unit
+    top = gum_z - direction * height * unit
+    section = [(-half, gum_z), (-half * 0.8, top), (half * 0.8, top), (half, gum_z)]
+    verts = np.empty((samples, len(section), 3))
+    for j, (offset, z) in enumerate(section):
+        verts[:, j, X] = points[:, 0] + offset * normals[:, 0]
+        verts[:, j, Y] = points[:, 1] + offset * normals[:, 1]
+        verts[:, j, Z] = z
+    return verts.reshape(-1, 3), _strip_faces(samples, len(section))
+
+
+def dome_geometry(arch, y_start, y_end, base_z, height, inset, unit, rows=10, columns=13):
+    """
+    弓の内側を覆うドーム（口蓋・舌）
+
+    行は奥行き、列は左右。各行の幅は弓の半幅から inset を引いたもの。
+    縁の高さが base_z、中央が height だけ高い
+    """
+    ys = np.linspace(y_start, y_end, rows)
+    half = np.maximum(arch.x_at(ys) - inset * unit, unit)
+    t = np.linspace(-1.0, 1.0, columns)
+    bulge = np.sqrt(np.clip(1.0 - t ** 2, 0.0, None))
+    verts = np.empty((rows, columns, 3))
+    verts[..., X] = half[:, None] * t[None, :]
+    verts[..., Y] = ys[:, None]
+    verts[..., Z] = base_z + height * unit * bulge[None, :]
+    return verts.reshape(-1, 3), _strip_faces(rows, columns)
+
+
+# --- 全体 ---
+
+class InteriorGeometry:
+    """部品を 1 つのメッシュ分の配列に積み上げる"""
+
+    def __init__(self, origin=(0.0, 0.0, 0.0)):
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self._verts, self._faces = [], []
+        self._material, self._jaw, self._smooth = [], [], []
+        self.parts = {}
+        self._count = 0
+
+    def add(self, name, verts, faces, material, jaw, smooth):
+        self._verts.append(verts)
+        self._faces.append(faces + self._count)
+        self._material.append(np.full(len(faces), material, dtype=np.int32))
+        self._smooth.append(np.full(len(faces), smooth, dtype=bool))
+        self._jaw.append(np.full(len(verts), jaw, dtype=bool))
+        self.parts[name] = (self._count, len(verts))
+        self._count += len(verts)
+
+    @property
+    def verts(self):
+        return np.concatenate(self._verts) + self.origin
+
+    @property
+    def faces(self):
+        return np.concatenate(self._faces)
+
+    @property
+    def material_index(self):
+        return np.concatenate(self._material)
+
+    @property
+    def smooth(self):
+        return np.concatenate(self._smooth)
+
+    @property
+    def jaw(self):
+        """顎に追従する頂点のマスク"""
+        return np.concatenate(self._jaw)
+
+
+def interior_params(marks):
+    """ランドマークから寸法を決める（メッシュのローカル座標）"""
+    unit = marks.mouth_half_width / 25.0
+    stomion = marks['stomion']
+    return {
+        'unit': unit,
+        'center_x': marks.center_x,
+        # 上の前歯の唇側は口裂から 8u 奥、切縁は口裂の 1u 下
+        'front_y': float(stomion[Y]) + 8.0 * unit,
+        'edge_z': float(stomion[Z]) - 1.0 * unit,
+    }
+
+
+def build_geometry(unit, front_y, edge_z, center_x=0.0, half_width=27.0, depth=42.0,
+                   teeth_per_side=7, overbite=2.0, opening=0.0):
+    """
+    口腔内のメッシュ配列を作る（寸法は u 単位、位置はローカル座標）
+
+    half_width / depth: 上の歯列弓の半幅と奥行き
+    overbite: 上の前歯が下の前歯に重なる高さ、opening: 上下の歯の間の隙間
+    """
+    if not 1 <= teeth_per_side <= len(UPPER_TEETH):
+        raise MouthInteriorError(f"片側の歯の数は 1〜{len(UPPER_TEETH)} 本です: {teeth_per_side}")
+    geometry = InteriorGeometry(origin=(center_x, 0.0, 0.0))
+
+    # 上顎: 歯肉の線は前歯の切縁から中切歯の高さだけ上
+    upper = Arch(half_width * unit, depth * unit, front_y)
+    upper_layout = tooth_layout(UPPER_TEETH, teeth_per_side)
+    upper_gum = edge_z + UPPER_TEETH[0, 2] * unit
+    geometry.add('upper_teeth', *teeth_geometry(upper, upper_layout, upper_gum, -1, unit),
+                 TEETH, jaw=False, smooth=False)
+    geometry.add('upper_gum', *gum_geometry(upper, upper_layout, upper_gum, -1, unit),
+                 GUM, jaw=False, smooth=True)
+    back = front_y + depth * unit * 1.05
+    geometry.add('palate', *dome_geometry(upper, front_y + 6.0 * unit, back,
+                                          upper_gum + 4.0 * unit, 12.0, 6.0, unit),
+                 GUM, jaw=False, smooth=True)
+
+    # 下顎: 上の前歯の舌側に収まるよう、前歯の厚みの分だけ奥に置く
+    lower = Arch(half_width * 0.92 * unit, depth * 0.95 * unit,
+                 front_y + (UPPER_TEETH[0, 1] + 0.5) * unit)
+    lower_layout = tooth_layout(LOWER_TEETH, teeth_per_side)
+    lower_edge = edge_z + (overbite - opening) * unit
+    lower_gum = lower_edge - LOWER_TEETH[0, 2] * unit
+    geometry.add('lower_teeth', *teeth_geometry(lower, lower_layout, lower_gum, 1, unit),
+                 TEETH, jaw=True, smooth=False)
+    geometry.add('lower_gum', *gum_geometry(lower, lower_layout, lower_gum, 1, unit),
+                 GUM, jaw=True, smooth=True)
+    geometry.add('tongue', *dome_geometry(lower, lower.front_y + 8.0 * unit, back,
+                                          lower_gum - 4.0 * unit, 10.0, 7.0, unit),
+                 TONGUE, jaw=True, smooth=True)
+    return geometry
+
+
+# --- Blender ---
+
+def ensure_material(name):
+    """名前で共有するマテリアル（なければ作成）"""
+    import bpy
+    material = bpy.data.materials.get(name)
+    if material is not None:
+        return material
+    color, roughness = MATERIALS[name]
+    material = bpy.data.materials.new(name=name)
+    material.use_nodes = True
+    material.diffuse_color = color
+    bsdf = material.node_tree.nodes.get('Principled BSDF')
+    if bsdf is not None:
+        bsdf.inputs['Base Color'].default_value = color
+        bsdf.inputs['Roughness'].default_value = roughness
+    # 口の中は裏から見えることがあるため両面（GLB の doubleSided）
+    material.use_backface_culling = False
+    return material
+
+
+def find_armature(face_obj):
+    """顔が乗っているアーマチュア（親、なければ Jaw ボーンを持つもの）"""
+    import bpy
+    if face_obj.parent is not None and face_obj.parent.type == 'ARMATURE':
+        return face_obj.parent
+    for obj in bpy.data.objects:
+        if obj.type == 'ARMATURE' and JAW_BONE in obj.data.bones:
+            return obj
+    return None
+
+
+def remove_legacy(names=LEGACY_OBJECTS):
+    """以前の口腔内オブジェクトを削除し、削除した名前を返す"""
+    import bpy
+    removed = []
+    for name in names:
+        obj = bpy.data.objects.get(name)
+        if obj is not None:
+            mesh = obj.data if obj.type == 'MESH' else None
+            bpy.data.objects.remove(obj, do_unlink=True)
+            if mesh is not None and mesh.users == 0:
+                bpy.data.meshes.remove(mesh)
+            removed.append(name)
+    return removed
+
+
+def bind_to_jaw(obj, armature, jaw_mask):
+    """顎側の頂点を Jaw、残りを Jaw の親ボーンに割り当ててアーマチュアで動かす"""
+    jaw = armature.data.bones.get(JAW_BONE)
+    if jaw is None:
+        raise MouthInteriorError(f"{armature.name} に {JAW_BONE} ボーンがありません")
+    if jaw.parent is None:
+        raise MouthInteriorError(f"{JAW_BONE} ボーンに親（上顎側）のボーンがありません")
+    for name, mask in ((JAW_BONE, jaw_mask), (jaw.parent.name, ~jaw_mask)):
+        group = obj.vertex_groups.get(name) or obj.vertex_groups.new(name=name)
+        group.add(np.flatnonzero(mask).tolist(), 1.0, 'REPLACE')
+
+    world = obj.matrix_world.copy()
+    obj.parent = armature
+    obj.parent_type = 'OBJECT'
+    obj.matrix_world = world
+    modifier = obj.modifiers.get('Armature') or obj.modifiers.new('Armature', 'ARMATURE')
+    modifier.object = armature
+    modifier.use_vertex_groups = True
+    return jaw.parent.name
+
+
+def build_mouth_interior(face_obj, marks, armature=None, collection=None, **options):
+    """
+    口腔内を 1 つのオブジェクトとして作り直す
+
+    options は build_geometry の寸法（half_width, depth, teeth_per_side, overbite, opening）。
+    armature があれば顎に追従させ、なければ顔オブジェクトの子にする。
+    """
+    import bpy
+    remove_legacy()
+    geometry = build_geometry(**interior_params(marks), **options)
+
+    mesh = bpy.data.meshes.new(OBJECT_NAME)
+    mesh.from_pydata(geometry.verts.tolist(), [], geometry.faces.tolist())
+    for name in MATERIALS:
+        mesh.materials.append(ensure_material(name))
+    mesh.polygons.foreach_set('material_index', geometry.material_index)
+    mesh.polygons.foreach_set('use_smooth', geometry.smooth)
+    mesh.update()
+
+    obj = bpy.data.objects.new(OBJECT_NAME, mesh)
+    (collection or face_obj.users_collection[0]).objects.link(obj)
+    obj.matrix_world = face_obj.matrix_world.copy()
+    if armature is not None:
+        bind_to_jaw(obj, armature, geometry.jaw)
+    else:
+        obj.parent = face_obj
+        obj.matrix_parent_inverse = face_obj.matrix_world.inverted()
+    obj['avatar_mouth_parts'] = {name: count for name, (_, count) in geometry.parts.items()}
+    return obj
@@ -0,0 +1,182 @@
+"""
+メッシュの頂点分布プロファイル
+
+座標は foreach_get で一度だけ (N, 3) 配列として取得し、範囲・統計量・
+軸ごとのヒストグラム・左右の頂点数・8 分割（オクタント）・高さ別の領域・
+最前面のスライス・中心線の Y-Z グリッド・極値の頂点をすべて NumPy で求める。
+ビンごとに頂点リストを数え直す（sum(1 for z in z_coords if ...)）必要がない。
+
+結果は public/models/*_analysis_*.json と同じ camelCase の JSON にできる。
+
+使用例:
+    report = profile_object(obj)
+    print(report['histograms']['z']['counts'])
+    save_report(report, 'public/models/face_mesh_analysis.json')
+"""
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from .regions import X, Y, Z
+
+AXES = ('x', 'y', 'z')
+
+# 高さ別の領域（Z 範囲に対する割合、visual_face_analysis.py と同じ区切り）
+HEIGHT_REGIONS = (
+    ('顎領域', 0.0, 0.2),
+    ('口領域', 0.2, 0.4),
+    ('目・鼻領域', 0.4, 0.7),
+    ('頭頂部', 0.7, 1.0),
+)
+
+EXTREMES = (
+    ('minX', X, np.argmin), ('maxX', X, np.argmax),
+    ('minY', Y, np.argmin), ('maxY', Y, np.argmax),
+    ('minZ', Z, np.argmin), ('maxZ', Z, np.argmax),
+)
+
+
+def _vec(values):
+    return {axis: float(v) for axis, v in zip(AXES, values)}
+
+
+def histogram(values, bins, lo, hi):
+    """[lo, hi] を bins 等分したヒストグラム（最後のビンは右端を含む）"""
+    counts, edges = np.histogram(values, bins=bins, range=(lo, hi if hi > lo else lo + 1e-9))
+    return {'edges': edges.tolist(), 'counts': counts.tolist()}
+
+
+def profile_coords(coords, bins=10, grid=10, side_band=0.05, center_band=0.02,
+                   front_depth=0.1, slice_height=0.1, neighbor_radius=0.1):
+    """
+    (N, 3) 座標の分布を 1 つの辞書にまとめる
+
+    bins: 軸ごとのヒストグラムのビン数
+    grid: 中心線（|X| < center_band）の Y-Z グリッドの分割数
+    side_band: 左・中央・右を分ける |X| の幅
+    front_depth: 最前面（Y 最小から front_depth 以内）とみなす奥行き
+    slice_height: 最前面の頂点を高さ別に数える間隔
+    neighbor_radius: 極値の頂点の近傍として数える距離
+    """
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 3)
+    count = len(coords)
+    report = {'vertexCount': count}
+    if count == 0:
+        return report
+
+    lo, hi = coords.min(axis=0), coords.max(axis=0)
+    size = hi - lo
+    report['boundingBox'] = {'min': _vec(lo), 'max': _vec(hi),
+                             'center': _vec((lo + hi) / 2), 'size': _vec(size)}
+    median = np.median(coords, axis=0)
+    mean = coords.mean(axis=0)
+    report['axes'] = {axis: {'min': float(lo[i]), 'max': float(hi[i]),
+                             'median': float(median[i]), 'mean': float(mean[i])}
+                      for i, axis in enumerate(AXES)}
+    report['histograms'] = {axis: histogram(coords[:, i], bins, lo[i], hi[i])
+                            for i, axis in enumerate(AXES)}
+
+    x, y, z = coords[:, X], coords[:, Y], coords[:, Z]
+    report['sides'] = {
+        'band': side_band,
+        'left': int(np.count_nonzero(x < -side_band)),
+        'center': int(np.count_nonzero(np.abs(x) <= side_band)),
+        'right': int(np.count_nonzero(x > side_band)),
+    }
+
+    # オクタント: 各軸の符号を 3 ビットにまとめて数える
+    code = (x >= 0).astype(np.int64) << 2 | (y >= 0).astype(np.int64) << 1 | (z >= 0).astype(np.int64)
+    octant_counts = np.bincount(code, minlength=8)
+    report['octants'] = {
+        f"X{'+' if c & 4 else '-'}Y{'+' if c & 2 else '-'}Z{'+' if c & 1 else '-'}": int(octant_counts[c])
+        for c in range(8)}
+
+    # 高さ別の領域（割合の区切りを一度に数える）
+    fractions = [start for _, start, _ in HEIGHT_REGIONS] + [1.0]
+    region_edges = lo[Z] + np.asarray(fractions) * size[Z]
+    region_counts = np.histogram(z, bins=region_edges)[0]
+    report['heightRegions'] = [
+        {'name': name, 'zMin': float(region_edges[i]), 'zMax': float(region_edges[i + 1]),
+         'count': int(region_counts[i])}
+        for i, (name, _, _) in enumerate(HEIGHT_REGIONS)]
+
+    # 最前面（-Y）の頂点を高さ別に
+    front = y < lo[Y] + front_depth
+    buckets = np.floor(z[front] / slice_height).astype(np.int64)
+    keys, counts = np.unique(buckets, return_counts=True)
+    report['frontSlices'] = {
+        'depth': front_depth,
+        'count': int(np.count_nonzero(front)),
+        'zMean': float(z[front].mean()) if front.any() else None,
+        'slices': [{'z': round(float(k) * slice_height, 6), 'count': int(c)}
+                   for k, c in zip(keys[::-1], counts[::-1])],
+    }
+
+    # 中心線上の頂点の Y-Z 分布（行は上から下、列は Y の小さい方から）
+    center = np.abs(x) < center_band
+    grid_counts, _, _ = np.histogram2d(
+        z[center], y[center], bins=grid,
+        range=[[lo[Z], hi[Z] if hi[Z] > lo[Z] else lo[Z] + 1e-9],
+               [lo[Y], hi[Y] if hi[Y] > lo[Y] else lo[Y] + 1e-9]])
+    report['centerlineGrid'] = {
+        'band': center_band,
+        'count': int(np.count_nonzero(center)),
+        'size': grid,
+        'yRange': [float(lo[Y]), float(hi[Y])],
+        'zRange': [float(hi[Z]), float(lo[Z])],
+        'counts': grid_counts[::-1].astype(np.int64).tolist(),
+    }
+
+    # 極値の頂点と近傍の頂点数（6 点 × N の距離を一度に計算）
+    picks = np.array([pick(coords[:, axis]) for _, axis, pick in EXTREMES])
+    d2 = ((coords[None, :, :] - coords[picks][:, None, :]) ** 2).sum(axis=2)
+    nearby = (d2 < neighbor_radius * neighbor_radius).sum(axis=1)
+    report['extremes'] = {
+        name: {'vertex': int(v), 'position': _vec(coords[v]), 'nearby': int(n)}
+        for (name, _, _), v, n in zip(EXTREMES, picks, nearby)}
+    report['extremes']['radius'] = neighbor_radius
+
+    report['orientation'] = {
+        # 原点から遠い側を顔の前面とみなす
+        'frontAxis': '-Y' if -lo[Y] >= hi[Y] else '+Y',
+        'frontZMean': report['frontSlices']['zMean'],
+    }
+    return report
+
+
+def read_world_coords(obj, world=False):
+    """オブジェクトの頂点座標（world=True ならワールド座標）"""
+    from .shape_keys import read_coords
+    coords = read_coords(obj.data.vertices).astype(np.float64)
+    if world:
+        matrix = np.array(obj.matrix_world, dtype=np.float64)
+        coords = coords @ matrix[:3, :3].T + matrix[:3, 3]
+    return coords
+
+
+def profile_object(obj, world=False, **options):
+    """メッシュオブジェクトのプロファイル（options は profile_coords と同じ）"""
+    mesh = obj.data
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+        'object': obj.name,
+        'space': 'world' if world else 'local',
+        'edgeCount': len(mesh.edges),
+        'faceCount': len(mesh.polygons),
+        'shapeKeys': [kb.name for kb in mesh.shape_keys.key_blocks] if mesh.shape_keys else [],
+        'materials': [slot.material.name for slot in obj.material_slots if slot.material],
+    }
+    report.update(profile_coords(read_world_coords(obj, world), **options))
+    return report
+
+
+def save_report(report, path):
+    """JSON として保存（日本語はそのまま）"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
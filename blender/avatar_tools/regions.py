@@ -0,0 +1,211 @@
+"""
+頂点領域マスク
+
+頂点インデックスをキーとするブール配列で領域を表す。メッシュごとに一度だけ
+作成し、すべてのシェイプキーで使い回す。所属判定は O(1)、NumPy の
+インデックスとしてそのまま使える（co[lips, Z] -= 0.03）。
+
+使用例:
+    mouth = RegionMask.from_box(engine.basis, x=(-0.15, 0.15), z=(-0.45, -0.15))
+    upper = mouth & (engine.z > -0.25)
+    weights = mouth.falloff(engine.basis, radius=0.05)
+"""
+import numpy as np
+from mathutils.kdtree import KDTree
+
+X, Y, Z = 0, 1, 2
+
+
+def vertex_group_weights(obj, group_name):
+    """頂点グループのウェイトを (N,) 配列で取得（グループ外の頂点は 0）"""
+    weights = np.zeros(len(obj.data.vertices), dtype=np.float32)
+    group = obj.vertex_groups.get(group_name)
+    if group is None:
+        return weights
+    index = group.index
+    # v.groups は可変長のため foreach_get できない。メッシュ1回の走査で済ませる
+    for v in obj.data.vertices:
+        for g in v.groups:
+            if g.group == index:
+                weights[v.index] = g.weight
+                break
+    return weights
+
+
+class RegionMask:
+    """頂点のブール配列をラップした領域"""
+
+    __slots__ = ('mask',)
+
+    # ndarray との演算でも RegionMask 側の演算子を使わせる
+    __array_ufunc__ = None
+
+    def __init__(self, mask):
+        self.mask = np.asarray(mask, dtype=bool)
+
+    # --- 作成 ---
+
+    @classmethod
+    def empty(cls, count):
+        return cls(np.zeros(count, dtype=bool))
+
+    @classmethod
+    def full(cls, count):
+        return cls(np.ones(count, dtype=bool))
+
+    @classmethod
+    def from_indices(cls, indices, count):
+        """頂点インデックスのリストから作成"""
+        mask = np.zeros(count, dtype=bool)
+        mask[np.asarray(list(indices), dtype=np.int64)] = True
+        return cls(mask)
+
+    @classmethod
+    def from_box(cls, coords, x=None, y=None, z=None):
+        """
+        座標が箱の内側（境界を含まない）にある頂点
+
+        各軸は (min, max) で指定し、None の軸・端は制限しない。
+        """
+        mask = np.ones(len(coords), dtype=bool)
+        for axis, bounds in ((X, x), (Y, y), (Z, z)):
+            if bounds is None:
+                continue
+            lo, hi = bounds
+            if lo is not None:
+                mask &= coords[:, axis] > lo
+            if hi is not None:
+                mask &= coords[:, axis] < hi
+        return cls(mask)
+
+    @classmethod
+    def from_sphere(cls, coords, center, radius):
+        """中心から radius 以内の頂点"""
+        d2 = ((coords - np.asarray(center, dtype=coords.dtype)) ** 2).sum(axis=1)
+        return cls(d2 <= radius * radius)
+
+    @classmethod
+    def from_vertex_group(cls, obj, group_name, min_weight=0.5):
+        """頂点グループのウェイトが min_weight より大きい頂点"""
+        return cls(vertex_group_weights(obj, group_name) > min_weight)
+
+    # --- 参照 ---
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            return self.mask
+        return self.mask.astype(dtype)
+
+    def __contains__(self, index):
+        return bool(self.mask[index])
+
+    def __len__(self):
+        return len(self.mask)
+
+    def __repr__(self):
+        return f"RegionMask({self.count}/{len(self.mask)})"
+
+    @property
+    def count(self):
+        """領域に含まれる頂点数"""
+        return int(np.count_nonzero(self.mask))
+
+    @property
+    def indices(self):
+        """領域に含まれる頂点インデックス（昇順）"""
+        return np.flatnonzero(self.mask)
+
+    @property
+    def weights(self):
+        """0/1 の重み配列（displace などの重み付き関数に渡せる）"""
+        return self.mask.astype(np.float32)
+
+    def bounds(self, coords):
+        """領域のバウンディングボックス (min, max)。空なら None"""
+        if not self.mask.any():
+            return None
+        sub = coords[self.mask]
+        return sub.min(axis=0), sub.max(axis=0)
+
+    # --- 集合演算 ---
+
+    @staticmethod
+    def _other(other):
+        return other.mask if isinstance(other, RegionMask) else np.asarray(other, dtype=bool)
+
+    def __or__(self, other):
+        return RegionMask(self.mask | self._other(other))
+
+    def __and__(self, other):
+        return RegionMask(self.mask & self._other(other))
+
+    def __sub__(self, other):
+        return RegionMask(self.mask & ~self._other(other))
+
+    def __xor__(self, other):
+        return RegionMask(self.mask ^ self._other(other))
+
+    def __invert__(self):
+        return RegionMask(~self.mask)
+
+    __ror__ = __or__
+    __rand__ = __and__
+
+    def union(self, *others):
+        mask = self.mask.copy()
+        for other in others:
+            mask |= self._other(other)
+        return RegionMask(mask)
+
+    def intersection(self, *others):
+        mask = self.mask.copy()
+        for other in others:
+            mask &= self._other(other)
+        return RegionMask(mask)
+
+    def difference(self, *others):
+        mask = self.mask.copy()
+        for other in others:
+            mask &= ~self._other(other)
+        return RegionMask(mask)
+
+    # --- 重み ---
+
+    def falloff(self, coords, radius, profile='smooth'):
+        """
+        領域の内側を 1、領域から radius 離れた位置を 0 とする重み配列
+
+        距離は領域内で最も近い頂点までのユークリッド距離。
+        profile: 'linear' / 'smooth'（smoothstep）/ 'sphere'
+        """
+        weights = self.mask.astype(np.float32)
+        if radius <= 0 or not self.mask.any():
+            return weights
+
+        # 拡張したバウンディングボックス内の頂点だけを問い合わせる
+        lo, hi = self.bounds(coords)
+        candidates = (~self.mask &
+                      np.all(coords > lo - radius, axis=1) &
+                      np.all(coords < hi + radius, axis=1))
+        cand_idx = np.flatnonzero(candidates)
+        if len(cand_idx) == 0:
+            return weights
+
+        region_idx = self.indices
+        tree = KDTree(len(region_idx))
+        for i in region_idx:
+            tree.insert(coords[i], int(i))
+        tree.balance()
+
+        dist = np.fromiter((tree.find(coords[i])[2] for i in cand_idx),
+                           dtype=np.float32, count=len(cand_idx))
+        t = np.clip(1.0 - dist / radius, 0.0, 1.0)
+        if profile == 'smooth':
+            t = t * t * (3.0 - 2.0 * t)
+        elif profile == 'sphere':
+            t = np.sqrt(np.clip(1.0 - (1.0 - t) ** 2, 0.0, 1.0))
+        elif profile != 'linear':
+            raise ValueError(f"未対応のフォールオフ: {profile}")
+        weights[cand_idx] = t
+        return weights
+
@@ -0,0 +1,265 @@
+"""
+シェイプキーの検証用レンダリング
+
+シェイプキーを 1 つずつ値 1.0 にして、正面・側面・口元アップの
+正投影カメラからレンダリングする。カメラの枠はメッシュのバウンディング
+ボックス（口元はランドマーク）から決めるため、アバターごとの調整はいらない。
+正投影・固定の色管理・固定ライトにして、同じ入力なら同じ画像になるようにする
+（画像差分による回帰テスト用）。
+
+タイルは compose_sheet で 1 枚のコンタクトシート（行 = キー、列 = ビュー）にまとめる。
+
+使用例:
+    setup_render(bpy.context.scene, engine='workbench', resolution=384)
+    frames = view_frames(obj)
+    paths = render_key(bpy.context.scene, obj, 'Vowel_A_Talk', frames, 'renders/')
+"""
+import hashlib
+import os
+import re
+
+import numpy as np
+
+from .shape_keys import read_coords
+
+# ビュー名 → (被写体からカメラへの向き, 枠)
+VIEWS = {
+    'front': ((0.0, -1.0, 0.0), 'full'),
+    'side': ((-1.0, 0.0, 0.0), 'full'),
+    'closeup': ((0.0, -1.0, 0.0), 'mouth'),
+}
+DEFAULT_VIEWS = tuple(VIEWS)
+
+ENGINES = {
+    'workbench': ('BLENDER_WORKBENCH',),
+    # Blender 4.2 以降は EEVEE Next
+    'eevee': ('BLENDER_EEVEE_NEXT', 'BLENDER_EEVEE'),
+}
+
+BASIS_ROW = 'Basis'
+CAMERA_NAME = 'VerifyCamera'
+LIGHT_NAME = 'VerifyLight'
+
+
+def tile_name(key, view):
+    """
+    タイル画像のファイル名（キー名の記号は _ に置き換える）
+
+    置き換えで "Mouth Open" と "Mouth_Open"、日本語のキー名どうしなどが
+    同じ名前にならないよう、元のキー名のハッシュを付ける。
+    """
+    safe = re.sub(r'[^0-9A-Za-z_.-]+', '_', key)
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]
+    return f"{safe}-{digest}__{view}.png"
+
+
+# --- シーン ---
+
+def _engine_id(scene, engine):
+    available = {item.identifier for item in
+                 scene.render.bl_rna.properties['engine'].enum_items}
+    for candidate in ENGINES[engine]:
+        if candidate in available:
+            return candidate
+    raise ValueError(f"このBlenderでは {engine} を使えません")
+
+
+def setup_render(scene, engine='workbench', resolution=384, samples=16):
+    """決定的な出力になるようレンダー設定を固定する"""
+    scene.render.engine = _engine_id(scene, engine)
+    scene.render.resolution_x = scene.render.resolution_y = resolution
+    scene.render.resolution_percentage = 100
+    scene.render.film_transparent = False
+    scene.render.image_settings.file_format = 'PNG'
+    scene.render.image_settings.color_mode = 'RGB'
+    scene.render.image_settings.color_depth = '8'
+    scene.view_settings.view_transform = 'Standard'
+    scene.view_settings.look = 'None'
+    scene.view_settings.exposure = 0.0
+    scene.view_settings.gamma = 1.0
+
+    if engine == 'workbench':
+        shading = scene.display.shading
+        shading.light = 'STUDIO'
+        shading.color_type = 'MATERIAL'
+        shading.show_shadows = False
+        shading.show_cavity = False
+        scene.display.render_aa = '8'
+    else:
+        eevee = scene.eevee
+        eevee.taa_render_samples = samples
+        _ensure_light(scene)
+
+
+def _ensure_light(scene):
+    import bpy
+    if any(obj.type == 'LIGHT' for obj in scene.objects):
+        return
+    light = bpy.data.objects.get(LIGHT_NAME)
+    if light is None:
+        light = bpy.data.objects.new(LIGHT_NAME, bpy.data.lights.new(LIGHT_NAME, 'SUN'))
+        scene.collection.objects.link(light)
+    light.rotation_euler = (0.9, 0.0, -0.4)
+    light.data.energy = 3.0
+
+
+def ensure_camera(scene):
+    """検証用の正投影カメラ（なければ作成）をシーンのカメラにする"""
+    import bpy
+    camera = bpy.data.objects.get(CAMERA_NAME)
+    if camera is None:
+        camera = bpy.data.objects.new(CAMERA_NAME, bpy.data.cameras.new(CAMERA_NAME))
+        scene.collection.objects.link(camera)
+    camera.data.type = 'ORTHO'
+    scene.camera = camera
+    return camera
+
+
+# --- 枠 ---
+
+def world_coords(obj):
+    coords = read_coords(obj.data.vertices).astype(np.float64)
+    matrix = np.array(obj.matrix_world, dtype=np.float64)
+    return coords @ matrix[:3, :3].T + matrix[:3, 3]
+
+
+def _mouth_frame(obj, coords, lo, hi):
+    """口元の (中心, 大きさ)。ランドマークが取れなければ顔の下 1/3"""
+    from .landmarks import LandmarkError, landmarks_for
+    try:
+        marks = landmarks_for(obj)
+    except LandmarkError:
+        marks = None
+    if marks is not None:
+        matrix = np.array(obj.matrix_world, dtype=np.float64)
+        center = matrix[:3, :3] @ marks['stomion'] + matrix[:3, 3]
+        scale = float(np.linalg.norm(matrix[:3, 0])) or 1.0
+        return center, marks.mouth_half_width * scale * 4.0
+    size = hi - lo
+    center = np.array([(lo[0] + hi[0]) / 2, lo[1], lo[2] + size[2] * 0.3])
+    return center, float(max(size[0], size[2])) * 0.35
+
+
+def view_frames(obj, views=DEFAULT_VIEWS):
+    """ビュー名 → (注視点, カメラの向き, 正投影の幅)"""
+    coords = world_coords(obj)
+    lo, hi = coords.min(axis=0), coords.max(axis=0)
+    center, size = (lo + hi) / 2, hi - lo
+    frames = {}
+    for view in views:
+        direction, frame = VIEWS[view]
+        direction = np.asarray(direction)
+        if frame == 'mouth':
+            target, extent = _mouth_frame(obj, coords, lo, hi)
+        else:
+            target = center
+            # 視線に垂直な 2 軸のうち大きい方
+            extent = float(np.max(size[np.abs(direction) < 0.5]))
+        frames[view] = (target, direction, extent * 1.1)
+    return frames
+
+
+def aim_camera(camera, target, direction, extent, distance=None):
+    """target を direction 側から見るようにカメラを置く"""
+    from mathutils import Vector
+    distance = distance or extent * 4.0
+    location = Vector(target) + Vector(direction) * distance
+    camera.location = location
+    camera.rotation_euler = (Vector(target) - location).to_track_quat('-Z', 'Y').to_euler()
+    camera.data.ortho_scale = extent
+    camera.data.clip_start = distance * 0.01
+    camera.data.clip_end = distance * 4.0
+
+
+# --- シェイプキー ---
+
+def isolate_shape_key(obj, name=None, value=1.0):
+    """name のシェイプキーだけを value にし、他は 0 にする（None なら Basis のみ）"""
+    key = obj.data.shape_keys
+    if key is None:
+        return
+    # ドライバーやアクションに上書きされないよう外す（保存しない前提）
+    if key.animation_data is not None:
+        key.animation_data_clear()
+    for kb in key.key_blocks:
+        if kb == key.reference_key:
+            continue
+        kb.mute = False
+        kb.value = value if kb.name == name else 0.0
+
+
+def render_key(scene, obj, name, frames, out_dir, camera=None):
+    """シェイプキー 1 つを全ビューでレンダリングし、{ビュー: パス} を返す"""
+    import bpy
+    camera = camera or ensure_camera(scene)
+    isolate_shape_key(obj, None if name == BASIS_ROW else name)
+    paths = {}
+    for view, (target, direction, extent) in frames.items():
+        aim_camera(camera, target, direction, extent)
+        path = os.path.join(out_dir, tile_name(name, view))
+        scene.render.filepath = path
+        bpy.ops.render.render(write_still=True)
+        paths[view] = path
+    return paths
+
+
+# --- コンタクトシート ---
+
+def read_image(path):
+    """画像を (高さ, 幅, 4) の float32 配列で読む（行は下から上）"""
+    import bpy
+    image = bpy.data.images.load(path, check_existing=False)
+    try:
+        width, height = image.size
+        pixels = np.empty(width * height * 4, dtype=np.float32)
+        image.pixels.foreach_get(pixels)
+    finally:
+        bpy.data.images.remove(image)
+    return pixels.reshape(height, width, 4)
+
+
+def write_image(path, pixels):
+    """(高さ, 幅, 4) の配列を PNG で保存"""
+    import bpy
+    height, width = pixels.shape[:2]
+    image = bpy.data.images.new(os.path.basename(path), width, height, alpha=True)
+    try:
+        image.pixels.foreach_set(np.ascontiguousarray(pixels, dtype=np.float32).ravel())
+        image.filepath_raw = path
+        image.file_format = 'PNG'
+        image.save()
+    finally:
+        bpy.data.images.remove(image)
+
+
+def compose_sheet(rows, out_path, gap=4, background=(0.15, 0.15, 0.15, 1.0)):
+    """
+    タイル画像を格子に並べた 1 枚の画像を書き出す
+
+    rows: [[パス または None, ...], ...]（上の行から）。None のセルは背景色のまま
+    """
+    tiles = {}
+    for row in rows:
+        for path in row:
+            if path and path not in tiles:
+                tiles[path] = read_image(path)
+    if not tiles:
+        raise ValueError("タイル画像がありません")
+    tile_h = max(t.shape[0] for t in tiles.values())
+    tile_w = max(t.shape[1] for t in tiles.values())
+    columns = max(len(row) for row in rows)
+    height = len(rows) * tile_h + (len(rows) + 1) * gap
+    width = columns * tile_w + (columns + 1) * gap
+    sheet = np.empty((height, width, 4), dtype=np.float32)
+    sheet[:] = background
+    for r, row in enumerate(rows):
+        # Blender の画像は下の行から並ぶため、上の行ほど大きい y に置く
+        y = height - (r + 1) * (tile_h + gap)
+        for c, path in enumerate(row):
+            if not path:
+                continue
+            tile = tiles[path]
+            x = gap + c * (tile_w + gap)
+            sheet[y:y + tile.shape[0], x:x + tile.shape[1]] = tile
+    write_image(out_path, sheet)
+    return out_path
@@ -0,0 +1,143 @@
+"""
+NumPyベースのシェイプキー作成エンジン
+
+頂点座標は foreach_get / foreach_set で一括転送し、変形はすべて
+(N, 3) 配列への演算として行う。頂点ごとの Python ループを使わないため、
+数万頂点のメッシュでもシェイプキー1つあたり数ミリ秒で書き込める。
+
+使用例:
+    engine = ShapeKeyEngine(obj)
+    co = engine.new_coords()
+    co[lower_lip, 2] -= 0.03
+    engine.write_key("Talk_Open", co)
+"""
+import numpy as np
+
+from .regions import RegionMask, X, Y, Z, vertex_group_weights  # noqa: F401
+from .symmetry import SymmetryMap
+
+
+def read_coords(data):
+    """頂点座標コレクション（mesh.vertices / key_block.data）を (N, 3) 配列で取得"""
+    coords = np.empty(len(data) * 3, dtype=np.float32)
+    data.foreach_get('co', coords)
+    return coords.reshape(-1, 3)
+
+
+def write_coords(data, coords):
+    """(N, 3) 配列を頂点座標コレクションへ一括で書き込む"""
+    flat = np.ascontiguousarray(coords, dtype=np.float32).reshape(-1)
+    if flat.size != len(data) * 3:
+        raise ValueError(f"頂点数が一致しません: {flat.size // 3} != {len(data)}")
+    data.foreach_set('co', flat)
+
+
+def _weights(mask):
+    """ブール配列または重み配列を (N, 1) の float 配列に変換"""
+    mask = np.asarray(getattr(mask, 'weights', mask))
+    return mask.astype(np.float32)[:, None]
+
+
+def displace(coords, mask, offset):
+    """マスク（ブール配列または 0〜1 の重み）に従って座標を平行移動"""
+    coords += _weights(mask) * np.asarray(offset, dtype=np.float32)
+    return coords
+
+
+def scale_axis(coords, mask, axis, factor, center=0.0):
+    """マスク内の頂点を center を基準に axis 方向へ factor 倍する"""
+    w = _weights(mask)[:, 0]
+    coords[:, axis] = center + (coords[:, axis] - center) * (1.0 + w * (factor - 1.0))
+    return coords
+
+
+class ShapeKeyEngine:
+    """オブジェクトのシェイプキーを配列演算で作成・更新する"""
+
+    def __init__(self, obj, basis_name='Basis'):
+        self.obj = obj
+        self.mesh = obj.data
+        if self.mesh.shape_keys is None:
+            obj.shape_key_add(name=basis_name, from_mix=False)
+        self.basis_name = basis_name
+        self.key_blocks = self.mesh.shape_keys.key_blocks
+        # Basis は一度だけ取得し、以降は読み取り専用で共有する
+        self.basis = read_coords(self.key_blocks[basis_name].data)
+        self.basis.flags.writeable = False
+        self._symmetry = {}
+
+    def __len__(self):
+        return len(self.basis)
+
+    @property
+    def x(self):
+        return self.basis[:, X]
+
+    @property
+    def y(self):
+        return self.basis[:, Y]
+
+    @property
+    def z(self):
+        return self.basis[:, Z]
+
+    def box(self, x=None, y=None, z=None):
+        """Basis 座標が箱の内側（境界を含まない）にある頂点の RegionMask"""
+        return RegionMask.from_box(self.basis, x=x, y=y, z=z)
+
+    def symmetry(self, tolerance=0.001):
+        """Basis の左右対称マップ（許容誤差ごとに一度だけ作成）"""
+        sym = self._symmetry.get(tolerance)
+        if sym is None:
+            sym = self._symmetry[tolerance] = SymmetryMap.from_coords(self.basis, tolerance)
+        return sym
+
+    def mirror_edit(self, coords, positive=True, tolerance=0.001):
+        """片側（既定は +X 側）だけ編集した座標を反対側へ写す"""
+        return self.symmetry(tolerance).mirror_edit(coords, self.basis, positive)
+
+    def new_coords(self):
+        """Basis のコピーを返す（各シェイプキーの作業用配列）"""
+        return self.basis.copy()
+
+    def read_key(self, name):
+        """既存シェイプキーの座標を (N, 3) 配列で取得"""
+        return read_coords(self.key_blocks[name].data)
+
+    def write_key(self, name, coords):
+        """シェイプキーを作成（既存なら上書き）して座標を一括で書き込む"""
+        key = self.key_blocks.get(name)
+        if key is None:
+            key = self.obj.shape_key_add(name=name, from_mix=False)
+        write_coords(key.data, coords)
+        return key
+
+    def reset_key(self, name):
+        """シェイプキーを Basis と同じ形に戻す"""
+        return self.write_key(name, self.basis)
+
+    def remove_keys(self, names=None, predicate=None):
+        """
+        シェイプキーを削除（Basis は対象外）
+
+        names を指定すればその名前だけ、predicate を指定すれば
+        predicate(name) が真のものを、どちらも無ければ Basis 以外すべてを削除する。
+        """
+        if names is not None:
+            names = set(names)
+        removed = []
+        for name in [key.name for key in self.key_blocks]:
+            if name == self.basis_name:
+                continue
+            if names is not None and name not in names:
+                continue
+            if predicate is not None and not predicate(name):
+                continue
+            # 削除のたびに RNA 参照が無効になるため、名前から引き直す
+            self.obj.shape_key_remove(self.key_blocks[name])
+            removed.append(name)
+        return removed
+
+    def update(self):
+        """書き込み後のメッシュ更新"""
+        self.mesh.update()
@@ -0,0 +1,123 @@
+"""
+左右対称マップ（X軸ミラー）
+
++X 側の各頂点を、X を反転した位置に最も近い -X 側の頂点と KD-tree で
+対応付ける。総当たりの O(N²) ではなく O(N log N) で作成できるため、
+製品解像度の頭部でも数秒で終わる。
+
+使用例:
+    sym = SymmetryMap.from_coords(engine.basis, tolerance=0.001)
+    co = engine.new_coords()
+    co[right_corner, Z] += 0.02        # 右側だけ編集
+    sym.mirror_edit(co, engine.basis)  # 左側へ反映
+"""
+import numpy as np
+from mathutils.kdtree import KDTree
+
+from .regions import RegionMask, X
+
+
+class SymmetryMap:
+    """頂点の左右対応表"""
+
+    def __init__(self, pairs, center_mask, tolerance):
+        # pairs: (+X 側, -X 側) の頂点インデックス対 (M, 2)
+        self.pairs = pairs
+        self.center_mask = center_mask
+        self.tolerance = tolerance
+        # mirror[i]: 頂点 i の鏡像頂点（中心線上は自分自身、対応なしは -1）
+        self.mirror = np.full(len(center_mask), -1, dtype=np.int64)
+        self.mirror[center_mask] = np.flatnonzero(center_mask)
+        self.mirror[pairs[:, 0]] = pairs[:, 1]
+        self.mirror[pairs[:, 1]] = pairs[:, 0]
+
+    @classmethod
+    def from_coords(cls, coords, tolerance=0.001, center_tolerance=None):
+        """
+        座標から対応表を作成
+
+        tolerance: 鏡像位置と対応頂点の各軸の許容誤差
+        center_tolerance: |X| がこれ以下の頂点を中心線上とみなす（省略時は tolerance）
+        """
+        coords = np.asarray(coords, dtype=np.float32)
+        if center_tolerance is None:
+            center_tolerance = tolerance
+        x = coords[:, X]
+
+        center_mask = np.abs(x) <= center_tolerance
+        right_idx = np.flatnonzero(x > center_tolerance)
+        left_idx = np.flatnonzero(x < -center_tolerance)
+
+        pairs = np.empty((0, 2), dtype=np.int64)
+        if len(right_idx) and len(left_idx):
+            tree = KDTree(len(left_idx))
+            for i in left_idx:
+                tree.insert(coords[i], int(i))
+            tree.balance()
+
+            flipped = coords[right_idx].copy()
+            flipped[:, X] *= -1.0
+            found = np.fromiter((tree.find(co)[1] for co in flipped),
+                                dtype=np.int64, count=len(right_idx))
+            within = np.all(np.abs(coords[found] - flipped) < tolerance, axis=1)
+
+            # 同じ左頂点に複数の右頂点が対応した場合は最も近いものを採用
+            right_ok, left_ok = right_idx[within], found[within]
+            dist = np.linalg.norm(coords[left_ok] - flipped[within], axis=1)
+            order = np.lexsort((dist, left_ok))
+            _, first = np.unique(left_ok[order], return_index=True)
+            keep = np.sort(order[first])
+            pairs = np.stack((right_ok[keep], left_ok[keep]), axis=1)
+
+        return cls(pairs, center_mask, tolerance)
+
+    def __len__(self):
+        return len(self.mirror)
+
+    # --- 対応表 ---
+
+    @property
+    def unmatched(self):
+        """鏡像が見つからなかった頂点インデックス"""
+        return np.flatnonzero(self.mirror < 0)
+
+    @property
+    def center(self):
+        """中心線上の頂点インデックス"""
+        return np.flatnonzero(self.center_mask)
+
+    def stats(self):
+        """集計値（表示・レポート用）"""
+        return {
+            'vertices': len(self.mirror),
+            'pairs': len(self.pairs),
+            'center': int(np.count_nonzero(self.center_mask)),
+            'unmatched': len(self.unmatched),
+            'tolerance': self.tolerance,
+        }
+
+    # --- ミラー操作 ---
+
+    def mirror_region(self, region):
+        """領域を反対側へ写した RegionMask（中心線上の頂点はそのまま）"""
+        src = np.flatnonzero(np.asarray(region, dtype=bool) & (self.mirror >= 0))
+        mask = np.zeros(len(self.mirror), dtype=bool)
+        mask[self.mirror[src]] = True
+        return RegionMask(mask)
+
+    def mirror_edit(self, coords, basis, positive=True):
+        """
+        片側の編集（Basis からの差分）を反対側へ写す
+
+        positive=True なら +X 側を正として -X 側を上書きする。
+        中心線上の頂点は X 方向の移動を打ち消して中心線上に保つ。
+        coords はその場で更新して返す。
+        """
+        delta = coords - basis
+        pairs = self.pairs
+        src, dst = (pairs[:, 0], pairs[:, 1]) if positive else (pairs[:, 1], pairs[:, 0])
+        mirrored = delta[src]
+        mirrored[:, X] *= -1.0
+        coords[dst] = basis[dst] + mirrored
+        coords[self.center_mask, X] = basis[self.center_mask, X]
+        return coords
@@ -0,0 +1,220 @@
+"""
+音素タイムラインから F-カーブを直接生成するコンパイラ
+
+音素列（VOICEVOX の audio_query、またはフロントエンドの
+{phoneme, timestamp, duration} 形式）をビセームに変換し、チャンネル
+（シェイプキーやコントローラーのカスタムプロパティ）ごとのキーフレーム列を
+NumPy で組み立てる。書き込みは keyframe_points.add(n) と foreach_set で
+F-カーブごとに一括で行うため、scene.frame_set や keyframe_insert による
+シーンの再評価が起きない（1分の会話でも数ミリ秒）。
+
+使用例:
+    timeline = timeline_from_voicevox(audio_query)
+    tracks = compile_timeline(timeline, SHAPE_KEY_VISEMES, fps=24)
+    bake_tracks(obj.data.shape_keys, tracks, shape_key_path, "Conversation")
+"""
+import numpy as np
+
+# ビセーム → チャンネルの重み（create_natural_conversation_shapes.py のシェイプキー）
+SHAPE_KEY_VISEMES = {
+    'a': {'Vowel_A_Talk': 0.8, 'Talk_Open': 0.6},
+    'i': {'Vowel_I_Talk': 0.8, 'Talk_Open': 0.3},
+    'u': {'Vowel_U_Talk': 0.8, 'Talk_Open': 0.2},
+    'e': {'Vowel_E_Talk': 0.8, 'Talk_Open': 0.4},
+    'o': {'Vowel_O_Talk': 0.7, 'Talk_Open': 0.4},
+    'N': {'Consonant_M': 0.6, 'Half_Open': 0.2},
+    'M': {'Consonant_M': 0.9},
+    'rest': {},
+}
+
+# ビセーム → FaceController のカスタムプロパティ（create_animation_controller.py）
+CONTROLLER_VISEMES = {
+    'a': {'vowel_a': 0.8, 'mouth_open': 0.5},
+    'i': {'vowel_i': 0.8, 'mouth_open': 0.3},
+    'u': {'vowel_u': 0.8, 'mouth_open': 0.2},
+    'e': {'vowel_e': 0.8, 'mouth_open': 0.4},
+    'o': {'vowel_o': 0.7, 'mouth_open': 0.3},
+    'N': {'mouth_open': 0.1},
+    'M': {},
+    'rest': {},
+}
+
+# 唇を閉じる子音（VOICEVOX の音素表記）
+BILABIAL_CONSONANTS = {'m', 'my', 'b', 'by', 'p', 'py'}
+
+_KANA_VOWELS = {
+    'a': 'あかさたなはまやらわがざだばぱぁゃゎ',
+    'i': 'いきしちにひみりぎじぢびぴぃ',
+    'u': 'うくすつぬふむゆるぐずづぶぷぅゅゔ',
+    'e': 'えけせてねへめれげぜでべぺぇ',
+    'o': 'おこそとのほもよろをごぞどぼぽぉょ',
+}
+KANA_VISEMES = {kana: vowel for vowel, chars in _KANA_VOWELS.items() for kana in chars}
+KANA_VISEMES.update({'ん': 'N', 'っ': 'rest', '、': 'rest', '。': 'rest'})
+
+# 補間の enum 値（keyframe_points.foreach_set 用）
+INTERPOLATION = {'CONSTANT': 0, 'LINEAR': 1, 'BEZIER': 2}
+
+
+def viseme_of(phoneme):
+    """音素（VOICEVOX 表記またはかな 1 文字）をビセームに変換（口形に影響しなければ None）"""
+    if phoneme in ('pau', 'sil', 'cl'):
+        return 'rest'
+    if phoneme == 'N':
+        return 'N'
+    if phoneme in ('a', 'i', 'u', 'e', 'o', 'A', 'I', 'U', 'E', 'O'):
+        return phoneme.lower()
+    if phoneme in BILABIAL_CONSONANTS:
+        return 'M'
+    if len(phoneme) == 1 and 'ァ' <= phoneme <= 'ヶ':
+        phoneme = chr(ord(phoneme) - 0x60)  # カタカナ → ひらがな
+    return KANA_VISEMES.get(phoneme)
+
+
+# --- タイムライン ---
+
+def timeline_from_events(events):
+    """{phoneme, timestamp, duration}（ミリ秒）のリスト → [(開始秒, 終了秒, 音素)]"""
+    timeline = []
+    for event in events:
+        start = event['timestamp'] / 1000.0
+        phoneme = event['phoneme']
+        if phoneme == 'ー' and timeline:
+            phoneme = timeline[-1][2]  # 長音は直前の音素を伸ばす
+        timeline.append((start, start + event['duration'] / 1000.0, phoneme))
+    return timeline
+
+
+def timeline_from_voicevox(query):
+    """VOICEVOX の audio_query → [(開始秒, 終了秒, 音素)]"""
+    speed = query.get('speedScale', 1.0) or 1.0
+    t = query.get('prePhonemeLength', 0.0) / speed
+    timeline = []
+
+    def add(length, phoneme):
+        nonlocal t
+        length = (length or 0.0) / speed
+        if length > 0:
+            timeline.append((t, t + length, phoneme))
+        t += length
+
+    for phrase in query.get('accent_phrases', []):
+        for mora in phrase['moras']:
+            if mora.get('consonant'):
+                add(mora.get('consonant_length'), mora['consonant'])
+            add(mora.get('vowel_length'), mora['vowel'])
+        pause = phrase.get('pause_mora')
+        if pause:
+            add(pause.get('vowel_length'), 'pau')
+    return timeline
+
+
+# --- コンパイル ---
+
+def compile_timeline(timeline, viseme_map, fps, ramp=0.04, frame_start=1):
+    """
+    タイムラインをチャンネルごとのキーフレーム列に変換
+
+    各音素の区間は「開始 + ramp」から「終了 - ramp」まで重みを保ち、
+    隣の音素との間を補間でつなぐ（短い音素は区間の中央の 1 点だけ）。
+    戻り値: {チャンネル名: (フレーム配列, 値配列)}
+    """
+    events = [(start, end, viseme_of(phoneme)) for start, end, phoneme in timeline]
+    events = [(start, end, viseme) for start, end, viseme in events if viseme in viseme_map]
+    channels = sorted({channel for weights in viseme_map.values() for channel in weights})
+    if not events or not channels:
+        return {}
+
+    starts = np.array([e[0] for e in events])
+    ends = np.array([e[1] for e in events])
+    weights = np.array([[viseme_map[e[2]].get(c, 0.0) for c in channels] for e in events],
+                       dtype=np.float32)                                  # (E, C)
+
+    attack = np.minimum(ramp, (ends - starts) / 2)
+    times = np.stack([starts + attack, ends - attack], axis=1).ravel()      # (2E,)
+    values = np.repeat(weights, 2, axis=0)                                  # (2E, C)
+    # 前後に休止（全チャンネル 0）を置く
+    times = np.concatenate([[max(starts[0] - ramp, 0.0)], times, [ends[-1] + ramp]])
+    values = np.concatenate([np.zeros((1, len(channels))), values, np.zeros((1, len(channels)))])
+    frames = times * fps + frame_start
+
+    # 同じフレームに重なったキー（短い音素の 2 点）は 1 つにまとめる
+    keep = np.concatenate([[True], np.diff(frames) > 1e-6])
+    frames, values = frames[keep], values[keep]
+
+    tracks = {}
+    for c, channel in enumerate(channels):
+        track = values[:, c]
+        # 前後と同じ値のキーは補間結果が変わらないので落とす
+        flat = np.zeros(len(track), dtype=bool)
+        flat[1:-1] = (track[1:-1] == track[:-2]) & (track[1:-1] == track[2:])
+        tracks[channel] = (frames[~flat], track[~flat])
+    return tracks
+
+
+def keyframes_to_tracks(keyframes):
+    """[(フレーム, {チャンネル: 値})] → {チャンネル: (フレーム配列, 値配列)}"""
+    tracks = {}
+    for frame, values in keyframes:
+        for channel, value in values.items():
+            tracks.setdefault(channel, ([], []))
+            tracks[channel][0].append(frame)
+            tracks[channel][1].append(value)
+    return {channel: (np.array(frames, dtype=np.float32), np.array(values, dtype=np.float32))
+            for channel, (frames, values) in tracks.items()}
+
+
+# --- 書き込み ---
+
+def shape_key_path(name):
+    return f'key_blocks["{name}"].value'
+
+
+def custom_property_path(name):
+    return f'["{name}"]'
+
+
+def write_fcurve(action, data_path, frames, values, index=0, interpolation='BEZIER', group=None):
+    """F-カーブを作り直し、キーフレームを一括で書き込む"""
+    fcurve = action.fcurves.find(data_path, index=index)
+    if fcurve is not None:
+        action.fcurves.remove(fcurve)
+    fcurve = action.fcurves.new(data_path, index=index, action_group=group or '')
+
+    count = len(frames)
+    co = np.empty(count * 2, dtype=np.float32)
+    co[0::2] = frames
+    co[1::2] = values
+    points = fcurve.keyframe_points
+    points.add(count)
+    points.foreach_set('co', co)
+    points.foreach_set('interpolation', np.full(count, INTERPOLATION[interpolation], dtype=np.int32))
+    # 並び替えとハンドルの自動計算
+    fcurve.update()
+    return fcurve
+
+
+def bake_tracks(id_block, tracks, path_for, action_name, interpolation='BEZIER', group=None):
+    """
+    tracks をアクションとして id_block に割り当てる
+
+    id_block: シェイプキーなら mesh.shape_keys、カスタムプロパティならオブジェクト
+    path_for: チャンネル名 → data_path（shape_key_path / custom_property_path）
+    """
+    import bpy
+    action = bpy.data.actions.get(action_name) or bpy.data.actions.new(action_name)
+    if id_block.animation_data is None:
+        id_block.animation_data_create()
+    id_block.animation_data.action = action
+    for channel, (frames, values) in tracks.items():
+        write_fcurve(action, path_for(channel), frames, values,
+                     interpolation=interpolation, group=group)
+    return action
+
+
+def frame_range(tracks):
+    """tracks 全体の (最初のフレーム, 最後のフレーム)"""
+    frames = [f for f, _ in tracks.values() if len(f)]
+    if not frames:
+        return None
+    return int(np.floor(min(f.min() for f in frames))), int(np.ceil(max(f.max() for f in frames)))
@@ -0,0 +1,90 @@
+"""
+音素タイムラインをシェイプキーのアニメーションに焼き込む
+
+VOICEVOX の audio_query（JSON）またはフロントエンドの音素列
+（[{phoneme, timestamp, duration}]、ミリ秒）を読み込み、F-カーブを
+直接書き込む。scene.frame_set を使わないため、長い会話でも一瞬で終わる。
+
+使い方:
+    blender avatar.blend --background --python blender/bake_viseme_timeline.py -- timeline.json
+    blender avatar.blend --background --python blender/bake_viseme_timeline.py -- query.json --controller
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import bpy
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.visemes import (CONTROLLER_VISEMES, SHAPE_KEY_VISEMES, bake_tracks,
+                                  compile_timeline, custom_property_path, frame_range,
+                                  shape_key_path, timeline_from_events, timeline_from_voicevox)
+
+
+def parse_args():
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    parser = argparse.ArgumentParser(description="音素タイムラインをアニメーションに焼き込む")
+    parser.add_argument('timeline', help="audio_query または音素列の JSON")
+    parser.add_argument('--object', default='HighQualityFaceAvatar', help="シェイプキーを持つオブジェクト")
+    parser.add_argument('--controller', action='store_true',
+                        help="FaceController のカスタムプロパティに焼き込む")
+    parser.add_argument('--action', default='Conversation', help="作成するアクション名")
+    parser.add_argument('--start', type=int, default=1, help="開始フレーム")
+    parser.add_argument('--save', action='store_true', help="焼き込み後に .blend を保存")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    with open(args.timeline, encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict) and 'accent_phrases' in data:
+        timeline = timeline_from_voicevox(data)
+    else:
+        timeline = timeline_from_events(data)
+
+    scene = bpy.context.scene
+    fps = scene.render.fps / scene.render.fps_base
+
+    if args.controller:
+        target = bpy.data.objects.get('FaceController')
+        if target is None:
+            print("エラー: FaceController が見つかりません（create_animation_controller.py を先に実行）")
+            return
+        viseme_map, path_for = CONTROLLER_VISEMES, custom_property_path
+    else:
+        obj = bpy.data.objects.get(args.object)
+        if obj is None or obj.data.shape_keys is None:
+            print(f"エラー: {args.object} またはシェイプキーが見つかりません")
+            return
+        target = obj.data.shape_keys
+        key_blocks = target.key_blocks
+        # メッシュにないシェイプキーは除外
+        viseme_map = {viseme: {name: w for name, w in weights.items() if name in key_blocks}
+                      for viseme, weights in SHAPE_KEY_VISEMES.items()}
+        path_for = shape_key_path
+
+    start = time.perf_counter()
+    tracks = compile_timeline(timeline, viseme_map, fps, frame_start=args.start)
+    if not tracks:
+        print("⚠️  焼き込むチャンネルがありません")
+        return
+    bake_tracks(target, tracks, path_for, args.action)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    first, last = frame_range(tracks)
+    scene.frame_start = min(scene.frame_start, first)
+    scene.frame_end = max(scene.frame_end, last)
+    keys = sum(len(frames) for frames, _ in tracks.values())
+    duration = timeline[-1][1] if timeline else 0.0
+    print(f"✓ {len(timeline)}音素（{duration:.1f}秒）→ {len(tracks)}チャンネル / {keys}キー"
+          f"（フレーム {first}〜{last}、{elapsed:.1f} ms）")
+
+    if args.save:
+        bpy.ops.wm.save_mainfile()
+        print("✓ 保存しました")
+
+
+main()
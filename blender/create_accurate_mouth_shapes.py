@@ -1,28 +1,26 @@
 """
 解剖学的分析に基づいて正確な口のシェイプキーを作成
 """
+import os
+import sys
+
 import bpy
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.shape_keys import ShapeKeyEngine, X, Y, Z
+
 obj = bpy.data.objects.get('HighQualityFaceAvatar')
 
 if obj:
     mesh = obj.data
-    vertices = mesh.vertices
     
     print("=== 解剖学的分析に基づく口のシェイプキー作成 ===\n")
     
+    engine = ShapeKeyEngine(obj)
+    bx, bz = engine.x, engine.z
+    
     # すべてのテストシェイプキーを削除
-    if mesh.shape_keys:
-        keys_to_remove = []
-        for key in mesh.shape_keys.key_blocks:
-            if key.name.startswith('Test_'):
-                keys_to_remove.append(key.name)
-        
-        for key_name in keys_to_remove:
-            obj.active_shape_key_index = mesh.shape_keys.key_blocks.find(key_name)
-            bpy.ops.object.shape_key_remove()
-    
-    basis = mesh.shape_keys.key_blocks['Basis']
+    engine.remove_keys(predicate=lambda name: name.startswith('Test_'))
     
     # 解剖学的分析から判明した口の位置
     print("口の正確な位置（解剖学的分析より）：")
@@ -31,146 +29,91 @@ if obj:
     print("- X座標: -0.140 〜 0.131\n")
     
     # 口の領域の頂点を収集
-    mouth_vertices = []
-    for i, v in enumerate(vertices):
-        if (-0.65 < v.co.y < -0.54 and
-            -0.30 < v.co.z < -0.09 and
-            -0.15 < v.co.x < 0.15):
-            mouth_vertices.append(i)
+    mouth_vertices = engine.box(x=(-0.15, 0.15), y=(-0.65, -0.54), z=(-0.30, -0.09))
     
-    print(f"口の領域の頂点数: {len(mouth_vertices)}\n")
+    print(f"口の領域の頂点数: {mouth_vertices.count}\n")
     
     # 上唇と下唇を分離
-    upper_lip_vertices = []
-    lower_lip_vertices = []
-    
-    for i in mouth_vertices:
-        if vertices[i].co.z > -0.18:  # 上部
-            upper_lip_vertices.append(i)
-        else:  # 下部
-            lower_lip_vertices.append(i)
+    upper_lip_vertices = mouth_vertices & (bz > -0.18)  # 上部
+    lower_lip_vertices = mouth_vertices & ~(bz > -0.18)  # 下部
     
-    print(f"上唇の頂点数: {len(upper_lip_vertices)}")
-    print(f"下唇の頂点数: {len(lower_lip_vertices)}\n")
+    print(f"上唇の頂点数: {upper_lip_vertices.count}")
+    print(f"下唇の頂点数: {lower_lip_vertices.count}\n")
     
     # シェイプキーを作成
     print("シェイプキーを作成中...\n")
     
     # 1. 口を開く
-    obj.shape_key_add(name="Mouth_Open", from_mix=False)
-    mouth_open = mesh.shape_keys.key_blocks["Mouth_Open"]
-    
-    for i in range(len(vertices)):
-        mouth_open.data[i].co = basis.data[i].co.copy()
-        
-        if i in lower_lip_vertices:
-            # 下唇を下げる
-            mouth_open.data[i].co.z -= 0.08
-            mouth_open.data[i].co.y += 0.02
-        elif i in upper_lip_vertices:
-            # 上唇は少しだけ
-            mouth_open.data[i].co.z += 0.01
+    co = engine.new_coords()
+    # 下唇を下げる
+    co[lower_lip_vertices, Z] -= 0.08
+    co[lower_lip_vertices, Y] += 0.02
+    # 上唇は少しだけ
+    co[upper_lip_vertices, Z] += 0.01
+    engine.write_key("Mouth_Open", co)
     
     print("✓ Mouth_Open - 口を開く")
     
     # 2. 母音「あ」
-    obj.shape_key_add(name="Vowel_A", from_mix=False)
-    vowel_a = mesh.shape_keys.key_blocks["Vowel_A"]
-    
-    for i in range(len(vertices)):
-        vowel_a.data[i].co = basis.data[i].co.copy()
-        
-        if i in mouth_vertices:
-            co = basis.data[i].co
-            # 大きく開く
-            if co.z < -0.18:  # 下唇
-                vowel_a.data[i].co.z -= 0.07
-            else:  # 上唇
-                vowel_a.data[i].co.z += 0.01
-            # 少し狭める
-            vowel_a.data[i].co.x *= 0.92
+    co = engine.new_coords()
+    # 大きく開く
+    co[mouth_vertices & (bz < -0.18), Z] -= 0.07  # 下唇
+    co[mouth_vertices & ~(bz < -0.18), Z] += 0.01  # 上唇
+    # 少し狭める
+    co[mouth_vertices, X] *= 0.92
+    engine.write_key("Vowel_A", co)
     
     print("✓ Vowel_A - 「あ」")
     
     # 3. 母音「い」
-    obj.shape_key_add(name="Vowel_I", from_mix=False)
-    vowel_i = mesh.shape_keys.key_blocks["Vowel_I"]
-    
-    for i in range(len(vertices)):
-        vowel_i.data[i].co = basis.data[i].co.copy()
-        
-        if i in mouth_vertices:
-            # 横に広げる
-            vowel_i.data[i].co.x *= 1.25
-            # 縦を狭める
-            vowel_i.data[i].co.z *= 0.98
+    co = engine.new_coords()
+    # 横に広げる
+    co[mouth_vertices, X] *= 1.25
+    # 縦を狭める
+    co[mouth_vertices, Z] *= 0.98
+    engine.write_key("Vowel_I", co)
     
     print("✓ Vowel_I - 「い」")
     
     # 4. 母音「う」
-    obj.shape_key_add(name="Vowel_U", from_mix=False)
-    vowel_u = mesh.shape_keys.key_blocks["Vowel_U"]
-    
-    for i in range(len(vertices)):
-        vowel_u.data[i].co = basis.data[i].co.copy()
-        
-        if i in mouth_vertices:
-            # すぼめる
-            vowel_u.data[i].co.x *= 0.65
-            # 前に突き出す
-            vowel_u.data[i].co.y -= 0.04
+    co = engine.new_coords()
+    # すぼめる
+    co[mouth_vertices, X] *= 0.65
+    # 前に突き出す
+    co[mouth_vertices, Y] -= 0.04
+    engine.write_key("Vowel_U", co)
     
     print("✓ Vowel_U - 「う」")
     
     # 5. 母音「え」
-    obj.shape_key_add(name="Vowel_E", from_mix=False)
-    vowel_e = mesh.shape_keys.key_blocks["Vowel_E"]
-    
-    for i in range(len(vertices)):
-        vowel_e.data[i].co = basis.data[i].co.copy()
-        
-        if i in mouth_vertices:
-            co = basis.data[i].co
-            # 少し横に
-            vowel_e.data[i].co.x *= 1.1
-            # 少し開く
-            if co.z < -0.18:
-                vowel_e.data[i].co.z -= 0.03
+    co = engine.new_coords()
+    # 少し横に
+    co[mouth_vertices, X] *= 1.1
+    # 少し開く
+    co[mouth_vertices & (bz < -0.18), Z] -= 0.03
+    engine.write_key("Vowel_E", co)
     
     print("✓ Vowel_E - 「え」")
     
     # 6. 母音「お」
-    obj.shape_key_add(name="Vowel_O", from_mix=False)
-    vowel_o = mesh.shape_keys.key_blocks["Vowel_O"]
-    
-    for i in range(len(vertices)):
-        vowel_o.data[i].co = basis.data[i].co.copy()
-        
-        if i in mouth_vertices:
-            co = basis.data[i].co
-            # 丸める
-            vowel_o.data[i].co.x *= 0.8
-            # 縦に開く
-            if co.z < -0.18:
-                vowel_o.data[i].co.z -= 0.05
-            # 少し前に
-            vowel_o.data[i].co.y -= 0.02
+    co = engine.new_coords()
+    # 丸める
+    co[mouth_vertices, X] *= 0.8
+    # 縦に開く
+    co[mouth_vertices & (bz < -0.18), Z] -= 0.05
+    # 少し前に
+    co[mouth_vertices, Y] -= 0.02
+    engine.write_key("Vowel_O", co)
     
     print("✓ Vowel_O - 「お」")
     
     # 7. 笑顔
-    obj.shape_key_add(name="Smile", from_mix=False)
-    smile = mesh.shape_keys.key_blocks["Smile"]
-    
-    for i in range(len(vertices)):
-        smile.data[i].co = basis.data[i].co.copy()
-        
-        if i in mouth_vertices:
-            co = basis.data[i].co
-            # 口角を上げる
-            if abs(co.x) > 0.08:
-                smile.data[i].co.z += 0.04
-                smile.data[i].co.x *= 1.08
+    co = engine.new_coords()
+    # 口角を上げる
+    corners = mouth_vertices & (abs(bx) > 0.08)
+    co[corners, Z] += 0.04
+    co[corners, X] *= 1.08
+    engine.write_key("Smile", co)
     
     print("✓ Smile - 笑顔")
     
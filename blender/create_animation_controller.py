@@ -1,8 +1,15 @@
 """
 アニメーションコントローラーの作成
 """
+import os
+import sys
+
 import bpy
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.drivers import add_driver, prop_var, report_python_drivers
+from avatar_tools.visemes import bake_tracks, custom_property_path, keyframes_to_tracks
+
 print("=== アニメーションコントローラー作成 ===\n")
 
 # オブジェクトを取得
@@ -75,24 +82,14 @@ if face_obj and armature_obj:
         
         print("\nドライバーを設定中...")
         
+        # 強さとの積は単純式、1 変数だけのものは SUM ドライバーにして Python を通さない
+        intensity = prop_var("intensity", controller, "talk_intensity")
+        
         # 口の開き（Talk_Open）
         if "Talk_Open" in shape_keys:
-            driver = shape_keys["Talk_Open"].driver_add("value").driver
-            driver.type = 'SCRIPTED'
-            
-            var1 = driver.variables.new()
-            var1.name = "mouth_open"
-            var1.type = 'SINGLE_PROP'
-            var1.targets[0].id = controller
-            var1.targets[0].data_path = '["mouth_open"]'
-            
-            var2 = driver.variables.new()
-            var2.name = "intensity"
-            var2.type = 'SINGLE_PROP'
-            var2.targets[0].id = controller
-            var2.targets[0].data_path = '["talk_intensity"]'
-            
-            driver.expression = "mouth_open * intensity"
+            add_driver(shape_keys["Talk_Open"], "value",
+                       [prop_var("mouth_open", controller, "mouth_open"), intensity],
+                       expression="mouth_open * intensity")
             print("✓ Talk_Open ドライバー設定")
         
         # 母音のドライバー
@@ -106,50 +103,21 @@ if face_obj and armature_obj:
         
         for shape_name, prop_name in vowel_shapes.items():
             if shape_name in shape_keys:
-                driver = shape_keys[shape_name].driver_add("value").driver
-                driver.type = 'SCRIPTED'
-                
-                var1 = driver.variables.new()
-                var1.name = prop_name
-                var1.type = 'SINGLE_PROP'
-                var1.targets[0].id = controller
-                var1.targets[0].data_path = f'["{prop_name}"]'
-                
-                var2 = driver.variables.new()
-                var2.name = "intensity"
-                var2.type = 'SINGLE_PROP'
-                var2.targets[0].id = controller
-                var2.targets[0].data_path = '["talk_intensity"]'
-                
-                driver.expression = f"{prop_name} * intensity"
+                add_driver(shape_keys[shape_name], "value",
+                           [prop_var(prop_name, controller, prop_name), intensity],
+                           expression=f"{prop_name} * intensity")
                 print(f"✓ {shape_name} ドライバー設定")
         
         # 表情のドライバー
         if "Smile_Subtle" in shape_keys:
-            driver = shape_keys["Smile_Subtle"].driver_add("value").driver
-            driver.type = 'SCRIPTED'
-            
-            var = driver.variables.new()
-            var.name = "smile"
-            var.type = 'SINGLE_PROP'
-            var.targets[0].id = controller
-            var.targets[0].data_path = '["smile"]'
-            
-            driver.expression = "smile"
+            add_driver(shape_keys["Smile_Subtle"], "value", [prop_var("smile", controller, "smile")])
             print("✓ Smile_Subtle ドライバー設定")
         
         if "Frown" in shape_keys:
-            driver = shape_keys["Frown"].driver_add("value").driver
-            driver.type = 'SCRIPTED'
-            
-            var = driver.variables.new()
-            var.name = "frown"
-            var.type = 'SINGLE_PROP'
-            var.targets[0].id = controller
-            var.targets[0].data_path = '["frown"]'
-            
-            driver.expression = "frown"
+            add_driver(shape_keys["Frown"], "value", [prop_var("frown", controller, "frown")])
             print("✓ Frown ドライバー設定")
+        
+        report_python_drivers([face_obj.data.shape_keys])
     
     # ボーンのコンストレイントを設定
     if armature_obj.pose:
@@ -170,27 +138,12 @@ if face_obj and armature_obj:
             if jaw_bone.rotation_mode != 'XYZ':
                 jaw_bone.rotation_mode = 'XYZ'
             
-            driver = jaw_bone.driver_add("rotation_euler", 0).driver
-            driver.type = 'SCRIPTED'
-            
-            var = driver.variables.new()
-            var.name = "jaw_rot"
-            var.type = 'SINGLE_PROP'
-            var.targets[0].id = controller
-            var.targets[0].data_path = '["jaw_rotation"]'
-            
-            driver.expression = "jaw_rot"
+            add_driver(jaw_bone, "rotation_euler", [prop_var("jaw_rot", controller, "jaw_rotation")], index=0)
             print("✓ Jaw ボーン制御設定")
     
     # アニメーションアクションを作成
     print("\nサンプルアニメーションを作成中...")
     
-    # 新しいアクションを作成
-    action = bpy.data.actions.new("Conversation_Sample")
-    controller.animation_data_create()
-    controller.animation_data.action = action
-    
-    # キーフレームを設定
     scene = bpy.context.scene
     scene.frame_start = 1
     scene.frame_end = 120
@@ -207,11 +160,8 @@ if face_obj and armature_obj:
         (90, {"mouth_open": 0, "vowel_o": 0, "vowel_i": 0, "vowel_a": 0, "smile": 0})
     ]
     
-    for frame, values in keyframes:
-        scene.frame_set(frame)
-        for prop, value in values.items():
-            controller[prop] = value
-            controller.keyframe_insert(data_path=f'["{prop}"]', frame=frame)
+    # F-カーブへ直接書き込む（frame_set によるシーンの再評価をしない）
+    bake_tracks(controller, keyframes_to_tracks(keyframes), custom_property_path, "Conversation_Sample")
     
     print("✓ サンプルアニメーション作成完了")
     
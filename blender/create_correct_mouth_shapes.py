@@ -1,13 +1,18 @@
 """
 前後が逆と判明したので、正しい座標で口のシェイプキーを作成
 """
+import os
+import sys
+
 import bpy
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.shape_keys import ShapeKeyEngine, X, Y, Z
+
 obj = bpy.data.objects.get('HighQualityFaceAvatar')
 
 if obj:
     mesh = obj.data
-    vertices = mesh.vertices
     
     print("=== 正しい座標系で口のシェイプキーを作成 ===\n")
     print("座標系の理解：")
@@ -16,6 +21,9 @@ if obj:
     print("- Z > 0: 上（額）")
     print("- Z < 0: 下（顎）\n")
     
+    engine = ShapeKeyEngine(obj)
+    bx, bz = engine.x, engine.z
+    
     # 既存のシェイプキーを削除
     shape_keys_to_create = [
         "Mouth_Open_FINAL",
@@ -26,146 +34,85 @@ if obj:
         "Vowel_O_FINAL",
         "Smile_FINAL"
     ]
-    
-    for key_name in shape_keys_to_create:
-        if key_name in mesh.shape_keys.key_blocks:
-            obj.active_shape_key_index = mesh.shape_keys.key_blocks.find(key_name)
-            bpy.ops.object.shape_key_remove()
-    
-    basis = mesh.shape_keys.key_blocks['Basis']
+    engine.remove_keys(shape_keys_to_create)
     
     # 口の正しい領域を定義
     # Y < -0.3 (顔の前面)
     # -0.3 < Z < 0.1 (鼻の下、顎の上)
     # |X| < 0.4 (中央付近)
+    mouth_vertices = engine.box(x=(-0.4, 0.4), y=(None, -0.3), z=(-0.3, 0.1))
     
-    def is_mouth_region(co):
-        return (co.y < -0.3 and  # 顔の前面
-                -0.3 < co.z < 0.1 and  # 口の高さ
-                abs(co.x) < 0.4)  # 中央付近
-    
-    # 口の領域の頂点を収集
-    mouth_vertices = []
-    for i, v in enumerate(vertices):
-        if is_mouth_region(v.co):
-            mouth_vertices.append(i)
-    
-    print(f"口の領域の頂点数: {len(mouth_vertices)}")
+    print(f"口の領域の頂点数: {mouth_vertices.count}")
     
     # 1. 口を開く
-    obj.shape_key_add(name="Mouth_Open_FINAL", from_mix=False)
-    mouth_open = mesh.shape_keys.key_blocks["Mouth_Open_FINAL"]
-    
-    for i, v in enumerate(vertices):
-        co = basis.data[i].co
-        mouth_open.data[i].co = co.copy()
-        
-        if i in mouth_vertices:
-            # 下唇を下げる
-            if co.z < -0.1:
-                mouth_open.data[i].co.z -= 0.08
-                mouth_open.data[i].co.y += 0.02  # 前後が逆なので符号も逆
+    co = engine.new_coords()
+    # 下唇を下げる
+    lower = mouth_vertices & (bz < -0.1)
+    co[lower, Z] -= 0.08
+    co[lower, Y] += 0.02  # 前後が逆なので符号も逆
+    engine.write_key("Mouth_Open_FINAL", co)
     
     print("✓ Mouth_Open_FINAL 作成完了")
     
     # 2. 母音「あ」
-    obj.shape_key_add(name="Vowel_A_FINAL", from_mix=False)
-    vowel_a = mesh.shape_keys.key_blocks["Vowel_A_FINAL"]
-    
-    for i, v in enumerate(vertices):
-        co = basis.data[i].co
-        vowel_a.data[i].co = co.copy()
-        
-        if i in mouth_vertices:
-            # 口を大きく開く
-            if co.z < -0.05:
-                vowel_a.data[i].co.z -= 0.06
-            # 少し狭める
-            vowel_a.data[i].co.x *= 0.95
+    co = engine.new_coords()
+    # 口を大きく開く
+    co[mouth_vertices & (bz < -0.05), Z] -= 0.06
+    # 少し狭める
+    co[mouth_vertices, X] *= 0.95
+    engine.write_key("Vowel_A_FINAL", co)
     
     print("✓ Vowel_A_FINAL 作成完了")
     
     # 3. 母音「い」
-    obj.shape_key_add(name="Vowel_I_FINAL", from_mix=False)
-    vowel_i = mesh.shape_keys.key_blocks["Vowel_I_FINAL"]
-    
-    for i, v in enumerate(vertices):
-        co = basis.data[i].co
-        vowel_i.data[i].co = co.copy()
-        
-        if i in mouth_vertices:
-            # 横に広げる
-            vowel_i.data[i].co.x *= 1.25
-            # 縦を狭める
-            vowel_i.data[i].co.z *= 0.9
+    co = engine.new_coords()
+    # 横に広げる
+    co[mouth_vertices, X] *= 1.25
+    # 縦を狭める
+    co[mouth_vertices, Z] *= 0.9
+    engine.write_key("Vowel_I_FINAL", co)
     
     print("✓ Vowel_I_FINAL 作成完了")
     
     # 4. 母音「う」
-    obj.shape_key_add(name="Vowel_U_FINAL", from_mix=False)
-    vowel_u = mesh.shape_keys.key_blocks["Vowel_U_FINAL"]
-    
-    for i, v in enumerate(vertices):
-        co = basis.data[i].co
-        vowel_u.data[i].co = co.copy()
-        
-        if i in mouth_vertices:
-            # すぼめる
-            vowel_u.data[i].co.x *= 0.65
-            # 前に突き出す（Y軸が逆なので）
-            vowel_u.data[i].co.y -= 0.04
+    co = engine.new_coords()
+    # すぼめる
+    co[mouth_vertices, X] *= 0.65
+    # 前に突き出す（Y軸が逆なので）
+    co[mouth_vertices, Y] -= 0.04
+    engine.write_key("Vowel_U_FINAL", co)
     
     print("✓ Vowel_U_FINAL 作成完了")
     
     # 5. 母音「え」
-    obj.shape_key_add(name="Vowel_E_FINAL", from_mix=False)
-    vowel_e = mesh.shape_keys.key_blocks["Vowel_E_FINAL"]
-    
-    for i, v in enumerate(vertices):
-        co = basis.data[i].co
-        vowel_e.data[i].co = co.copy()
-        
-        if i in mouth_vertices:
-            # 少し横に開く
-            vowel_e.data[i].co.x *= 1.1
-            # 少し開く
-            if co.z < -0.1:
-                vowel_e.data[i].co.z -= 0.03
+    co = engine.new_coords()
+    # 少し横に開く
+    co[mouth_vertices, X] *= 1.1
+    # 少し開く
+    co[mouth_vertices & (bz < -0.1), Z] -= 0.03
+    engine.write_key("Vowel_E_FINAL", co)
     
     print("✓ Vowel_E_FINAL 作成完了")
     
     # 6. 母音「お」
-    obj.shape_key_add(name="Vowel_O_FINAL", from_mix=False)
-    vowel_o = mesh.shape_keys.key_blocks["Vowel_O_FINAL"]
-    
-    for i, v in enumerate(vertices):
-        co = basis.data[i].co
-        vowel_o.data[i].co = co.copy()
-        
-        if i in mouth_vertices:
-            # 丸める
-            vowel_o.data[i].co.x *= 0.85
-            # 縦に開く
-            if co.z < -0.08:
-                vowel_o.data[i].co.z -= 0.05
-            # 少し前に
-            vowel_o.data[i].co.y -= 0.02
+    co = engine.new_coords()
+    # 丸める
+    co[mouth_vertices, X] *= 0.85
+    # 縦に開く
+    co[mouth_vertices & (bz < -0.08), Z] -= 0.05
+    # 少し前に
+    co[mouth_vertices, Y] -= 0.02
+    engine.write_key("Vowel_O_FINAL", co)
     
     print("✓ Vowel_O_FINAL 作成完了")
     
     # 7. 笑顔
-    obj.shape_key_add(name="Smile_FINAL", from_mix=False)
-    smile = mesh.shape_keys.key_blocks["Smile_FINAL"]
-    
-    for i, v in enumerate(vertices):
-        co = basis.data[i].co
-        smile.data[i].co = co.copy()
-        
-        if i in mouth_vertices:
-            # 口角を上げる
-            if abs(co.x) > 0.2:
-                smile.data[i].co.z += 0.04
-                smile.data[i].co.x *= 1.08
+    co = engine.new_coords()
+    # 口角を上げる
+    corners = mouth_vertices & (abs(bx) > 0.2)
+    co[corners, Z] += 0.04
+    co[corners, X] *= 1.08
+    engine.write_key("Smile_FINAL", co)
     
     print("✓ Smile_FINAL 作成完了")
     
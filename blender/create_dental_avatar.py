@@ -7,6 +7,10 @@ Blender 3.6以上で実行してください
 2. Scripting タブに切り替え
 3. このスクリプトをコピー＆ペースト
 4. Run Script ボタンをクリック
+
+コマンドラインでは出力先を指定するとそのまま GLB を書き出す
+（--compression で scripts/avatar_pipeline/compression.py のプロファイルを選べる）:
+    blender --background --python blender/create_dental_avatar.py -- patient-avatar.glb --compression meshopt
 """
 
 import bpy
@@ -301,28 +305,31 @@ def setup_scene():
     rim_light.data.spot_size = 0.8
 
 # エクスポート設定
-def export_avatar(filepath):
+def export_avatar(filepath, profile=None):
+    """圧縮プロファイルを適用して書き出す（scripts/avatar_pipeline を使う）"""
+    import os
+    import sys
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+    from avatar_pipeline.export_options import merge_export_options
+    from avatar_pipeline.worker import export_with_compression
+
     # すべてのオブジェクトを選択
     bpy.ops.object.select_all(action='SELECT')
-    
-    # GLTFエクスポート
-    bpy.ops.export_scene.gltf(
-        filepath=filepath,
-        export_format='GLB',
-        export_texcoords=True,
-        export_normals=True,
-        export_materials='EXPORT',
-        export_cameras=False,
-        export_lights=False,
-        export_yup=True,
-        export_apply=True,
-        export_animations=True,
-        export_morph=True,
-        export_morph_normal=True,
-        export_morph_tangent=False
-    )
-    
-    print(f"アバターがエクスポートされました: {filepath}")
+
+    options = merge_export_options({'export_tangents': False})
+    size = export_with_compression(filepath, options, profile)
+
+    print(f"アバターがエクスポートされました: {filepath}（{size / 1024 / 1024:.2f} MB）")
+
+def command_line_args():
+    """`blender ... -- 出力.glb --compression プロファイル` の引数（なければ既定値）"""
+    import argparse
+    import sys
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    parser = argparse.ArgumentParser(prog='create_dental_avatar.py')
+    parser.add_argument('output', nargs='?', help="書き出す GLB（省略時は書き出さない）")
+    parser.add_argument('--compression', default=None, help="圧縮プロファイル（none / draco / meshopt / quantize）")
+    return parser.parse_args(argv)
 
 # メイン実行関数
 def main():
@@ -353,6 +360,11 @@ def main():
     setup_scene()
     
     print("アバターの作成が完了しました！")
+
+    args = command_line_args()
+    if args.output:
+        export_avatar(args.output, args.compression)
+        return
     print("\nエクスポートするには:")
     print("1. File > Export > glTF 2.0")
     print("2. ファイル名: patient-avatar.glb")
@@ -1,8 +1,14 @@
 """
 手動設定のため、すべてのシェイプキーを削除し、上唇・下唇の基準シェイプキーを作成
 """
+import os
+import sys
+
 import bpy
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.shape_keys import ShapeKeyEngine
+
 obj = bpy.data.objects.get('HighQualityFaceAvatar')
 
 if obj:
@@ -10,53 +16,28 @@ if obj:
     
     print("=== シェイプキーのリセットと基準作成 ===\n")
     
+    engine = ShapeKeyEngine(obj)
+    
     # 1. すべてのシェイプキーを削除（Basis以外）
-    if mesh.shape_keys:
-        print("既存のシェイプキーを削除中...")
-        keys_to_remove = []
-        
-        for key in mesh.shape_keys.key_blocks:
-            if key.name != 'Basis':
-                keys_to_remove.append(key.name)
-        
-        for key_name in keys_to_remove:
-            obj.active_shape_key_index = mesh.shape_keys.key_blocks.find(key_name)
-            bpy.ops.object.shape_key_remove()
-        
-        print(f"{len(keys_to_remove)}個のシェイプキーを削除しました\n")
+    print("既存のシェイプキーを削除中...")
+    removed = engine.remove_keys()
+    print(f"{len(removed)}個のシェイプキーを削除しました\n")
     
     # 2. 基準となるシェイプキーを作成
     print("基準シェイプキーを作成中...\n")
     
-    basis = mesh.shape_keys.key_blocks['Basis']
-    
-    # 上唇の基準シェイプキー
-    obj.shape_key_add(name="Upper_Lip_Reference", from_mix=False)
-    upper_lip = mesh.shape_keys.key_blocks["Upper_Lip_Reference"]
-    
-    # すべての頂点をBasisからコピー
-    for i in range(len(mesh.vertices)):
-        upper_lip.data[i].co = basis.data[i].co.copy()
+    # 上唇の基準シェイプキー（すべての頂点をBasisからコピー）
+    engine.reset_key("Upper_Lip_Reference")
     
     print("✓ Upper_Lip_Reference - 上唇の基準（手動で編集してください）")
     
     # 下唇の基準シェイプキー
-    obj.shape_key_add(name="Lower_Lip_Reference", from_mix=False)
-    lower_lip = mesh.shape_keys.key_blocks["Lower_Lip_Reference"]
-    
-    # すべての頂点をBasisからコピー
-    for i in range(len(mesh.vertices)):
-        lower_lip.data[i].co = basis.data[i].co.copy()
+    engine.reset_key("Lower_Lip_Reference")
     
     print("✓ Lower_Lip_Reference - 下唇の基準（手動で編集してください）")
     
     # 口全体の基準シェイプキー
-    obj.shape_key_add(name="Mouth_Region_Reference", from_mix=False)
-    mouth_region = mesh.shape_keys.key_blocks["Mouth_Region_Reference"]
-    
-    # すべての頂点をBasisからコピー
-    for i in range(len(mesh.vertices)):
-        mouth_region.data[i].co = basis.data[i].co.copy()
+    engine.reset_key("Mouth_Region_Reference")
     
     print("✓ Mouth_Region_Reference - 口全体の基準（手動で編集してください）")
     
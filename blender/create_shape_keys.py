@@ -1,193 +1,153 @@
 """
 シェイプキーに実際の変形データを作成するスクリプト
 """
+import os
+import sys
+
 import bpy
 import math
 
-def get_face_regions(mesh):
-    """顔の各領域の頂点インデックスを取得"""
-    vertices = mesh.vertices
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.shape_keys import RegionMask, ShapeKeyEngine, X, Y, Z
+
+def get_face_regions(engine):
+    """顔の各領域の頂点を RegionMask で取得（メッシュごとに一度だけ作成）"""
+    x, y, z = engine.x, engine.y, engine.z
     
     # Z座標で領域を分類
-    z_coords = [v.co.z for v in vertices]
-    z_min, z_max = min(z_coords), max(z_coords)
+    z_min, z_max = z.min(), z.max()
     z_range = z_max - z_min
     
-    regions = {
-        'mouth': [],
-        'jaw': [],
-        'cheek': [],
-        'nose': [],
-        'eye': [],
-        'forehead': []
-    }
+    def z_between(lo, hi):
+        return (z_min + lo * z_range < z) & (z < z_min + hi * z_range)
     
-    for i, v in enumerate(vertices):
-        x, y, z = v.co.x, v.co.y, v.co.z
-        
-        # 口周辺（下部前方）
-        if z < z_min + 0.35 * z_range and y > -0.5:
-            if abs(x) < 0.6:  # 中央付近
-                regions['mouth'].append(i)
-            
+    regions = {
+        # 口周辺（下部前方、中央付近）
+        'mouth': (z < z_min + 0.35 * z_range) & (y > -0.5) & (abs(x) < 0.6),
         # 顎（最下部）
-        if z < z_min + 0.2 * z_range:
-            regions['jaw'].append(i)
-            
+        'jaw': z < z_min + 0.2 * z_range,
         # 頬（中部側面）
-        if z_min + 0.2 * z_range < z < z_min + 0.6 * z_range and abs(x) > 0.5:
-            regions['cheek'].append(i)
-            
+        'cheek': z_between(0.2, 0.6) & (abs(x) > 0.5),
         # 鼻周辺（中部前方）
-        if z_min + 0.4 * z_range < z < z_min + 0.6 * z_range and abs(x) < 0.3 and y > 0:
-            regions['nose'].append(i)
-            
+        'nose': z_between(0.4, 0.6) & (abs(x) < 0.3) & (y > 0),
         # 目周辺（上部）
-        if z_min + 0.55 * z_range < z < z_min + 0.75 * z_range and abs(x) < 0.8:
-            regions['eye'].append(i)
-            
+        'eye': z_between(0.55, 0.75) & (abs(x) < 0.8),
         # 額（最上部）
-        if z > z_min + 0.7 * z_range:
-            regions['forehead'].append(i)
+        'forehead': z > z_min + 0.7 * z_range,
+    }
     
-    return regions
+    return {name: RegionMask(mask) for name, mask in regions.items()}
 
-def create_mouth_open(mesh, shape_key, regions):
+def create_mouth_open(co, basis, regions):
     """口を開けるシェイプキー"""
-    basis = mesh.shape_keys.key_blocks['Basis']
+    mouth = regions['mouth']
     
-    for i in regions['mouth']:
-        v = basis.data[i].co
-        # 口の下部を下げる
-        if v.z < -0.8:
-            shape_key.data[i].co.z = v.z - 0.15
-            # 少し後ろに引く
-            shape_key.data[i].co.y = v.y - 0.05
+    # 口の下部を下げる、少し後ろに引く
+    lower = mouth & (basis[:, Z] < -0.8)
+    co[lower, Z] = basis[lower, Z] - 0.15
+    co[lower, Y] = basis[lower, Y] - 0.05
     
     # 顎も少し下げる
-    for i in regions['jaw']:
-        v = basis.data[i].co
-        shape_key.data[i].co.z = v.z - 0.08
+    jaw = regions['jaw']
+    co[jaw, Z] = basis[jaw, Z] - 0.08
 
-def create_viseme_a(mesh, shape_key, regions):
+def create_viseme_a(co, basis, regions):
     """「あ」の口形"""
-    basis = mesh.shape_keys.key_blocks['Basis']
-    
-    for i in regions['mouth']:
-        v = basis.data[i].co
-        # 口を縦に開く
-        if v.z < -0.5:
-            shape_key.data[i].co.z = v.z - 0.1
-        # 横幅を少し狭める
-        shape_key.data[i].co.x = v.x * 0.95
+    mouth = regions['mouth']
+    
+    # 口を縦に開く
+    lower = mouth & (basis[:, Z] < -0.5)
+    co[lower, Z] = basis[lower, Z] - 0.1
+    # 横幅を少し狭める
+    co[mouth, X] = basis[mouth, X] * 0.95
 
-def create_viseme_i(mesh, shape_key, regions):
+def create_viseme_i(co, basis, regions):
     """「い」の口形"""
-    basis = mesh.shape_keys.key_blocks['Basis']
-    
-    for i in regions['mouth']:
-        v = basis.data[i].co
-        # 横に引く
-        shape_key.data[i].co.x = v.x * 1.2
-        # 縦を狭める
-        if abs(v.z + 0.8) < 0.2:
-            shape_key.data[i].co.z = v.z * 0.95
+    mouth = regions['mouth']
+    
+    # 横に引く
+    co[mouth, X] = basis[mouth, X] * 1.2
+    # 縦を狭める
+    center = mouth & (abs(basis[:, Z] + 0.8) < 0.2)
+    co[center, Z] = basis[center, Z] * 0.95
 
-def create_viseme_u(mesh, shape_key, regions):
+def create_viseme_u(co, basis, regions):
     """「う」の口形"""
-    basis = mesh.shape_keys.key_blocks['Basis']
-    
-    for i in regions['mouth']:
-        v = basis.data[i].co
-        # 口をすぼめる
-        shape_key.data[i].co.x = v.x * 0.7
-        # 前に突き出す
-        shape_key.data[i].co.y = v.y + 0.05
+    mouth = regions['mouth']
+    
+    # 口をすぼめる
+    co[mouth, X] = basis[mouth, X] * 0.7
+    # 前に突き出す
+    co[mouth, Y] = basis[mouth, Y] + 0.05
 
-def create_viseme_e(mesh, shape_key, regions):
+def create_viseme_e(co, basis, regions):
     """「え」の口形"""
-    basis = mesh.shape_keys.key_blocks['Basis']
-    
-    for i in regions['mouth']:
-        v = basis.data[i].co
-        # 横に少し引く
-        shape_key.data[i].co.x = v.x * 1.1
-        # 少し開く
-        if v.z < -0.7:
-            shape_key.data[i].co.z = v.z - 0.05
+    mouth = regions['mouth']
+    
+    # 横に少し引く
+    co[mouth, X] = basis[mouth, X] * 1.1
+    # 少し開く
+    lower = mouth & (basis[:, Z] < -0.7)
+    co[lower, Z] = basis[lower, Z] - 0.05
 
-def create_viseme_o(mesh, shape_key, regions):
+def create_viseme_o(co, basis, regions):
     """「お」の口形"""
-    basis = mesh.shape_keys.key_blocks['Basis']
-    
-    for i in regions['mouth']:
-        v = basis.data[i].co
-        # 丸める
-        shape_key.data[i].co.x = v.x * 0.85
-        # 縦に開く
-        if v.z < -0.6:
-            shape_key.data[i].co.z = v.z - 0.08
-        # 少し前に
-        shape_key.data[i].co.y = v.y + 0.03
+    mouth = regions['mouth']
+    
+    # 丸める
+    co[mouth, X] = basis[mouth, X] * 0.85
+    # 縦に開く
+    lower = mouth & (basis[:, Z] < -0.6)
+    co[lower, Z] = basis[lower, Z] - 0.08
+    # 少し前に
+    co[mouth, Y] = basis[mouth, Y] + 0.03
 
-def create_smile(mesh, shape_key, regions):
+def create_smile(co, basis, regions):
     """笑顔"""
-    basis = mesh.shape_keys.key_blocks['Basis']
-    
     # 口角を上げる
-    for i in regions['mouth']:
-        v = basis.data[i].co
-        if abs(v.x) > 0.3:  # 口の端
-            shape_key.data[i].co.z = v.z + 0.05
-            shape_key.data[i].co.x = v.x * 1.05
+    corners = regions['mouth'] & (abs(basis[:, X]) > 0.3)  # 口の端
+    co[corners, Z] = basis[corners, Z] + 0.05
+    co[corners, X] = basis[corners, X] * 1.05
     
     # 頬を少し上げる
-    for i in regions['cheek']:
-        v = basis.data[i].co
-        if v.z < 0:
-            shape_key.data[i].co.z = v.z + 0.02
+    cheek = regions['cheek'] & (basis[:, Z] < 0)
+    co[cheek, Z] = basis[cheek, Z] + 0.02
 
-def create_frown(mesh, shape_key, regions):
+def create_frown(co, basis, regions):
     """しかめ面"""
-    basis = mesh.shape_keys.key_blocks['Basis']
-    
     # 口角を下げる
-    for i in regions['mouth']:
-        v = basis.data[i].co
-        if abs(v.x) > 0.3:  # 口の端
-            shape_key.data[i].co.z = v.z - 0.03
+    corners = regions['mouth'] & (abs(basis[:, X]) > 0.3)  # 口の端
+    co[corners, Z] = basis[corners, Z] - 0.03
 
-def create_surprise(mesh, shape_key, regions):
+def create_surprise(co, basis, regions):
     """驚き"""
-    basis = mesh.shape_keys.key_blocks['Basis']
+    mouth = regions['mouth']
     
     # 口を大きく開く
-    for i in regions['mouth']:
-        v = basis.data[i].co
-        if v.z < -0.5:
-            shape_key.data[i].co.z = v.z - 0.12
-        # 丸くする
-        shape_key.data[i].co.x = v.x * 0.9
+    lower = mouth & (basis[:, Z] < -0.5)
+    co[lower, Z] = basis[lower, Z] - 0.12
+    # 丸くする
+    co[mouth, X] = basis[mouth, X] * 0.9
     
     # 眉を上げる（額を少し上げる）
-    for i in regions['forehead']:
-        v = basis.data[i].co
-        shape_key.data[i].co.z = v.z + 0.03
+    forehead = regions['forehead']
+    co[forehead, Z] = basis[forehead, Z] + 0.03
 
 # メイン処理
 face_obj = bpy.data.objects.get('HighQualityFaceAvatar')
 
 if face_obj and face_obj.data.shape_keys:
     mesh = face_obj.data
-    regions = get_face_regions(mesh)
+    engine = ShapeKeyEngine(face_obj)
+    regions = get_face_regions(engine)
     
     print(f"顔の領域分析:")
-    print(f"  口周辺: {len(regions['mouth'])}頂点")
-    print(f"  顎: {len(regions['jaw'])}頂点")
-    print(f"  頬: {len(regions['cheek'])}頂点")
-    print(f"  鼻: {len(regions['nose'])}頂点")
-    print(f"  目: {len(regions['eye'])}頂点")
-    print(f"  額: {len(regions['forehead'])}頂点")
+    print(f"  口周辺: {regions['mouth'].count}頂点")
+    print(f"  顎: {regions['jaw'].count}頂点")
+    print(f"  頬: {regions['cheek'].count}頂点")
+    print(f"  鼻: {regions['nose'].count}頂点")
+    print(f"  目: {regions['eye'].count}頂点")
+    print(f"  額: {regions['forehead'].count}頂点")
     
     # シェイプキーに変形を適用
     shape_functions = {
@@ -209,15 +169,13 @@ if face_obj and face_obj.data.shape_keys:
     
     print("\nシェイプキーの作成:")
     for key_name, func in shape_functions.items():
-        shape_key = mesh.shape_keys.key_blocks.get(key_name)
-        if shape_key:
+        if key_name in mesh.shape_keys.key_blocks:
             # まず基準位置をコピー
-            basis = mesh.shape_keys.key_blocks['Basis']
-            for i in range(len(mesh.vertices)):
-                shape_key.data[i].co = basis.data[i].co.copy()
+            co = engine.new_coords()
             
             # 変形を適用
-            func(mesh, shape_key, regions)
+            func(co, engine.basis, regions)
+            engine.write_key(key_name, co)
             print(f"  ✓ {key_name}")
     
     # ファイルを保存
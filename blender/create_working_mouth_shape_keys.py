@@ -1,8 +1,13 @@
 """
 実際に動作する口のシェイプキーを作成
 """
+import os
+import sys
+
 import bpy
-import bmesh
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.shape_keys import ShapeKeyEngine, X, Y, Z
 
 obj = bpy.data.objects.get('HighQualityFaceAvatar')
 
@@ -14,14 +19,8 @@ if obj:
     obj.select_set(True)
     
     mesh = obj.data
-    
-    # 編集モードに切り替えて口の頂点を直接選択
-    bpy.ops.object.mode_set(mode='EDIT')
-    bpy.ops.mesh.select_all(action='DESELECT')
-    
-    # BMeshを取得
-    bm = bmesh.from_edit_mesh(mesh)
-    bm.verts.ensure_lookup_table()
+    engine = ShapeKeyEngine(obj)
+    bx, bz = engine.x, engine.z
     
     # 口の位置を画像から推定：
     # - 顔の前面（Y > 0.3）
@@ -30,101 +29,63 @@ if obj:
     
     print("口の頂点を選択中...")
     
-    # 頂点を選択
-    selected_count = 0
-    mouth_verts = []
+    # 画像から推定される口の位置
+    mouth_verts = engine.box(x=(-0.35, 0.35),  # 中央付近
+                             y=(0.35, None),  # 前面
+                             z=(-0.15, 0.05))  # 口の高さ（調整）
+    selected_count = mouth_verts.count
     
-    for v in bm.verts:
-        # 画像から推定される口の位置
-        if (v.co.y > 0.35 and  # 前面
-            abs(v.co.x) < 0.35 and  # 中央付近
-            -0.15 < v.co.z < 0.05):  # 口の高さ（調整）
-            
-            v.select = True
-            selected_count += 1
-            mouth_verts.append(v.index)
+    # 編集モードで確認できるように選択状態を一括で設定
+    mesh.vertices.foreach_set('select', mouth_verts.mask)
     
     print(f"選択された頂点数: {selected_count}")
     
-    # メッシュを更新
-    bmesh.update_edit_mesh(mesh)
-    
-    # オブジェクトモードに戻る
-    bpy.ops.object.mode_set(mode='OBJECT')
-    
     if selected_count > 0:
         # 新しいシェイプキーを作成
         print("\nシェイプキーを作成中...")
         
         # 古いテストキーを削除
-        test_keys = ["Mouth_Open_NEW", "Mouth_A_NEW", "Mouth_I_NEW", "Mouth_U_NEW", "Mouth_Smile_NEW"]
-        for key_name in test_keys:
-            if key_name in mesh.shape_keys.key_blocks:
-                obj.active_shape_key_index = mesh.shape_keys.key_blocks.find(key_name)
-                bpy.ops.object.shape_key_remove()
-        
-        basis = mesh.shape_keys.key_blocks['Basis']
+        engine.remove_keys(["Mouth_Open_NEW", "Mouth_A_NEW", "Mouth_I_NEW", "Mouth_U_NEW", "Mouth_Smile_NEW"])
         
         # 1. 口を開く
-        obj.shape_key_add(name="Mouth_Open_NEW", from_mix=False)
-        mouth_open = mesh.shape_keys.key_blocks["Mouth_Open_NEW"]
-        
-        for i in mouth_verts:
-            co = basis.data[i].co
-            mouth_open.data[i].co = co.copy()
-            # 下顎部分を下に
-            if co.z < 0:
-                mouth_open.data[i].co.z -= 0.08
-                mouth_open.data[i].co.y -= 0.02
+        co = engine.new_coords()
+        # 下顎部分を下に
+        jaw = mouth_verts & (bz < 0)
+        co[jaw, Z] -= 0.08
+        co[jaw, Y] -= 0.02
+        engine.write_key("Mouth_Open_NEW", co)
         
         # 2. 「あ」の口
-        obj.shape_key_add(name="Mouth_A_NEW", from_mix=False)
-        mouth_a = mesh.shape_keys.key_blocks["Mouth_A_NEW"]
-        
-        for i in mouth_verts:
-            co = basis.data[i].co
-            mouth_a.data[i].co = co.copy()
-            # 縦に開く
-            if co.z < -0.05:
-                mouth_a.data[i].co.z -= 0.06
-            # 少し狭める
-            mouth_a.data[i].co.x *= 0.95
+        co = engine.new_coords()
+        # 縦に開く
+        co[mouth_verts & (bz < -0.05), Z] -= 0.06
+        # 少し狭める
+        co[mouth_verts, X] *= 0.95
+        engine.write_key("Mouth_A_NEW", co)
         
         # 3. 「い」の口
-        obj.shape_key_add(name="Mouth_I_NEW", from_mix=False)
-        mouth_i = mesh.shape_keys.key_blocks["Mouth_I_NEW"]
-        
-        for i in mouth_verts:
-            co = basis.data[i].co
-            mouth_i.data[i].co = co.copy()
-            # 横に引く
-            mouth_i.data[i].co.x *= 1.2
-            # 縦を狭める
-            mouth_i.data[i].co.z *= 0.95
+        co = engine.new_coords()
+        # 横に引く
+        co[mouth_verts, X] *= 1.2
+        # 縦を狭める
+        co[mouth_verts, Z] *= 0.95
+        engine.write_key("Mouth_I_NEW", co)
         
         # 4. 「う」の口
-        obj.shape_key_add(name="Mouth_U_NEW", from_mix=False)
-        mouth_u = mesh.shape_keys.key_blocks["Mouth_U_NEW"]
-        
-        for i in mouth_verts:
-            co = basis.data[i].co
-            mouth_u.data[i].co = co.copy()
-            # すぼめる
-            mouth_u.data[i].co.x *= 0.7
-            # 前に突き出す
-            mouth_u.data[i].co.y += 0.03
+        co = engine.new_coords()
+        # すぼめる
+        co[mouth_verts, X] *= 0.7
+        # 前に突き出す
+        co[mouth_verts, Y] += 0.03
+        engine.write_key("Mouth_U_NEW", co)
         
         # 5. 笑顔
-        obj.shape_key_add(name="Mouth_Smile_NEW", from_mix=False)
-        mouth_smile = mesh.shape_keys.key_blocks["Mouth_Smile_NEW"]
-        
-        for i in mouth_verts:
-            co = basis.data[i].co
-            mouth_smile.data[i].co = co.copy()
-            # 口角を上げる
-            if abs(co.x) > 0.15:
-                mouth_smile.data[i].co.z += 0.03
-                mouth_smile.data[i].co.x *= 1.05
+        co = engine.new_coords()
+        # 口角を上げる
+        corners = mouth_verts & (abs(bx) > 0.15)
+        co[corners, Z] += 0.03
+        co[corners, X] *= 1.05
+        engine.write_key("Mouth_Smile_NEW", co)
         
         print("\n作成完了:")
         print("- Mouth_Open_NEW")
@@ -137,22 +98,11 @@ if obj:
         print("\n⚠️ 口の頂点が見つかりませんでした")
         print("Z座標の範囲を調整して再試行します...")
         
-        # 別の高さで試す
-        bpy.ops.object.mode_set(mode='EDIT')
-        bpy.ops.mesh.select_all(action='DESELECT')
-        
-        bm = bmesh.from_edit_mesh(mesh)
-        
         # より広い範囲で選択
-        for v in bm.verts:
-            if (v.co.y > 0.3 and  # 前面
-                abs(v.co.x) < 0.4 and  # 中央
-                -0.3 < v.co.z < 0.1):  # より広い高さ
-                
-                v.select = True
-        
-        bmesh.update_edit_mesh(mesh)
-        bpy.ops.object.mode_set(mode='OBJECT')
+        wider = engine.box(x=(-0.4, 0.4),  # 中央
+                           y=(0.3, None),  # 前面
+                           z=(-0.3, 0.1))  # より広い高さ
+        mesh.vertices.foreach_set('select', wider.mask)
         
         print("より広い範囲で選択しました")
     
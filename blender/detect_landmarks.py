@@ -0,0 +1,79 @@
+"""
+顔のランドマークを検出して頂点グループに保存する
+
+鼻先・上唇・口裂・下唇・顎先・口角・顎関節をメッシュの形から求め、
+Landmark_* 頂点グループとカスタムプロパティ avatar_landmarks に保存する。
+シェイプキー作成スクリプトはこの結果を読み込むため、新しいアバターでも
+口元の座標を手で調べ直す必要はない。
+
+使い方:
+    blender avatar.blend --background --python blender/detect_landmarks.py
+    blender avatar.blend --background --python blender/detect_landmarks.py -- --object Head --markers --save
+"""
+import argparse
+import os
+import sys
+import time
+
+import bpy
+from mathutils import Vector
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.landmarks import LandmarkError, landmarks_for
+
+
+def parse_args():
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    parser = argparse.ArgumentParser(description="顔のランドマークを検出する")
+    parser.add_argument('--object', default='HighQualityFaceAvatar', help="頭部メッシュのオブジェクト")
+    parser.add_argument('--force', action='store_true', help="キャッシュを使わずに再検出")
+    parser.add_argument('--markers', action='store_true', help="確認用の Empty を各ランドマークに置く")
+    parser.add_argument('--save', action='store_true', help="検出後に .blend を保存")
+    return parser.parse_args(argv)
+
+
+def place_markers(obj, marks):
+    """ランドマークの位置に Empty を置く（LM_<名前>、既存なら移動）"""
+    for name, co in marks.points.items():
+        marker_name = f"LM_{name}"
+        marker = bpy.data.objects.get(marker_name)
+        if marker is None:
+            marker = bpy.data.objects.new(marker_name, None)
+            marker.empty_display_type = 'SPHERE'
+            marker.empty_display_size = 0.01
+            bpy.context.collection.objects.link(marker)
+        marker.location = obj.matrix_world @ Vector(co)
+
+
+def main():
+    args = parse_args()
+    obj = bpy.data.objects.get(args.object)
+    if obj is None or obj.type != 'MESH':
+        print(f"エラー: メッシュ {args.object} が見つかりません")
+        return
+
+    start = time.perf_counter()
+    try:
+        marks = landmarks_for(obj, force=args.force)
+    except LandmarkError as e:
+        print(f"❌ ランドマークを検出できません: {e}")
+        return
+    elapsed = (time.perf_counter() - start) * 1000
+
+    print(f"=== ランドマーク: {obj.name}（{len(obj.data.vertices):,}頂点、{elapsed:.0f} ms） ===")
+    for name, co in marks.summary().items():
+        print(f"  {name:15s} ({co[0]:+.4f}, {co[1]:+.4f}, {co[2]:+.4f})")
+    print(f"  口の半幅: {marks.mouth_half_width:.4f}  唇のしきい値: {marks.lip_gap:.4f}")
+    box = marks.mouth_box()
+    print(f"  口元の箱: x={box['x'][0]:+.3f}〜{box['x'][1]:+.3f}, "
+          f"y〜{box['y'][1]:+.3f}, z={box['z'][0]:+.3f}〜{box['z'][1]:+.3f}")
+
+    if args.markers:
+        place_markers(obj, marks)
+        print("✓ 確認用の Empty（LM_*）を配置しました")
+    if args.save:
+        bpy.ops.wm.save_mainfile()
+        print("✓ 保存しました")
+
+
+main()
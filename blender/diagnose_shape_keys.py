@@ -1,8 +1,14 @@
 """
 シェイプキーの問題を診断
 """
+import os
+import sys
+
 import bpy
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.analysis import analyze_shape_keys
+
 face_obj = bpy.data.objects.get('HighQualityFaceAvatar')
 
 if face_obj:
@@ -19,6 +25,9 @@ if face_obj:
         print(f"\nシェイプキーデータ: 存在")
         print(f"シェイプキー数: {len(mesh.shape_keys.key_blocks)}")
         
+        # 全シェイプキーの変位を一括で解析
+        stats = analyze_shape_keys(mesh, threshold=0.001)
+        
         # 各シェイプキーの状態を確認
         print("\n各シェイプキーの状態:")
         for i, key in enumerate(mesh.shape_keys.key_blocks):
@@ -28,18 +37,16 @@ if face_obj:
             print(f"   最大値: {key.slider_max}")
             print(f"   ミュート: {key.mute}")
             
-            # 頂点位置の差を確認（最初の5頂点のみ）
-            if i > 0:  # Basis以外
-                basis = mesh.shape_keys.key_blocks[0]
-                diff_count = 0
-                for j in range(min(5, len(mesh.vertices))):
-                    diff = (key.data[j].co - basis.data[j].co).length
-                    if diff > 0.001:
-                        diff_count += 1
-                        print(f"   頂点{j}: 差分 {diff:.4f}")
-                
-                if diff_count == 0:
-                    print(f"   ⚠️ 最初の5頂点に変化なし")
+            # 基準キーからの変位
+            if key.name in stats:  # Basis以外
+                result = stats.summary(key.name)
+                if result['affected'] == 0:
+                    print("   ⚠️ 変化なし")
+                else:
+                    print(f"   変化した頂点: {result['affected']:,} (最大 {result['max']:.4f}, 平均 {result['mean']:.4f})")
+                    overlaps = stats.overlapping(key.name, min_ratio=0.9)
+                    if overlaps:
+                        print(f"   ほぼ同じ頂点を動かすキー: {', '.join(name for name, _ in overlaps[:5])}")
                     
         # アクティブなシェイプキーインデックス
         print(f"\nアクティブシェイプキー: {face_obj.active_shape_key_index}")
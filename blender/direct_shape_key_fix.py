@@ -1,7 +1,14 @@
 """
 シェイプキーを直接編集モードで作成
 """
+import os
+import sys
+
 import bpy
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.shape_keys import ShapeKeyEngine, X, Y, Z
 
 # オブジェクトを取得
 face_obj = bpy.data.objects.get('HighQualityFaceAvatar')
@@ -53,25 +60,20 @@ else:
     # オブジェクトモードに戻る
     bpy.ops.object.mode_set(mode='OBJECT')
     
-    # 頂点を直接編集
-    mouth_open = shape_keys.key_blocks["Mouth_Open"]
-    basis = shape_keys.key_blocks["Basis"]
+    # 頂点を配列で一括編集
+    engine = ShapeKeyEngine(face_obj)
+    bz = engine.z
     
     # 口周辺の頂点を移動
-    vertices = mesh.vertices
-    modified_count = 0
+    # 下顎付近の頂点（Z座標が低い）を下に移動
+    region = engine.box(x=(-0.8, 0.8), y=(-0.5, None), z=(None, -0.5))
+    co = engine.read_key("Mouth_Open")
+    co[region] = engine.basis[region]
+    co[region, Z] -= 0.15  # 下に移動
+    co[region, Y] -= 0.05  # 少し後ろに
+    engine.write_key("Mouth_Open", co)
     
-    for i, vertex in enumerate(vertices):
-        co = basis.data[i].co
-        # 下顎付近の頂点（Z座標が低い）を下に移動
-        if co.z < -0.5 and co.y > -0.5 and abs(co.x) < 0.8:
-            # 頂点を下に移動
-            mouth_open.data[i].co = co.copy()
-            mouth_open.data[i].co.z -= 0.15  # 下に移動
-            mouth_open.data[i].co.y -= 0.05  # 少し後ろに
-            modified_count += 1
-    
-    print(f"変更した頂点数: {modified_count}")
+    print(f"変更した頂点数: {region.count}")
     
     # Viseme_A を作成
     print("\nViseme_A シェイプキーを作成中...")
@@ -83,22 +85,17 @@ else:
     viseme_a_index = shape_keys.key_blocks.find("Viseme_A")
     face_obj.active_shape_key_index = viseme_a_index
     
-    viseme_a = shape_keys.key_blocks["Viseme_A"]
-    modified_count = 0
-    
-    for i, vertex in enumerate(vertices):
-        co = basis.data[i].co
-        # 口周辺を「あ」の形に
-        if co.z < -0.4 and co.y > -0.5 and abs(co.x) < 0.7:
-            viseme_a.data[i].co = co.copy()
-            # 縦に開く
-            if co.z < -0.6:
-                viseme_a.data[i].co.z -= 0.12
-            # 横幅を少し狭める
-            viseme_a.data[i].co.x *= 0.9
-            modified_count += 1
+    # 口周辺を「あ」の形に
+    region = engine.box(x=(-0.7, 0.7), y=(-0.5, None), z=(None, -0.4))
+    co = engine.read_key("Viseme_A")
+    co[region] = engine.basis[region]
+    # 縦に開く
+    co[region & (bz < -0.6), Z] -= 0.12
+    # 横幅を少し狭める
+    co[region, X] *= 0.9
+    engine.write_key("Viseme_A", co)
     
-    print(f"変更した頂点数: {modified_count}")
+    print(f"変更した頂点数: {region.count}")
     
     # メッシュを更新
     mesh.update()
@@ -111,11 +108,8 @@ else:
             key.value = 1.0
             print(f"{key_name}: 値を1.0に設定")
             # 実際の頂点の変化を確認
-            diff_count = 0
-            for i in range(min(100, len(vertices))):
-                diff = (key.data[i].co - basis.data[i].co).length
-                if diff > 0.001:
-                    diff_count += 1
+            diff = np.linalg.norm(engine.read_key(key_name)[:100] - engine.basis[:100], axis=1)
+            diff_count = int((diff > 0.001).sum())
             print(f"  最初の100頂点中 {diff_count} 個が変化")
             key.value = 0.0
     
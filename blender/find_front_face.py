@@ -1,8 +1,15 @@
 """
 顔の前面を正しく特定する
 """
+import os
+import sys
+
 import bpy
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.profiling import profile_coords
+from avatar_tools.shape_keys import ShapeKeyEngine, Z, read_coords
+
 obj = bpy.data.objects.get('HighQualityFaceAvatar')
 
 if obj:
@@ -20,17 +27,14 @@ if obj:
     # 座標の分布を詳しく分析
     print("\n座標分布の分析:")
     
-    # Y座標の分布を確認（前後）
-    y_coords = [v.co.y for v in vertices]
-    y_min, y_max = min(y_coords), max(y_coords)
+    # Y座標の分布を確認（前後）: 座標を一度だけ取得してまとめて数える
+    report = profile_coords(read_coords(vertices), bins=10)
+    y_hist = report['histograms']['y']
     
     # Y座標を10分割して頂点数を数える
     print("\nY座標（前後）の分布:")
-    step = (y_max - y_min) / 10
-    for i in range(10):
-        y_start = y_min + i * step
-        y_end = y_min + (i + 1) * step
-        count = sum(1 for y in y_coords if y_start <= y < y_end)
+    for i, count in enumerate(y_hist['counts']):
+        y_start, y_end = y_hist['edges'][i], y_hist['edges'][i + 1]
         
         # 推定
         if i < 3:
@@ -45,48 +49,33 @@ if obj:
     # 前面と思われる領域でテスト
     print("\n\n顔の前面を特定するためのテスト...")
     
-    # 既存のテストキーを削除
-    test_keys = ["Front_Test_Negative", "Front_Test_Center", "Front_Test_Positive"]
-    for key_name in test_keys:
-        if key_name in mesh.shape_keys.key_blocks:
-            obj.active_shape_key_index = mesh.shape_keys.key_blocks.find(key_name)
-            bpy.ops.object.shape_key_remove()
+    engine = ShapeKeyEngine(obj)
     
-    basis = mesh.shape_keys.key_blocks['Basis']
+    # 既存のテストキーを削除
+    engine.remove_keys(["Front_Test_Negative", "Front_Test_Center", "Front_Test_Positive"])
     
     # Y座標の異なる領域でテスト
     test_regions = [
-        ("Front_Test_Negative", lambda co: co.y < -0.3, "Y < -0.3（後ろ？）"),
-        ("Front_Test_Center", lambda co: -0.2 < co.y < 0.2, "-0.2 < Y < 0.2（中央）"),
-        ("Front_Test_Positive", lambda co: co.y > 0.3, "Y > 0.3（前？）"),
+        ("Front_Test_Negative", (None, -0.3), "Y < -0.3（後ろ？）"),
+        ("Front_Test_Center", (-0.2, 0.2), "-0.2 < Y < 0.2（中央）"),
+        ("Front_Test_Positive", (0.3, None), "Y > 0.3（前？）"),
     ]
     
-    for key_name, test_func, desc in test_regions:
-        obj.shape_key_add(name=key_name, from_mix=False)
-        shape_key = mesh.shape_keys.key_blocks[key_name]
-        
-        count = 0
-        for i, v in enumerate(vertices):
-            co = basis.data[i].co
-            shape_key.data[i].co = co.copy()
-            
-            # 中央付近で指定のY範囲
-            if abs(co.x) < 0.3 and test_func(co) and -0.2 < co.z < 0.2:
-                # 下に動かす
-                shape_key.data[i].co.z -= 0.05
-                count += 1
+    for key_name, y_range, desc in test_regions:
+        # 中央付近で指定のY範囲
+        region = engine.box(x=(-0.3, 0.3), y=y_range, z=(-0.2, 0.2))
+        co = engine.new_coords()
+        # 下に動かす
+        co[region, Z] -= 0.05
+        engine.write_key(key_name, co)
         
-        print(f"{key_name}: {count}頂点を変形 ({desc})")
+        print(f"{key_name}: {region.count}頂点を変形 ({desc})")
     
     # より細かくテスト
     print("\n\n口の正確な位置を特定...")
     
     # 顔の向きが分かったら、その前面で口を探す
-    mouth_test_keys = ["Mouth_Exact_1", "Mouth_Exact_2", "Mouth_Exact_3"]
-    for key_name in mouth_test_keys:
-        if key_name in mesh.shape_keys.key_blocks:
-            obj.active_shape_key_index = mesh.shape_keys.key_blocks.find(key_name)
-            bpy.ops.object.shape_key_remove()
+    engine.remove_keys(["Mouth_Exact_1", "Mouth_Exact_2", "Mouth_Exact_3"])
     
     # 異なるY値でテスト
     y_tests = [
@@ -96,23 +85,13 @@ if obj:
     ]
     
     for key_name, y_min, y_max in y_tests:
-        obj.shape_key_add(name=key_name, from_mix=False)
-        shape_key = mesh.shape_keys.key_blocks[key_name]
-        
-        count = 0
-        for i, v in enumerate(vertices):
-            co = basis.data[i].co
-            shape_key.data[i].co = co.copy()
-            
-            # 指定のY範囲、中央、適切な高さ
-            if (y_min < co.y < y_max and 
-                abs(co.x) < 0.3 and 
-                -0.2 < co.z < 0.1):
-                
-                shape_key.data[i].co.z -= 0.05
-                count += 1
+        # 指定のY範囲、中央、適切な高さ
+        region = engine.box(x=(-0.3, 0.3), y=(y_min, y_max), z=(-0.2, 0.1))
+        co = engine.new_coords()
+        co[region, Z] -= 0.05
+        engine.write_key(key_name, co)
         
-        print(f"{key_name}: {count}頂点 (Y: {y_min:.1f}〜{y_max:.1f})")
+        print(f"{key_name}: {region.count}頂点 (Y: {y_min:.1f}〜{y_max:.1f})")
     
     # 保存
     print("\n保存中...")
@@ -1,8 +1,15 @@
 """
 マテリアルや既存のシェイプキーから口の位置を特定
 """
+import os
+import sys
+
 import bpy
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.analysis import analyze_shape_keys
+from avatar_tools.shape_keys import ShapeKeyEngine, Y, Z
+
 obj = bpy.data.objects.get('HighQualityFaceAvatar')
 
 if obj:
@@ -12,77 +19,58 @@ if obj:
     
     # 既存のシェイプキーで実際に動いている頂点を確認
     if mesh.shape_keys:
-        basis = mesh.shape_keys.key_blocks['Basis']
+        stats = analyze_shape_keys(mesh, threshold=0.001)
         
         # 口関連のシェイプキーを探す
         mouth_related_keys = []
-        for key in mesh.shape_keys.key_blocks:
-            if any(word in key.name.lower() for word in ['mouth', 'lip', 'viseme', 'jp_']):
-                mouth_related_keys.append(key.name)
+        for name in stats.keys:
+            if any(word in name.lower() for word in ['mouth', 'lip', 'viseme', 'jp_']):
+                mouth_related_keys.append(name)
         
         print(f"口関連のシェイプキー: {len(mouth_related_keys)}個")
         
         # 最初の口関連シェイプキーで動く頂点を分析
         if mouth_related_keys:
             for key_name in mouth_related_keys[:5]:  # 最初の5個をチェック
-                key = mesh.shape_keys.key_blocks[key_name]
-                
-                # このシェイプキーで動く頂点を収集
-                moving_verts = []
-                for i in range(len(mesh.vertices)):
-                    displacement = (key.data[i].co - basis.data[i].co).length
-                    if displacement > 0.001:
-                        moving_verts.append((i, basis.data[i].co, displacement))
+                result = stats.summary(key_name)
                 
-                if moving_verts:
-                    print(f"\n{key_name}: {len(moving_verts)}個の頂点が動く")
+                if result['affected']:
+                    print(f"\n{key_name}: {result['affected']}個の頂点が動く")
                     
-                    # 動く頂点の座標範囲を計算
-                    x_coords = [v[1].x for v in moving_verts]
-                    y_coords = [v[1].y for v in moving_verts]
-                    z_coords = [v[1].z for v in moving_verts]
+                    # 動く頂点の座標範囲
+                    lo, hi = result['bbox_min'], result['bbox_max']
+                    print(f"  X範囲: {lo[0]:.2f} 〜 {hi[0]:.2f}")
+                    print(f"  Y範囲: {lo[1]:.2f} 〜 {hi[1]:.2f}")
+                    print(f"  Z範囲: {lo[2]:.2f} 〜 {hi[2]:.2f}")
                     
-                    print(f"  X範囲: {min(x_coords):.2f} 〜 {max(x_coords):.2f}")
-                    print(f"  Y範囲: {min(y_coords):.2f} 〜 {max(y_coords):.2f}")
-                    print(f"  Z範囲: {min(z_coords):.2f} 〜 {max(z_coords):.2f}")
-                    
-                    # サンプル頂点を表示
+                    # 大きく動く頂点を表示
                     print("  サンプル頂点:")
-                    for i, (idx, co, disp) in enumerate(moving_verts[:3]):
-                        print(f"    頂点{idx}: X={co.x:.2f}, Y={co.y:.2f}, Z={co.z:.2f}, 変位={disp:.3f}")
+                    for idx, disp, co in result['top'][:3]:
+                        print(f"    頂点{idx}: X={co[0]:.2f}, Y={co[1]:.2f}, Z={co[2]:.2f}, 変位={disp:.3f}")
     
     # 画像から判断して、正しい口の位置でシェイプキーを作成
     print("\n\n画像の観察に基づいてシェイプキーを作成...")
     
     # 新しいアプローチ：小さな領域から始めて徐々に広げる
     test_regions = [
-        ("Mouth_Center_Small", lambda co: abs(co.x) < 0.1 and 0.1 < co.y < 0.5 and -0.2 < co.z < 0.2),
-        ("Mouth_Center_Medium", lambda co: abs(co.x) < 0.2 and 0.0 < co.y < 0.6 and -0.3 < co.z < 0.3),
-        ("Mouth_Center_Large", lambda co: abs(co.x) < 0.3 and -0.1 < co.y < 0.7 and -0.4 < co.z < 0.4),
+        ("Mouth_Center_Small", dict(x=(-0.1, 0.1), y=(0.1, 0.5), z=(-0.2, 0.2))),
+        ("Mouth_Center_Medium", dict(x=(-0.2, 0.2), y=(0.0, 0.6), z=(-0.3, 0.3))),
+        ("Mouth_Center_Large", dict(x=(-0.3, 0.3), y=(-0.1, 0.7), z=(-0.4, 0.4))),
     ]
     
-    basis = mesh.shape_keys.key_blocks['Basis']
+    engine = ShapeKeyEngine(obj)
     
-    for key_name, test_func in test_regions:
-        if key_name in mesh.shape_keys.key_blocks:
-            obj.active_shape_key_index = mesh.shape_keys.key_blocks.find(key_name)
-            bpy.ops.object.shape_key_remove()
-        
-        obj.shape_key_add(name=key_name, from_mix=False)
-        shape_key = mesh.shape_keys.key_blocks[key_name]
+    for key_name, bounds in test_regions:
+        engine.remove_keys([key_name])
         
-        count = 0
-        for i, v in enumerate(mesh.vertices):
-            co = basis.data[i].co
-            shape_key.data[i].co = co.copy()
-            
-            if test_func(co):
-                # 頂点を少し下に動かす
-                shape_key.data[i].co.z -= 0.05
-                shape_key.data[i].co.y -= 0.02
-                count += 1
+        region = engine.box(**bounds)
+        co = engine.new_coords()
+        # 頂点を少し下に動かす
+        co[region, Z] -= 0.05
+        co[region, Y] -= 0.02
+        engine.write_key(key_name, co)
         
-        print(f"{key_name}: {count}頂点を変形")
+        print(f"{key_name}: {region.count}頂点を変形")
     
     # 保存
     print("\n保存中...")
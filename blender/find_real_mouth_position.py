@@ -1,8 +1,14 @@
 """
 実際の口の位置を特定するため、顔の中心付近の頂点を可視化
 """
+import os
+import sys
+
 import bpy
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.shape_keys import ShapeKeyEngine, Z
+
 obj = bpy.data.objects.get('HighQualityFaceAvatar')
 
 if obj:
@@ -53,42 +59,29 @@ if obj:
     # テスト用シェイプキーを作成
     print("\n\nテスト用シェイプキーを作成中...")
     
-    # 既存のテストキーを削除
-    if "Mouth_Test_Visual" in mesh.shape_keys.key_blocks:
-        obj.active_shape_key_index = mesh.shape_keys.key_blocks.find("Mouth_Test_Visual")
-        bpy.ops.object.shape_key_remove()
+    engine = ShapeKeyEngine(obj)
     
-    # 新しいテストキーを作成
-    obj.shape_key_add(name="Mouth_Test_Visual", from_mix=False)
-    test_key = mesh.shape_keys.key_blocks["Mouth_Test_Visual"]
-    basis = mesh.shape_keys.key_blocks["Basis"]
+    # 既存のテストキーを削除して新しいテストキーを作成
+    engine.remove_keys(["Mouth_Test_Visual"])
+    engine.reset_key("Mouth_Test_Visual")
     
     # 異なる高さで小さな変形を加える
     test_regions = [
-        ("Upper_Lip_Test", lambda z: 0.0 < z < 0.2, 0.05),     # 上唇候補
-        ("Lower_Lip_Test", lambda z: -0.2 < z < 0.0, -0.05),  # 下唇候補
-        ("Chin_Test", lambda z: -0.4 < z < -0.2, -0.03),      # 顎候補
+        ("Upper_Lip_Test", (0.0, 0.2), 0.05),     # 上唇候補
+        ("Lower_Lip_Test", (-0.2, 0.0), -0.05),  # 下唇候補
+        ("Chin_Test", (-0.4, -0.2), -0.03),      # 顎候補
     ]
     
-    for region_name, z_check, displacement in test_regions:
-        if region_name in mesh.shape_keys.key_blocks:
-            obj.active_shape_key_index = mesh.shape_keys.key_blocks.find(region_name)
-            bpy.ops.object.shape_key_remove()
+    for region_name, z_range, displacement in test_regions:
+        engine.remove_keys([region_name])
         
-        obj.shape_key_add(name=region_name, from_mix=False)
-        region_key = mesh.shape_keys.key_blocks[region_name]
-        
-        count = 0
-        for i, v in enumerate(vertices):
-            co = basis.data[i].co
-            region_key.data[i].co = co.copy()
-            
-            # 顔の前面中央で、指定された高さの頂点を動かす
-            if abs(co.x) < 0.3 and co.y > 0.3 and z_check(co.z):
-                region_key.data[i].co.z = co.z + displacement
-                count += 1
+        # 顔の前面中央で、指定された高さの頂点を動かす
+        region = engine.box(x=(-0.3, 0.3), y=(0.3, None), z=z_range)
+        co = engine.new_coords()
+        co[region, Z] += displacement
+        engine.write_key(region_name, co)
         
-        print(f"{region_name}: {count}頂点を変形")
+        print(f"{region_name}: {region.count}頂点を変形")
     
     # 保存
     print("\n保存中...")
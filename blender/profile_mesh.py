@@ -0,0 +1,57 @@
+"""
+メッシュの頂点分布プロファイルを JSON に書き出す
+
+座標を一度だけ取得し、ヒストグラム・オクタント・高さ別の領域・
+中心線グリッド・極値などをまとめて計算する（avatar_tools.profiling）。
+出力は public/models/*_analysis_*.json と同じ camelCase の JSON。
+
+使い方:
+    blender avatar.blend --background --python blender/profile_mesh.py
+    blender avatar.blend --background --python blender/profile_mesh.py -- --object Head --bins 20 \\
+        --output public/models/head_mesh_analysis.json
+"""
+import argparse
+import os
+import sys
+import time
+
+import bpy
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.profiling import profile_object, save_report
+
+
+def parse_args():
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    parser = argparse.ArgumentParser(description="メッシュの頂点分布をプロファイルする")
+    parser.add_argument('--object', default='HighQualityFaceAvatar', help="対象のメッシュオブジェクト")
+    parser.add_argument('--output', help="JSON の出力先（省略時は <オブジェクト名>_mesh_analysis_<ミリ秒>.json）")
+    parser.add_argument('--bins', type=int, default=10, help="軸ごとのヒストグラムのビン数")
+    parser.add_argument('--grid', type=int, default=10, help="中心線グリッドの分割数")
+    parser.add_argument('--world', action='store_true', help="ワールド座標で集計")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    obj = bpy.data.objects.get(args.object)
+    if obj is None or obj.type != 'MESH':
+        print(f"エラー: メッシュ {args.object} が見つかりません")
+        return
+
+    start = time.perf_counter()
+    report = profile_object(obj, world=args.world, bins=args.bins, grid=args.grid)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    output = args.output or f"{obj.name}_mesh_analysis_{int(time.time() * 1000)}.json"
+    save_report(report, output)
+
+    size = report['boundingBox']['size']
+    print(f"✓ {obj.name}: {report['vertexCount']:,}頂点 / {report['faceCount']:,}面"
+          f"（{size['x']:.3f} × {size['y']:.3f} × {size['z']:.3f}、{elapsed:.0f} ms）")
+    for region in report['heightRegions']:
+        print(f"  {region['name']}: {region['count']:,}頂点")
+    print(f"✓ {output}")
+
+
+main()
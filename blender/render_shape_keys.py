@@ -0,0 +1,171 @@
+"""
+シェイプキーの検証レンダリング（Blender 側）
+
+scripts/render_shape_keys.py が複数の Blender プロセスに分けて起動する。
+単体でも実行できる。
+
+    # シェイプキーの一覧
+    blender avatar.blend --background --python blender/render_shape_keys.py -- list --object HighQualityFaceAvatar
+    # 指定したキーを正面・側面・口元アップでレンダリング
+    blender avatar.blend --background --python blender/render_shape_keys.py -- \\
+        render --out renders --keys Basis Vowel_A_Talk --engine workbench
+    # タイルをコンタクトシートにまとめる（rows.json は [[パス, ...], ...]）
+    blender --background --factory-startup --python blender/render_shape_keys.py -- \\
+        sheet --rows rows.json --out sheet.png
+    # メッシュのハッシュとシェイプキーごとの変位の統計
+    blender avatar.blend --background --python blender/render_shape_keys.py -- inspect
+    # ゴールデン画像との知覚的な差分（pairs.json は [{id, golden, current, diff}, ...]）
+    blender --background --factory-startup --python blender/render_shape_keys.py -- \\
+        compare --pairs pairs.json
+
+--object を省略すると、シェイプキーが最も多いメッシュを対象にする。
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+
+import bpy
+
+BLENDER_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BLENDER_DIR)
+sys.path.append(os.path.join(os.path.dirname(BLENDER_DIR), 'scripts'))
+from avatar_pipeline.progress import emit  # noqa: E402
+from avatar_tools.analysis import ShapeKeyStats, mesh_digest, read_key_coords  # noqa: E402
+from avatar_tools.imagediff import JND, compare  # noqa: E402
+from avatar_tools.render import (BASIS_ROW, DEFAULT_VIEWS, ENGINES, VIEWS,  # noqa: E402
+                                 compose_sheet, ensure_camera, read_image, render_key,
+                                 setup_render, view_frames, write_image)
+
+
+def parse_args():
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    parser = argparse.ArgumentParser(description="シェイプキーの検証レンダリング")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    listing = sub.add_parser('list', help="シェイプキーの一覧を出力")
+    listing.add_argument('--object')
+
+    inspect = sub.add_parser('inspect', help="メッシュのハッシュと変位の統計を出力")
+    inspect.add_argument('--object')
+    inspect.add_argument('--threshold', type=float, default=0.0001, help="動いたとみなす変位")
+
+    render = sub.add_parser('render', help="シェイプキーをレンダリング")
+    render.add_argument('--object')
+    render.add_argument('--out', required=True, help="タイル画像の出力先")
+    render.add_argument('--keys', nargs='*', help="レンダリングするキー（省略時は Basis と全キー）")
+    render.add_argument('--views', nargs='+', default=list(DEFAULT_VIEWS), choices=list(VIEWS))
+    render.add_argument('--engine', default='workbench', choices=list(ENGINES))
+    render.add_argument('--resolution', type=int, default=384)
+    render.add_argument('--samples', type=int, default=16, help="EEVEE のサンプル数")
+
+    sheet = sub.add_parser('sheet', help="タイルをコンタクトシートにまとめる")
+    sheet.add_argument('--rows', required=True, help="[[パス, ...], ...] の JSON")
+    sheet.add_argument('--out', required=True)
+
+    diff = sub.add_parser('compare', help="ゴールデン画像と比べる")
+    diff.add_argument('--pairs', required=True, help="[{id, golden, current, diff}, ...] の JSON")
+    diff.add_argument('--jnd', type=float, default=JND, help="知覚できる色差 ΔE")
+    return parser.parse_args(argv)
+
+
+def find_object(name=None):
+    """name のメッシュ。省略時はシェイプキーが最も多いメッシュ"""
+    if name:
+        obj = bpy.data.objects.get(name)
+        if obj is None or obj.type != 'MESH':
+            raise ValueError(f"メッシュ {name} が見つかりません")
+        return obj
+    meshes = [obj for obj in bpy.data.objects if obj.type == 'MESH' and obj.data.shape_keys]
+    if not meshes:
+        raise ValueError("シェイプキーを持つメッシュがありません")
+    return max(meshes, key=lambda obj: len(obj.data.shape_keys.key_blocks))
+
+
+def shape_key_names(obj):
+    key = obj.data.shape_keys
+    if key is None:
+        return []
+    return [kb.name for kb in key.key_blocks if kb != key.reference_key]
+
+
+def command_list(args):
+    obj = find_object(args.object)
+    emit('keys', object=obj.name, keys=shape_key_names(obj))
+
+
+def command_inspect(args):
+    obj = find_object(args.object)
+    if obj.data.shape_keys is None:
+        emit('mesh', object=obj.name, digest=None, vertices=len(obj.data.vertices), keys={})
+        return
+    names, coords = read_key_coords(obj.data)
+    stats = ShapeKeyStats.compute(names, coords, args.threshold)
+    keys = {}
+    for name in stats.keys:
+        info = stats.summary(name)
+        keys[name] = {field: info[field] for field in ('max', 'mean', 'affected', 'bbox_min', 'bbox_max')}
+    emit('mesh', object=obj.name, digest=mesh_digest(names, coords, args.threshold),
+         vertices=stats.vertex_count, keys=keys)
+
+
+def command_render(args):
+    obj = find_object(args.object)
+    names = args.keys if args.keys else [BASIS_ROW] + shape_key_names(obj)
+    missing = [n for n in names if n != BASIS_ROW and n not in shape_key_names(obj)]
+    if missing:
+        raise ValueError(f"シェイプキーがありません: {', '.join(missing)}")
+
+    os.makedirs(args.out, exist_ok=True)
+    scene = bpy.context.scene
+    setup_render(scene, args.engine, args.resolution, args.samples)
+    camera = ensure_camera(scene)
+    frames = view_frames(obj, args.views)
+    for name in names:
+        start = time.time()
+        paths = render_key(scene, obj, name, frames, args.out, camera)
+        emit('tile', key=name, tiles=paths, elapsed=round(time.time() - start, 3))
+
+
+def command_sheet(args):
+    with open(args.rows, encoding='utf-8') as f:
+        rows = json.load(f)
+    compose_sheet(rows, args.out)
+    emit('sheet', path=args.out, rows=len(rows))
+
+
+def command_compare(args):
+    with open(args.pairs, encoding='utf-8') as f:
+        pairs = json.load(f)
+    for pair in pairs:
+        result = compare(read_image(pair['golden']), read_image(pair['current']), jnd=args.jnd)
+        heatmap = result.pop('heatmap')
+        if pair.get('diff') and result['changed'] > 0:
+            os.makedirs(os.path.dirname(pair['diff']), exist_ok=True)
+            write_image(pair['diff'], heatmap)
+        emit('diff', id=pair['id'], **result)
+
+
+COMMANDS = {
+    'list': command_list,
+    'inspect': command_inspect,
+    'render': command_render,
+    'sheet': command_sheet,
+    'compare': command_compare,
+}
+
+
+def main():
+    args = parse_args()
+    try:
+        COMMANDS[args.command](args)
+    except Exception as e:
+        traceback.print_exc()
+        emit('failed', error=str(e))
+        sys.exit(1)
+    emit('done')
+
+
+main()
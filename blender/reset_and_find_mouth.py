@@ -1,8 +1,14 @@
 """
 すべてのシェイプキーを削除して、口の位置を確認
 """
+import os
+import sys
+
 import bpy
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.shape_keys import ShapeKeyEngine, Y, Z
+
 obj = bpy.data.objects.get('HighQualityFaceAvatar')
 
 if obj:
@@ -10,107 +16,82 @@ if obj:
     
     print("=== シェイプキーのリセットと口の位置確認 ===\n")
     
+    engine = ShapeKeyEngine(obj)
+    
     # 1. Basis以外のすべてのシェイプキーを削除
-    if mesh.shape_keys:
-        print("既存のシェイプキーを削除中...")
-        keys_to_remove = []
-        
-        for key in mesh.shape_keys.key_blocks:
-            if key.name != 'Basis':
-                keys_to_remove.append(key.name)
-        
-        for key_name in keys_to_remove:
-            obj.active_shape_key_index = mesh.shape_keys.key_blocks.find(key_name)
-            bpy.ops.object.shape_key_remove()
-        
-        print(f"{len(keys_to_remove)}個のシェイプキーを削除しました\n")
+    print("既存のシェイプキーを削除中...")
+    removed = engine.remove_keys()
+    print(f"{len(removed)}個のシェイプキーを削除しました\n")
     
     # 2. 口の位置を段階的に探す
     print("口の位置を探索するためのテストシェイプキーを作成...\n")
     
-    basis = mesh.shape_keys.key_blocks['Basis']
-    vertices = mesh.vertices
-    
-    # 顔の各部分でテスト
+    # 顔の各部分でテスト（Y<-0.4 と Z範囲）
     test_regions = [
         {
             'name': 'Test_Forehead',
-            'condition': lambda co: co.y < -0.4 and co.z > 0.4,
+            'z_range': (0.4, None),
             'desc': '額の領域（Y<-0.4, Z>0.4）'
         },
         {
             'name': 'Test_Eyes',
-            'condition': lambda co: co.y < -0.4 and 0.1 < co.z < 0.4,
+            'z_range': (0.1, 0.4),
             'desc': '目の領域（Y<-0.4, 0.1<Z<0.4）'
         },
         {
             'name': 'Test_Nose',
-            'condition': lambda co: co.y < -0.4 and -0.1 < co.z < 0.1,
+            'z_range': (-0.1, 0.1),
             'desc': '鼻の領域（Y<-0.4, -0.1<Z<0.1）'
         },
         {
             'name': 'Test_Mouth_Upper',
-            'condition': lambda co: co.y < -0.4 and -0.2 < co.z < -0.1,
+            'z_range': (-0.2, -0.1),
             'desc': '口の上部（Y<-0.4, -0.2<Z<-0.1）'
         },
         {
             'name': 'Test_Mouth_Lower',
-            'condition': lambda co: co.y < -0.4 and -0.3 < co.z < -0.2,
+            'z_range': (-0.3, -0.2),
             'desc': '口の下部（Y<-0.4, -0.3<Z<-0.2）'
         },
         {
             'name': 'Test_Chin',
-            'condition': lambda co: co.y < -0.4 and -0.4 < co.z < -0.3,
+            'z_range': (-0.4, -0.3),
             'desc': '顎（Y<-0.4, -0.4<Z<-0.3）'
         },
         {
             'name': 'Test_Neck',
-            'condition': lambda co: co.y < -0.4 and co.z < -0.4,
+            'z_range': (None, -0.4),
             'desc': '首（Y<-0.4, Z<-0.4）'
         }
     ]
     
     for test in test_regions:
-        obj.shape_key_add(name=test['name'], from_mix=False)
-        shape_key = mesh.shape_keys.key_blocks[test['name']]
+        # 中央付近のみ
+        region = engine.box(x=(-0.35, 0.35), y=(None, -0.4), z=test['z_range'])
+        co = engine.new_coords()
+        # 少し前に出す
+        co[region, Y] -= 0.05
+        engine.write_key(test['name'], co)
         
-        count = 0
-        for i, v in enumerate(vertices):
-            co = basis.data[i].co
-            shape_key.data[i].co = co.copy()
-            
-            # 中央付近のみ
-            if abs(co.x) < 0.35 and test['condition'](co):
-                # 少し前に出す
-                shape_key.data[i].co.y -= 0.05
-                count += 1
-        
-        print(f"{test['name']}: {count}頂点 - {test['desc']}")
+        print(f"{test['name']}: {region.count}頂点 - {test['desc']}")
     
     # 3. 視覚的に分かりやすい色分けテスト
     print("\n\n追加の位置確認テスト...")
     
     # Y軸の値でテスト（前後の確認）
     y_tests = [
-        ('Test_Y_Front', lambda co: co.y < -0.5, 'Y < -0.5（最前面）'),
-        ('Test_Y_Middle', lambda co: -0.5 < co.y < 0, '-0.5 < Y < 0（中間）'),
-        ('Test_Y_Back', lambda co: co.y > 0, 'Y > 0（後方）')
+        ('Test_Y_Front', (None, -0.5), 'Y < -0.5（最前面）'),
+        ('Test_Y_Middle', (-0.5, 0), '-0.5 < Y < 0（中間）'),
+        ('Test_Y_Back', (0, None), 'Y > 0（後方）')
     ]
     
-    for name, condition, desc in y_tests:
-        obj.shape_key_add(name=name, from_mix=False)
-        shape_key = mesh.shape_keys.key_blocks[name]
-        
-        count = 0
-        for i, v in enumerate(vertices):
-            co = basis.data[i].co
-            shape_key.data[i].co = co.copy()
-            
-            if condition(co) and abs(co.x) < 0.3 and -0.2 < co.z < 0:
-                shape_key.data[i].co.z -= 0.05
-                count += 1
+    for name, y_range, desc in y_tests:
+        region = engine.box(x=(-0.3, 0.3), y=y_range, z=(-0.2, 0))
+        co = engine.new_coords()
+        co[region, Z] -= 0.05
+        engine.write_key(name, co)
         
-        print(f"{name}: {count}頂点 - {desc}")
+        print(f"{name}: {region.count}頂点 - {desc}")
     
     # 保存
     print("\n保存中...")
@@ -1,8 +1,15 @@
 """
 シンプルな方法でシェイプキーを作成
 """
+import os
+import sys
+
 import bpy
 import bmesh
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.shape_keys import ShapeKeyEngine, X, Y, Z
 
 def create_shape_key_simple(obj, key_name):
     """シンプルにシェイプキーを作成"""
@@ -59,47 +66,35 @@ if obj:
     # 2. プログラムで別のシェイプキーを作成
     print("\nプログラムで Mouth_Open_V2 を作成中...")
     
-    # 新しいシェイプキーを作成
-    mouth_key = create_shape_key_simple(obj, "Mouth_Open_V2")
-    
-    # 頂点データを直接操作
-    for i, vert in enumerate(mesh.vertices):
-        # Basisの位置をコピー
-        basis_pos = basis.data[i].co
-        mouth_key.data[i].co = basis_pos.copy()
-        
-        # 口周辺の頂点を変形
-        if basis_pos.z < -0.6 and abs(basis_pos.x) < 0.7:
-            # 下に移動
-            mouth_key.data[i].co.z = basis_pos.z - 0.15
-            # 少し後ろに
-            mouth_key.data[i].co.y = basis_pos.y - 0.05
+    # 頂点データを配列で一括操作
+    engine = ShapeKeyEngine(obj)
+    
+    # 口周辺の頂点を変形
+    region = engine.box(x=(-0.7, 0.7), z=(None, -0.6))
+    co = engine.new_coords()
+    # 下に移動
+    co[region, Z] -= 0.15
+    # 少し後ろに
+    co[region, Y] -= 0.05
+    engine.write_key("Mouth_Open_V2", co)
     
     # 3. あいうえおの基本形を作成
     vowels = {
-        'A_Simple': lambda p: (p.x * 0.95, p.y, p.z - 0.1 if p.z < -0.5 else p.z),
-        'I_Simple': lambda p: (p.x * 1.2 if abs(p.x) > 0.2 else p.x, p.y, p.z),
-        'U_Simple': lambda p: (p.x * 0.7, p.y + 0.05, p.z),
-        'E_Simple': lambda p: (p.x * 1.1, p.y, p.z - 0.05 if p.z < -0.6 else p.z),
-        'O_Simple': lambda p: (p.x * 0.85, p.y + 0.03, p.z - 0.08 if p.z < -0.5 else p.z)
+        'A_Simple': lambda x, y, z: (x * 0.95, y, np.where(z < -0.5, z - 0.1, z)),
+        'I_Simple': lambda x, y, z: (np.where(abs(x) > 0.2, x * 1.2, x), y, z),
+        'U_Simple': lambda x, y, z: (x * 0.7, y + 0.05, z),
+        'E_Simple': lambda x, y, z: (x * 1.1, y, np.where(z < -0.6, z - 0.05, z)),
+        'O_Simple': lambda x, y, z: (x * 0.85, y + 0.03, np.where(z < -0.5, z - 0.08, z))
     }
     
+    # 口周辺のみ変形（それ以外は基準位置のまま）
+    region = engine.box(x=(-0.8, 0.8), z=(None, -0.3))
+    
     for vowel_name, transform_func in vowels.items():
         print(f"作成中: {vowel_name}")
-        vowel_key = create_shape_key_simple(obj, vowel_name)
-        
-        for i, vert in enumerate(mesh.vertices):
-            basis_pos = basis.data[i].co
-            
-            # 口周辺のみ変形
-            if basis_pos.z < -0.3 and abs(basis_pos.x) < 0.8:
-                new_x, new_y, new_z = transform_func(basis_pos)
-                vowel_key.data[i].co.x = new_x
-                vowel_key.data[i].co.y = new_y
-                vowel_key.data[i].co.z = new_z
-            else:
-                # それ以外は基準位置のまま
-                vowel_key.data[i].co = basis_pos.copy()
+        co = engine.new_coords()
+        co[region, X], co[region, Y], co[region, Z] = transform_func(*engine.basis[region].T)
+        engine.write_key(vowel_name, co)
     
     # メッシュを更新
     mesh.update()
@@ -1,8 +1,14 @@
 """
 自然な会話アニメーションのテスト
 """
+import os
+import sys
+
 import bpy
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.visemes import bake_tracks, keyframes_to_tracks, shape_key_path
+
 obj = bpy.data.objects.get('HighQualityFaceAvatar')
 
 if obj and obj.data.shape_keys:
@@ -15,12 +21,6 @@ if obj and obj.data.shape_keys:
     fps = 24
     scene.render.fps = fps
     
-    # すべてのシェイプキーをリセット
-    for key in obj.data.shape_keys.key_blocks:
-        if key.name != 'Basis':
-            key.value = 0
-            key.keyframe_insert("value", frame=1)
-    
     # 「こんにちは」のアニメーション例
     print("「こんにちは」のアニメーションを設定中...\n")
     
@@ -62,34 +62,20 @@ if obj and obj.data.shape_keys:
         (90, [])
     ]
     
-    # アニメーションキーフレームを設定
+    # 各フレームで指定されていないシェイプキーは0にする（フレーム1はすべて0）
+    key_names = [key.name for key in obj.data.shape_keys.key_blocks
+                 if key != obj.data.shape_keys.reference_key]
+    keyframes = [(1, {name: 0.0 for name in key_names})]
     for frame, shapes in animations:
-        scene.frame_set(frame)
-        
-        # すべてのシェイプキーをリセット
-        for key in obj.data.shape_keys.key_blocks:
-            if key.name != 'Basis':
-                # 現在のフレームで指定されているシェイプキー以外は0に
-                shape_names = [s[0] for s in shapes]
-                if key.name not in shape_names:
-                    key.value = 0
-                    key.keyframe_insert("value", frame=frame)
-        
-        # 指定されたシェイプキーを設定
+        values = {name: 0.0 for name in key_names}
         for shape_name, value in shapes:
-            if shape_name in obj.data.shape_keys.key_blocks:
-                key = obj.data.shape_keys.key_blocks[shape_name]
-                key.value = value
-                key.keyframe_insert("value", frame=frame)
+            if shape_name in values:
+                values[shape_name] = value
                 print(f"Frame {frame}: {shape_name} = {value}")
+        keyframes.append((frame, values))
     
-    # 補間をスムーズに
-    if obj.animation_data and obj.animation_data.action:
-        for fcurve in obj.animation_data.action.fcurves:
-            for keyframe in fcurve.keyframe_points:
-                keyframe.interpolation = 'BEZIER'
-                keyframe.handle_left_type = 'AUTO'
-                keyframe.handle_right_type = 'AUTO'
+    # F-カーブへ直接書き込む（ベジェ補間・自動ハンドル）
+    bake_tracks(obj.data.shape_keys, keyframes_to_tracks(keyframes), shape_key_path, "Conversation_Test")
     
     print("\n✅ アニメーション設定完了！")
     print("\nテスト方法：")
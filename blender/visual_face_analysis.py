@@ -1,8 +1,13 @@
 """
 顔モデルの視覚的構造を詳細に分析
 """
+import os
+import sys
+
 import bpy
-import math
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.profiling import profile_object
 
 print('\n' + '='*80)
 print('🔍 顔モデル構造の詳細分析レポート')
@@ -22,20 +27,16 @@ if face_obj:
     print(f'  │  ├─ エッジ数: {len(face_obj.data.edges):,}')
     print(f'  │  └─ 面数: {len(face_obj.data.polygons):,}')
     
-    # 頂点位置から顔の各部位を推定
-    vertices = [face_obj.matrix_world @ v.co for v in face_obj.data.vertices]
-    
-    # Z座標でグループ分け（高さ別）
-    z_coords = [v.z for v in vertices]
-    z_min, z_max = min(z_coords), max(z_coords)
-    z_range = z_max - z_min
+    # 頂点位置から顔の各部位を推定（ワールド座標を一度だけ取得して高さ別に数える）
+    report = profile_object(face_obj, world=True)
     
-    print(f'  │')
-    print(f'  ├─ 顔の領域分析（高さ別）:')
-    print(f'  │  ├─ 頭頂部 (Z > {z_min + 0.7*z_range:.2f}): 約{sum(1 for z in z_coords if z > z_min + 0.7*z_range):,}頂点')
-    print(f'  │  ├─ 目・鼻領域 (Z: {z_min + 0.4*z_range:.2f}～{z_min + 0.7*z_range:.2f}): 約{sum(1 for z in z_coords if z_min + 0.4*z_range <= z <= z_min + 0.7*z_range):,}頂点')
-    print(f'  │  ├─ 口領域 (Z: {z_min + 0.2*z_range:.2f}～{z_min + 0.4*z_range:.2f}): 約{sum(1 for z in z_coords if z_min + 0.2*z_range <= z <= z_min + 0.4*z_range):,}頂点')
-    print(f'  │  └─ 顎領域 (Z < {z_min + 0.2*z_range:.2f}): 約{sum(1 for z in z_coords if z < z_min + 0.2*z_range):,}頂点')
+    print('  │')
+    print('  ├─ 顔の領域分析（高さ別）:')
+    regions = report['heightRegions'][::-1]
+    for i, region in enumerate(regions):
+        branch = '└─' if i == len(regions) - 1 else '├─'
+        print(f"  │  {branch} {region['name']} (Z: {region['zMin']:.2f}～{region['zMax']:.2f}): "
+              f"約{region['count']:,}頂点")
 
 # 口腔内パーツの相対位置分析
 print(f'\n🦷 口腔内パーツの配置:')
@@ -1,8 +1,14 @@
 """
 顔の向きと各部位の座標を可視化
 """
+import os
+import sys
+
 import bpy
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from avatar_tools.shape_keys import ShapeKeyEngine, Z
+
 obj = bpy.data.objects.get('HighQualityFaceAvatar')
 
 if obj:
@@ -45,14 +51,10 @@ if obj:
     # 4. 実際に口がありそうな領域でシェイプキーを作成
     print("\n\n視覚的に確認できるシェイプキーを作成...")
     
-    # 既存のキーを削除
-    visual_keys = ["Mouth_Visual_1", "Mouth_Visual_2", "Mouth_Visual_3"]
-    for key_name in visual_keys:
-        if key_name in mesh.shape_keys.key_blocks:
-            obj.active_shape_key_index = mesh.shape_keys.key_blocks.find(key_name)
-            bpy.ops.object.shape_key_remove()
+    engine = ShapeKeyEngine(obj)
     
-    basis = mesh.shape_keys.key_blocks['Basis']
+    # 既存のキーを削除
+    engine.remove_keys(["Mouth_Visual_1", "Mouth_Visual_2", "Mouth_Visual_3"])
     
     # 異なる高さで口の動きをテスト
     test_configs = [
@@ -62,24 +64,16 @@ if obj:
     ]
     
     for key_name, z_min, z_max, desc in test_configs:
-        obj.shape_key_add(name=key_name, from_mix=False)
-        shape_key = mesh.shape_keys.key_blocks[key_name]
-        
-        count = 0
-        for i, v in enumerate(vertices):
-            co = basis.data[i].co
-            shape_key.data[i].co = co.copy()
-            
-            # 顔の前面中央で指定の高さ範囲
-            if (abs(co.x) < 0.35 and  # 中央
-                co.y > 0.2 and  # 前面
-                z_min < co.z < z_max):  # 高さ範囲
-                
-                # 下に動かす（口を開く）
-                shape_key.data[i].co.z -= 0.06
-                count += 1
+        # 顔の前面中央で指定の高さ範囲
+        region = engine.box(x=(-0.35, 0.35),  # 中央
+                            y=(0.2, None),  # 前面
+                            z=(z_min, z_max))  # 高さ範囲
+        co = engine.new_coords()
+        # 下に動かす（口を開く）
+        co[region, Z] -= 0.06
+        engine.write_key(key_name, co)
         
-        print(f"{key_name}: {count}頂点を変形 ({desc})")
+        print(f"{key_name}: {region.count}頂点を変形 ({desc})")
     
     # 保存
     print("\n保存中...")
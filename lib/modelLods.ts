@@ -0,0 +1,69 @@
+// LOD（詳細度）の選択
+// scripts/batch_convert.py がモデルと同じディレクトリに書き出す lods.json を読み、
+// 端末の性能に合ったレベルの GLB のパスを返す
+
+export interface LodLevel {
+  level: number;
+  file: string;
+  ratio: number;
+  lipsyncOnly: boolean;
+  triangles: number;
+  vertices: number;
+  primitives: number;
+  morphTargets: number;
+  bytes: number;
+}
+
+export interface LodIndex {
+  version: number;
+  avatars: Record<string, { levels: LodLevel[] }>;
+}
+
+export interface LodBudget {
+  // 三角形数の上限
+  maxTriangles?: number;
+  // ファイルサイズの上限（バイト）
+  maxBytes?: number;
+  // リップシンク以外の表情（モーフ）が必要か
+  needsExpressions?: boolean;
+}
+
+// モデルのパスと同じディレクトリのファイルへのパス
+const siblingPath = (modelPath: string, file: string): string => {
+  const slash = modelPath.lastIndexOf('/');
+  return slash >= 0 ? `${modelPath.slice(0, slash + 1)}${file}` : file;
+};
+
+// lods.json を読み込む（無ければ null）
+export const loadLodIndex = async (modelPath: string): Promise<LodIndex | null> => {
+  try {
+    const response = await fetch(siblingPath(modelPath, 'lods.json'));
+    return response.ok ? await response.json() : null;
+  } catch {
+    return null;
+  }
+};
+
+// 予算に収まる中で最も詳細なレベルを選ぶ（どれも収まらなければ最も粗いレベル）
+export const chooseLodLevel = (levels: LodLevel[], budget: LodBudget = {}): LodLevel | undefined => {
+  const sorted = [...levels].sort((a, b) => a.level - b.level);
+  const fits = sorted.filter(level =>
+    (budget.maxTriangles === undefined || level.triangles <= budget.maxTriangles) &&
+    (budget.maxBytes === undefined || level.bytes <= budget.maxBytes) &&
+    !(budget.needsExpressions && level.lipsyncOnly)
+  );
+  return fits[0] ?? sorted[sorted.length - 1];
+};
+
+// モデルのパスを選んだ LOD のパスに置き換える（索引に無いアバターはそのまま）
+export const getLodModelPath = (
+  modelPath: string,
+  index: LodIndex | null,
+  avatar: string,
+  budget: LodBudget = {}
+): string => {
+  const levels = index?.avatars[avatar]?.levels;
+  if (!levels || levels.length === 0) return modelPath;
+  const level = chooseLodLevel(levels, budget);
+  return level ? siblingPath(modelPath, level.file) : modelPath;
+};
@@ -0,0 +1,9 @@
+"""
+アバターのGLB変換パイプライン（ホスト側）
+
+マニフェストに列挙したアセット（.blend / .fbx）を、CPUコア数に合わせた
+`blender --background` ワーカーのプールで並列に変換する。
+Blender 内で動くのは worker.py のみで、それ以外は通常の Python で動作する。
+
+    python3 scripts/batch_convert.py scripts/avatars.manifest.json
+"""
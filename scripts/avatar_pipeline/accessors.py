@@ -0,0 +1,146 @@
+"""
+glTF アクセサーの NumPy 読み書き
+
+glb.GLB の bufferView から (count, 成分数) の配列を取り出し、書き戻すときは
+新しい bufferView を追加してアクセサーを付け替える（元の bufferView は
+GLB.compact() で取り除く）。疎アクセサー（sparse）の読み書きにも対応する。
+accessor_view() はコピーせずに bufferView を直接参照する配列を返す
+（glb_reader.MappedGLB と組み合わせるとファイルのメモリマップを直接見る）。
+"""
+import numpy as np
+
+COMPONENT_DTYPES = {
+    5120: np.dtype(np.int8),
+    5121: np.dtype(np.uint8),
+    5122: np.dtype(np.int16),
+    5123: np.dtype(np.uint16),
+    5125: np.dtype(np.uint32),
+    5126: np.dtype(np.float32),
+}
+COMPONENT_TYPES = {dtype: component for component, dtype in COMPONENT_DTYPES.items()}
+
+TYPE_SIZES = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4, 'MAT2': 4, 'MAT3': 9, 'MAT4': 16}
+
+# bufferView.target
+ARRAY_BUFFER = 34962
+
+
+def _view_array(glb, view_index, offset, count, dtype, size, stride=None, copy=True):
+    data = glb.view(view_index)
+    stride = stride or glb.gltf['bufferViews'][view_index].get('byteStride') or dtype.itemsize * size
+    array = np.ndarray((count, size), dtype=dtype, buffer=data, offset=offset,
+                       strides=(stride, dtype.itemsize))
+    return array.copy() if copy else array
+
+
+def dequantize(array, component_type):
+    """正規化された整数を [-1, 1] / [0, 1] の浮動小数点に戻す"""
+    info = np.iinfo(COMPONENT_DTYPES[component_type])
+    values = array.astype(np.float32) / info.max
+    return np.maximum(values, -1.0) if info.min < 0 else values
+
+
+def read_accessor(glb, index, raw=False):
+    """
+    アクセサーを (count, 成分数) の配列で読む
+
+    raw=False なら normalized の整数は浮動小数点に戻す
+    """
+    accessor = glb.gltf['accessors'][index]
+    dtype = COMPONENT_DTYPES[accessor['componentType']]
+    size = TYPE_SIZES[accessor['type']]
+    count = accessor['count']
+    if 'bufferView' in accessor:
+        array = _view_array(glb, accessor['bufferView'], accessor.get('byteOffset', 0), count, dtype, size)
+    else:
+        array = np.zeros((count, size), dtype=dtype)
+
+    sparse = accessor.get('sparse')
+    if sparse:
+        indices = sparse['indices']
+        index_dtype = COMPONENT_DTYPES[indices['componentType']]
+        rows = _view_array(glb, indices['bufferView'], indices.get('byteOffset', 0),
+                           sparse['count'], index_dtype, 1, stride=index_dtype.itemsize)[:, 0]
+        values = sparse['values']
+        array[rows] = _view_array(glb, values['bufferView'], values.get('byteOffset', 0),
+                                  sparse['count'], dtype, size, stride=dtype.itemsize * size)
+
+    if accessor.get('normalized') and not raw:
+        array = dequantize(array, accessor['componentType'])
+    return array
+
+
+def accessor_view(glb, index):
+    """
+    アクセサーをコピーせずに (count, 成分数) の配列で参照する
+
+    bufferView を直接見るため、normalized の整数も整数のまま返す（必要なら
+    dequantize() で戻す）。疎アクセサーと bufferView のないアクセサーは
+    実体化が必要なので read_accessor(raw=True) と同じくコピーを返す。
+    """
+    accessor = glb.gltf['accessors'][index]
+    if 'sparse' in accessor or 'bufferView' not in accessor:
+        return read_accessor(glb, index, raw=True)
+    return _view_array(glb, accessor['bufferView'], accessor.get('byteOffset', 0), accessor['count'],
+                       COMPONENT_DTYPES[accessor['componentType']], TYPE_SIZES[accessor['type']], copy=False)
+
+
+def _update_bounds(accessor, array):
+    if 'min' in accessor or 'max' in accessor:
+        accessor['min'] = array.min(axis=0).tolist() if len(array) else accessor.get('min', [])
+        accessor['max'] = array.max(axis=0).tolist() if len(array) else accessor.get('max', [])
+
+
+def write_accessor(glb, index, array, target=None):
+    """
+    アクセサーの中身を array（成分型はアクセサーのまま）で置き換える
+
+    頂点属性（target=ARRAY_BUFFER）の要素が 4 バイトの倍数でなければ
+    （int16 の VEC3 など）、glTF の規定どおり byteStride を 4 の倍数にそろえる。
+    """
+    accessor = glb.gltf['accessors'][index]
+    array = np.ascontiguousarray(array, dtype=COMPONENT_DTYPES[accessor['componentType']])
+    array = array.reshape(len(array), -1)
+    element = array.itemsize * array.shape[1]
+    if target == ARRAY_BUFFER and element % 4:
+        stride = element + (-element) % 4
+        padded = np.zeros((len(array), stride), dtype=np.uint8)
+        padded[:, :element] = array.view(np.uint8).reshape(len(array), element)
+        accessor['bufferView'] = glb.add_view(padded.tobytes(), target=target, byte_stride=stride)
+    else:
+        accessor['bufferView'] = glb.add_view(array.tobytes(), target=target)
+    accessor['byteOffset'] = 0
+    accessor['count'] = len(array)
+    accessor.pop('sparse', None)
+    _update_bounds(accessor, array)
+
+
+def sparse_size(array):
+    """疎アクセサーにしたときの (インデックス型, 非ゼロ行, バイト数)"""
+    rows = np.flatnonzero(np.any(array != 0, axis=1))
+    count = len(array)
+    index_dtype = np.dtype(np.uint8 if count <= 0xFF else np.uint16 if count <= 0xFFFF else np.uint32)
+    size = len(rows) * (index_dtype.itemsize + array.itemsize * array.shape[1])
+    return index_dtype, rows, size
+
+
+def write_sparse(glb, index, array):
+    """
+    ゼロ以外の行だけを持つ疎アクセサーに書き換える（bufferView は持たない）
+
+    戻り値: 書き換え後のデータのバイト数
+    """
+    accessor = glb.gltf['accessors'][index]
+    array = np.ascontiguousarray(array, dtype=COMPONENT_DTYPES[accessor['componentType']])
+    index_dtype, rows, size = sparse_size(array)
+    for key in ('bufferView', 'byteOffset', 'sparse'):
+        accessor.pop(key, None)
+    if len(rows):
+        accessor['sparse'] = {
+            'count': len(rows),
+            'indices': {'bufferView': glb.add_view(rows.astype(index_dtype).tobytes()),
+                        'componentType': COMPONENT_TYPES[index_dtype]},
+            'values': {'bufferView': glb.add_view(array[rows].tobytes())},
+        }
+    _update_bounds(accessor, array)
+    return size
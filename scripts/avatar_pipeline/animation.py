@@ -0,0 +1,316 @@
+"""
+アニメーションのキーフレーム削減（エクスポート後に GLB を書き換える）
+
+ドライバーのベイクや blender/create_animation_controller.py で作った会話用の
+アニメーションは、すべてのシェイプキー・ボーンに毎フレームのキーを持つ。
+export_optimize_animation_size が消すのは値がまったく同じキーだけなので、
+長い会話のクリップでは weights のサンプラーが GLB の大半を占める。
+
+LINEAR（と STEP）のサンプラーごとに、誤差がチャンネルの種類別の許容誤差に
+収まる範囲でキーを間引く（Ramer–Douglas–Peucker と同じく、区間内で誤差が
+最大の位置のキーを残して再帰的に分割する）。補間は LINEAR・STEP・CUBICSPLINE
+の候補のうち、許容誤差に収まりバイト数が最小のものを選ぶ。CUBICSPLINE の
+接線は元のカーブの傾きを Fritsch–Carlson の条件で抑えたもので、段差の前後で
+行き過ぎない。
+
+誤差は元のキーの時刻だけでなく、キーの間（SUBSAMPLES 等分した点）でも
+元のカーブと比べて測る（24 fps のキーを 60 fps で再生しても許容誤差に収まる）。
+単位: translation は距離（m）、rotation は回転の角度（度）、scale と weights は
+成分ごとの差の絶対値。
+"""
+import numpy as np
+
+from .accessors import TYPE_SIZES, read_accessor, write_accessor
+
+FLOAT = 5126
+INTERPOLATIONS = ('LINEAR', 'STEP', 'CUBICSPLINE')
+
+# 誤差を測るときに元のキーの間を何等分するか
+SUBSAMPLES = 4
+
+
+class AnimationError(Exception):
+    pass
+
+
+def _continuous(quaternions):
+    """隣り合うクォータニオンの符号をそろえる（q と -q は同じ回転）"""
+    quaternions = quaternions.copy()
+    for i in range(1, len(quaternions)):
+        if np.dot(quaternions[i], quaternions[i - 1]) < 0:
+            quaternions[i] = -quaternions[i]
+    return quaternions
+
+
+def _slerp(q0, q1, s):
+    dot = np.clip(np.einsum('ij,ij->i', q0, q1), -1.0, 1.0)
+    q1 = np.where(dot[:, None] < 0, -q1, q1)
+    dot = np.abs(dot)
+    angle = np.arccos(dot)
+    small = angle < 1e-6
+    sin = np.where(small, 1.0, np.sin(angle))
+    w0 = np.where(small, 1.0 - s, np.sin((1.0 - s) * angle) / sin)
+    w1 = np.where(small, s, np.sin(s * angle) / sin)
+    return w0[:, None] * q0 + w1[:, None] * q1
+
+
+def interpolate(t0, t1, v0, v1, m0, m1, at, interpolation, rotation):
+    """キー (t0, v0, 接線 m0) と (t1, v1, m1) の間のカーブを時刻 at で評価する"""
+    count = len(at)
+    if interpolation == 'STEP':
+        result = np.repeat(v0[None], count, axis=0)
+        result[at >= t1] = v1
+        return result
+    s = (at - t0) / (t1 - t0)
+    if interpolation == 'LINEAR':
+        if rotation:
+            return _slerp(np.repeat(v0[None], count, axis=0), np.repeat(v1[None], count, axis=0), s)
+        return v0 + s[:, None] * (v1 - v0)
+    # CUBICSPLINE: glTF のエルミート曲線（接線は 1 秒あたりの変化量）
+    dt = t1 - t0
+    s = s[:, None]
+    s2, s3 = s * s, s * s * s
+    result = ((2 * s3 - 3 * s2 + 1) * v0 + (s3 - 2 * s2 + s) * dt * m0
+              + (-2 * s3 + 3 * s2) * v1 + (s3 - s2) * dt * m1)
+    if rotation:
+        result /= np.linalg.norm(result, axis=1, keepdims=True)
+    return result
+
+
+def monotone_tangents(times, values):
+    """
+    各キーの接線（1 秒あたりの変化量）
+
+    Fritsch–Carlson の条件で抑える: 前後の傾きの符号が違う（山・谷・平ら）キーでは 0、
+    それ以外は前後の傾きの小さい方の 3 倍まで。隣り合うキーの間で単調になる。
+    """
+    secants = np.diff(values, axis=0) / np.diff(times)[:, None]
+    tangents = np.empty_like(values)
+    tangents[0], tangents[-1] = secants[0], secants[-1]
+    left, right = secants[:-1], secants[1:]
+    inner = np.where(left * right > 0, (left + right) / 2, 0.0)
+    limit = 3 * np.minimum(np.abs(left), np.abs(right))
+    tangents[1:-1] = np.clip(inner, -limit, limit)
+    return tangents
+
+
+def reference(times, values, interpolation, rotation):
+    """
+    元のカーブをキーの間も含めて評価する
+
+    戻り値: (時刻, 値)。元のキー i は i * SUBSAMPLES 番目。
+    """
+    steps = np.arange(SUBSAMPLES) / SUBSAMPLES
+    dense_times = (times[:-1, None] + np.diff(times)[:, None] * steps).reshape(-1)
+    dense_times = np.append(dense_times, times[-1])
+    dense_values = np.empty((len(dense_times), values.shape[1]))
+    for i in range(len(times) - 1):
+        start = i * SUBSAMPLES
+        dense_values[start:start + SUBSAMPLES] = interpolate(
+            times[i], times[i + 1], values[i], values[i + 1], None, None,
+            dense_times[start:start + SUBSAMPLES], interpolation, rotation)
+    dense_values[-1] = values[-1]
+    return dense_times, dense_values
+
+
+def curve_error(path, expected, actual):
+    """点ごとの誤差（translation: 距離、rotation: 角度（度）、それ以外: 成分の差の最大）"""
+    if path == 'translation':
+        return np.linalg.norm(actual - expected, axis=1)
+    if path == 'rotation':
+        actual = actual / np.linalg.norm(actual, axis=1, keepdims=True)
+        dot = np.abs(np.einsum('ij,ij->i', actual, expected / np.linalg.norm(expected, axis=1, keepdims=True)))
+        return np.degrees(2 * np.arccos(np.clip(dot, 0.0, 1.0)))
+    return np.abs(actual - expected).max(axis=1)
+
+
+class Curve:
+    """1 本のカーブ（元のキーと、誤差を測るための細かい評価点）"""
+
+    def __init__(self, times, values, path, interpolation='LINEAR'):
+        self.path = path
+        self.rotation = path == 'rotation'
+        self.times = times
+        self.values = _continuous(values) if self.rotation else values
+        self.tangents = monotone_tangents(times, self.values)
+        self.dense_times, self.dense_values = reference(times, self.values, interpolation, self.rotation)
+
+    def segment(self, i, j, interpolation):
+        """キー i と j だけで作った区間のカーブを、その間の評価点で評価する"""
+        a, b = i * SUBSAMPLES, j * SUBSAMPLES
+        return interpolate(self.times[i], self.times[j], self.values[i], self.values[j],
+                           self.tangents[i], self.tangents[j], self.dense_times[a:b + 1],
+                           interpolation, self.rotation)
+
+    def segment_error(self, i, j, interpolation):
+        a, b = i * SUBSAMPLES, j * SUBSAMPLES
+        return curve_error(self.path, self.dense_values[a:b + 1], self.segment(i, j, interpolation))
+
+    def error(self, keep, interpolation):
+        """残したキーのカーブの、すべての評価点での最大誤差"""
+        return max(float(self.segment_error(a, b, interpolation).max())
+                   for a, b in zip(keep[:-1], keep[1:]))
+
+
+def _fit_step(curve, tolerance):
+    """値が変わったキーだけを残す（階段状のカーブ向け）"""
+    keep = [0]
+    values = curve.values
+    for i in range(1, len(values)):
+        if curve_error(curve.path, values[i:i + 1], values[keep[-1]:keep[-1] + 1])[0] > tolerance:
+            keep.append(i)
+    if keep[-1] != len(values) - 1:
+        # クリップの長さを変えないよう最後のキーは残す
+        keep.append(len(values) - 1)
+    return np.array(keep)
+
+
+def fit(curve, tolerance, interpolation='LINEAR'):
+    """
+    許容誤差に収まるように残すキーの番号を返す
+
+    LINEAR / CUBICSPLINE は区間の誤差が最大の評価点に最も近い元のキーで
+    再帰的に分割する。両端のキーは必ず残す。隣り合うキーの間でも許容誤差を
+    超える（段差を CUBICSPLINE で表すなど）場合は、そのまま返すので
+    curve.error() で確かめる。
+    """
+    if interpolation == 'STEP':
+        return _fit_step(curve, tolerance)
+    last = len(curve.times) - 1
+    keep = np.zeros(last + 1, dtype=bool)
+    keep[[0, last]] = True
+    stack = [(0, last)]
+    while stack:
+        i, j = stack.pop()
+        if j - i < 2:
+            continue
+        error = curve.segment_error(i, j, interpolation)
+        worst = int(np.argmax(error))
+        if error[worst] <= tolerance:
+            continue
+        split = min(max(i + int(round(worst / SUBSAMPLES)), i + 1), j - 1)
+        keep[split] = True
+        stack += [(i, split), (split, j)]
+    return np.flatnonzero(keep)
+
+
+def sampler_bytes(keys, components, interpolation):
+    """float の input / output のバイト数（CUBICSPLINE は接線を含めて 3 倍）"""
+    values = 3 if interpolation == 'CUBICSPLINE' else 1
+    return keys * 4 + keys * components * values * 4
+
+
+def simplify_curve(times, values, path, tolerance, interpolations=INTERPOLATIONS, source='LINEAR'):
+    """
+    1 本のカーブ（source の補間）を間引く
+
+    戻り値: {'interpolation', 'times', 'values'（CUBICSPLINE は (キー数, 3, 成分数)）,
+    'error'（キーの間を含めた最大誤差）, 'bytes'}。許容誤差に収まる候補のうち
+    バイト数が最小のもの（なければ None）。
+    """
+    curve = Curve(times, values, path, source)
+    best = None
+    for interpolation in interpolations:
+        keep = fit(curve, tolerance, interpolation)
+        size = sampler_bytes(len(keep), values.shape[1], interpolation)
+        if best is not None and size >= best['bytes']:
+            continue
+        error = curve.error(keep, interpolation)
+        if error > tolerance:
+            continue
+        output = curve.values[keep]
+        if interpolation == 'CUBICSPLINE':
+            # キーごとに in-tangent、値、out-tangent の順
+            output = np.stack([curve.tangents[keep], output, curve.tangents[keep]], axis=1)
+        best = {'interpolation': interpolation, 'times': times[keep], 'values': output,
+                'error': error, 'bytes': size}
+    return best
+
+
+def _tolerance(options, path):
+    return options[f"{path}_tolerance"]
+
+
+def _add_accessor(glb, array, accessor_type, bounds=False):
+    accessor = {'componentType': FLOAT, 'type': accessor_type, 'count': 0}
+    if bounds:
+        accessor.update({'min': [], 'max': []})
+    accessors = glb.gltf.setdefault('accessors', [])
+    accessors.append(accessor)
+    write_accessor(glb, len(accessors) - 1, array)
+    return len(accessors) - 1
+
+
+def simplify(glb, options):
+    """
+    GLB のすべてのアニメーションの LINEAR / STEP サンプラーを間引く
+
+    options: export_options.DEFAULT_ANIMATION_OPTIONS の形（*_tolerance、interpolations）。
+    戻り値: アニメーションごとの
+    {'animation', 'samplers', 'changed', 'keys_before', 'keys_after', 'bytes_before',
+     'bytes_after', 'max_error': {path: 誤差}, 'interpolations': {補間: サンプラー数}, 'skipped'}
+    """
+    interpolations = [i for i in options.get('interpolations', INTERPOLATIONS) if i in INTERPOLATIONS]
+    if not interpolations:
+        raise AnimationError(f"補間は {', '.join(INTERPOLATIONS)} から選んでください")
+    gltf = glb.gltf
+    accessors = gltf.get('accessors', [])
+    inputs = {}
+    report = []
+    for a, animation in enumerate(gltf.get('animations', [])):
+        paths = {channel['sampler']: channel['target'].get('path') for channel in animation['channels']}
+        entry = {'animation': animation.get('name', f"animation{a}"), 'samplers': len(animation['samplers']),
+                 'changed': 0, 'keys_before': 0, 'keys_after': 0, 'bytes_before': 0, 'bytes_after': 0,
+                 'max_error': {}, 'interpolations': {}, 'skipped': 0}
+        for s, sampler in enumerate(animation['samplers']):
+            path = paths.get(s)
+            interpolation = sampler.get('interpolation', 'LINEAR')
+            source, target = accessors[sampler['input']], accessors[sampler['output']]
+            keys = source['count']
+            components = target['count'] * TYPE_SIZES[target['type']] // max(keys, 1)
+            before = sampler_bytes(keys, components, interpolation)
+            entry['keys_before'] += keys
+            entry['bytes_before'] += before
+            if (interpolation not in ('LINEAR', 'STEP')
+                    or path not in ('translation', 'rotation', 'scale', 'weights')
+                    or keys < 3 or target['componentType'] != FLOAT or source['componentType'] != FLOAT):
+                # 量子化済み・CUBICSPLINE は触らない
+                entry['skipped'] += 1
+                entry['keys_after'] += keys
+                entry['bytes_after'] += before
+                continue
+            times = read_accessor(glb, sampler['input'])[:, 0].astype(np.float64)
+            if np.any(np.diff(times) <= 0):
+                # 同じ時刻のキーがあるサンプラーは触らない
+                entry['skipped'] += 1
+                entry['keys_after'] += keys
+                entry['bytes_after'] += before
+                continue
+            values = read_accessor(glb, sampler['output']).reshape(keys, components).astype(np.float64)
+            result = simplify_curve(times, values, path, _tolerance(options, path), interpolations,
+                                    source=interpolation)
+            if result is None or result['bytes'] >= before:
+                entry['keys_after'] += keys
+                entry['bytes_after'] += before
+                continue
+
+            new_times = result['times'].astype(np.float32)
+            key = new_times.tobytes()
+            if key not in inputs:
+                # 同じ時刻の列はサンプラー間で共有する
+                inputs[key] = _add_accessor(glb, new_times.reshape(-1, 1), 'SCALAR', bounds=True)
+            sampler['input'] = inputs[key]
+            size = TYPE_SIZES[target['type']]
+            sampler['output'] = _add_accessor(glb, result['values'].astype(np.float32).reshape(-1, size),
+                                              target['type'])
+            sampler['interpolation'] = result['interpolation']
+
+            entry['changed'] += 1
+            entry['keys_after'] += len(new_times)
+            entry['bytes_after'] += result['bytes']
+            entry['max_error'][path] = max(entry['max_error'].get(path, 0.0), result['error'])
+            counts = entry['interpolations']
+            counts[result['interpolation']] = counts.get(result['interpolation'], 0) + 1
+        report.append(entry)
+    glb.compact()
+    return report
@@ -0,0 +1,224 @@
+"""
+コンテンツアドレス型のエクスポートキャッシュ
+
+ステージごとのキーを「入力の内容ハッシュ + 参照テクスチャ + スクリプトの
+バージョン + オプション」から作り、キーが変わったステージだけを再実行する。
+
+    prepare キー = H(入力ファイル, 参照テクスチャ, import_scale, stages, 読み込み・前処理スクリプト)
+    export キー  = H(prepare キー, エクスポートオプション, LOD, エクスポートスクリプト)
+
+- export キーが一致すれば Blender を起動せず、キャッシュ済みの GLB を使う
+- prepare キーだけが一致すれば、前処理済みの .blend（チェックポイント）を
+  開いてエクスポートだけを行う
+
+参照テクスチャは前回の実行時にワーカーが報告したものを使う（depfile 方式）。
+入力ファイル自体が変われば参照も再取得される。LOD の GLB は
+`<export キー>.lod<n>.glb` として本体と一緒に保存・復元する。ファイルのハッシュは
+(サイズ, 更新時刻) ごとに記録し、変わっていないファイルは読み直さない。
+"""
+import dataclasses
+import hashlib
+import json
+import os
+import shutil
+
+CACHE_VERSION = 1
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 各ステージの処理を定義しているスクリプト（scripts/ からの相対パス）。
+# 内容が変わればそのステージ以降のキャッシュが無効になる
+STAGE_SOURCES = {
+    'load': ['avatar_pipeline/worker.py'],
+    'materials': ['convert_blend_to_glb_v4.py'],
+    'placeholder_shape_keys': [],
+    'pack_textures': [],
+    'optimize_textures': ['avatar_pipeline/textures.py'],
+    'dedup_textures': ['avatar_pipeline/textures.py', 'avatar_pipeline/texture_index.py'],
+    'consolidate': ['avatar_pipeline/consolidate.py'],
+    'sparse_morphs': ['avatar_pipeline/morphs.py', 'avatar_pipeline/accessors.py'],
+    'prune_morph_normals': ['avatar_pipeline/morphs.py', 'avatar_pipeline/accessors.py'],
+    'simplify_animation': ['avatar_pipeline/animation.py', 'avatar_pipeline/accessors.py'],
+    'quantize': ['avatar_pipeline/quantize.py', 'avatar_pipeline/accessors.py'],
+    'lod': ['avatar_pipeline/decimate.py', 'avatar_pipeline/lods.py'],
+    'export': ['avatar_pipeline/worker.py', 'avatar_pipeline/export_options.py',
+               'avatar_pipeline/ktx2.py', 'avatar_pipeline/glb.py',
+               'avatar_pipeline/compression.py', 'avatar_pipeline/postprocess.py'],
+}
+
+
+def _hash_json(value):
+    data = json.dumps(value, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path):
+    """ファイル内容の SHA-256（1MB ずつ読む）"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@dataclasses.dataclass
+class Plan:
+    """1ジョブの実行計画"""
+    action: str  # 'up_to_date' / 'restore' / 'export' / 'full'
+    prepare_key: str
+    export_key: str
+    checkpoint: str = ''
+
+    @property
+    def needs_blender(self):
+        return self.action in ('export', 'full')
+
+
+class ExportCache:
+    """キャッシュディレクトリ（index.json + objects/）の管理"""
+
+    def __init__(self, root):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.index_path = os.path.join(root, 'index.json')
+        self.index = {'version': CACHE_VERSION, 'files': {}, 'assets': {}}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('version') == CACHE_VERSION:
+                self.index = index
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self.index_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.index_path)
+
+    # --- ハッシュ ---
+
+    def digest(self, path):
+        """ファイルの内容ハッシュ。存在しなければ None"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        path = os.path.abspath(path)
+        memo = self.index['files'].get(path)
+        if memo and memo[0] == st.st_size and memo[1] == st.st_mtime_ns:
+            return memo[2]
+        digest = hash_file(path)
+        self.index['files'][path] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def sources_digest(self, stages):
+        """ステージを定義するスクリプトの内容ハッシュ"""
+        files = sorted({src for stage in stages for src in STAGE_SOURCES.get(stage, [])})
+        return {src: self.digest(os.path.join(SCRIPTS_DIR, src)) for src in files}
+
+    def stage_key(self, stage, parent_key, options, stages=None):
+        """ステージのキー = H(前段のキー, オプション, スクリプト)"""
+        return _hash_json({
+            'stage': stage,
+            'parent': parent_key,
+            'options': options,
+            'sources': self.sources_digest(stages or [stage]),
+        })
+
+    # --- 計画と記録 ---
+
+    def _object(self, key, ext):
+        return os.path.join(self.objects_dir, key[:2], key + ext)
+
+    def _outputs(self, job, export_key):
+        """出力パス → キャッシュのパス（LOD を含む）"""
+        outputs = {job.output: self._object(export_key, '.glb')}
+        for level in job.lods:
+            outputs[level['output']] = self._object(export_key, f".lod{level['level']}.glb")
+        return outputs
+
+    def plan(self, job):
+        """キャッシュの状態からジョブの実行計画を立てる"""
+        entry = self.index['assets'].get(job.name, {})
+        deps = entry.get('deps', []) if entry.get('input') == job.input else []
+        inputs = {'input': self.digest(job.input),
+                  'deps': {dep: self.digest(dep) for dep in deps}}
+        if 'dedup_textures' in job.stages and job.texture_index:
+            # 索引を作り直して重複が増えれば dedup_textures の結果も変わる
+            inputs['texture_index'] = self.digest(job.texture_index)
+        prepare_options = {'import_scale': job.import_scale, 'stages': job.stages, 'textures': job.textures}
+        if 'consolidate' in job.stages:
+            prepare_options['consolidate'] = job.consolidate
+        prepare_key = self.stage_key('prepare', _hash_json(inputs), prepare_options,
+                                     stages=['load'] + list(job.stages))
+        export_options = {'export': job.export, 'textures': job.textures,
+                          'compression': job.compression, 'post_stages': job.post_stages}
+        export_stages = ['export'] + list(job.post_stages)
+        if job.compression.get('profile') == 'quantize' and 'quantize' not in export_stages:
+            # worker.post_passes が quantize パスを足す
+            export_stages.append('quantize')
+        if 'prune_morph_normals' in job.post_stages:
+            export_options['morphs'] = job.morphs
+        if 'simplify_animation' in job.post_stages:
+            export_options['animation'] = job.animation
+        if job.lods:
+            export_options['lods'] = [{k: v for k, v in level.items() if k != 'output'} for level in job.lods]
+            export_stages.append('lod')
+        export_key = self.stage_key('export', prepare_key, export_options, stages=export_stages)
+
+        if entry.get('input') == job.input and entry.get('export_key') == export_key:
+            outputs = self._outputs(job, export_key)
+            if entry.get('output') == job.output and all(
+                    self.digest(path) == entry.get('output_digests', {}).get(path) for path in outputs):
+                return Plan('up_to_date', prepare_key, export_key)
+            if all(os.path.exists(cached) for cached in outputs.values()):
+                return Plan('restore', prepare_key, export_key)
+
+        checkpoint = self._object(prepare_key, '.blend')
+        if job.stages and entry.get('prepare_key') == prepare_key and os.path.exists(checkpoint):
+            return Plan('export', prepare_key, export_key, checkpoint)
+        return Plan('full', prepare_key, export_key)
+
+    def worker_job(self, job, plan):
+        """計画に合わせてワーカーへ渡すジョブを作る"""
+        if plan.action == 'export':
+            return dataclasses.replace(job, checkpoint_in=plan.checkpoint)
+        if plan.action == 'full' and job.stages:
+            plan.checkpoint = self._object(plan.prepare_key, '.blend')
+            os.makedirs(os.path.dirname(plan.checkpoint), exist_ok=True)
+            return dataclasses.replace(job, checkpoint_out=plan.checkpoint)
+        return job
+
+    def restore(self, job, plan):
+        """キャッシュ済みの GLB を出力先へコピー"""
+        for output, cached in self._outputs(job, plan.export_key).items():
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+            shutil.copyfile(cached, output)
+        self._record_output(job, plan)
+
+    def record(self, job, plan, deps=None):
+        """ワーカーの成功結果をキャッシュに登録"""
+        entry = self.index['assets'].setdefault(job.name, {})
+        if plan.action == 'full':
+            entry['input'] = job.input
+            entry['deps'] = sorted(set(deps or []) - {os.path.abspath(job.input)})
+            entry.pop('export_key', None)
+            # 参照テクスチャが判明したのでキーを計算し直し、チェックポイントも付け替える
+            final = self.plan(job)
+            checkpoint = self._object(final.prepare_key, '.blend')
+            if plan.checkpoint and plan.checkpoint != checkpoint and os.path.exists(plan.checkpoint):
+                os.makedirs(os.path.dirname(checkpoint), exist_ok=True)
+                os.replace(plan.checkpoint, checkpoint)
+            plan = final
+        entry['prepare_key'] = plan.prepare_key
+
+        for output, cached in self._outputs(job, plan.export_key).items():
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            shutil.copyfile(output, cached)
+        self._record_output(job, plan)
+
+    def _record_output(self, job, plan):
+        entry = self.index['assets'].setdefault(job.name, {})
+        entry['output'] = job.output
+        entry['export_key'] = plan.export_key
+        entry['output_digests'] = {path: self.digest(path) for path in self._outputs(job, plan.export_key)}
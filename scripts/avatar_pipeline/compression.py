@@ -0,0 +1,197 @@
+"""
+ジオメトリ圧縮プロファイル
+
+    none     圧縮なし
+    draco    Blender のエクスポーターで KHR_draco_mesh_compression
+             （位置・法線・UV を量子化。モーフターゲットは非圧縮のまま）
+    meshopt  エクスポート後に gltfpack で EXT_meshopt_compression
+             （モーフの差分も位置と同じ刻みで量子化される）
+    quantize エクスポート後に KHR_mesh_quantization（quantize.py）
+             （位置とモーフの差分は int16、法線は int8、UV は uint16）
+
+圧縮で見た目が崩れないことを、リップシンク用シェイプキーを適用した頂点の
+量子化誤差で検証する。量子化はメッシュのバウンディングボックスの最大辺を
+2^bits - 1 等分した格子への丸めなので、エンコーダーを通さなくても
+誤差を正確に再現できる。
+"""
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+
+import numpy as np
+
+# リップシンクで動かすシェイプキー（ビューアの FinalLipSyncAvatar と
+# convert_fbx_to_glb.py のプレースホルダーの名前）
+LIPSYNC_SHAPE_KEY_PATTERN = re.compile(r'^(V_|Mouth_|Move_Jaw|Vowel_|Talk_|mouth|jaw|tongue)')
+
+PROFILES = {
+    'none': {},
+    'draco': {
+        'position_bits': 14,
+        'normal_bits': 10,
+        'texcoord_bits': 12,
+        'level': 6,
+    },
+    'meshopt': {
+        'position_bits': 14,
+        'normal_bits': 8,
+        'texcoord_bits': 12,
+    },
+    'quantize': {
+        'position_bits': 16,
+        'normal_bits': 8,
+        'texcoord_bits': 16,
+        # 法線・接線の角度の許容誤差（度）
+        'max_normal_error': 1.0,
+    },
+}
+
+# 量子化ビット数の上限（これでも誤差が閾値を超えるなら失敗にする）
+MAX_POSITION_BITS = 16
+
+DEFAULT_COMPRESSION = {
+    'profile': 'none',
+    # リップシンク用シェイプキーを適用した頂点の許容誤差（m）
+    'max_error': 0.0002,
+}
+
+
+class CompressionError(Exception):
+    """未知のプロファイル・gltfpack の失敗・誤差が許容値を超えた"""
+
+
+def is_lipsync_key(name):
+    return bool(LIPSYNC_SHAPE_KEY_PATTERN.match(name))
+
+
+def merge_compression_options(*overrides):
+    """
+    既定の圧縮設定に上書きを重ね、プロファイルの既定値で補う
+
+    上書きは {"profile": "draco", "position_bits": 12} の形か、プロファイル名の文字列
+    """
+    options = dict(DEFAULT_COMPRESSION)
+    for override in overrides:
+        if isinstance(override, str):
+            override = {'profile': override}
+        if override:
+            options.update(override)
+    profile = options['profile']
+    if profile not in PROFILES:
+        raise CompressionError(f"未知の圧縮プロファイル: {profile}（{' / '.join(PROFILES)}）")
+    return {**PROFILES[profile], **options}
+
+
+def export_options(compression):
+    """Draco プロファイルをエクスポーターのオプションに変換"""
+    if compression['profile'] != 'draco':
+        return {'export_draco_mesh_compression_enable': False}
+    return {
+        'export_draco_mesh_compression_enable': True,
+        'export_draco_mesh_compression_level': compression['level'],
+        'export_draco_position_quantization': compression['position_bits'],
+        'export_draco_normal_quantization': compression['normal_bits'],
+        'export_draco_texcoord_quantization': compression['texcoord_bits'],
+    }
+
+
+# --- 誤差の検証 ---
+
+def quantization_step(positions, bits):
+    """バウンディングボックスの最大辺を 2^bits - 1 等分した刻み"""
+    extent = float(np.ptp(positions, axis=0).max()) if len(positions) else 0.0
+    return extent / ((1 << bits) - 1) if extent > 0 else 0.0
+
+
+def morph_error(base, delta, bits, quantize_delta):
+    """
+    シェイプキーを重み 1 で適用した頂点の量子化誤差（頂点ごとの距離）
+
+    base: (N, 3) 基準形状、delta: (N, 3) シェイプキーの差分
+    quantize_delta: 差分も同じ刻みで量子化されるか（meshopt）
+    """
+    step = quantization_step(base, bits)
+    if step == 0.0:
+        return np.zeros(len(base), dtype=np.float32)
+    origin = base.min(axis=0)
+    quantized = np.round((base - origin) / step) * step + origin
+    if quantize_delta:
+        quantized += np.round(delta / step) * step
+    else:
+        quantized += delta
+    return np.linalg.norm(quantized - (base + delta), axis=1)
+
+
+def check_meshes(meshes, compression, threshold=1e-6):
+    """
+    リップシンク用シェイプキーの誤差を調べる
+
+    meshes: [(メッシュ名, 基準形状, {シェイプキー名: 差分}, ワールドスケール)]
+    戻り値: [{'mesh', 'key', 'max_error'}]（動く頂点のみで評価）
+    """
+    bits = compression['position_bits']
+    quantize_delta = compression['profile'] in ('meshopt', 'quantize')
+    report = []
+    for mesh, base, deltas, scale in meshes:
+        for key, delta in deltas.items():
+            if not is_lipsync_key(key):
+                continue
+            moved = np.linalg.norm(delta, axis=1) > threshold
+            if not moved.any():
+                continue
+            error = morph_error(base, delta, bits, quantize_delta)[moved]
+            report.append({'mesh': mesh, 'key': key, 'max_error': float(error.max()) * scale})
+    return report
+
+
+def validate(meshes, compression):
+    """
+    許容誤差に収まる位置の量子化ビット数を決める
+
+    プロファイルのビット数で収まらなければ MAX_POSITION_BITS まで増やす。
+    戻り値: (ビット数, 最悪のシェイプキーの報告)
+    """
+    if compression['profile'] == 'none':
+        return None, None
+    bits = compression['position_bits']
+    while True:
+        report = check_meshes(meshes, {**compression, 'position_bits': bits})
+        worst = max(report, key=lambda r: r['max_error'], default=None)
+        if worst is None or worst['max_error'] <= compression['max_error']:
+            return bits, worst
+        if bits >= MAX_POSITION_BITS:
+            raise CompressionError(
+                f"{worst['mesh']} / {worst['key']} の誤差 {worst['max_error'] * 1000:.3f} mm が"
+                f"許容値 {compression['max_error'] * 1000:.3f} mm を超えます（{bits} bit）")
+        bits += 1
+
+
+# --- meshopt ---
+
+def gltfpack_args(compression):
+    return [
+        '-cc',
+        '-vp', str(compression['position_bits']),
+        '-vn', str(compression['normal_bits']),
+        '-vt', str(compression['texcoord_bits']),
+        # ノード名・マテリアル・extras（シェイプキー名）を残す
+        '-kn', '-km', '-ke',
+    ]
+
+
+def compress_meshopt(path, compression, gltfpack='gltfpack'):
+    """gltfpack で GLB を meshopt 圧縮して上書き。戻り値: (圧縮前, 圧縮後) のバイト数"""
+    gltfpack = shutil.which(gltfpack) or gltfpack
+    if not os.path.exists(gltfpack):
+        raise CompressionError("gltfpack が見つかりません（npm install -g gltfpack などでインストールしてください）")
+    before = os.path.getsize(path)
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, 'out.glb')
+        proc = subprocess.run([gltfpack, '-i', path, '-o', out] + gltfpack_args(compression),
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise CompressionError(f"gltfpack が失敗しました: {proc.stderr.strip()}")
+        shutil.move(out, path)
+    return before, os.path.getsize(path)
@@ -0,0 +1,439 @@
+"""
+オブジェクトとドローコールの統合ステージ（Blender 内で実行）
+
+目・瞳・白目、歯・舌・口蓋、髪のパーツのような小さなメッシュは、glTF では
+それぞれがノード 1 つ・マテリアルごとにドローコール 1 つになる。
+エクスポート前に次の 2 つを行い、ドローコールとマテリアルを減らす。
+
+1. アトラス化: 小さな画像 1 枚だけ、または単色のマテリアルを 1 枚の
+   アトラス画像にまとめ、UV をアトラス内のタイルに付け替えて 1 つの
+   マテリアルにする（粗さ・金属度などが同じもの同士）
+2. 結合: 静的なメッシュを、同じ親・同じアーマチュアごとに 1 つのオブジェクトに
+   結合する。glTF ではマテリアルごとに 1 プリミティブになるため、同じ
+   マテリアルの部品は 1 回のドローコールで描かれる
+
+シェイプキー（モーフターゲット）を持つメッシュ、アニメーションやコンストレイント
+のあるオブジェクト、アーマチュア以外のモディファイアーを持つオブジェクトは
+そのまま残す。
+"""
+import numpy as np
+
+import bpy
+
+from .export_options import DEFAULT_CONSOLIDATE_OPTIONS
+
+ATLAS_PREFIX = 'Atlas'
+UV_NAME = 'UVMap'
+
+# アトラスにまとめるマテリアルが揃っている必要のある Principled BSDF の設定（入力以外）
+BSDF_PROPERTIES = ('distribution', 'subsurface_method')
+
+
+# --- 集計 ---
+
+def _used_materials(obj):
+    """オブジェクトの面が実際に使っているマテリアル（スロットの順）"""
+    mesh = obj.data
+    if len(mesh.polygons) == 0:
+        return []
+    indices = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get('material_index', indices)
+    slots = obj.material_slots
+    used = []
+    for index in np.unique(indices):
+        material = slots[index].material if index < len(slots) else None
+        if material not in used:
+            used.append(material)
+    return used
+
+
+def draw_call_stats(objects=None):
+    """メッシュノード数・ドローコール数（メッシュ × マテリアル）・マテリアル数・画像数"""
+    objects = [obj for obj in (objects if objects is not None else bpy.context.scene.objects)
+               if obj.type == 'MESH' and not obj.hide_render]
+    materials = set()
+    draw_calls = 0
+    for obj in objects:
+        used = _used_materials(obj)
+        draw_calls += len(used)
+        materials.update(m for m in used if m is not None)
+    images = {node.image for material in materials if material.use_nodes and material.node_tree
+              for node in material.node_tree.nodes if node.type == 'TEX_IMAGE' and node.image}
+    return {
+        'meshes': len(objects),
+        'draw_calls': draw_calls,
+        'materials': len(materials),
+        'images': len(images),
+        'morph_meshes': sum(1 for obj in objects if obj.data.shape_keys is not None),
+    }
+
+
+# --- 対象の判定 ---
+
+def static_reason(obj):
+    """結合できないオブジェクトならその理由（結合できれば None）"""
+    if obj.data.shape_keys is not None:
+        return "シェイプキーあり"
+    if obj.animation_data is not None and (obj.animation_data.action or obj.animation_data.drivers):
+        return "アニメーションあり"
+    if len(obj.constraints):
+        return "コンストレイントあり"
+    if any(modifier.type != 'ARMATURE' for modifier in obj.modifiers):
+        return "モディファイアーあり"
+    if obj.hide_render or not obj.visible_get():
+        return "非表示"
+    return None
+
+
+def _armature(obj):
+    for modifier in obj.modifiers:
+        if modifier.type == 'ARMATURE' and modifier.object is not None:
+            return modifier.object
+    return None
+
+
+def merge_groups(objects):
+    """同じ親・親ボーン・アーマチュアごとに結合候補をまとめる（2 つ以上のグループのみ）"""
+    groups = {}
+    for obj in objects:
+        key = (obj.parent, obj.parent_type, obj.parent_bone if obj.parent_type == 'BONE' else '',
+               _armature(obj))
+        groups.setdefault(key, []).append(obj)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+# --- アトラス ---
+
+def _principled(material):
+    if not material.use_nodes or material.node_tree is None:
+        return None
+    bsdfs = [node for node in material.node_tree.nodes if node.type == 'BSDF_PRINCIPLED']
+    return bsdfs[0] if len(bsdfs) == 1 else None
+
+
+def _shading_inputs(bsdf):
+    """Base Color 以外の、値を持つ Principled BSDF の入力"""
+    for socket in bsdf.inputs:
+        if socket.name == 'Base Color' or socket.hide_value or not hasattr(socket, 'default_value'):
+            continue
+        yield socket
+
+
+def shading_values(bsdf):
+    """
+    Base Color 以外の入力と設定の値 {識別子: 値}
+
+    Blender 3.x と 4.x で名前の違う入力（Transmission / Transmission Weight、
+    Clearcoat / Coat Weight、Emission / Emission Color、Specular / Specular IOR Level
+    など）も、ソケットを列挙するのでそのまま比べられる。
+    """
+    values = {}
+    for socket in _shading_inputs(bsdf):
+        value = socket.default_value
+        if hasattr(value, '__len__'):
+            values[socket.identifier] = tuple(round(v, 3) for v in value)
+        else:
+            values[socket.identifier] = round(value, 3) if isinstance(value, float) else value
+    for name in BSDF_PROPERTIES:
+        if hasattr(bsdf, name):
+            values[name] = getattr(bsdf, name)
+    return values
+
+
+def atlas_source(material, tile_max):
+    """
+    アトラスにできるマテリアルなら (画像 または None, 単色, 揃えるべき値) を返す
+
+    Base Color が UV 指定なしの画像ノード 1 つに直接つながるか単色で、
+    ほかのテクスチャ・入力のリンクを使わず不透明なものだけを対象にする。
+    揃えるべき値は Base Color 以外のすべての入力（Transmission・Coat・Sheen・
+    Specular・Emission など）なので、ガラスの角膜と不透明な白目はまとめない。
+    """
+    bsdf = _principled(material)
+    if bsdf is None:
+        return None
+    textures = [node for node in material.node_tree.nodes if node.type == 'TEX_IMAGE']
+    base = bsdf.inputs['Base Color']
+    image = None
+    if base.is_linked:
+        node = base.links[0].from_node
+        if (node.type != 'TEX_IMAGE' or node.image is None or len(textures) != 1
+                or node.inputs['Vector'].is_linked or node.extension != 'REPEAT'
+                or max(node.image.size) == 0 or max(node.image.size) > tile_max
+                or node.image.is_float or node.image.colorspace_settings.name != 'sRGB'):
+            return None
+        image = node.image
+    elif textures:
+        return None
+    if any(socket.is_linked for socket in bsdf.inputs if socket.name != 'Base Color'):
+        return None
+    if 'Alpha' in bsdf.inputs and bsdf.inputs['Alpha'].default_value < 1.0:
+        return None
+    signature = tuple(sorted(shading_values(bsdf).items()))
+    signature += (material.use_backface_culling,)
+    color = tuple(base.default_value)
+    return image, color, signature
+
+
+def _linear_to_srgb(values):
+    values = np.clip(np.asarray(values, dtype=np.float32), 0.0, 1.0)
+    return np.where(values <= 0.0031308, values * 12.92, 1.055 * values ** (1 / 2.4) - 0.055)
+
+
+def _tile_pixels(image, color, solid):
+    """タイルの画素 (高さ, 幅, 4)（単色なら solid × solid）"""
+    if image is None:
+        tile = np.empty((solid, solid, 4), dtype=np.float32)
+        tile[..., :3] = _linear_to_srgb(color[:3])
+        tile[..., 3] = 1.0
+        return tile
+    width, height = image.size
+    pixels = np.empty(width * height * image.channels, dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+    pixels = pixels.reshape(height, width, image.channels)
+    if image.channels == 4:
+        return pixels
+    tile = np.ones((height, width, 4), dtype=np.float32)
+    tile[..., :min(3, image.channels)] = pixels[..., :3]
+    return tile
+
+
+def pack_shelves(sizes, atlas_size, padding):
+    """
+    (幅, 高さ) の矩形を棚詰めで並べ、入ったものの {番号: (x, y)} と使った高さを返す
+
+    高い順に左から詰め、行が埋まったら次の棚に移る。
+    """
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    placed = {}
+    x = y = shelf = 0
+    for i in order:
+        width, height = sizes[i][0] + padding * 2, sizes[i][1] + padding * 2
+        if x + width > atlas_size:
+            x, y, shelf = 0, y + shelf, 0
+        if y + height > atlas_size or width > atlas_size:
+            continue
+        placed[i] = (x + padding, y + padding)
+        x += width
+        shelf = max(shelf, height)
+    return placed, y + shelf
+
+
+def _render_uv_layer(mesh):
+    if not mesh.uv_layers:
+        return mesh.uv_layers.new(name=UV_NAME)
+    for layer in mesh.uv_layers:
+        if layer.active_render:
+            return layer
+    return mesh.uv_layers[0]
+
+
+def _uv_inside(obj, slot_index):
+    """そのスロットの面の UV がすべて 0〜1 に収まるか（繰り返しテクスチャは対象外）"""
+    mesh = obj.data
+    if not mesh.uv_layers:
+        return True
+    uv = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+    _render_uv_layer(mesh).data.foreach_get('uv', uv)
+    loops = _slot_loops(mesh, slot_index)
+    values = uv.reshape(-1, 2)[loops]
+    return values.size == 0 or (values.min() >= -1e-3 and values.max() <= 1 + 1e-3)
+
+
+def _slot_loops(mesh, slot_index):
+    """material_index == slot_index の面に属するループの番号"""
+    count = len(mesh.polygons)
+    indices = np.empty(count, dtype=np.int32)
+    starts = np.empty(count, dtype=np.int32)
+    totals = np.empty(count, dtype=np.int32)
+    mesh.polygons.foreach_get('material_index', indices)
+    mesh.polygons.foreach_get('loop_start', starts)
+    mesh.polygons.foreach_get('loop_total', totals)
+    selected = indices == slot_index
+    if not selected.any():
+        return np.empty(0, dtype=np.int64)
+    starts, totals = starts[selected], totals[selected]
+    return np.repeat(starts - np.cumsum(totals) + totals, totals) + np.arange(totals.sum())
+
+
+def _make_atlas_material(name, template, image):
+    material = bpy.data.materials.new(name=name)
+    material.use_nodes = True
+    material.use_backface_culling = template.use_backface_culling
+    nodes = material.node_tree.nodes
+    bsdf = nodes.get('Principled BSDF')
+    source = _principled(template)
+    targets = {socket.identifier: socket for socket in _shading_inputs(bsdf)}
+    for socket in _shading_inputs(source):
+        if socket.identifier in targets:
+            targets[socket.identifier].default_value = socket.default_value
+    for name in BSDF_PROPERTIES:
+        if hasattr(source, name):
+            setattr(bsdf, name, getattr(source, name))
+    texture = nodes.new('ShaderNodeTexImage')
+    texture.image = image
+    texture.interpolation = 'Linear'
+    texture.location = (bsdf.location.x - 350, bsdf.location.y)
+    material.node_tree.links.new(texture.outputs['Color'], bsdf.inputs['Base Color'])
+    return material
+
+
+def build_atlases(objects, options):
+    """
+    objects だけが使うマテリアルをアトラスにまとめ、作ったアトラスの情報を返す
+
+    ほかのオブジェクト（シェイプキーのあるメッシュなど）と共有している
+    マテリアルは、そちらの見た目を変えないよう対象にしない。
+    """
+    candidates = set(objects)
+    users = {}
+    for obj in bpy.context.scene.objects:
+        if obj.type != 'MESH':
+            continue
+        for index, slot in enumerate(obj.material_slots):
+            if slot.material is not None:
+                users.setdefault(slot.material, []).append((obj, index))
+
+    groups = {}
+    for material, slots in users.items():
+        if any(obj not in candidates for obj, _ in slots):
+            continue
+        source = atlas_source(material, options['atlas_tile_max'])
+        if source is None:
+            continue
+        image, color, signature = source
+        if image is not None and not all(_uv_inside(obj, index) for obj, index in slots):
+            continue
+        groups.setdefault(signature, []).append((material, image, color, slots))
+
+    atlases = []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        tiles = [_tile_pixels(image, color, options['solid_tile']) for _, image, color, _ in members]
+        sizes = [(tile.shape[1], tile.shape[0]) for tile in tiles]
+        placed, used_height = pack_shelves(sizes, options['atlas_size'], options['padding'])
+        if len(placed) < 2:
+            continue
+        atlas_w = options['atlas_size']
+        atlas_h = 1 << max(0, int(np.ceil(np.log2(max(used_height, 1)))))
+        pixels = np.zeros((atlas_h, atlas_w, 4), dtype=np.float32)
+        pixels[..., 3] = 1.0
+        name = f"{ATLAS_PREFIX}{len(atlases) + 1}"
+        for i, (x, y) in placed.items():
+            tile = tiles[i]
+            height, width = tile.shape[:2]
+            pad = options['padding']
+            # 余白は端の画素を伸ばして埋める
+            padded = np.pad(tile, ((pad, pad), (pad, pad), (0, 0)), mode='edge')
+            pixels[y - pad:y + height + pad, x - pad:x + width + pad] = padded
+
+        image = bpy.data.images.new(name, atlas_w, atlas_h, alpha=False)
+        image.pixels.foreach_set(pixels.ravel())
+        image.pack()
+        material = _make_atlas_material(name, members[0][0], image)
+
+        remapped = set()
+        for i, (x, y) in placed.items():
+            source_material, source_image, _, slots = members[i]
+            width, height = sizes[i]
+            offset = np.array([x / atlas_w, y / atlas_h], dtype=np.float32)
+            scale = np.array([width / atlas_w, height / atlas_h], dtype=np.float32)
+            for obj, slot_index in slots:
+                mesh = obj.data
+                obj.material_slots[slot_index].material = material
+                # メッシュを共有するオブジェクトで 2 回付け替えない
+                if (mesh, slot_index) in remapped:
+                    continue
+                remapped.add((mesh, slot_index))
+                layer = _render_uv_layer(mesh)
+                uv = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+                layer.data.foreach_get('uv', uv)
+                uv = uv.reshape(-1, 2)
+                loops = _slot_loops(mesh, slot_index)
+                if source_image is None:
+                    # 単色はタイルの中心の 1 点を参照する
+                    uv[loops] = offset + scale / 2
+                else:
+                    # 端の画素の中心より内側に収めてにじみを防ぐ
+                    inset = 0.5 / np.array([width, height], dtype=np.float32)
+                    uv[loops] = offset + scale * np.clip(uv[loops], inset, 1 - inset)
+                layer.data.foreach_set('uv', uv.ravel())
+            print(f"  {source_material.name} → {name}")
+        atlases.append({
+            'image': name,
+            'size': (atlas_w, atlas_h),
+            'materials': [members[i][0].name for i in placed],
+            'replaced': [members[i][0] for i in placed],
+        })
+    return atlases
+
+
+# --- 結合 ---
+
+def _unify_uv_names(objects):
+    """UV マップが 1 つだけのメッシュの名前を揃える（結合で別レイヤーにならないように）"""
+    for obj in objects:
+        layers = obj.data.uv_layers
+        if len(layers) == 1 and layers[0].name != UV_NAME:
+            layers[0].name = UV_NAME
+
+
+def join_objects(group):
+    """グループを 1 つのオブジェクトに結合し、結合後のオブジェクトを返す"""
+    _unify_uv_names(group)
+    # 最も頂点の多いものに結合する（名前と原点を引き継ぐ）
+    target = max(group, key=lambda obj: len(obj.data.vertices))
+    for obj in group:
+        if obj.data.users > 1:
+            obj.data = obj.data.copy()
+    with bpy.context.temp_override(active_object=target, selected_editable_objects=group,
+                                   selected_objects=group, object=target):
+        bpy.ops.object.join()
+    # 結合で使われなくなったスロットを除く（GLB の空プリミティブを防ぐ）
+    used = _used_materials(target)
+    if len(used) < len(target.material_slots):
+        with bpy.context.temp_override(object=target, active_object=target):
+            bpy.ops.object.material_slot_remove_unused()
+    return target
+
+
+# --- ステージ ---
+
+def consolidate(options=None):
+    """
+    アトラス化と結合を行い、前後の集計を返す
+
+    戻り値: {'before', 'after', 'atlases', 'merged', 'kept'}
+    """
+    options = {**DEFAULT_CONSOLIDATE_OPTIONS, **(options or {})}
+    before = draw_call_stats()
+
+    meshes = [obj for obj in bpy.context.scene.objects if obj.type == 'MESH']
+    kept = {}
+    static = []
+    for obj in meshes:
+        reason = static_reason(obj)
+        if reason:
+            kept[obj.name] = reason
+        else:
+            static.append(obj)
+
+    atlases = build_atlases(static, options) if options['atlas'] else []
+
+    merged = []
+    if options['merge']:
+        for group in merge_groups(static):
+            names = sorted(obj.name for obj in group)
+            target = join_objects(group)
+            merged.append({'object': target.name, 'sources': names})
+            print(f"  {len(names)}個を {target.name} に結合: {', '.join(names)}")
+
+    # アトラスに置き換えたマテリアルは使われなくなる
+    for atlas in atlases:
+        for material in atlas.pop('replaced'):
+            if material.users == 0:
+                bpy.data.materials.remove(material)
+
+    after = draw_call_stats()
+    return {'before': before, 'after': after, 'atlases': atlases, 'merged': merged, 'kept': kept}
@@ -0,0 +1,166 @@
+"""
+LOD 用のメッシュの間引き（Blender 内で実行）
+
+編集モードの「ジオメトリを間引く」（bpy.ops.mesh.decimate、エッジの縮約）を
+使う。BMesh の縮約では頂点のカスタムデータとしてシェイプキーと頂点グループ
+（スキンのウェイト）も補間されるため、モーフターゲットとスキンが残る。
+
+縮約の順序は一時的な頂点グループで制御する（ウェイトが大きい頂点ほど残る）。
+
+- UV の継ぎ目の頂点（ループごとに UV が異なる頂点）とメッシュの境界の頂点: 1.0
+- 残すシェイプキーで動く頂点: 変位の大きさに応じて 0〜1
+
+リップシンク用のシェイプキーで動く口の周りは細かいまま残り、動かない部分
+から先に間引かれる。
+"""
+import numpy as np
+
+import bpy
+
+from .compression import is_lipsync_key
+
+PROTECT_GROUP = '_lod_protect'
+# これより面の少ないメッシュは間引かない
+MIN_FACES = 64
+# 変位がシェイプキーごとの最大値のこの割合を超える頂点は完全に保護する
+DISPLACEMENT_SATURATION = 0.1
+# 保護ウェイトの段階数（頂点グループへは段階ごとにまとめて書き込む）
+WEIGHT_LEVELS = 8
+
+
+def _coords(data):
+    coords = np.empty(len(data) * 3, dtype=np.float32)
+    data.foreach_get('co', coords)
+    return coords.reshape(-1, 3)
+
+
+def seam_vertices(mesh):
+    """UV の継ぎ目上の頂点（ループごとに UV が異なる頂点）"""
+    count = len(mesh.vertices)
+    seams = np.zeros(count, dtype=bool)
+    if not mesh.loops:
+        return seams
+    loop_verts = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get('vertex_index', loop_verts)
+    for layer in mesh.uv_layers:
+        uv = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+        layer.data.foreach_get('uv', uv)
+        uv = uv.reshape(-1, 2)
+        for axis in range(2):
+            low = np.full(count, np.inf, dtype=np.float32)
+            high = np.full(count, -np.inf, dtype=np.float32)
+            np.minimum.at(low, loop_verts, uv[:, axis])
+            np.maximum.at(high, loop_verts, uv[:, axis])
+            seams |= (high - low) > 1e-5
+    return seams
+
+
+def boundary_vertices(mesh):
+    """面 1 枚にしか属さない辺の頂点"""
+    boundary = np.zeros(len(mesh.vertices), dtype=bool)
+    if not mesh.edges or not mesh.polygons:
+        return boundary
+    edge_keys = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get('edge_index', edge_keys)
+    faces_per_edge = np.bincount(edge_keys, minlength=len(mesh.edges))
+    edges = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.edges.foreach_get('vertices', edges)
+    boundary[edges.reshape(-1, 2)[faces_per_edge == 1].ravel()] = True
+    return boundary
+
+
+def displacement_weights(mesh, keys):
+    """シェイプキーごとの変位を最大値で正規化し、頂点ごとの最大を 0〜1 で返す"""
+    weights = np.zeros(len(mesh.vertices), dtype=np.float32)
+    if mesh.shape_keys is None:
+        return weights
+    reference = _coords(mesh.shape_keys.reference_key.data)
+    for kb in mesh.shape_keys.key_blocks:
+        if kb.name not in keys:
+            continue
+        disp = np.linalg.norm(_coords(kb.data) - reference, axis=1)
+        peak = disp.max(initial=0.0)
+        if peak > 0:
+            weights = np.maximum(weights, np.clip(disp / (peak * DISPLACEMENT_SATURATION), 0.0, 1.0))
+    return weights
+
+
+def protect_weights(mesh, keys):
+    """間引きで残したい度合い（0〜1）"""
+    weights = displacement_weights(mesh, keys)
+    weights[seam_vertices(mesh) | boundary_vertices(mesh)] = 1.0
+    return weights
+
+
+def _write_group(obj, weights):
+    """重みを段階ごとにまとめて一時的な頂点グループへ書き込む"""
+    group = obj.vertex_groups.new(name=PROTECT_GROUP)
+    levels = np.round(weights * WEIGHT_LEVELS).astype(np.int32)
+    for level in np.unique(levels):
+        if level == 0:
+            continue
+        group.add(np.flatnonzero(levels == level).tolist(), level / WEIGHT_LEVELS, 'REPLACE')
+    return group
+
+
+def decimate_object(obj, ratio, keys):
+    """1 オブジェクトの面数を ratio 倍にする。間引いた後の面数を返す"""
+    mesh = obj.data
+    if len(mesh.polygons) < MIN_FACES or ratio >= 1.0:
+        return len(mesh.polygons)
+
+    group = _write_group(obj, protect_weights(mesh, keys))
+    obj.vertex_groups.active_index = group.index
+    if mesh.shape_keys is not None:
+        # 基準形状を編集する（縮約で動いた分が他のキーにも相対的に反映される）
+        obj.active_shape_key_index = 0
+
+    bpy.ops.object.select_all(action='DESELECT')
+    obj.select_set(True)
+    bpy.context.view_layer.objects.active = obj
+    bpy.ops.object.mode_set(mode='EDIT')
+    try:
+        bpy.ops.mesh.select_all(action='SELECT')
+        # ウェイトが大きいほど縮約されにくくするため反転する
+        bpy.ops.mesh.decimate(ratio=ratio, use_vertex_group=True, vertex_group_factor=1.0,
+                              invert_vertex_group=True, use_symmetry=True, symmetry_axis='X')
+    finally:
+        bpy.ops.object.mode_set(mode='OBJECT')
+        obj.vertex_groups.remove(obj.vertex_groups[PROTECT_GROUP])
+    return len(mesh.polygons)
+
+
+def drop_shape_keys(obj, keep):
+    """keep(name) が偽のシェイプキーを削除し、削除した数を返す"""
+    if obj.data.shape_keys is None:
+        return 0
+    reference = obj.data.shape_keys.reference_key
+    removed = [kb for kb in obj.data.shape_keys.key_blocks if kb != reference and not keep(kb.name)]
+    for kb in removed:
+        obj.shape_key_remove(kb)
+    if len(obj.data.shape_keys.key_blocks) == 1:
+        # 基準形状だけになったらシェイプキー自体を消す
+        obj.shape_key_remove(reference)
+    return len(removed)
+
+
+def build_lod(ratio, lipsync_only=False):
+    """
+    シーンのメッシュを ratio 倍（直前の状態に対する割合）に間引く
+
+    lipsync_only なら先にリップシンク用以外のシェイプキーを削除する。
+    {'faces': (前, 後), 'removed_keys': n} を返す。
+    """
+    before = after = removed = 0
+    meshes = {}
+    for obj in bpy.context.scene.objects:
+        # 非表示のオブジェクトは編集モードに入れないため対象外
+        if obj.type == 'MESH' and obj.visible_get() and obj.data not in meshes:
+            meshes[obj.data] = obj
+    for obj in meshes.values():
+        if lipsync_only:
+            removed += drop_shape_keys(obj, is_lipsync_key)
+        keys = set(obj.data.shape_keys.key_blocks.keys()) if obj.data.shape_keys else set()
+        before += len(obj.data.polygons)
+        after += decimate_object(obj, ratio, keys)
+    return {'faces': (before, after), 'removed_keys': removed}
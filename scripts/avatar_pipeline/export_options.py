@@ -0,0 +1,144 @@
+"""
+glTF エクスポーターの既定オプション
+
+各エクスポートスクリプトで個別に指定していた設定をまとめたもの。
+マニフェストの "export" で上書きできる。
+"""
+
+
+def _merge(defaults, *overrides):
+    """defaults の写しに上書き用の辞書（None や空は無視）を順に重ねる"""
+    options = dict(defaults)
+    for override in overrides:
+        if override:
+            options.update(override)
+    return options
+
+
+DEFAULT_EXPORT_OPTIONS = {
+    'export_format': 'GLB',
+    'use_selection': False,
+    'export_apply': True,
+    'export_yup': True,
+    'export_texcoords': True,
+    'export_normals': True,
+    'export_tangents': True,
+    'export_colors': True,
+    'export_materials': 'EXPORT',
+    'export_image_format': 'AUTO',
+    'export_animations': True,
+    'export_morph': True,
+    'export_morph_normal': True,
+    'export_morph_tangent': False,
+    'export_skins': True,
+    'export_extras': True,
+    'export_cameras': False,
+    'export_lights': False,
+    'export_draco_mesh_compression_enable': False,
+    'export_optimize_animation_size': True,
+}
+
+# テクスチャ最適化（stages に optimize_textures を指定したときに使う）
+DEFAULT_TEXTURE_OPTIONS = {
+    # エクスポーターでの符号化形式: AUTO / WEBP / JPEG / KTX2（エクスポート後に toktx で変換）
+    'format': 'WEBP',
+    'quality': 85,
+    # KTX2（ETC1S）の品質 1〜255
+    'ktx2_quality': 128,
+    # 用途ごとの長辺の上限（ピクセル）
+    'max_size': {
+        'albedo': 2048,
+        'normal': 1024,
+        'roughness': 1024,
+        'metallic': 1024,
+        'occlusion': 1024,
+        'emission': 1024,
+        'other': 1024,
+    },
+    # アルファを使っていない画像のアルファを捨てる
+    'strip_alpha': True,
+}
+
+
+# 結合とアトラス化（stages に consolidate を指定したときに使う）
+DEFAULT_CONSOLIDATE_OPTIONS = {
+    # 同じ親・アーマチュアの静的なメッシュを結合する
+    'merge': True,
+    # 小さな画像・単色のマテリアルをアトラスにまとめる
+    'atlas': True,
+    # アトラスに入れる画像の長辺の上限（ピクセル）
+    'atlas_tile_max': 512,
+    # アトラス画像の幅（ピクセル）
+    'atlas_size': 2048,
+    # 単色マテリアルのタイルの大きさ（ピクセル）
+    'solid_tile': 8,
+    # タイルの周囲の余白（ピクセル）
+    'padding': 4,
+}
+
+
+# モーフターゲットの後処理（post_stages の prune_morph_normals などで使う）
+DEFAULT_MORPH_OPTIONS = {
+    # 向きの変化（度）がこれ未満のターゲットの NORMAL / TANGENT 差分を削除する
+    'normal_threshold': 1.0,
+    'tangent_threshold': 1.0,
+}
+
+
+def merge_morph_options(*overrides):
+    """既定のモーフオプションに上書き用の辞書を順に重ねる"""
+    return _merge(DEFAULT_MORPH_OPTIONS, *overrides)
+
+
+# アニメーションのキーフレーム削減（post_stages の simplify_animation で使う）
+DEFAULT_ANIMATION_OPTIONS = {
+    # チャンネルごとの許容誤差（元のキーの時刻で測る）
+    'translation_tolerance': 0.0001,  # m
+    'rotation_tolerance': 0.05,       # 度
+    'scale_tolerance': 0.001,
+    'weights_tolerance': 0.002,       # シェイプキーの値（0〜1）
+    # 候補にする補間（許容誤差に収まり最も小さいものを選ぶ）
+    'interpolations': ['LINEAR', 'STEP', 'CUBICSPLINE'],
+}
+
+
+def merge_animation_options(*overrides):
+    """既定のアニメーションオプションに上書き用の辞書を順に重ねる"""
+    return _merge(DEFAULT_ANIMATION_OPTIONS, *overrides)
+
+
+def merge_consolidate_options(*overrides):
+    """既定の結合オプションに上書き用の辞書を順に重ねる"""
+    return _merge(DEFAULT_CONSOLIDATE_OPTIONS, *overrides)
+
+
+def merge_texture_options(*overrides):
+    """既定のテクスチャオプションに上書き用の辞書を順に重ねる（max_size は用途ごとに統合）"""
+    options = dict(DEFAULT_TEXTURE_OPTIONS)
+    options['max_size'] = dict(DEFAULT_TEXTURE_OPTIONS['max_size'])
+    for override in overrides:
+        if not override:
+            continue
+        for key, value in override.items():
+            if key == 'max_size':
+                options['max_size'].update(value)
+            else:
+                options[key] = value
+    return options
+
+
+def texture_export_options(textures):
+    """テクスチャオプションをエクスポーターのオプションに変換"""
+    image_format = textures.get('format', 'AUTO')
+    if image_format == 'KTX2':
+        # toktx が読める形式で埋め込んでおき、エクスポート後に変換する
+        image_format = 'AUTO'
+    return {
+        'export_image_format': image_format,
+        'export_image_quality': textures.get('quality', 85),
+    }
+
+
+def merge_export_options(*overrides):
+    """既定オプションに上書き用の辞書を順に重ねる"""
+    return _merge(DEFAULT_EXPORT_OPTIONS, *overrides)
@@ -0,0 +1,336 @@
+"""
+GLB（バイナリglTF）の読み書き
+
+JSON チャンクは dict、BIN チャンクは bufferView ごとのバイト列として保持し、
+書き出し時に bufferView を詰め直して BIN を再構成する。bufferView の中身を
+差し替えたり追加したりしても、オフセットの整合は save() が取る。
+標準ライブラリだけで動くため、Blender 内でもホスト側でも使える。
+
+GLB.open() はファイルをメモリマップし（MappedFile）、bufferView をコピーせずに
+参照する。save() は bufferView を順に書き出すだけなので、BIN 全体を結合した
+バイト列は作らない（メモリに載るのは差し替えた bufferView だけ）。
+MappedFile は読み取り専用の glb_reader.MappedGLB も使う。
+"""
+import io
+import json
+import mmap
+import os
+import struct
+
+GLB_MAGIC = 0x46546C67  # 'glTF'
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+# bufferView の先頭をそろえる境界（accessor の要素型はすべて 4 バイト以下）
+VIEW_ALIGNMENT = 4
+
+
+class GLBError(Exception):
+    """GLB として読めないファイル"""
+
+
+def _pad(data, alignment, fill=b'\0'):
+    remainder = len(data) % alignment
+    return data if remainder == 0 else data + fill * (alignment - remainder)
+
+
+class MappedFile:
+    """
+    読み取り専用でメモリマップしたファイル（data は memoryview）
+
+    close() で閉じる。data から作ったビュー（スライスや NumPy 配列）が
+    残っているあいだは閉じられず、最後のビューが解放されたときに閉じる。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                # 空のファイルは mmap できない
+                raise GLBError(f"{path}: {e}") from e
+        self.data = memoryview(self._map)
+
+    @property
+    def closed(self):
+        return self._map is None
+
+    def close(self):
+        if self._map is None:
+            return
+        try:
+            self.data.release()
+            self._map.close()
+        except BufferError:
+            pass
+        self._map = self.data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_chunks(data):
+    """
+    GLB のバイト列（バッファプロトコルを持つもの）を JSON と BIN チャンクに分ける
+
+    BIN は data のスライスとして返すので、data がメモリマップならコピーされない。
+    """
+    if len(data) < 12:
+        raise GLBError("ファイルが短すぎます")
+    magic, version, length = struct.unpack_from('<III', data, 0)
+    if magic != GLB_MAGIC:
+        raise GLBError("GLB ではありません（マジックナンバー不一致）")
+    if version != 2:
+        raise GLBError(f"未対応の glTF バージョン: {version}")
+
+    gltf, binary = None, b''
+    offset = 12
+    while offset + 8 <= min(length, len(data)):
+        chunk_length, chunk_type = struct.unpack_from('<II', data, offset)
+        chunk = data[offset + 8:offset + 8 + chunk_length]
+        if chunk_type == CHUNK_JSON:
+            gltf = json.loads(bytes(chunk).decode('utf-8'))
+        elif chunk_type == CHUNK_BIN and not len(binary):
+            binary = chunk
+        offset += 8 + chunk_length
+    if gltf is None:
+        raise GLBError("JSON チャンクがありません")
+    return gltf, binary
+
+
+class GLB:
+    """GLB の JSON と bufferView データ"""
+
+    def __init__(self, gltf, views):
+        self.gltf = gltf
+        # views[i]: bufferViews[i] のバイト列（bytes または memoryview、
+        # GLB 埋め込みバッファ以外は None）
+        self.views = views
+        # open() で開いたときのメモリマップ
+        self._source = None
+
+    # --- 読み込み ---
+
+    @classmethod
+    def from_bytes(cls, data):
+        gltf, binary = read_chunks(data)
+        views = []
+        for view in gltf.get('bufferViews', []):
+            buffer = gltf['buffers'][view['buffer']]
+            if 'uri' in buffer:
+                views.append(None)
+                continue
+            start = view.get('byteOffset', 0)
+            views.append(binary[start:start + view['byteLength']])
+        return cls(gltf, views)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+    @classmethod
+    def open(cls, path):
+        """
+        メモリマップで開く（bufferView は読み取り専用の memoryview）
+
+        使い終わったら close() するか with 文で使う。
+        """
+        source = MappedFile(path)
+        try:
+            glb = cls.from_bytes(source.data)
+        except GLBError:
+            source.close()
+            raise
+        glb._source = source
+        return glb
+
+    def close(self):
+        """open() で開いたメモリマップを閉じる（以降は使えない）"""
+        source = getattr(self, '_source', None)
+        if source is None:
+            return
+        for data in self.views or []:
+            if isinstance(data, memoryview):
+                try:
+                    data.release()
+                except BufferError:
+                    pass
+        self.views = None
+        source.close()
+        self._source = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- bufferView ---
+
+    def view(self, index):
+        return self.views[index]
+
+    def set_view(self, index, data):
+        """bufferView の中身を差し替える（長さが変わってもよい）"""
+        self.views[index] = bytes(data)
+        self.gltf['bufferViews'][index]['byteLength'] = len(data)
+
+    def add_view(self, data, target=None, byte_stride=None):
+        """埋め込みバッファに bufferView を追加し、インデックスを返す"""
+        view = {'buffer': self._embedded_buffer(), 'byteOffset': 0, 'byteLength': len(data)}
+        if target is not None:
+            view['target'] = target
+        if byte_stride is not None:
+            view['byteStride'] = byte_stride
+        self.gltf.setdefault('bufferViews', []).append(view)
+        self.views.append(bytes(data))
+        return len(self.views) - 1
+
+    def _embedded_buffer(self):
+        buffers = self.gltf.setdefault('buffers', [])
+        for i, buffer in enumerate(buffers):
+            if 'uri' not in buffer:
+                return i
+        buffers.append({'byteLength': 0})
+        return len(buffers) - 1
+
+    # --- 拡張 ---
+
+    def use_extension(self, name, required=False):
+        used = self.gltf.setdefault('extensionsUsed', [])
+        if name not in used:
+            used.append(name)
+        if required:
+            req = self.gltf.setdefault('extensionsRequired', [])
+            if name not in req:
+                req.append(name)
+
+    # --- 未使用データの除去 ---
+
+    def _accessor_refs(self):
+        """アクセサーを参照している (dict, キー) の組"""
+        gltf = self.gltf
+        for mesh in gltf.get('meshes', []):
+            for primitive in mesh['primitives']:
+                yield from ((primitive['attributes'], key) for key in primitive['attributes'])
+                if 'indices' in primitive:
+                    yield primitive, 'indices'
+                for target in primitive.get('targets', []):
+                    yield from ((target, key) for key in target)
+        for animation in gltf.get('animations', []):
+            for sampler in animation['samplers']:
+                yield sampler, 'input'
+                yield sampler, 'output'
+        for skin in gltf.get('skins', []):
+            if 'inverseBindMatrices' in skin:
+                yield skin, 'inverseBindMatrices'
+        for node in gltf.get('nodes', []):
+            instancing = node.get('extensions', {}).get('EXT_mesh_gpu_instancing')
+            if instancing:
+                yield from ((instancing['attributes'], key) for key in instancing['attributes'])
+
+    def _view_refs(self, value=None):
+        """bufferView を参照している (dict, 'bufferView') の組（bufferViews 自体は除く）"""
+        if value is None:
+            value = {key: item for key, item in self.gltf.items() if key != 'bufferViews'}
+        if isinstance(value, dict):
+            if isinstance(value.get('bufferView'), int):
+                yield value, 'bufferView'
+            for item in value.values():
+                yield from self._view_refs(item)
+        elif isinstance(value, list):
+            for item in value:
+                yield from self._view_refs(item)
+
+    def compact(self):
+        """どこからも参照されていないアクセサーと bufferView を取り除き、番号を詰める"""
+        accessors = self.gltf.get('accessors', [])
+        refs = list(self._accessor_refs())
+        used = sorted({owner[key] for owner, key in refs})
+        remap = {old: new for new, old in enumerate(used)}
+        for owner, key in refs:
+            owner[key] = remap[owner[key]]
+        if accessors:
+            self.gltf['accessors'] = [accessors[i] for i in used]
+
+        refs = list(self._view_refs())
+        used = sorted({owner[key] for owner, key in refs if self.views[owner[key]] is not None}
+                      | {i for i, data in enumerate(self.views) if data is None})
+        remap = {old: new for new, old in enumerate(used)}
+        for owner, key in refs:
+            owner[key] = remap[owner[key]]
+        if self.views:
+            self.gltf['bufferViews'] = [self.gltf['bufferViews'][i] for i in used]
+            self.views = [self.views[i] for i in used]
+
+    # --- 書き出し ---
+
+    def _layout(self):
+        """bufferView のオフセットを決めて JSON に反映し、(JSON, BIN の長さ) を返す"""
+        offset = 0
+        embedded = None
+        for view, data in zip(self.gltf.get('bufferViews', []), self.views):
+            if data is None:
+                continue
+            embedded = view['buffer']
+            offset += (-offset) % VIEW_ALIGNMENT
+            view['byteOffset'] = offset
+            view['byteLength'] = len(data)
+            offset += len(data)
+        binary_length = offset + (-offset) % 4
+        if embedded is not None:
+            self.gltf['buffers'][embedded]['byteLength'] = binary_length
+        json_bytes = _pad(json.dumps(self.gltf, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 4, b' ')
+        return json_bytes, binary_length
+
+    def byte_length(self):
+        """書き出したときのファイルサイズ"""
+        json_bytes, binary_length = self._layout()
+        return 12 + 8 + len(json_bytes) + (8 + binary_length if binary_length else 0)
+
+    def write(self, f):
+        """ファイルオブジェクトへ先頭から順に書き出し、バイト数を返す"""
+        json_bytes, binary_length = self._layout()
+        total = 12 + 8 + len(json_bytes) + (8 + binary_length if binary_length else 0)
+        f.write(struct.pack('<III', GLB_MAGIC, 2, total))
+        f.write(struct.pack('<II', len(json_bytes), CHUNK_JSON))
+        f.write(json_bytes)
+        if binary_length:
+            f.write(struct.pack('<II', binary_length, CHUNK_BIN))
+            offset = 0
+            for view, data in zip(self.gltf['bufferViews'], self.views):
+                if data is None:
+                    continue
+                f.write(b'\0' * (view['byteOffset'] - offset))
+                f.write(data)
+                offset = view['byteOffset'] + len(data)
+            f.write(b'\0' * (binary_length - offset))
+        return total
+
+    def to_bytes(self):
+        """bufferView を詰め直して GLB のバイト列を作る"""
+        buffer = io.BytesIO()
+        self.write(buffer)
+        return buffer.getvalue()
+
+    def save(self, path):
+        """
+        path へ書き出す（一時ファイルに書いてから置き換えるので、
+        open() で開いた元のファイルへの上書きもできる）
+
+        元のファイルに上書きするときは、置き換える前にメモリマップを閉じる
+        （Windows では開いたままのファイルを置き換えられない）。以降この GLB は使えない。
+        """
+        tmp = f"{path}.tmp"
+        with open(tmp, 'wb') as f:
+            size = self.write(f)
+        source = self._source
+        if source is not None and os.path.exists(path) and os.path.samefile(source.path, path):
+            self.close()
+        os.replace(tmp, path)
+        return size
@@ -0,0 +1,385 @@
+"""
+メモリマップによる GLB の読み取り専用アクセス
+
+ファイル全体を glb.MappedFile でメモリマップし、JSON チャンクだけを解析する。アクセサー・
+メッシュ・モーフターゲット・スキンはすべて BIN チャンクを直接参照する
+NumPy 配列（読み取り専用、コピーなし）として返すため、数百 MB の GLB でも
+開くのは一瞬で、触れたデータだけがディスクから読まれる。Blender もブラウザも
+不要で、CI での解析（scripts/inspect_glb.py）に使う。
+
+    with MappedGLB.open('public/models/adult-male.glb') as glb:
+        for mesh in glb.meshes():
+            for primitive in mesh.primitives:
+                positions = primitive.attributes['POSITION']   # (N, 3) float32 のビュー
+                for name, target in zip(mesh.target_names, primitive.targets):
+                    delta = target['POSITION']
+
+疎アクセサーと bufferView のないアクセサーだけは実体化のためコピーになる。
+BIN チャンクにあたるのは buffers[0] だけで、それ以外のバッファを参照する
+bufferView と、頂点データを展開しないと読めない Draco / meshopt 圧縮を
+必須とするファイル（COMPRESSION_EXTENSIONS）は GLBError にする。
+整数のアクセサーは整数のまま返すので、必要なら Primitive.as_float() で戻す
+（normalized のものだけ型の最大値で割る）。KHR_mesh_quantization で量子化した
+メッシュは、元の座標に戻す変換がノード（スキンメッシュは inverseBindMatrices）に
+移されているので、POSITION が整数なら analyze() はノードのワールド変換
+（スキンメッシュはバインドポーズでの変換）を掛けたシーンの単位で大きさや変位を返す。
+"""
+import dataclasses
+
+import numpy as np
+
+from .accessors import COMPONENT_DTYPES, accessor_view, dequantize
+from .glb import GLBError, MappedFile, read_chunks
+
+# glTF の primitive.mode
+TRIANGLES, TRIANGLE_STRIP, TRIANGLE_FAN = 4, 5, 6
+
+# 展開しないと頂点データを読めない拡張（extensionsRequired にあれば読まない）
+COMPRESSION_EXTENSIONS = ('KHR_draco_mesh_compression', 'EXT_meshopt_compression')
+
+
+@dataclasses.dataclass
+class Primitive:
+    """メッシュのプリミティブ（配列はすべて BIN へのビュー）"""
+    attributes: dict
+    indices: np.ndarray = None
+    # targets[i]: {'POSITION': 差分, 'NORMAL': ...}
+    targets: list = dataclasses.field(default_factory=list)
+    material: int = None
+    mode: int = TRIANGLES
+    # normalized のアクセサー（属性は属性名、ターゲットは (番号, 属性名)）と成分型
+    normalized: dict = dataclasses.field(default_factory=dict)
+
+    def as_float(self, name, target=None):
+        """属性（target を渡せばモーフターゲットの差分）を浮動小数点で返す"""
+        values = self.attributes[name] if target is None else self.targets[target][name]
+        key = name if target is None else (target, name)
+        return as_float(values, self.normalized.get(key))
+
+    @property
+    def vertex_count(self):
+        return len(self.attributes['POSITION'])
+
+    @property
+    def triangle_count(self):
+        count = len(self.indices) if self.indices is not None else self.vertex_count
+        if self.mode == TRIANGLES:
+            return count // 3
+        if self.mode in (TRIANGLE_STRIP, TRIANGLE_FAN):
+            return max(count - 2, 0)
+        return 0
+
+
+@dataclasses.dataclass
+class Mesh:
+    index: int
+    name: str
+    primitives: list
+    # モーフターゲットの名前（extras.targetNames、なければ番号）
+    target_names: list
+    # weights の既定値
+    weights: list
+
+
+@dataclasses.dataclass
+class Skin:
+    index: int
+    name: str
+    # joints[i]: ジョイントのノード番号
+    joints: list
+    joint_names: list
+    # (ジョイント数, 4, 4)、列優先で格納されているので行列として使うときは転置する
+    inverse_bind_matrices: np.ndarray = None
+
+
+class MappedGLB:
+    """メモリマップした GLB（accessors の関数には glb.GLB と同じように渡せる）"""
+
+    def __init__(self, data, path=None, source=None):
+        self.path = path
+        self.data = data
+        self.gltf, self.binary = read_chunks(data)
+        self._source = source
+        compressed = [e for e in self.gltf.get('extensionsRequired', []) if e in COMPRESSION_EXTENSIONS]
+        if compressed:
+            raise GLBError(f"圧縮された GLB には未対応です（{', '.join(compressed)}）")
+
+    @classmethod
+    def open(cls, path):
+        source = MappedFile(path)
+        try:
+            return cls(np.frombuffer(source.data, dtype=np.uint8), path, source)
+        except Exception:
+            source.close()
+            raise
+
+    def close(self):
+        """メモリマップを閉じる（返した配列が残っていればそれが解放されるまで保持される）"""
+        self.data = self.binary = None
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- bufferView とアクセサー ---
+
+    def view(self, index):
+        """bufferView のバイト列（BIN チャンクへのビュー）"""
+        view = self.gltf['bufferViews'][index]
+        if view['buffer'] != 0 or 'uri' in self.gltf['buffers'][0]:
+            raise GLBError(f"bufferView {index} は BIN チャンク以外のバッファを参照しています")
+        start = view.get('byteOffset', 0)
+        end = start + view['byteLength']
+        if end > len(self.binary):
+            raise GLBError(f"bufferView {index} が BIN チャンクの範囲外です")
+        return self.binary[start:end]
+
+    def accessor(self, index):
+        """アクセサーを (count, 成分数) のビューで返す"""
+        return accessor_view(self, index)
+
+    # --- メッシュ・スキン ---
+
+    def _primitive(self, primitive):
+        accessors = self.gltf.get('accessors', [])
+        attributes = {name: self.accessor(index) for name, index in primitive['attributes'].items()}
+        indices = self.accessor(primitive['indices'])[:, 0] if 'indices' in primitive else None
+        targets = [{name: self.accessor(index) for name, index in target.items()}
+                   for target in primitive.get('targets', [])]
+        normalized = {name: accessors[index]['componentType'] for name, index in primitive['attributes'].items()
+                      if accessors[index].get('normalized')}
+        normalized.update({(t, name): accessors[index]['componentType']
+                           for t, target in enumerate(primitive.get('targets', []))
+                           for name, index in target.items() if accessors[index].get('normalized')})
+        return Primitive(attributes, indices, targets, primitive.get('material'),
+                         primitive.get('mode', TRIANGLES), normalized)
+
+    def mesh(self, index):
+        mesh = self.gltf['meshes'][index]
+        primitives = [self._primitive(p) for p in mesh.get('primitives', [])]
+        count = max((len(p.targets) for p in primitives), default=0)
+        names = list(mesh.get('extras', {}).get('targetNames', []))[:count]
+        names += [str(i) for i in range(len(names), count)]
+        weights = list(mesh.get('weights', [0.0] * count))
+        return Mesh(index, mesh.get('name', f"mesh{index}"), primitives, names, weights)
+
+    def meshes(self):
+        return [self.mesh(i) for i in range(len(self.gltf.get('meshes', [])))]
+
+    def skin(self, index):
+        skin = self.gltf['skins'][index]
+        nodes = self.gltf.get('nodes', [])
+        joints = list(skin.get('joints', []))
+        matrices = None
+        if 'inverseBindMatrices' in skin:
+            matrices = self.accessor(skin['inverseBindMatrices']).reshape(-1, 4, 4)
+        return Skin(index, skin.get('name', f"skin{index}"), joints,
+                    [nodes[j].get('name', f"node{j}") for j in joints], matrices)
+
+    def skins(self):
+        return [self.skin(i) for i in range(len(self.gltf.get('skins', [])))]
+
+    def world_matrices(self):
+        """ノードごとのワールド変換（4x4、行優先）"""
+        return world_matrices(self.gltf)
+
+    def mesh_transform(self, index, matrices=None):
+        """
+        メッシュの座標をシーンの座標に移す変換（4x4、行優先）
+
+        スキンメッシュはバインドポーズでの変換（最初のジョイントのワールド変換・
+        inverseBindMatrix）。どのノードからも使われていなければ None。
+        """
+        nodes = self.mesh_nodes().get(index)
+        if not nodes:
+            return None
+        matrices = matrices if matrices is not None else self.world_matrices()
+        node = nodes[0]
+        if node['skin'] is None:
+            return matrices[node['node']]
+        skin = self.skin(node['skin'])
+        if not skin.joints:
+            return matrices[node['node']]
+        ibm = np.eye(4) if skin.inverse_bind_matrices is None else skin.inverse_bind_matrices[0].T
+        return matrices[skin.joints[0]] @ ibm
+
+    def mesh_nodes(self):
+        """メッシュ番号 → それを使うノード（スキンの有無を含む）のリスト"""
+        result = {}
+        for i, node in enumerate(self.gltf.get('nodes', [])):
+            if 'mesh' in node:
+                result.setdefault(node['mesh'], []).append({'node': i, 'name': node.get('name', ''),
+                                                            'skin': node.get('skin')})
+        return result
+
+
+# --- ノードの変換 ---
+
+def _quaternion_matrix(quaternion):
+    x, y, z, w = quaternion
+    return np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+    ])
+
+
+def node_matrix(node):
+    """ノードのローカル変換（4x4、行優先）"""
+    if 'matrix' in node:
+        return np.asarray(node['matrix'], dtype=np.float64).reshape(4, 4).T
+    matrix = np.eye(4)
+    matrix[:3, :3] = _quaternion_matrix(node.get('rotation', [0.0, 0.0, 0.0, 1.0])) * node.get('scale', [1.0, 1.0, 1.0])
+    matrix[:3, 3] = node.get('translation', [0.0, 0.0, 0.0])
+    return matrix
+
+
+def world_matrices(gltf):
+    """ノードごとのワールド変換（4x4、行優先）のリスト"""
+    nodes = gltf.get('nodes', [])
+    parents = {child: i for i, node in enumerate(nodes) for child in node.get('children', [])}
+    matrices = [None] * len(nodes)
+
+    def world(index):
+        if matrices[index] is None:
+            local = node_matrix(nodes[index])
+            parent = parents.get(index)
+            matrices[index] = local if parent is None else world(parent) @ local
+        return matrices[index]
+
+    for index in range(len(nodes)):
+        world(index)
+    return matrices
+
+
+def linear_scale(matrix):
+    """変換の 3x3 部分が長さを何倍にするか（最大）"""
+    return float(np.linalg.norm(matrix[:3, :3], axis=0).max())
+
+
+# --- 解析 ---
+
+def as_float(values, component_type=None):
+    """
+    整数の配列を浮動小数点に戻す
+
+    component_type（normalized のアクセサーの成分型）を渡したときだけ型の最大値で
+    割る。normalized でない整数（gltfpack の出力など）は値をそのまま使い、
+    元の単位に戻す倍率はノードの変換に任せる。
+    """
+    if values.dtype.kind not in 'iu':
+        return values
+    if component_type is not None:
+        return dequantize(values, component_type)
+    return values.astype(np.float32)
+
+
+def position_bounds(primitives, transform=None):
+    """POSITION の配列（transform があれば変換後）から求めた min / max"""
+    lows, highs = [], []
+    for primitive in primitives:
+        positions = primitive.as_float('POSITION')
+        if transform is not None:
+            positions = positions @ transform[:3, :3].T.astype(np.float32) + transform[:3, 3].astype(np.float32)
+        if len(positions):
+            lows.append(positions.min(axis=0))
+            highs.append(positions.max(axis=0))
+    if not lows:
+        return None
+    return np.min(lows, axis=0), np.max(highs, axis=0)
+
+
+def morph_stats(mesh, threshold=1e-6, transform=None):
+    """
+    モーフターゲットごとの最大変位と、threshold を超えて動く頂点数
+
+    transform があれば差分にその 3x3 部分を掛けてから測る。
+    """
+    stats = {}
+    for t, name in enumerate(mesh.target_names):
+        peak, affected = 0.0, 0
+        for primitive in mesh.primitives:
+            if t >= len(primitive.targets) or 'POSITION' not in primitive.targets[t]:
+                continue
+            delta = primitive.as_float('POSITION', t)
+            if not len(delta):
+                continue
+            if transform is not None:
+                delta = delta @ transform[:3, :3].T.astype(np.float32)
+            # float32 のまま 2 乗和を取る（float64 への変換コピーを避ける）
+            length = np.sqrt(np.einsum('ij,ij->i', delta, delta, dtype=np.float32))
+            peak = max(peak, float(length.max()))
+            affected += int(np.count_nonzero(length > threshold))
+        stats[name] = {'maxDisplacement': peak, 'affectedVertices': affected}
+    return stats
+
+
+def _vec(values):
+    return dict(zip('xyz', (float(v) for v in values)))
+
+
+def analyze(glb, with_morph_stats=True):
+    """
+    GLB の概要（app/api/analyze-avatar・scripts/analyze-shape-keys.js の出力と同じ形）
+
+    {'meshes': [{'name', 'type', 'shapeKeys', 'vertexCount', 'faceCount', 'hasSkeleton',
+                 'boundingBox'}], 'skins': [...], 'summary': {...}}
+    """
+    nodes = glb.mesh_nodes()
+    matrices = None
+    meshes, all_keys = [], set()
+    for mesh in glb.meshes():
+        skinned = any(node['skin'] is not None for node in nodes.get(mesh.index, []))
+        info = {
+            'name': mesh.name,
+            'type': 'SkinnedMesh' if skinned else 'Mesh',
+            'shapeKeys': list(mesh.target_names),
+            'vertexCount': sum(p.vertex_count for p in mesh.primitives),
+            'faceCount': sum(p.triangle_count for p in mesh.primitives),
+            'hasSkeleton': skinned,
+            'primitives': len(mesh.primitives),
+        }
+        accessors = glb.gltf.get('accessors', [])
+        declared = [accessors[p['attributes']['POSITION']]
+                    for p in glb.gltf['meshes'][mesh.index].get('primitives', [])]
+        # 整数の POSITION（normalized の有無によらない）は元の座標に戻す変換がノード側に
+        # あるので、シーンの座標で測る。宣言された min / max も量子化後の値なので使わない
+        quantized = any(COMPONENT_DTYPES[a['componentType']].kind in 'iu' for a in declared)
+        transform = None
+        if quantized:
+            info['quantized'] = True
+            if matrices is None:
+                matrices = glb.world_matrices()
+            transform = glb.mesh_transform(mesh.index, matrices)
+        if declared and not quantized and all('min' in a and 'max' in a for a in declared):
+            bounds = (np.min([a['min'] for a in declared], axis=0), np.max([a['max'] for a in declared], axis=0))
+        else:
+            bounds = position_bounds(mesh.primitives, transform)
+        if bounds is not None:
+            low, high = bounds
+            info['boundingBox'] = {'min': _vec(low), 'max': _vec(high),
+                                   'center': _vec((low + high) / 2), 'size': _vec(high - low)}
+        if with_morph_stats and mesh.target_names:
+            info['morphStats'] = morph_stats(mesh, transform=transform)
+        all_keys.update(mesh.target_names)
+        meshes.append(info)
+
+    skins = [{'name': skin.name, 'joints': skin.joint_names} for skin in glb.skins()]
+    return {
+        'meshes': meshes,
+        'skins': skins,
+        'allShapeKeys': sorted(all_keys),
+        'summary': {
+            'totalMeshes': len(meshes),
+            'meshesWithShapeKeys': sum(bool(m['shapeKeys']) for m in meshes),
+            'totalUniqueShapeKeys': len(all_keys),
+            'totalVertices': sum(m['vertexCount'] for m in meshes),
+            'totalFaces': sum(m['faceCount'] for m in meshes),
+            'totalJoints': sum(len(s['joints']) for s in skins),
+        },
+    }
@@ -0,0 +1,125 @@
+"""
+GLB に埋め込まれた画像を KTX2（Basis Universal）へ変換
+
+KTX-Software の toktx を画像ごとに並列で呼び出し、テクスチャを
+KHR_texture_basisu 拡張で参照するように書き換える。用途はマテリアルの
+スロットから判定し、カラー（アルベド・発光）は ETC1S + sRGB、
+法線は UASTC の法線モード、それ以外のデータは UASTC + リニアで符号化する。
+ブラウザ側では three.js の KTX2Loader を GLTFLoader に設定しておくこと。
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from .glb import GLB
+
+EXTENSION = 'KHR_texture_basisu'
+
+MIME_EXTENSIONS = {'image/png': '.png', 'image/jpeg': '.jpg'}
+
+
+class KTX2Error(Exception):
+    """toktx が見つからない・変換に失敗した"""
+
+
+def _texture_slots(material):
+    """マテリアルのテクスチャ参照と用途"""
+    pbr = material.get('pbrMetallicRoughness', {})
+    slots = [
+        (pbr.get('baseColorTexture'), 'color'),
+        (material.get('emissiveTexture'), 'color'),
+        (material.get('normalTexture'), 'normal'),
+        (pbr.get('metallicRoughnessTexture'), 'data'),
+        (material.get('occlusionTexture'), 'data'),
+    ]
+    return [(ref['index'], kind) for ref, kind in slots if ref]
+
+
+def image_kinds(gltf):
+    """画像インデックス → 用途（color / normal / data）"""
+    kinds = {}
+    textures = gltf.get('textures', [])
+    for material in gltf.get('materials', []):
+        for texture_index, kind in _texture_slots(material):
+            source = textures[texture_index].get('source')
+            if source is None:
+                continue
+            # カラーとして使う画像は sRGB を優先する
+            if kinds.get(source) != 'color':
+                kinds[source] = kind
+    return kinds
+
+
+def toktx_args(kind, quality):
+    if kind == 'color':
+        return ['--encode', 'etc1s', '--clevel', '2', '--qlevel', str(quality),
+                '--assign_oetf', 'srgb']
+    args = ['--encode', 'uastc', '--uastc_quality', '2', '--zcmp', '18',
+            '--assign_oetf', 'linear']
+    if kind == 'normal':
+        args.append('--normal_mode')
+    return args
+
+
+def _encode(toktx, data, suffix, kind, quality):
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'in' + suffix)
+        dst = os.path.join(tmp, 'out.ktx2')
+        with open(src, 'wb') as f:
+            f.write(data)
+        cmd = [toktx, '--t2', '--genmipmap'] + toktx_args(kind, quality) + [dst, src]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise KTX2Error(f"toktx が失敗しました: {proc.stderr.strip()}")
+        with open(dst, 'rb') as f:
+            return f.read()
+
+
+def compress_textures(glb, quality=128, toktx='toktx', workers=None):
+    """
+    GLB の PNG / JPEG 画像を KTX2 に置き換える
+
+    戻り値: (変換前の画像合計バイト数, 変換後の合計バイト数)
+    """
+    toktx = shutil.which(toktx) or toktx
+    if not os.path.exists(toktx):
+        raise KTX2Error("toktx が見つかりません（KTX-Software をインストールしてください）")
+
+    gltf = glb.gltf
+    kinds = image_kinds(gltf)
+    targets = [(i, image) for i, image in enumerate(gltf.get('images', []))
+               if 'bufferView' in image and image.get('mimeType') in MIME_EXTENSIONS]
+    if not targets:
+        return 0, 0
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(_encode, toktx, glb.view(image['bufferView']),
+                               MIME_EXTENSIONS[image['mimeType']], kinds.get(i, 'color'), quality)
+                   for i, image in targets]
+        encoded = [future.result() for future in futures]
+
+    before = after = 0
+    for (i, image), data in zip(targets, encoded):
+        before += len(glb.view(image['bufferView']))
+        after += len(data)
+        glb.set_view(image['bufferView'], data)
+        image['mimeType'] = 'image/ktx2'
+
+    # テクスチャの参照を拡張へ移す（フォールバック画像は持たない）
+    converted = {i for i, _ in targets}
+    for texture in gltf.get('textures', []):
+        if texture.get('source') in converted:
+            texture.setdefault('extensions', {})[EXTENSION] = {'source': texture.pop('source')}
+    glb.use_extension(EXTENSION, required=True)
+    return before, after
+
+
+def compress_glb_textures(path, quality=128, toktx='toktx', workers=None):
+    """GLB ファイルの画像を KTX2 に置き換えて上書き保存"""
+    with GLB.open(path) as glb:
+        before, after = compress_textures(glb, quality, toktx, workers)
+        if before:
+            glb.save(path)
+    return before, after
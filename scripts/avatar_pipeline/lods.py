@@ -0,0 +1,153 @@
+"""
+LOD（詳細度）レベルの設定とフロントエンド用の索引
+
+マニフェストの "lods" に LOD1 以降のレベルを並べると、ワーカーは通常の GLB
+（LOD0）をエクスポートしたあと、メッシュを段階的に間引いて
+`<出力名>.lod1.glb`、`<出力名>.lod2.glb` ... を書き出す（decimate.py）。
+
+    "lods": [
+      {"ratio": 0.5},
+      {"ratio": 0.2, "lipsync_only": true, "export": {"export_morph_normal": false}}
+    ]
+
+- ratio: LOD0 に対する面数の割合（レベルが上がるほど小さく）
+- lipsync_only: リップシンク用以外のシェイプキーを削除する
+- export: そのレベルだけのエクスポートオプションの上書き
+
+変換後、各 GLB の JSON から三角形数・頂点数・モーフターゲット数を数えて
+索引（既定: 出力先の lods.json）を書き出す。フロントエンドはこれを見て
+端末に合うレベルを選ぶ（lib/modelLods.ts）。
+"""
+import json
+import os
+
+from .glb import GLBError, MappedFile, read_chunks
+from .glb_reader import TRIANGLE_FAN, TRIANGLE_STRIP, TRIANGLES
+
+LOD_INDEX_VERSION = 1
+DEFAULT_INDEX_NAME = 'lods.json'
+
+
+class LODError(Exception):
+    """LOD の設定の誤り"""
+
+
+def lod_path(output, level):
+    """LOD level の出力パス（LOD0 は output そのもの）"""
+    if level == 0:
+        return output
+    stem, ext = os.path.splitext(output)
+    return f"{stem}.lod{level}{ext or '.glb'}"
+
+
+def parse_levels(levels, output):
+    """マニフェストの "lods" を検証し、level と output を補ったリストにする"""
+    result = []
+    previous = 1.0
+    for level, entry in enumerate(levels or [], start=1):
+        if isinstance(entry, (int, float)):
+            entry = {'ratio': entry}
+        unknown = set(entry) - {'ratio', 'lipsync_only', 'export'}
+        if unknown:
+            raise LODError(f"LOD{level}: 未知の項目 {', '.join(sorted(unknown))}")
+        ratio = float(entry.get('ratio', 0))
+        if not 0.0 < ratio < previous:
+            raise LODError(f"LOD{level}: ratio は前のレベル（{previous}）より小さい正の値にしてください: {ratio}")
+        previous = ratio
+        result.append({
+            'level': level,
+            'ratio': ratio,
+            'lipsync_only': bool(entry.get('lipsync_only', False)),
+            'export': dict(entry.get('export', {})),
+            'output': lod_path(output, level),
+        })
+    return result
+
+
+# --- 索引 ---
+
+def _triangles(gltf, primitive):
+    mode = primitive.get('mode', TRIANGLES)
+    accessors = gltf.get('accessors', [])
+    if 'indices' in primitive:
+        count = accessors[primitive['indices']]['count']
+    else:
+        count = accessors[primitive['attributes']['POSITION']]['count']
+    if mode == TRIANGLES:
+        return count // 3
+    if mode in (TRIANGLE_STRIP, TRIANGLE_FAN):
+        return max(count - 2, 0)
+    return 0
+
+
+def glb_stats(path):
+    """GLB の三角形数・頂点数・プリミティブ数・モーフターゲット数（名前の種類）・バイト数"""
+    # JSON だけを読む（BIN はメモリマップのまま触らないので、圧縮した GLB でもよい）
+    with MappedFile(path) as source:
+        gltf = read_chunks(source.data)[0]
+    accessors = gltf.get('accessors', [])
+    triangles = vertices = primitives = 0
+    targets = set()
+    for index, mesh in enumerate(gltf.get('meshes', [])):
+        count = 0
+        for primitive in mesh.get('primitives', []):
+            primitives += 1
+            triangles += _triangles(gltf, primitive)
+            vertices += accessors[primitive['attributes']['POSITION']]['count']
+            count = max(count, len(primitive.get('targets', [])))
+        # 名前のないターゲットはメッシュごとに別物として数える
+        names = mesh.get('extras', {}).get('targetNames', [])
+        targets.update(names[i] if i < len(names) else (index, i) for i in range(count))
+    return {
+        'triangles': triangles,
+        'vertices': vertices,
+        'primitives': primitives,
+        'morphTargets': len(targets),
+        'bytes': os.path.getsize(path),
+    }
+
+
+def lod_entries(job):
+    """ジョブの全レベル（LOD0 を含む）の索引エントリ。存在しないファイルは除く"""
+    levels = [{'level': 0, 'ratio': 1.0, 'lipsync_only': False, 'output': job.output}] + list(job.lods)
+    base_dir = os.path.dirname(job.output)
+    entries = []
+    for level in levels:
+        if not os.path.exists(level['output']):
+            continue
+        try:
+            stats = glb_stats(level['output'])
+        except (OSError, GLBError, KeyError, IndexError) as e:
+            raise LODError(f"{level['output']} を読めません: {e}") from e
+        entries.append({
+            'level': level['level'],
+            'file': os.path.relpath(level['output'], base_dir).replace(os.sep, '/'),
+            'ratio': level['ratio'],
+            'lipsyncOnly': level['lipsync_only'],
+            **stats,
+        })
+    return entries
+
+
+def write_lod_index(jobs, path):
+    """
+    LOD の索引を書き出す（既存の索引にあるほかのアバターは残す）
+
+    {"version": 1, "avatars": {"boy": {"levels": [{"level": 0, "file": "boy-avatar.glb",
+     "triangles": ..., "morphTargets": ..., "bytes": ...}, ...]}}}
+    """
+    index = {'version': LOD_INDEX_VERSION, 'avatars': {}}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            existing = json.load(f)
+        if existing.get('version') == LOD_INDEX_VERSION:
+            index = existing
+    for job in jobs:
+        entries = lod_entries(job)
+        if entries:
+            index['avatars'][job.name] = {'levels': entries}
+    index['avatars'] = dict(sorted(index['avatars'].items()))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    return index
@@ -0,0 +1,162 @@
+"""
+変換マニフェストの読み込み
+
+マニフェストは JSON で、アセットごとに入力・出力・前処理ステージを指定する。
+パス中の環境変数（${AVATAR_SOURCE_DIR} など）は展開され、相対パスは
+source_dir / output_dir（さらにその基準はマニフェストのあるディレクトリ）
+から解決される。
+
+    {
+      "source_dir": "${AVATAR_SOURCE_DIR}",
+      "output_dir": "../public/models",
+      "export": {"export_morph_tangent": false},
+      "textures": {"format": "WEBP", "max_size": {"albedo": 2048}},
+      "compression": "draco",
+      "assets": [
+        {"name": "adult-male", "input": "Man_Grey_Suit_01_Blender.Fbx",
+         "output": "adult-male.glb", "import_scale": 0.01,
+         "stages": ["placeholder_shape_keys", "optimize_textures"],
+         "post_stages": ["sparse_morphs"],
+         "lods": [{"ratio": 0.5}, {"ratio": 0.2, "lipsync_only": true}]}
+      ]
+    }
+"""
+import json
+import os
+from dataclasses import dataclass, field
+
+from .compression import CompressionError, merge_compression_options
+from .export_options import (merge_animation_options, merge_consolidate_options, merge_export_options,
+                             merge_morph_options, merge_texture_options)
+from .lods import DEFAULT_INDEX_NAME, LODError, parse_levels
+
+SUPPORTED_INPUTS = ('.blend', '.fbx', '.glb', '.gltf', '.obj')
+
+
+class ManifestError(Exception):
+    """マニフェストの記述ミス"""
+
+
+@dataclass
+class Job:
+    """1アセット分の変換ジョブ（ワーカーへ JSON で渡す）"""
+    name: str
+    input: str
+    output: str
+    import_scale: float = 1.0
+    stages: list = field(default_factory=list)
+    # エクスポート後に GLB を書き換える処理
+    post_stages: list = field(default_factory=list)
+    export: dict = field(default_factory=dict)
+    textures: dict = field(default_factory=dict)
+    compression: dict = field(default_factory=dict)
+    # consolidate ステージのオプション
+    consolidate: dict = field(default_factory=dict)
+    # モーフターゲットの後処理（post_stages）のオプション
+    morphs: dict = field(default_factory=dict)
+    # キーフレーム削減（post_stages の simplify_animation）のオプション
+    animation: dict = field(default_factory=dict)
+    # dedup_textures ステージが読むテクスチャ索引（scripts/dedup_textures.py で作る）
+    texture_index: str = ''
+    # LOD1 以降のレベル（lods.parse_levels の結果）と、フロントエンド用の索引
+    lods: list = field(default_factory=list)
+    lod_index: str = ''
+    # キャッシュ用: 前処理済み .blend の読み込み元 / 保存先
+    checkpoint_in: str = ''
+    checkpoint_out: str = ''
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'input': self.input,
+            'output': self.output,
+            'import_scale': self.import_scale,
+            'stages': list(self.stages),
+            'post_stages': list(self.post_stages),
+            'export': dict(self.export),
+            'textures': dict(self.textures),
+            'compression': dict(self.compression),
+            'consolidate': dict(self.consolidate),
+            'morphs': dict(self.morphs),
+            'animation': dict(self.animation),
+            'texture_index': self.texture_index,
+            'lods': [dict(level) for level in self.lods],
+            'lod_index': self.lod_index,
+            'checkpoint_in': self.checkpoint_in,
+            'checkpoint_out': self.checkpoint_out,
+        }
+
+
+def resolve_path(path, base_dir):
+    path = os.path.expanduser(os.path.expandvars(path))
+    if '$' in path:
+        raise ManifestError(f"未定義の環境変数を含むパス: {path}")
+    if not os.path.isabs(path):
+        path = os.path.join(base_dir, path)
+    return os.path.normpath(path)
+
+
+def load_manifest(path):
+    """マニフェストを読み込み、Job のリストを返す"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    manifest_dir = os.path.dirname(os.path.abspath(path))
+    source_dir = resolve_path(data.get('source_dir', '.'), manifest_dir)
+    output_dir = resolve_path(data.get('output_dir', '.'), manifest_dir)
+    defaults = data.get('defaults', {})
+    texture_index = resolve_path(data['texture_index'], manifest_dir) if data.get('texture_index') else ''
+    lod_index = resolve_path(data.get('lod_index', DEFAULT_INDEX_NAME), output_dir)
+
+    jobs = []
+    names = set()
+    for entry in data.get('assets', []):
+        entry = {**defaults, **entry}
+        name = entry.get('name')
+        if not name or 'input' not in entry:
+            raise ManifestError(f"name と input は必須です: {entry}")
+        if name in names:
+            raise ManifestError(f"アセット名が重複しています: {name}")
+        names.add(name)
+
+        input_path = resolve_path(entry['input'], source_dir)
+        if not input_path.lower().endswith(SUPPORTED_INPUTS):
+            raise ManifestError(f"未対応の入力形式: {input_path}")
+        output_path = resolve_path(entry.get('output', f"{name}.glb"), output_dir)
+        try:
+            geometry = merge_compression_options(data.get('compression'), entry.get('compression'))
+        except CompressionError as e:
+            raise ManifestError(f"{name}: {e}") from e
+        try:
+            lods = parse_levels(entry.get('lods', data.get('lods')), output_path)
+        except LODError as e:
+            raise ManifestError(f"{name}: {e}") from e
+
+        jobs.append(Job(
+            name=name,
+            input=input_path,
+            output=output_path,
+            import_scale=float(entry.get('import_scale', 1.0)),
+            stages=list(entry.get('stages', [])),
+            post_stages=list(entry.get('post_stages', [])),
+            export=merge_export_options(data.get('export'), entry.get('export')),
+            textures=merge_texture_options(data.get('textures'), entry.get('textures')),
+            compression=geometry,
+            consolidate=merge_consolidate_options(data.get('consolidate'), entry.get('consolidate')),
+            morphs=merge_morph_options(data.get('morphs'), entry.get('morphs')),
+            animation=merge_animation_options(data.get('animation'), entry.get('animation')),
+            texture_index=texture_index,
+            lods=lods,
+            lod_index=lod_index if lods else '',
+        ))
+    return jobs
+
+
+def select_jobs(jobs, names):
+    """名前で絞り込む（names が空なら全件）"""
+    if not names:
+        return jobs
+    unknown = set(names) - {job.name for job in jobs}
+    if unknown:
+        raise ManifestError(f"マニフェストにないアセット: {', '.join(sorted(unknown))}")
+    return [job for job in jobs if job.name in names]
@@ -0,0 +1,232 @@
+"""
+モーフターゲットの疎アクセサー化（エクスポート後に GLB を書き換える）
+
+glTF のモーフターゲットは全頂点分の差分を持つが、口まわりのシェイプキーが
+動かすのは数百頂点だけで、プレースホルダーのように何も動かさないものもある。
+
+- すべてのプリミティブで差分がゼロのターゲットは削除する
+  （mesh.weights、extras.targetNames、ノードの weights、weights アニメーションも詰める）
+- 残ったターゲットは、疎アクセサーの方が小さくなるものだけ sparse に書き換える
+
+prune_normals() は、ターゲットごとに法線・接線の向きの変化（角度）を測り、
+閾値より小さいターゲットの NORMAL / TANGENT 差分を削除する。口まわりの
+小さな動きでは法線はほとんど変わらず、位置の差分の 2〜3 倍のデータが
+陰影にほぼ影響しないまま残っているため。
+"""
+import os
+
+import numpy as np
+
+from .accessors import (ARRAY_BUFFER, COMPONENT_DTYPES, TYPE_SIZES, read_accessor, sparse_size,
+                        write_accessor, write_sparse)
+from .glb import GLB
+
+
+def _target_is_zero(glb, primitives, index):
+    for primitive in primitives:
+        for accessor in primitive['targets'][index].values():
+            if np.any(read_accessor(glb, accessor, raw=True)):
+                return False
+    return True
+
+
+def _weights_samplers(gltf, mesh_index):
+    """mesh_index のメッシュを持つノードの weights アニメーションのサンプラー"""
+    nodes = {i for i, node in enumerate(gltf.get('nodes', [])) if node.get('mesh') == mesh_index}
+    for animation in gltf.get('animations', []):
+        for channel in animation['channels']:
+            target = channel['target']
+            if target.get('path') == 'weights' and target.get('node') in nodes:
+                yield animation['samplers'][channel['sampler']]
+
+
+def _remove_weights_channels(gltf, mesh_index):
+    """ターゲットがなくなったメッシュの weights アニメーションを削除する"""
+    nodes = {i for i, node in enumerate(gltf.get('nodes', [])) if node.get('mesh') == mesh_index}
+    animations = []
+    for animation in gltf.get('animations', []):
+        channels = [c for c in animation['channels']
+                    if not (c['target'].get('path') == 'weights' and c['target'].get('node') in nodes)]
+        used = sorted({c['sampler'] for c in channels})
+        remap = {old: new for new, old in enumerate(used)}
+        for channel in channels:
+            channel['sampler'] = remap[channel['sampler']]
+        animation['channels'] = channels
+        animation['samplers'] = [animation['samplers'][i] for i in used]
+        if channels:
+            animations.append(animation)
+    if 'animations' in gltf:
+        gltf['animations'] = animations
+
+
+def remove_targets(glb, mesh_index, keep):
+    """keep（残すターゲットの番号）以外のモーフターゲットを削除する"""
+    gltf = glb.gltf
+    mesh = gltf['meshes'][mesh_index]
+    count = len(mesh['primitives'][0].get('targets', []))
+    for primitive in mesh['primitives']:
+        primitive['targets'] = [primitive['targets'][i] for i in keep]
+        if not primitive['targets']:
+            del primitive['targets']
+    for owner in [mesh] + [node for node in gltf.get('nodes', []) if node.get('mesh') == mesh_index]:
+        if 'weights' in owner:
+            owner['weights'] = [owner['weights'][i] for i in keep]
+            if not keep:
+                del owner['weights']
+    names = mesh.get('extras', {}).get('targetNames')
+    if names:
+        mesh['extras']['targetNames'] = [names[i] for i in keep]
+
+    if not keep:
+        _remove_weights_channels(gltf, mesh_index)
+        return
+
+    # weights アニメーションの出力は（キーフレーム × ターゲット数）の並び
+    # （複数のチャンネルで共有されるサンプラーは 1 回だけ詰める）
+    seen = set()
+    for sampler in _weights_samplers(gltf, mesh_index):
+        if id(sampler) in seen:
+            continue
+        seen.add(id(sampler))
+        values = read_accessor(glb, sampler['output'], raw=True).reshape(-1, count)[:, keep]
+        write_accessor(glb, sampler['output'], values.reshape(-1, 1))
+
+
+def sparsify(glb, threshold=0.0):
+    """
+    ゼロのターゲットを削除し、残りを疎アクセサーに書き換える
+
+    threshold: これ以下の差分はゼロとみなす（0 なら厳密にゼロだけ）
+    戻り値: メッシュごとの報告のリスト
+    """
+    gltf = glb.gltf
+    report = []
+    for mesh_index, mesh in enumerate(gltf.get('meshes', [])):
+        primitives = mesh['primitives']
+        count = len(primitives[0].get('targets', []))
+        if count == 0:
+            continue
+        names = mesh.get('extras', {}).get('targetNames') or [str(i) for i in range(count)]
+
+        if threshold > 0:
+            for primitive in primitives:
+                for target in primitive['targets']:
+                    for accessor in target.values():
+                        values = read_accessor(glb, accessor)
+                        if not gltf['accessors'][accessor].get('normalized'):
+                            small = np.all(np.abs(values) <= threshold, axis=1)
+                            if small.any() and np.any(values[small]):
+                                values[small] = 0
+                                write_accessor(glb, accessor, values, target=ARRAY_BUFFER)
+
+        keep = [i for i in range(count) if not _target_is_zero(glb, primitives, i)]
+        removed = [names[i] for i in range(count) if i not in keep]
+        if removed:
+            remove_targets(glb, mesh_index, keep)
+
+        dense = sparse = converted = 0
+        for primitive in primitives:
+            for target in primitive.get('targets', []):
+                for accessor in target.values():
+                    values = read_accessor(glb, accessor, raw=True)
+                    _, _, size = sparse_size(values)
+                    dense += values.nbytes
+                    if size < values.nbytes:
+                        sparse += write_sparse(glb, accessor, values)
+                        converted += 1
+                    else:
+                        sparse += values.nbytes
+        report.append({
+            'mesh': mesh.get('name', str(mesh_index)),
+            'targets': count,
+            'removed': removed,
+            'sparse_accessors': converted,
+            'dense_bytes': dense,
+            'sparse_bytes': sparse,
+        })
+    glb.compact()
+    return report
+
+
+# --- 法線・接線の差分の削除 ---
+
+def _normalize(values):
+    length = np.linalg.norm(values, axis=1, keepdims=True)
+    return values / np.where(length > 0, length, 1.0)
+
+
+def direction_change(base, delta):
+    """差分を重み 1 で加えたときの向きの変化（頂点ごとの角度、度）"""
+    base = _normalize(base[:, :3].astype(np.float64))
+    moved = _normalize(base + delta[:, :3])
+    cos = np.clip(np.sum(base * moved, axis=1), -1.0, 1.0)
+    return np.degrees(np.arccos(cos))
+
+
+def accessor_bytes(gltf, index):
+    """アクセサーのデータのバイト数（疎アクセサーはインデックスと値の合計）"""
+    accessor = gltf['accessors'][index]
+    element = COMPONENT_DTYPES[accessor['componentType']].itemsize * TYPE_SIZES[accessor['type']]
+    size = 0
+    if 'bufferView' in accessor:
+        stride = gltf['bufferViews'][accessor['bufferView']].get('byteStride') or element
+        size += accessor['count'] * stride
+    sparse = accessor.get('sparse')
+    if sparse:
+        index_size = COMPONENT_DTYPES[sparse['indices']['componentType']].itemsize
+        size += sparse['count'] * (index_size + element)
+    return size
+
+
+def prune_normals(glb, normal_threshold=1.0, tangent_threshold=1.0):
+    """
+    向きの変化が閾値（度）未満のターゲットの NORMAL / TANGENT 差分を削除する
+
+    角度はメッシュの全プリミティブ・全頂点での最大で判定する。
+    戻り値: メッシュごとの報告 [{'mesh', 'targets': [{'name', 'normal', 'tangent',
+    'dropped'}], 'removed_bytes'}]（normal / tangent は最大角度、差分がなければ None）
+    """
+    gltf = glb.gltf
+    thresholds = {'NORMAL': normal_threshold, 'TANGENT': tangent_threshold}
+    report = []
+    for mesh_index, mesh in enumerate(gltf.get('meshes', [])):
+        primitives = mesh['primitives']
+        count = len(primitives[0].get('targets', []))
+        if count == 0:
+            continue
+        names = mesh.get('extras', {}).get('targetNames') or [str(i) for i in range(count)]
+        targets = []
+        removed_bytes = 0
+        for t in range(count):
+            angles = {}
+            for attribute in thresholds:
+                for primitive in primitives:
+                    index = primitive['targets'][t].get(attribute)
+                    if index is None:
+                        continue
+                    angle = 0.0
+                    if attribute in primitive['attributes']:
+                        base = read_accessor(glb, primitive['attributes'][attribute])
+                        change = direction_change(base, read_accessor(glb, index))
+                        angle = float(change.max(initial=0.0))
+                    angles[attribute] = max(angles.get(attribute, 0.0), angle)
+            dropped = [attribute for attribute, angle in angles.items() if angle < thresholds[attribute]]
+            for primitive in primitives:
+                for attribute in dropped:
+                    index = primitive['targets'][t].pop(attribute, None)
+                    if index is not None:
+                        removed_bytes += accessor_bytes(gltf, index)
+            targets.append({'name': names[t], 'normal': angles.get('NORMAL'),
+                            'tangent': angles.get('TANGENT'), 'dropped': dropped})
+        report.append({'mesh': mesh.get('name', str(mesh_index)), 'targets': targets,
+                       'removed_bytes': removed_bytes})
+    glb.compact()
+    return report
+
+
+def sparsify_file(path, threshold=0.0):
+    """GLB ファイルを書き換える。戻り値: (報告, 変換前のサイズ, 変換後のサイズ)"""
+    before = os.path.getsize(path)
+    with GLB.open(path) as glb:
+        report = sparsify(glb, threshold)
+        return report, before, glb.save(path)
@@ -0,0 +1,148 @@
+"""
+エクスポート後の GLB の書き換えパイプライン
+
+Blender のエクスポーターが書き出した GLB を 1 回だけ開き（メモリマップ）、
+登録したパスを順に JSON と bufferView へ適用してから、1 回の順次書き込みで
+保存する。パスごとに処理時間と書き出し後のサイズの増減を報告する。
+
+bufferView はファイルを直接参照したまま扱い、パスが差し替えた bufferView
+だけがメモリに載る。Blender を使わないので、ホスト側でも既存の GLB に
+適用できる（scripts/postprocess_glb.py）。
+
+パスは PASSES に登録する関数 `pass(glb, options) -> 報告の文字列 | None`。
+options はマニフェストのジョブ（worker に渡す dict）と同じ形で、パスは
+必要な項目だけを読む。
+"""
+import os
+import time
+
+from .glb import GLB
+
+
+def pass_sparse_morphs(glb, options):
+    """差分がゼロのモーフターゲットを削除し、残りを疎アクセサーにする"""
+    from .morphs import sparsify
+    report = sparsify(glb)
+    for mesh in report:
+        if mesh['removed']:
+            print(f"  {mesh['mesh']}: 空のターゲット {len(mesh['removed'])} 個を削除")
+        print(f"  {mesh['mesh']}: 疎アクセサー {mesh['sparse_accessors']} 個 "
+              f"({mesh['dense_bytes'] / 1024:.0f} KB → {mesh['sparse_bytes'] / 1024:.0f} KB)")
+    removed = sum(len(mesh['removed']) for mesh in report)
+    sparse = sum(mesh['sparse_accessors'] for mesh in report)
+    return f"疎アクセサー {sparse} 個、空のターゲット {removed} 個を削除"
+
+
+def pass_ktx2(glb, options):
+    """埋め込み画像を KTX2 に変換"""
+    from .ktx2 import compress_textures
+    textures = options.get('textures', {})
+    before, after = compress_textures(glb, quality=textures.get('ktx2_quality', 128))
+    return f"画像 {before / 1024 / 1024:.2f} MB → {after / 1024 / 1024:.2f} MB"
+
+
+def pass_prune_morph_normals(glb, options):
+    """陰影にほぼ影響しないモーフの法線・接線の差分を削除する"""
+    from .export_options import merge_morph_options
+    from .morphs import prune_normals
+    settings = merge_morph_options(options.get('morphs'))
+    report = prune_normals(glb, settings['normal_threshold'], settings['tangent_threshold'])
+    dropped = kept = removed = 0
+    for mesh in report:
+        mesh_dropped = sum(len(target['dropped']) for target in mesh['targets'])
+        measured = [(angle, target['name'], attribute) for target in mesh['targets']
+                    for attribute, angle in (('NORMAL', target['normal']), ('TANGENT', target['tangent']))
+                    if angle is not None and attribute not in target['dropped']]
+        dropped += mesh_dropped
+        kept += len(measured)
+        removed += mesh['removed_bytes']
+        if mesh_dropped or measured:
+            line = f"  {mesh['mesh']}: {mesh_dropped} 個を削除（{mesh['removed_bytes'] / 1024:.0f} KB）"
+            if measured:
+                angle, name, attribute = min(measured)
+                line += f"、残り {len(measured)} 個（最小 {name} の {attribute} {angle:.1f}°）"
+            print(line)
+    return f"法線・接線の差分 {dropped} 個を削除、{kept} 個を残す（{removed / 1024 / 1024:.2f} MB 削減）"
+
+
+def pass_simplify_animation(glb, options):
+    """許容誤差に収まる範囲でアニメーションのキーフレームを間引く"""
+    from .animation import simplify
+    from .export_options import merge_animation_options
+    settings = merge_animation_options(options.get('animation'))
+    report = simplify(glb, settings)
+    before = after = keys_before = keys_after = 0
+    for animation in report:
+        before += animation['bytes_before']
+        after += animation['bytes_after']
+        keys_before += animation['keys_before']
+        keys_after += animation['keys_after']
+        if not animation['changed']:
+            continue
+        ratio = animation['bytes_before'] / max(animation['bytes_after'], 1)
+        interpolations = ', '.join(f"{name} {count}" for name, count in sorted(animation['interpolations'].items()))
+        errors = ', '.join(f"{path} {error:.4g}" for path, error in sorted(animation['max_error'].items()))
+        print(f"  {animation['animation']}: キー {animation['keys_before']:,} → {animation['keys_after']:,}"
+              f"（データ 1/{ratio:.1f}）、{interpolations}、最大誤差 {errors}")
+    return (f"キー {keys_before:,} → {keys_after:,}、"
+            f"{before / 1024 / 1024:.2f} MB → {after / 1024 / 1024:.2f} MB（1/{before / max(after, 1):.1f}）")
+
+
+def pass_quantize(glb, options):
+    """KHR_mesh_quantization で頂点属性を整数にする"""
+    from .compression import merge_compression_options
+    from .quantize import quantize
+    # 許容誤差などはジョブの compression を使い、プロファイルは quantize にそろえる
+    settings = merge_compression_options({**(options.get('compression') or {}), 'profile': 'quantize'})
+    report = quantize(glb, settings)
+    for group in report['groups']:
+        key = f"、{group['key']}" if group['key'] else ''
+        print(f"  {', '.join(group['meshes'])}: 最大誤差 {group['error'] * 1000:.3f} mm{key}")
+    for name, reason in sorted(report['kept'].items()):
+        print(f"  ⚠️  {name}: 位置は float のまま（{reason}）")
+    for attribute in report['attributes']:
+        print(f"  ⚠️  float のまま: {attribute}")
+    return f"頂点データ {report['before'] / 1024 / 1024:.2f} MB → {report['after'] / 1024 / 1024:.2f} MB"
+
+
+PASSES = {
+    'sparse_morphs': pass_sparse_morphs,
+    'prune_morph_normals': pass_prune_morph_normals,
+    'simplify_animation': pass_simplify_animation,
+    'quantize': pass_quantize,
+    'ktx2': pass_ktx2,
+}
+
+
+def check_passes(names):
+    unknown = [name for name in names if name not in PASSES]
+    if unknown:
+        raise ValueError(f"未知のステージ: {', '.join(unknown)}")
+
+
+def run_passes(path, names, options=None, output=None, on_pass=None):
+    """
+    path の GLB に names のパスを順に適用して output（既定: 上書き）へ保存する
+
+    パスごとに on_pass(報告) を呼ぶ。報告は
+    {'pass', 'elapsed', 'before', 'after', 'message'}（before / after は書き出し後のバイト数）。
+    戻り値: (報告のリスト, 元のファイルサイズ, 保存したファイルサイズ)
+    """
+    check_passes(names)
+    options = options or {}
+    original = os.path.getsize(path)
+    with GLB.open(path) as glb:
+        size = glb.byte_length()
+        reports = []
+        for name in names:
+            start = time.time()
+            message = PASSES[name](glb, options)
+            elapsed = time.time() - start
+            after = glb.byte_length()
+            report = {'pass': name, 'elapsed': elapsed, 'before': size, 'after': after, 'message': message or ''}
+            reports.append(report)
+            if on_pass:
+                on_pass(report)
+            size = after
+        written = glb.save(output or path)
+    return reports, original, written
@@ -0,0 +1,26 @@
+"""
+ワーカーとホスト間の進捗メッセージ
+
+ワーカーは標準出力に `@@progress {JSON}` の1行を書き、ホストはそれ以外の
+行をログとして扱う。Blender 自身の出力と混ざっても判別できる。
+"""
+import json
+import sys
+
+PREFIX = '@@progress '
+
+
+def emit(event, **fields):
+    """進捗イベントを1行で出力（ワーカー側）"""
+    sys.stdout.write(PREFIX + json.dumps({'event': event, **fields}, ensure_ascii=False) + '\n')
+    sys.stdout.flush()
+
+
+def parse(line):
+    """進捗行ならイベントの辞書、それ以外は None（ホスト側）"""
+    if not line.startswith(PREFIX):
+        return None
+    try:
+        return json.loads(line[len(PREFIX):])
+    except json.JSONDecodeError:
+        return None
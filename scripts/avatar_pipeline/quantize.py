@@ -0,0 +1,336 @@
+"""
+KHR_mesh_quantization による頂点属性の量子化（エクスポート後に GLB を書き換える）
+
+    POSITION とモーフの POSITION 差分   int16（normalized）
+    NORMAL / TANGENT                    int8（normalized）
+    モーフの NORMAL / TANGENT 差分      int16（normalized、|差分| <= 1 のとき）
+    TEXCOORD_n                          uint16（normalized、0〜1 に収まるとき）
+
+位置は [-1, 1] に正規化して格納し、元の座標に戻す変換 D（平行移動 + 一様
+スケール）をノード側へ移す。スキンメッシュはノードの変換が使われないので、
+スキンの inverseBindMatrices に D を掛ける（同じスキンを使うメッシュは同じ D）。
+子ノードを持つノードや、変換がアニメーションされるノードのメッシュは
+位置を float のまま残す。
+
+量子化した値を元の float と比べ、位置（リップシンク用シェイプキーを重み 1 で
+適用した形を含む）の誤差が max_error、法線の角度誤差が max_normal_error を
+超えるグループは float のまま残す。位置の誤差は compression.check_meshes と
+同じく、ノードのワールド変換（スキンはバインドポーズ）の倍率を掛けた長さで測る。
+"""
+import numpy as np
+
+from .accessors import (ARRAY_BUFFER, dequantize, read_accessor, sparse_size, write_accessor,
+                        write_sparse)
+from .compression import is_lipsync_key
+from .glb_reader import linear_scale, world_matrices
+
+EXTENSION = 'KHR_mesh_quantization'
+
+BYTE, UNSIGNED_SHORT, SHORT, FLOAT = 5120, 5123, 5122, 5126
+
+# 動いたとみなす差分の大きさ（m）
+MOVED_THRESHOLD = 1e-6
+
+
+def quantize_normalized(values, component_type):
+    """[-1, 1]（符号なしは [0, 1]）の値を normalized 整数に丸める"""
+    info = np.iinfo(np.int8 if component_type == BYTE else
+                    np.uint16 if component_type == UNSIGNED_SHORT else np.int16)
+    low = -1.0 if info.min < 0 else 0.0
+    return np.round(np.clip(values, low, 1.0) * info.max).astype(info.dtype)
+
+
+def _rotate(quaternion, vector):
+    x, y, z, w = quaternion
+    q = np.array([x, y, z], dtype=np.float64)
+    v = np.asarray(vector, dtype=np.float64)
+    t = 2.0 * np.cross(q, v)
+    return v + w * t + np.cross(q, t)
+
+
+def dequantization_matrix(offset, scale):
+    """正規化した座標を元に戻す 4x4 行列（行優先）"""
+    matrix = np.diag([scale, scale, scale, 1.0])
+    matrix[:3, 3] = offset
+    return matrix
+
+
+def fold_into_node(node, offset, scale):
+    """ノードの変換 M を M・D に置き換える"""
+    if 'matrix' in node:
+        matrix = np.asarray(node['matrix'], dtype=np.float64).reshape(4, 4).T
+        node['matrix'] = (matrix @ dequantization_matrix(offset, scale)).T.reshape(-1).tolist()
+        return
+    # T・R・S・T(o)・S(c) = T(t + R(S o))・R・S c
+    node_scale = np.asarray(node.get('scale', [1.0, 1.0, 1.0]), dtype=np.float64)
+    rotation = node.get('rotation', [0.0, 0.0, 0.0, 1.0])
+    translation = np.asarray(node.get('translation', [0.0, 0.0, 0.0]), dtype=np.float64)
+    node['translation'] = (translation + _rotate(rotation, node_scale * offset)).tolist()
+    node['scale'] = (node_scale * scale).tolist()
+
+
+def fold_into_skin(glb, skin, offset, scale):
+    """inverseBindMatrices を IBM・D に置き換える（アクセサーは新しく作る）"""
+    gltf = glb.gltf
+    joints = len(skin['joints'])
+    if 'inverseBindMatrices' in skin:
+        matrices = read_accessor(glb, skin['inverseBindMatrices']).reshape(-1, 4, 4).transpose(0, 2, 1)
+    else:
+        matrices = np.tile(np.eye(4), (joints, 1, 1))
+    folded = matrices @ dequantization_matrix(offset, scale)
+    gltf['accessors'].append({'componentType': FLOAT, 'count': joints, 'type': 'MAT4'})
+    skin['inverseBindMatrices'] = len(gltf['accessors']) - 1
+    write_accessor(glb, skin['inverseBindMatrices'], folded.transpose(0, 2, 1).reshape(joints, 16))
+
+
+# --- グループ分け ---
+
+def _animated_nodes(gltf):
+    nodes = set()
+    for animation in gltf.get('animations', []):
+        for channel in animation.get('channels', []):
+            target = channel.get('target', {})
+            if target.get('path') in ('translation', 'rotation', 'scale') and 'node' in target:
+                nodes.add(target['node'])
+    return nodes
+
+
+def position_groups(gltf):
+    """
+    位置の変換 D を共有するメッシュのグループ
+
+    戻り値: ({('skin', i) | ('mesh', i): [メッシュ番号]}, {メッシュ番号: float のまま残す理由})
+    """
+    animated = _animated_nodes(gltf)
+    owners = {}
+    for index, node in enumerate(gltf.get('nodes', [])):
+        if 'mesh' not in node:
+            continue
+        if 'skin' in node:
+            owners.setdefault(node['mesh'], set()).add(('skin', node['skin']))
+        elif node.get('children'):
+            owners.setdefault(node['mesh'], set()).add(('blocked', '子ノードがある'))
+        elif index in animated:
+            owners.setdefault(node['mesh'], set()).add(('blocked', '変換がアニメーションされる'))
+        else:
+            owners.setdefault(node['mesh'], set()).add(('mesh', node['mesh']))
+
+    groups, skipped = {}, {}
+    for mesh, keys in owners.items():
+        blocked = [reason for kind, reason in keys if kind == 'blocked']
+        if blocked:
+            skipped[mesh] = blocked[0]
+        elif len(keys) > 1:
+            skipped[mesh] = 'スキンの有無や種類が異なる複数のノードで使われている'
+        else:
+            groups.setdefault(next(iter(keys)), []).append(mesh)
+    return groups, skipped
+
+
+# --- 量子化 ---
+
+class _Writer:
+    """同じアクセサーを二度書き換えないようにまとめて書き込む"""
+
+    def __init__(self, glb):
+        self.glb = glb
+        self.done = set()
+        self.before = self.after = 0
+
+    def write(self, index, values, component_type):
+        if index in self.done:
+            return
+        self.done.add(index)
+        accessor = self.glb.gltf['accessors'][index]
+        sparse = 'sparse' in accessor
+        if sparse:
+            self.before += sparse_size(values.astype(np.float32))[2]
+        else:
+            self.before += accessor['count'] * values.shape[1] * 4
+        accessor['componentType'] = component_type
+        accessor['normalized'] = True
+        if sparse:
+            self.after += write_sparse(self.glb, index, values)
+        else:
+            write_accessor(self.glb, index, values, target=ARRAY_BUFFER)
+            view = self.glb.gltf['bufferViews'][accessor['bufferView']]
+            self.after += view['byteLength']
+
+
+def _primitives(gltf, meshes):
+    for mesh in meshes:
+        yield from gltf['meshes'][mesh]['primitives']
+
+
+def _target_names(gltf, mesh):
+    names = gltf['meshes'][mesh].get('extras', {}).get('targetNames', [])
+    count = len(gltf['meshes'][mesh]['primitives'][0].get('targets', []))
+    return [names[i] if i < len(names) else str(i) for i in range(count)]
+
+
+def world_scale(glb, kind, index, matrices):
+    """グループの座標がワールドで何倍になるか（スキンはバインドポーズ）"""
+    gltf = glb.gltf
+    if kind == 'skin':
+        skin = gltf['skins'][index]
+        if not skin.get('joints'):
+            return 1.0
+        ibm = np.eye(4)
+        if 'inverseBindMatrices' in skin:
+            ibm = read_accessor(glb, skin['inverseBindMatrices'])[0].reshape(4, 4).T
+        return linear_scale(matrices[skin['joints'][0]] @ ibm)
+    scales = [linear_scale(matrices[i]) for i, node in enumerate(gltf.get('nodes', []))
+              if node.get('mesh') == index]
+    return max(scales, default=1.0)
+
+
+def quantize_positions(glb, meshes, options, writer, scale_to_world=1.0):
+    """
+    グループのメッシュの位置とモーフの位置差分を int16 にする
+
+    誤差はメッシュの座標での長さに scale_to_world を掛けたワールドでの長さ。
+    戻り値: (offset, scale, 最大誤差 m, 最悪のシェイプキー)。誤差が許容値を
+    超えたら何も書き換えずに scale=None を返す
+    """
+    gltf = glb.gltf
+    primitives = list(_primitives(gltf, meshes))
+    positions = {p['attributes']['POSITION']: read_accessor(glb, p['attributes']['POSITION'])
+                 for p in primitives}
+    low = np.min([values.min(axis=0) for values in positions.values() if len(values)], axis=0)
+    high = np.max([values.max(axis=0) for values in positions.values() if len(values)], axis=0)
+    offset = (low + high) / 2
+    scale = float(np.max(high - low)) / 2
+
+    deltas = {}
+    for mesh in meshes:
+        names = _target_names(gltf, mesh)
+        for primitive in gltf['meshes'][mesh]['primitives']:
+            for name, target in zip(names, primitive.get('targets', [])):
+                if 'POSITION' in target:
+                    delta = read_accessor(glb, target['POSITION'])
+                    deltas[(primitive['attributes']['POSITION'], name, target['POSITION'])] = delta
+                    scale = max(scale, float(np.abs(delta).max(initial=0.0)))
+    if scale == 0.0:
+        scale = 1.0
+
+    quantized = {index: quantize_normalized((values - offset) / scale, SHORT)
+                 for index, values in positions.items()}
+    restored = {index: dequantize(q, SHORT).astype(np.float64) * scale + offset
+                for index, q in quantized.items()}
+    error = max((float(np.linalg.norm(restored[i] - positions[i], axis=1).max(initial=0.0))
+                 for i in positions), default=0.0)
+    worst = None
+    quantized_deltas = {}
+    for (base, name, index), delta in deltas.items():
+        q = quantize_normalized(delta / scale, SHORT)
+        quantized_deltas[index] = q
+        if not is_lipsync_key(name):
+            continue
+        moved = np.linalg.norm(delta, axis=1) > MOVED_THRESHOLD
+        if not moved.any():
+            continue
+        shape = restored[base] + dequantize(q, SHORT) * scale
+        key_error = float(np.linalg.norm(shape - (positions[base] + delta), axis=1)[moved].max())
+        if key_error > error:
+            error, worst = key_error, name
+    error *= scale_to_world
+    if error > options['max_error']:
+        return offset, None, error, worst
+
+    for index, q in quantized.items():
+        writer.write(index, q, SHORT)
+    for index, q in quantized_deltas.items():
+        writer.write(index, q, SHORT)
+    return offset, scale, error, worst
+
+
+def _normalize(values):
+    length = np.linalg.norm(values, axis=1, keepdims=True)
+    return values / np.where(length > 0, length, 1.0)
+
+
+def normal_error(original, restored):
+    """法線の角度誤差の最大（度）"""
+    cos = np.sum(_normalize(original) * _normalize(restored), axis=1)
+    return float(np.degrees(np.arccos(np.clip(cos, -1.0, 1.0))).max(initial=0.0))
+
+
+def quantize_attributes(glb, primitives, options, writer, skipped):
+    """法線・接線・UV・モーフの法線と接線の差分を量子化する"""
+    gltf = glb.gltf
+    for primitive in primitives:
+        attributes = primitive['attributes']
+        for name, index in attributes.items():
+            accessor = gltf['accessors'][index]
+            if index in writer.done or accessor['componentType'] != FLOAT:
+                continue
+            values = read_accessor(glb, index)
+            if name in ('NORMAL', 'TANGENT'):
+                xyz = values[:, :3]
+                q = quantize_normalized(values, BYTE)
+                error = normal_error(xyz, dequantize(q, BYTE)[:, :3])
+                if error > options['max_normal_error']:
+                    skipped.append(f"{name}（角度誤差 {error:.2f}°）")
+                    continue
+                writer.write(index, q, BYTE)
+            elif name.startswith('TEXCOORD_'):
+                if len(values) and (values.min() < 0.0 or values.max() > 1.0):
+                    skipped.append(f"{name}（0〜1 の外の UV）")
+                    continue
+                writer.write(index, quantize_normalized(values, UNSIGNED_SHORT), UNSIGNED_SHORT)
+        for target in primitive.get('targets', []):
+            for name in ('NORMAL', 'TANGENT'):
+                index = target.get(name)
+                if index is None or index in writer.done or gltf['accessors'][index]['componentType'] != FLOAT:
+                    continue
+                values = read_accessor(glb, index)
+                if len(values) and np.abs(values).max() > 1.0:
+                    continue
+                writer.write(index, quantize_normalized(values, SHORT), SHORT)
+
+
+def quantize(glb, options):
+    """
+    GLB の頂点属性を量子化する
+
+    options: compression の設定（max_error: 位置の許容誤差 m、max_normal_error: 度）
+    戻り値: {'groups': [{'group', 'meshes', 'scale', 'error', 'key'}],
+             'kept': {メッシュ名: 理由}, 'attributes': [...], 'before', 'after'}
+    """
+    gltf = glb.gltf
+    meshes = gltf.get('meshes', [])
+    writer = _Writer(glb)
+    report = {'groups': [], 'kept': {}, 'attributes': []}
+
+    groups, skipped = position_groups(gltf)
+    matrices = world_matrices(gltf)
+    for mesh, reason in skipped.items():
+        report['kept'][meshes[mesh].get('name', str(mesh))] = reason
+    for (kind, index), members in sorted(groups.items()):
+        primitives = list(_primitives(gltf, members))
+        if any(gltf['accessors'][p['attributes']['POSITION']]['componentType'] != FLOAT
+               for p in primitives):
+            continue
+        offset, scale, error, key = quantize_positions(glb, members, options, writer,
+                                                       world_scale(glb, kind, index, matrices))
+        names = [meshes[m].get('name', str(m)) for m in members]
+        if scale is None:
+            for name in names:
+                report['kept'][name] = f"誤差 {error * 1000:.3f} mm が許容値を超える（{key or '基準形状'}）"
+            continue
+        if kind == 'skin':
+            fold_into_skin(glb, gltf['skins'][index], offset, scale)
+        else:
+            for node in gltf.get('nodes', []):
+                if node.get('mesh') == index:
+                    fold_into_node(node, offset, scale)
+        report['groups'].append({'group': f"{kind} {index}", 'meshes': names, 'scale': scale,
+                                 'error': error, 'key': key})
+
+    quantize_attributes(glb, (p for mesh in meshes for p in mesh['primitives']),
+                        options, writer, report['attributes'])
+    if writer.done:
+        glb.use_extension(EXTENSION, required=True)
+        glb.compact()
+    report['before'], report['after'] = writer.before, writer.after
+    return report
@@ -0,0 +1,420 @@
+"""
+口の形の画像差分による回帰テスト
+
+スイート設定（JSON）に並べたアバターごとにシェイプキーをレンダリングし
+（renders.render_shape_keys）、ゴールデン画像と知覚的な差分
+（SSIM と ΔE が JND を超えた画素の割合）で比べる。あわせてシェイプキーの
+頂点変位（最大・平均・動いた頂点数・範囲）がゴールデンから許容値以上
+ずれていないかも調べる。
+
+レンダリングはメッシュのハッシュ（全シェイプキーの座標）+ レンダー設定 +
+レンダリング用スクリプトの内容から作ったキーでキャッシュし、キーが
+変わったアバターだけを再レンダリングする。.blend の内容ハッシュが前回と
+同じなら Blender を起動せずにメッシュの情報も再利用する。
+
+    {
+      "source_dir": "${AVATAR_SOURCE_DIR}",
+      "golden_dir": "../tests/golden/mouth",
+      "views": ["front", "closeup"],
+      "resolution": 256,
+      "tolerance": {"ssim_min": 0.98, "changed_max": 0.002},
+      "avatars": [
+        {"name": "boy", "input": "Boy.blend", "keys": "lipsync"}
+      ]
+    }
+
+keys は名前のリスト、"lipsync"（リップシンク用のキーのみ）、省略（全キー）のいずれか。
+"""
+import dataclasses
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from . import renders
+from .cache import hash_file
+from .compression import is_lipsync_key
+from .manifest import ManifestError, resolve_path
+
+REPO_DIR = renders.REPO_DIR
+CACHE_DIR = os.path.join(REPO_DIR, '.cache', 'mouth_regression')
+
+REPORT_VERSION = 1
+STATE_NAME = 'state.json'
+GOLDEN_META = 'golden.json'
+DISPLACEMENTS_NAME = 'displacements.json'
+REPORT_NAME = 'report.json'
+
+DEFAULT_TOLERANCE = {
+    'ssim_min': 0.98,          # ビューごとの平均 SSIM の下限
+    'changed_max': 0.002,      # ΔE が JND を超えた画素の割合の上限
+    'displacement': 0.0005,    # 最大・平均変位と範囲のずれの上限（メッシュの単位）
+    'affected_ratio': 0.05,    # 動いた頂点数の相対的なずれの上限
+}
+
+# レンダリング結果を左右するスクリプト（リポジトリからの相対パス）
+RENDER_SOURCES = [
+    'blender/render_shape_keys.py',
+    'blender/avatar_tools/render.py',
+    'blender/avatar_tools/landmarks.py',
+]
+
+STATUSES = ('pass', 'fail', 'new', 'missing')
+
+
+class RegressionError(Exception):
+    """スイート設定の誤りやレンダリングの失敗"""
+
+
+@dataclasses.dataclass
+class Avatar:
+    name: str
+    input: str
+    object: str = None
+    keys: object = None  # list / 'lipsync' / None
+
+
+@dataclasses.dataclass
+class Suite:
+    golden_dir: str
+    avatars: list
+    views: tuple = renders.DEFAULT_VIEWS
+    engine: str = 'workbench'
+    resolution: int = 256
+    tolerance: dict = dataclasses.field(default_factory=lambda: dict(DEFAULT_TOLERANCE))
+
+    @property
+    def render_options(self):
+        return {'views': list(self.views), 'engine': self.engine, 'resolution': self.resolution}
+
+
+def load_suite(path):
+    """スイート設定を読み込む"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    try:
+        source_dir = resolve_path(data.get('source_dir', '.'), base_dir)
+        golden_dir = resolve_path(data.get('golden_dir', 'golden'), base_dir)
+        avatars = []
+        for entry in data.get('avatars', []):
+            if not entry.get('name') or 'input' not in entry:
+                raise RegressionError(f"name と input は必須です: {entry}")
+            keys = entry.get('keys')
+            if keys is not None and keys != 'lipsync' and not isinstance(keys, list):
+                raise RegressionError(f"{entry['name']}: keys はリスト か \"lipsync\" です")
+            avatars.append(Avatar(entry['name'], resolve_path(entry['input'], source_dir),
+                                  entry.get('object'), keys))
+    except ManifestError as e:
+        raise RegressionError(str(e)) from e
+
+    names = [a.name for a in avatars]
+    duplicated = sorted({n for n in names if names.count(n) > 1})
+    if duplicated:
+        raise RegressionError(f"アバター名が重複しています: {', '.join(duplicated)}")
+    unknown = set(data.get('tolerance', {})) - set(DEFAULT_TOLERANCE)
+    if unknown:
+        raise RegressionError(f"未知の許容値: {', '.join(sorted(unknown))}")
+    views = tuple(data.get('views', renders.DEFAULT_VIEWS))
+    unknown = set(views) - set(renders.DEFAULT_VIEWS)
+    if unknown:
+        raise RegressionError(f"未知のビュー: {', '.join(sorted(unknown))}")
+    return Suite(golden_dir=golden_dir, avatars=avatars, views=views,
+                 engine=data.get('engine', 'workbench'),
+                 resolution=int(data.get('resolution', 256)),
+                 tolerance={**DEFAULT_TOLERANCE, **data.get('tolerance', {})})
+
+
+def _hash_json(value):
+    data = json.dumps(value, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+def _load_json(path, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_json(path, value):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(value, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def sources_digest():
+    return {src: hash_file(os.path.join(REPO_DIR, src)) for src in RENDER_SOURCES}
+
+
+def select_keys(avatar, mesh_keys):
+    """比べるキー（先頭は Basis）"""
+    if avatar.keys is None:
+        keys = list(mesh_keys)
+    elif avatar.keys == 'lipsync':
+        keys = [k for k in mesh_keys if is_lipsync_key(k)]
+    else:
+        missing = [k for k in avatar.keys if k not in mesh_keys]
+        if missing:
+            raise RegressionError(f"{avatar.name}: シェイプキーがありません: {', '.join(missing)}")
+        keys = list(avatar.keys)
+    return [renders.BASIS_ROW] + keys
+
+
+# --- 比較 ---
+
+def compare_displacement(golden, current, tolerance):
+    """1 キー分の変位の統計を比べ、ずれの説明のリストを返す"""
+    limit = tolerance['displacement']
+    reasons = []
+    for field in ('max', 'mean'):
+        delta = abs(current[field] - golden[field])
+        if delta > limit:
+            reasons.append(f"変位の{field}が {golden[field]:.5f} → {current[field]:.5f}")
+    base = max(golden['affected'], 1)
+    if abs(current['affected'] - golden['affected']) / base > tolerance['affected_ratio']:
+        reasons.append(f"動く頂点数が {golden['affected']} → {current['affected']}")
+    for field in ('bbox_min', 'bbox_max'):
+        if (golden[field] is None) != (current[field] is None):
+            reasons.append(f"{field} の有無が変わりました")
+        elif golden[field] is not None:
+            delta = max(abs(a - b) for a, b in zip(golden[field], current[field]))
+            if delta > limit:
+                reasons.append(f"{field} が {delta:.5f} ずれました")
+    return reasons
+
+
+def judge_image(result, tolerance):
+    reasons = []
+    if result['ssim'] < tolerance['ssim_min']:
+        reasons.append(f"SSIM {result['ssim']:.4f} < {tolerance['ssim_min']}")
+    if result['changed'] > tolerance['changed_max']:
+        reasons.append(f"差のある画素 {result['changed'] * 100:.2f}% > {tolerance['changed_max'] * 100:.2f}%")
+    return reasons
+
+
+class RegressionSuite:
+    """スイート 1 回分の実行（レンダリング → 比較 → レポート）"""
+
+    def __init__(self, suite, cache_dir=CACHE_DIR, blender='blender', workers=None,
+                 force=False, log=print):
+        self.suite = suite
+        self.cache_dir = cache_dir
+        self.blender = blender
+        self.workers = workers
+        self.force = force
+        self.log = log
+        self._sources = None
+
+    def avatar_dir(self, avatar):
+        return os.path.join(self.cache_dir, avatar.name)
+
+    def golden_avatar_dir(self, avatar):
+        return os.path.join(self.suite.golden_dir, avatar.name)
+
+    # --- レンダリング ---
+
+    def prepare(self, avatar):
+        """
+        メッシュの情報を取り、必要ならレンダリングする
+
+        戻り値: {'mesh', 'keys', 'index', 'cached'}
+        """
+        if not os.path.exists(avatar.input):
+            raise RegressionError(f"{avatar.name}: 入力がありません: {avatar.input}")
+        work_dir = self.avatar_dir(avatar)
+        state_path = os.path.join(work_dir, STATE_NAME)
+        state = {} if self.force else _load_json(state_path, {})
+
+        blend_hash = hash_file(avatar.input)
+        if state.get('blend') == blend_hash and state.get('object') == avatar.object and state.get('mesh'):
+            mesh = state['mesh']
+        else:
+            os.makedirs(work_dir, exist_ok=True)
+            try:
+                mesh = renders.inspect_mesh(avatar.input, avatar.object, self.blender,
+                                            log_path=os.path.join(work_dir, 'inspect.log'))
+            except renders.RenderError as e:
+                raise RegressionError(f"{avatar.name}: {e}") from e
+            mesh.pop('event', None)
+
+        keys = select_keys(avatar, list(mesh['keys']))
+        if self._sources is None:
+            self._sources = sources_digest()
+        render_key = _hash_json({
+            'digest': mesh['digest'],
+            'object': mesh['object'],
+            'keys': keys,
+            'options': self.suite.render_options,
+            'sources': self._sources,
+        })
+
+        renders_dir = os.path.join(work_dir, 'renders')
+        index = _load_json(os.path.join(renders_dir, renders.INDEX_NAME))
+        cached = index is not None and state.get('render_key') == render_key
+        if not cached:
+            if os.path.isdir(renders_dir):
+                shutil.rmtree(renders_dir)
+            try:
+                index = renders.render_shape_keys(
+                    avatar.input, renders_dir, obj_name=mesh['object'], keys=keys,
+                    workers=self.workers, blender=self.blender, **self.suite.render_options)
+            except renders.RenderError as e:
+                raise RegressionError(f"{avatar.name}: レンダリングに失敗: {e}"
+                                      f"（ログ: {os.path.join(renders_dir, 'logs')}）") from e
+
+        _save_json(state_path, {'blend': blend_hash, 'object': avatar.object,
+                                'mesh': mesh, 'render_key': render_key})
+        return {'mesh': mesh, 'keys': keys, 'index': index, 'cached': cached,
+                'renders_dir': renders_dir}
+
+    # --- 比較 ---
+
+    def _pairs(self, avatar, prepared):
+        """(ゴールデン画像がある) 比較する画像の組"""
+        golden_dir = self.golden_avatar_dir(avatar)
+        diff_dir = os.path.join(self.avatar_dir(avatar), 'diffs')
+        if os.path.isdir(diff_dir):
+            shutil.rmtree(diff_dir)
+        pairs = []
+        for row in prepared['index']['rows']:
+            for view, tile in row['tiles'].items():
+                golden = os.path.join(golden_dir, os.path.basename(tile))
+                if os.path.exists(golden):
+                    pairs.append({
+                        'id': f"{avatar.name}/{row['key']}/{view}",
+                        'golden': golden,
+                        'current': os.path.join(prepared['renders_dir'], tile),
+                        'diff': os.path.join(diff_dir, os.path.basename(tile)),
+                    })
+        return pairs
+
+    def judge(self, avatar, prepared, diffs):
+        """アバター 1 体分の結果"""
+        tolerance = self.suite.tolerance
+        golden_dir = self.golden_avatar_dir(avatar)
+        golden_meta = _load_json(os.path.join(golden_dir, GOLDEN_META), {})
+        golden_disp = _load_json(os.path.join(golden_dir, DISPLACEMENTS_NAME), {})
+        notes = []
+        if golden_meta and golden_meta.get('options') != self.suite.render_options:
+            notes.append("ゴールデン画像とレンダー設定が違います（--update で更新してください）")
+
+        keys = []
+        for row in prepared['index']['rows']:
+            key = row['key']
+            result = {'key': key, 'reasons': [], 'views': {}}
+            has_golden = False
+            for view, tile in row['tiles'].items():
+                diff = diffs.get(f"{avatar.name}/{key}/{view}")
+                if diff is None:
+                    continue
+                has_golden = True
+                reasons = judge_image(diff, tolerance)
+                diff_path = os.path.join(self.avatar_dir(avatar), 'diffs', os.path.basename(tile))
+                result['views'][view] = {**diff, 'diff': diff_path if diff['changed'] > 0 else None}
+                result['reasons'] += [f"{view}: {r}" for r in reasons]
+
+            current = prepared['mesh']['keys'].get(key)
+            if current is not None and key in golden_disp:
+                has_golden = True
+                result['displacement'] = current
+                result['reasons'] += compare_displacement(golden_disp[key], current, tolerance)
+
+            if result['reasons']:
+                result['status'] = 'fail'
+            else:
+                result['status'] = 'pass' if has_golden else 'new'
+            keys.append(result)
+
+        present = {row['key'] for row in prepared['index']['rows']}
+        golden_keys = set(golden_meta.get('keys', []))
+        for key in sorted(golden_keys - present):
+            keys.append({'key': key, 'status': 'missing', 'views': {},
+                         'reasons': ["ゴールデンにあるキーがレンダリングされていません"]})
+
+        counts = {status: sum(1 for k in keys if k['status'] == status) for status in STATUSES}
+        return {
+            'name': avatar.name,
+            'input': avatar.input,
+            'object': prepared['mesh']['object'],
+            'digest': prepared['mesh']['digest'],
+            'cached': prepared['cached'],
+            'sheet': (os.path.join(prepared['renders_dir'], prepared['index']['sheet'])
+                      if prepared['index'].get('sheet') else None),
+            'notes': notes,
+            'counts': counts,
+            'keys': keys,
+        }
+
+    # --- ゴールデンの更新 ---
+
+    def update_golden(self, avatar, prepared):
+        """今回のレンダリングと変位をゴールデンとして保存する"""
+        golden_dir = self.golden_avatar_dir(avatar)
+        if os.path.isdir(golden_dir):
+            shutil.rmtree(golden_dir)
+        os.makedirs(golden_dir)
+        for row in prepared['index']['rows']:
+            for tile in row['tiles'].values():
+                shutil.copyfile(os.path.join(prepared['renders_dir'], tile),
+                                os.path.join(golden_dir, os.path.basename(tile)))
+        mesh = prepared['mesh']
+        _save_json(os.path.join(golden_dir, DISPLACEMENTS_NAME),
+                   {key: mesh['keys'][key] for key in prepared['keys'] if key in mesh['keys']})
+        _save_json(os.path.join(golden_dir, GOLDEN_META), {
+            'object': mesh['object'],
+            'digest': mesh['digest'],
+            'keys': prepared['keys'],
+            'options': self.suite.render_options,
+        })
+
+    # --- 実行 ---
+
+    def run(self, names=None, update=False):
+        """
+        スイートを実行してレポートを返す（cache_dir/report.json にも保存）
+
+        update=True なら比較のあと、今回の結果をゴールデンとして保存する。
+        """
+        start = time.time()
+        avatars = [a for a in self.suite.avatars if not names or a.name in names]
+        unknown = set(names or []) - {a.name for a in self.suite.avatars}
+        if unknown:
+            raise RegressionError(f"スイートにないアバター: {', '.join(sorted(unknown))}")
+
+        prepared = {}
+        for avatar in avatars:
+            prepared[avatar.name] = self.prepare(avatar)
+            state = "キャッシュ" if prepared[avatar.name]['cached'] else "レンダリング"
+            self.log(f"✓ {avatar.name}: {len(prepared[avatar.name]['keys'])}キー（{state}）")
+
+        # 全アバターの画像の組を 1 つの Blender でまとめて比べる
+        pairs = [p for avatar in avatars for p in self._pairs(avatar, prepared[avatar.name])]
+        os.makedirs(self.cache_dir, exist_ok=True)
+        try:
+            diffs = renders.compare_images(pairs, self.blender,
+                                           log_path=os.path.join(self.cache_dir, 'compare.log'))
+        except renders.RenderError as e:
+            raise RegressionError(f"画像の比較に失敗: {e}") from e
+        results = [self.judge(avatar, prepared[avatar.name], diffs) for avatar in avatars]
+
+        # 更新時も、差分は更新前のゴールデンとの比較として残す
+        if update:
+            for avatar in avatars:
+                self.update_golden(avatar, prepared[avatar.name])
+
+        report = {
+            'version': REPORT_VERSION,
+            'golden_dir': self.suite.golden_dir,
+            'updated': update,
+            'tolerance': self.suite.tolerance,
+            'options': self.suite.render_options,
+            'avatars': results,
+            'counts': {status: sum(r['counts'][status] for r in results) for status in STATUSES},
+            'elapsed': round(time.time() - start, 3),
+        }
+        _save_json(os.path.join(self.cache_dir, REPORT_NAME), report)
+        return report
@@ -0,0 +1,196 @@
+"""
+シェイプキーの検証レンダリング（ホスト側）
+
+blender/render_shape_keys.py を複数の `blender --background` に分けて起動し、
+シェイプキーを正面・側面・口元アップでレンダリングする。キーはワーカーに
+順番に配り、Blender 内部のスレッド数はコアをワーカー間で分け合う。
+最後にタイルをコンタクトシート（行 = キー、列 = ビュー）にまとめ、
+キーとタイルの対応を index.json に書き出す。
+"""
+import json
+import os
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import progress
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+RENDER_SCRIPT = os.path.join(REPO_DIR, 'blender', 'render_shape_keys.py')
+
+BASIS_ROW = 'Basis'
+DEFAULT_VIEWS = ('front', 'side', 'closeup')
+INDEX_NAME = 'index.json'
+SHEET_NAME = 'contact_sheet.png'
+
+
+class RenderError(Exception):
+    """Blender でのレンダリングに失敗"""
+
+
+def run_blender(blender, script_args, blend=None, threads=None, on_event=None, log_path=None):
+    """render_shape_keys.py を 1 回実行し、進捗イベントのリストを返す"""
+    cmd = [blender, '--background', '--factory-startup']
+    if blend:
+        cmd.append(blend)
+    if threads:
+        cmd += ['--threads', str(threads)]
+    cmd += ['--python', RENDER_SCRIPT, '--'] + list(script_args)
+
+    events = []
+    log = open(log_path, 'w', encoding='utf-8') if log_path else None
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                text=True, encoding='utf-8', errors='replace', bufsize=1)
+    except OSError as e:
+        if log:
+            log.close()
+        raise RenderError(f"Blender を起動できません: {e}")
+    try:
+        for line in proc.stdout:
+            event = progress.parse(line)
+            if event is None:
+                if log:
+                    log.write(line)
+                continue
+            events.append(event)
+            if on_event:
+                on_event(event)
+        returncode = proc.wait()
+    finally:
+        if log:
+            log.close()
+
+    failed = [e for e in events if e.get('event') == 'failed']
+    if failed:
+        raise RenderError(failed[-1].get('error', '不明なエラー'))
+    if returncode != 0 or not any(e.get('event') == 'done' for e in events):
+        raise RenderError(f"終了コード {returncode}")
+    return events
+
+
+def _object_args(obj_name):
+    """obj_name を省略したときは Blender 側でシェイプキーが最も多いメッシュを選ぶ"""
+    return ['--object', obj_name] if obj_name else []
+
+
+def _find_event(events, name):
+    for event in events:
+        if event.get('event') == name:
+            return event
+    return None
+
+
+def list_shape_keys(blend, obj_name=None, blender='blender'):
+    """blend 内のオブジェクトのシェイプキー名（基準キーを除く）"""
+    event = _find_event(run_blender(blender, ['list', *_object_args(obj_name)], blend=blend), 'keys')
+    if event is None:
+        raise RenderError("シェイプキーの一覧を取得できません")
+    return event['keys']
+
+
+def inspect_mesh(blend, obj_name=None, blender='blender', log_path=None):
+    """メッシュのハッシュとシェイプキーごとの変位の統計（'mesh' イベントの内容）"""
+    events = run_blender(blender, ['inspect', *_object_args(obj_name)], blend=blend, log_path=log_path)
+    event = _find_event(events, 'mesh')
+    if event is None:
+        raise RenderError("メッシュの情報を取得できません")
+    return event
+
+
+def compare_images(pairs, blender='blender', log_path=None):
+    """
+    画像の組をまとめて 1 つの Blender で比べ、{id: 結果} を返す
+
+    pairs: [{'id', 'golden', 'current', 'diff'}, ...]。diff には差分のヒートマップを書く
+    """
+    if not pairs:
+        return {}
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8') as f:
+        json.dump(pairs, f, ensure_ascii=False)
+        pairs_path = f.name
+    try:
+        events = run_blender(blender, ['compare', '--pairs', pairs_path], log_path=log_path)
+    finally:
+        os.unlink(pairs_path)
+    return {event['id']: {k: v for k, v in event.items() if k not in ('event', 'id')}
+            for event in events if event.get('event') == 'diff'}
+
+
+def split_keys(keys, workers):
+    """キーをワーカーに順番に配る（負荷を均すため連続した塊にしない）"""
+    chunks = [keys[i::workers] for i in range(workers)]
+    return [chunk for chunk in chunks if chunk]
+
+
+def render_shape_keys(blend, out_dir, obj_name=None, keys=None,
+                      views=DEFAULT_VIEWS, engine='workbench', resolution=384,
+                      workers=None, blender='blender', sheet=True, on_event=None):
+    """
+    シェイプキーを並列にレンダリングし、索引（index.json の内容）を返す
+
+    keys を省略すると Basis と全シェイプキー。obj_name を省略するとシェイプキーが
+    最も多いメッシュ。on_event(worker番号, イベント) で進捗を受け取る。
+    """
+    start = time.time()
+    if keys is None:
+        keys = [BASIS_ROW] + list_shape_keys(blend, obj_name, blender)
+    if not keys:
+        raise RenderError("レンダリングするシェイプキーがありません")
+    out_dir = os.path.abspath(out_dir)
+    tiles_dir = os.path.join(out_dir, 'tiles')
+    log_dir = os.path.join(out_dir, 'logs')
+    os.makedirs(tiles_dir, exist_ok=True)
+    os.makedirs(log_dir, exist_ok=True)
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(keys)))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    chunks = split_keys(list(keys), workers)
+
+    def run(index, chunk):
+        args = ['render', *_object_args(obj_name), '--out', tiles_dir,
+                '--views', *views, '--engine', engine, '--resolution', str(resolution),
+                '--keys', *chunk]
+        callback = (lambda event: on_event(index, event)) if on_event else None
+        return run_blender(blender, args, blend=blend, threads=threads, on_event=callback,
+                           log_path=os.path.join(log_dir, f"worker{index}.log"))
+
+    tiles = {}
+    elapsed = {}
+    with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+        futures = [pool.submit(run, i, chunk) for i, chunk in enumerate(chunks)]
+        for future in futures:
+            for event in future.result():
+                if event.get('event') == 'tile':
+                    tiles[event['key']] = {view: os.path.relpath(path, out_dir)
+                                           for view, path in event['tiles'].items()}
+                    elapsed[event['key']] = event.get('elapsed', 0.0)
+
+    index = {
+        'blend': os.path.abspath(blend),
+        'object': obj_name,
+        'views': list(views),
+        'engine': engine,
+        'resolution': resolution,
+        'workers': len(chunks),
+        'rows': [{'key': key, 'tiles': tiles[key], 'elapsed': elapsed[key]} for key in keys],
+        'sheet': None,
+    }
+
+    if sheet:
+        rows = [[os.path.join(out_dir, row['tiles'][view]) for view in views] for row in index['rows']]
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8') as f:
+            json.dump(rows, f, ensure_ascii=False)
+            rows_path = f.name
+        try:
+            run_blender(blender, ['sheet', '--rows', rows_path, '--out', os.path.join(out_dir, SHEET_NAME)],
+                        log_path=os.path.join(log_dir, 'sheet.log'))
+        finally:
+            os.unlink(rows_path)
+        index['sheet'] = SHEET_NAME
+
+    index['elapsed'] = round(time.time() - start, 3)
+    with open(os.path.join(out_dir, INDEX_NAME), 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    return index
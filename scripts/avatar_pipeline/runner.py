@@ -0,0 +1,157 @@
+"""
+Blender ワーカープール
+
+ジョブごとに `blender --background` を1プロセス起動し、同時実行数は
+CPU コア数（またはジョブ数の少ない方）に合わせる。ワーカーの標準出力を
+1行ずつ読み、進捗イベントはコールバックへ、それ以外はジョブのログへ流す。
+失敗・タイムアウトしたジョブは指定回数まで再試行する。
+"""
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+from . import progress
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'worker.py')
+
+
+@dataclass
+class JobResult:
+    name: str
+    ok: bool
+    attempts: int = 0
+    elapsed: float = 0.0
+    size: int = 0
+    error: str = ''
+    stages: dict = field(default_factory=dict)
+    deps: list = field(default_factory=list)
+    log_path: str = ''
+
+
+class BatchRunner:
+    """マニフェストのジョブを Blender ワーカーで並列実行する"""
+
+    def __init__(self, blender='blender', workers=None, retries=1, timeout=None,
+                 log_dir=None, on_event=None):
+        self.blender = blender
+        self.workers = workers or os.cpu_count() or 1
+        self.retries = retries
+        self.timeout = timeout
+        self.log_dir = log_dir
+        self.on_event = on_event or (lambda name, event: None)
+
+    def run(self, jobs):
+        """全ジョブを実行し、マニフェスト順の JobResult リストを返す"""
+        if not jobs:
+            return []
+        workers = min(self.workers, len(jobs))
+        # Blender 内部のスレッド数はコアをワーカー間で分け合う
+        threads = max(1, (os.cpu_count() or 1) // workers)
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(self._run_with_retry, job, threads): job for job in jobs}
+            for future in as_completed(futures):
+                result = future.result()
+                results[result.name] = result
+        return [results[job.name] for job in jobs]
+
+    def _run_with_retry(self, job, threads):
+        result = JobResult(name=job.name, ok=False)
+        start = time.time()
+        for attempt in range(1, self.retries + 2):
+            result.attempts = attempt
+            self.on_event(job.name, {'event': 'start', 'attempt': attempt})
+            ok, info = self._run_once(job, threads, attempt)
+            result.stages.update(info.get('stages', {}))
+            result.log_path = info.get('log_path', '')
+            result.deps = info.get('deps', [])
+            if ok:
+                result.ok = True
+                result.size = info.get('size', 0)
+                result.error = ''
+                break
+            result.error = info.get('error', '不明なエラー')
+            if attempt <= self.retries:
+                delay = min(2 ** (attempt - 1), 30)
+                self.on_event(job.name, {'event': 'retry', 'attempt': attempt,
+                                         'error': result.error, 'delay': delay})
+                time.sleep(delay)
+        result.elapsed = time.time() - start
+        self.on_event(job.name, {'event': 'finished', 'ok': result.ok,
+                                 'elapsed': result.elapsed, 'size': result.size,
+                                 'error': result.error})
+        return result
+
+    def _run_once(self, job, threads, attempt):
+        """ワーカーを1回起動する。(成功したか, 付加情報) を返す"""
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False,
+                                         encoding='utf-8') as f:
+            json.dump(job.to_dict(), f, ensure_ascii=False)
+            job_path = f.name
+
+        cmd = [self.blender, '--background', '--factory-startup',
+               '--threads', str(threads),
+               '--python', WORKER_SCRIPT, '--', job_path]
+        info = {'stages': {}}
+        log = None
+        if self.log_dir:
+            os.makedirs(self.log_dir, exist_ok=True)
+            info['log_path'] = os.path.join(self.log_dir, f"{job.name}.log")
+            log = open(info['log_path'], 'a' if attempt > 1 else 'w', encoding='utf-8')
+
+        timed_out = threading.Event()
+        try:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                    text=True, encoding='utf-8', errors='replace', bufsize=1)
+        except OSError as e:
+            os.unlink(job_path)
+            if log:
+                log.close()
+            return False, {**info, 'error': f"Blender を起動できません: {e}"}
+
+        timer = None
+        if self.timeout:
+            def kill():
+                timed_out.set()
+                proc.kill()
+            timer = threading.Timer(self.timeout, kill)
+            timer.start()
+
+        try:
+            for line in proc.stdout:
+                event = progress.parse(line)
+                if event is None:
+                    if log:
+                        log.write(line)
+                    continue
+                kind = event.get('event')
+                if kind == 'stage_done':
+                    info['stages'][event['stage']] = event.get('elapsed', 0.0)
+                elif kind == 'deps':
+                    info['deps'] = event.get('files', [])
+                elif kind == 'done':
+                    info['size'] = event.get('size', 0)
+                elif kind == 'failed':
+                    info['error'] = event.get('error', '')
+                self.on_event(job.name, event)
+            returncode = proc.wait()
+        finally:
+            if timer:
+                timer.cancel()
+            if log:
+                log.close()
+            os.unlink(job_path)
+
+        if timed_out.is_set():
+            info['error'] = f"タイムアウト（{self.timeout}秒）"
+            return False, info
+        if returncode != 0 or 'size' not in info:
+            info.setdefault('error', f"終了コード {returncode}")
+            return False, info
+        return True, info
@@ -0,0 +1,131 @@
+"""
+テクスチャの内容ハッシュ索引
+
+同じ内容の画像ファイル（Max / Maya / Unity など書き出し先ごとのコピー）を
+SHA-256 でまとめ、グループごとに正規のファイルを 1 つ決める。
+サイズが他と重ならないファイルは重複しようがないのでハッシュを取らず、
+ハッシュは (サイズ, 更新時刻) ごとに記録して次回は読み直さない。
+標準ライブラリだけで動くため、Blender 内でもホスト側でも使える。
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import hash_file
+
+INDEX_VERSION = 1
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tga', '.tif', '.tiff', '.bmp', '.webp', '.exr', '.hdr')
+
+
+def _canonical_order(path):
+    # 浅い階層・短いパスを正規とする（同じなら名前順）
+    return path.count(os.sep), len(path), path
+
+
+class TextureIndex:
+    """画像ファイルのパス → 内容ハッシュ"""
+
+    def __init__(self, path=None):
+        self.path = path
+        # files[abspath] = {'size', 'mtime', 'hash'}（hash はサイズが重なるときだけ）
+        self.files = {}
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION:
+                self.files = data['files']
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'files': self.files}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+    # --- 走査 ---
+
+    def scan(self, roots, workers=None):
+        """roots 以下の画像を登録し直す（消えたファイルは索引から外す）"""
+        found = {}
+        for root in roots:
+            for dirpath, _, filenames in os.walk(root):
+                for filename in filenames:
+                    if filename.lower().endswith(IMAGE_EXTENSIONS):
+                        path = os.path.abspath(os.path.join(dirpath, filename))
+                        st = os.stat(path)
+                        found[path] = (st.st_size, st.st_mtime)
+        roots = [os.path.abspath(root) + os.sep for root in roots]
+        for path in list(self.files):
+            if path not in found and any(path.startswith(root) for root in roots):
+                del self.files[path]
+        for path, (size, mtime) in found.items():
+            entry = self.files.get(path)
+            if entry is None or entry['size'] != size or entry['mtime'] != mtime:
+                self.files[path] = {'size': size, 'mtime': mtime}
+        self._hash_collisions(workers)
+        return len(found)
+
+    def _hash_collisions(self, workers=None):
+        """サイズが重なるファイルのうち、未計算のものだけハッシュを取る"""
+        by_size = {}
+        for path, entry in self.files.items():
+            by_size.setdefault(entry['size'], []).append(path)
+        pending = [path for paths in by_size.values() if len(paths) > 1
+                   for path in paths if 'hash' not in self.files[path]]
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            for path, digest in zip(pending, pool.map(hash_file, pending)):
+                self.files[path]['hash'] = digest
+
+    def hash(self, path):
+        """1 ファイルのハッシュ（索引にあれば再利用）"""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        entry = self.files.get(path)
+        if entry and entry['size'] == st.st_size and entry['mtime'] == st.st_mtime and 'hash' in entry:
+            return entry['hash']
+        digest = hash_file(path)
+        self.files[path] = {'size': st.st_size, 'mtime': st.st_mtime, 'hash': digest}
+        return digest
+
+    # --- 重複 ---
+
+    def groups(self):
+        """内容ハッシュ → 同じ内容のパス（正規のファイルが先頭、2 件以上のものだけ）"""
+        groups = {}
+        for path, entry in self.files.items():
+            if 'hash' in entry:
+                groups.setdefault(entry['hash'], []).append(path)
+        return {digest: sorted(paths, key=_canonical_order)
+                for digest, paths in groups.items() if len(paths) > 1}
+
+    def canonical_map(self):
+        """重複ファイルのパス → 正規のファイルのパス"""
+        mapping = {}
+        for paths in self.groups().values():
+            for path in paths[1:]:
+                mapping[path] = paths[0]
+        return mapping
+
+    def canonical(self, path):
+        """path と同じ内容の正規のファイル（索引に重複がなければ path のまま）"""
+        path = os.path.abspath(path)
+        digest = self.hash(path)
+        size = self.files[path]['size']
+        same = [p for p, entry in list(self.files.items())
+                if entry['size'] == size and os.path.exists(p) and self.hash(p) == digest]
+        return min(same, key=_canonical_order)
+
+    def summary(self):
+        """ファイル数・ユニーク数・削減できるバイト数"""
+        groups = self.groups()
+        duplicates = sum(len(paths) - 1 for paths in groups.values())
+        reclaimed = sum(self.files[paths[0]]['size'] * (len(paths) - 1) for paths in groups.values())
+        return {
+            'files': len(self.files),
+            'unique': len(self.files) - duplicates,
+            'groups': len(groups),
+            'duplicates': duplicates,
+            'total_bytes': sum(entry['size'] for entry in self.files.values()),
+            'reclaimed_bytes': reclaimed,
+        }
@@ -0,0 +1,158 @@
+"""
+テクスチャ最適化ステージ（Blender 内で実行）
+
+マテリアルのノードを辿って各画像の用途（アルベド・法線・ラフネスなど）を
+判定し、用途ごとの最大解像度まで縮小する。アルファを使っていない画像は
+アルファを捨て、処理した画像は .blend にパックする（チェックポイントにも残る）。
+エンコード形式（WebP / JPEG）はエクスポーターのオプションで指定し、
+KTX2 はエクスポート後に ktx2.py で変換する。
+同じ内容の画像データブロックは dedup_images で 1 つにまとめる。
+"""
+import hashlib
+import os
+
+import numpy as np
+
+import bpy
+
+# Principled BSDF の入力ソケット → 用途
+SOCKET_MAP_TYPES = {
+    'Base Color': 'albedo',
+    'Alpha': 'alpha',
+    'Normal': 'normal',
+    'Roughness': 'roughness',
+    'Metallic': 'metallic',
+    'Emission': 'emission',
+    'Emission Color': 'emission',
+    'Occlusion': 'occlusion',  # glTF Material Output グループ
+}
+
+# ノードを辿る最大の深さ（Mix / Gamma / Normal Map などの中継ノード分）
+MAX_DEPTH = 6
+
+
+def image_usages(materials=None):
+    """画像ごとに用途の集合とアルファを使うかを調べる"""
+    usages = {}
+    for mat in materials if materials is not None else bpy.data.materials:
+        if not mat.use_nodes or mat.node_tree is None:
+            continue
+        for node in mat.node_tree.nodes:
+            if node.type != 'TEX_IMAGE' or node.image is None:
+                continue
+            types = set()
+            uses_alpha = node.outputs['Alpha'].is_linked
+            stack = [(link, 0) for output in node.outputs for link in output.links]
+            while stack:
+                link, depth = stack.pop()
+                target = link.to_node
+                map_type = SOCKET_MAP_TYPES.get(link.to_socket.name)
+                if target.type in ('BSDF_PRINCIPLED', 'GROUP') and map_type:
+                    types.add(map_type)
+                    continue
+                if target.type == 'NORMAL_MAP':
+                    types.add('normal')
+                    continue
+                if depth < MAX_DEPTH:
+                    stack.extend((next_link, depth + 1)
+                                 for output in target.outputs for next_link in output.links)
+            info = usages.setdefault(node.image.name, {'types': set(), 'alpha': False})
+            info['types'] |= (types - {'alpha'}) or {'other'}
+            info['alpha'] |= uses_alpha or 'alpha' in types
+    return usages
+
+
+def target_size(image, max_size):
+    """長辺を max_size 以下にしたときのサイズ（縮小不要なら None）"""
+    width, height = image.size
+    longest = max(width, height)
+    if not max_size or longest <= max_size:
+        return None
+    scale = max_size / longest
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def strip_alpha(image):
+    """アルファを 1 で埋め、アルファなしとして扱わせる"""
+    pixels = np.empty(len(image.pixels), dtype=np.float32)
+    image.pixels.foreach_get(pixels)
+    pixels.reshape(-1, image.channels)[:, 3] = 1.0
+    image.pixels.foreach_set(pixels)
+    image.alpha_mode = 'NONE'
+
+
+def optimize_textures(options):
+    """
+    用途ごとに画像を縮小・アルファ除去してパックする
+
+    options: export_options.DEFAULT_TEXTURE_OPTIONS と同じ形式
+    戻り値: 画像ごとの処理結果のリスト
+    """
+    max_sizes = options.get('max_size', {})
+    report = []
+    for name, info in image_usages().items():
+        image = bpy.data.images.get(name)
+        if image is None or image.size[0] == 0:
+            continue
+        types = info['types']
+        # 複数の用途がある画像は最も高い解像度を必要とする用途に合わせる
+        max_size = max((max_sizes.get(t, max_sizes.get('other', 0)) for t in types), default=0)
+        before = tuple(image.size)
+        size = target_size(image, max_size)
+        changed = False
+        if size:
+            image.scale(*size)
+            changed = True
+        # depth はピクセルあたりのビット数（32 / 128 ならアルファ付き）
+        if options.get('strip_alpha', True) and not info['alpha'] and image.depth in (32, 128):
+            strip_alpha(image)
+            changed = True
+        if changed:
+            image.pack()
+        report.append({
+            'image': name,
+            'types': sorted(types),
+            'before': before,
+            'after': tuple(image.size),
+            'changed': changed,
+        })
+        status = "縮小" if size else ("アルファ除去" if changed else "そのまま")
+        print(f"  {name} [{', '.join(sorted(types))}] "
+              f"{before[0]}x{before[1]} → {image.size[0]}x{image.size[1]} ({status})")
+    return report
+
+
+def dedup_images(index):
+    """
+    同じ内容の画像データブロックを 1 つにまとめ、正規のファイルを参照させる
+
+    index: texture_index.TextureIndex（外部ファイルのハッシュと正規のファイルを引く）
+    戻り値: (削除したデータブロック数, 削減したバイト数)
+    """
+    groups = {}
+    for image in bpy.data.images:
+        if image.source != 'FILE':
+            continue
+        if image.packed_file:
+            data = image.packed_file.data
+            digest, path, size = hashlib.sha256(data).hexdigest(), None, len(data)
+        else:
+            path = bpy.path.abspath(image.filepath)
+            if not os.path.isfile(path):
+                continue
+            path = index.canonical(path)
+            digest, size = index.hash(path), os.path.getsize(path)
+        groups.setdefault(digest, []).append((image, path, size))
+
+    removed = saved = 0
+    for members in groups.values():
+        keep, path, size = members[0]
+        if path and os.path.normpath(bpy.path.abspath(keep.filepath)) != path:
+            keep.filepath = path
+        for image, _, _ in members[1:]:
+            print(f"  {image.name} → {keep.name}")
+            image.user_remap(keep)
+            bpy.data.images.remove(image)
+            removed += 1
+            saved += size
+    return removed, saved
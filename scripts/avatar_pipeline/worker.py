@@ -0,0 +1,345 @@
+"""
+Blender 内で1ジョブを実行するワーカー
+
+    blender --background --factory-startup --python scripts/avatar_pipeline/worker.py -- job.json
+
+job.json は manifest.Job.to_dict() の内容。読み込み → 前処理ステージ →
+エクスポート（→ LOD ごとの間引きとエクスポート）の順に実行し、各ステージの
+開始・完了を progress.emit で通知する。
+"""
+import json
+import os
+import sys
+import time
+import traceback
+
+import bpy
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPTS_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(SCRIPTS_DIR), 'blender'))
+
+from avatar_pipeline import compression  # noqa: E402
+from avatar_pipeline.export_options import texture_export_options  # noqa: E402
+from avatar_pipeline.progress import emit  # noqa: E402
+
+# convert_fbx_to_glb.py で追加していたリップシンク用のプレースホルダー
+PLACEHOLDER_SHAPE_KEYS = [
+    'mouthOpen', 'mouthSmile', 'mouthFrown', 'mouthPucker', 'mouthWide',
+    'mouthPress', 'mouthDimple', 'mouthLeft', 'mouthRight',
+    'mouthShrugUpper', 'mouthShrugLower', 'mouthClose',
+    'jawOpen', 'jawLeft', 'jawRight', 'jawForward', 'tongueOut',
+]
+
+
+# --- 読み込み ---
+
+def load_input(path, import_scale=1.0):
+    """入力ファイルを空のシーンに読み込む"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.blend':
+        bpy.ops.wm.open_mainfile(filepath=path)
+    else:
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+        if ext == '.fbx':
+            bpy.ops.import_scene.fbx(filepath=path)
+        elif ext in ('.glb', '.gltf'):
+            bpy.ops.import_scene.gltf(filepath=path)
+        elif ext == '.obj':
+            bpy.ops.wm.obj_import(filepath=path)
+        else:
+            raise ValueError(f"未対応の入力形式: {path}")
+
+    if import_scale != 1.0:
+        # FBX は cm 単位のことが多いため、スケールを掛けて適用する
+        objects = list(bpy.context.scene.objects)
+        for obj in objects:
+            obj.scale = [s * import_scale for s in obj.scale]
+        bpy.ops.object.select_all(action='DESELECT')
+        for obj in objects:
+            obj.select_set(True)
+        if objects:
+            bpy.context.view_layer.objects.active = objects[0]
+            bpy.ops.object.transform_apply(location=False, rotation=False, scale=True)
+
+
+# --- 前処理ステージ ---
+
+def stage_materials(job):
+    """マテリアルを glTF 互換（Principled BSDF）に揃える"""
+    from convert_blend_to_glb_v4 import setup_materials
+    setup_materials()
+
+
+def stage_placeholder_shape_keys(job):
+    """リップシンク用のシェイプキーが無いメッシュにプレースホルダーを追加"""
+    added = 0
+    for obj in bpy.context.scene.objects:
+        if obj.type != 'MESH':
+            continue
+        if obj.data.shape_keys is None:
+            obj.shape_key_add(name='Basis', from_mix=False)
+        key_blocks = obj.data.shape_keys.key_blocks
+        for name in PLACEHOLDER_SHAPE_KEYS:
+            if name not in key_blocks:
+                obj.shape_key_add(name=name, from_mix=False).value = 0.0
+                added += 1
+    print(f"プレースホルダーのシェイプキーを {added} 個追加")
+
+
+def stage_pack_textures(job):
+    """外部テクスチャを .blend にパックする"""
+    bpy.ops.file.pack_all()
+
+
+def stage_optimize_textures(job):
+    """用途ごとにテクスチャを縮小し、不要なアルファを捨てる"""
+    from avatar_pipeline.textures import optimize_textures
+    optimize_textures(job['textures'])
+
+
+def stage_dedup_textures(job):
+    """同じ内容の画像を 1 つにまとめ、正規のファイルを参照させる"""
+    from avatar_pipeline.texture_index import TextureIndex
+    from avatar_pipeline.textures import dedup_images
+    removed, saved = dedup_images(TextureIndex(job.get('texture_index') or None))
+    print(f"重複テクスチャを {removed} 個統合（{saved / 1024 / 1024:.2f} MB 削減）")
+
+
+def stage_consolidate(job):
+    """静的なメッシュの結合と小さなテクスチャのアトラス化でドローコールを減らす"""
+    from avatar_pipeline.consolidate import consolidate
+    report = consolidate(job.get('consolidate'))
+    for name, reason in sorted(report['kept'].items()):
+        print(f"  {name}: そのまま（{reason}）")
+    before, after = report['before'], report['after']
+    print(f"consolidate: メッシュ {before['meshes']} → {after['meshes']}、"
+          f"ドローコール {before['draw_calls']} → {after['draw_calls']}、"
+          f"マテリアル {before['materials']} → {after['materials']}、"
+          f"画像 {before['images']} → {after['images']}")
+    emit('draw_calls', before=before, after=after)
+
+
+STAGES = {
+    'materials': stage_materials,
+    'placeholder_shape_keys': stage_placeholder_shape_keys,
+    'pack_textures': stage_pack_textures,
+    'optimize_textures': stage_optimize_textures,
+    'dedup_textures': stage_dedup_textures,
+    'consolidate': stage_consolidate,
+}
+
+# Blender のバージョンによって名前が異なるエクスポートオプション
+OPTION_ALIASES = [
+    ('use_selection', 'export_selected'),
+    ('export_image_quality', 'export_jpeg_quality'),
+]
+
+
+# --- エクスポート ---
+
+def supported_export_options(options):
+    """実行中の Blender のエクスポーターが受け付けるオプションだけを残す"""
+    known = set(bpy.ops.export_scene.gltf.get_rna_type().properties.keys())
+    result = {}
+    for key, value in options.items():
+        if key not in known:
+            # 別バージョンの名前に読み替える
+            for names in OPTION_ALIASES:
+                if key in names:
+                    key = next((name for name in names if name in known), key)
+        if key in known:
+            result[key] = value
+        else:
+            print(f"⚠️  このBlenderでは未対応のエクスポートオプションを無視: {key}")
+    return result
+
+
+def export_glb(path, options):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    bpy.ops.export_scene.gltf(filepath=path, **supported_export_options(options))
+
+
+# --- 実行 ---
+
+def shape_key_meshes():
+    """圧縮の検証用に、リップシンク用シェイプキーを持つメッシュの基準形状と差分を集める"""
+    from avatar_tools.shape_keys import read_coords
+    meshes = []
+    for obj in bpy.context.scene.objects:
+        if obj.type != 'MESH' or obj.data.shape_keys is None:
+            continue
+        reference = obj.data.shape_keys.reference_key
+        base = read_coords(obj.data.vertices)
+        deltas = {kb.name: read_coords(kb.data) - read_coords(reference.data)
+                  for kb in obj.data.shape_keys.key_blocks
+                  if kb != reference and compression.is_lipsync_key(kb.name)}
+        if deltas:
+            meshes.append((obj.name, base, deltas, max(obj.matrix_world.to_scale())))
+    return meshes
+
+
+def validate_compression(options):
+    """リップシンク用シェイプキーの量子化誤差が許容値に収まるビット数を決める"""
+    bits, worst = compression.validate(shape_key_meshes(), options)
+    if worst is None:
+        print("リップシンク用シェイプキーがないため誤差の検証を省略")
+    else:
+        if bits != options['position_bits']:
+            print(f"⚠️  位置の量子化を {options['position_bits']} → {bits} bit に増やしました")
+        print(f"最大誤差 {worst['max_error'] * 1000:.3f} mm（{worst['mesh']} / {worst['key']}、{bits} bit）")
+    if bits is not None:
+        options['position_bits'] = bits
+
+
+# --- エクスポート後の処理（GLB を書き換える） ---
+
+def post_passes(job):
+    """エクスポート後に GLB へ適用するパス（postprocess.PASSES の名前）"""
+    passes = list(job.get('post_stages', []))
+    if (job.get('compression') or {}).get('profile') == 'quantize' and 'quantize' not in passes:
+        passes.append('quantize')
+    textures = job.get('textures', {})
+    if 'optimize_textures' in job.get('stages', []) and textures.get('format') == 'KTX2':
+        passes.append('ktx2')
+    return passes
+
+
+def postprocess(path, passes, job):
+    """GLB を 1 回読み、パスを順に適用して 1 回で書き出す"""
+    from avatar_pipeline.postprocess import run_passes
+
+    def report(result):
+        delta = result['after'] - result['before']
+        print(f"{result['pass']}: {result['message']}（{delta / 1024:+,.0f} KB、{result['elapsed']:.2f}s）")
+        emit('post_pass', **result)
+
+    _, before, after = run_passes(path, passes, job, on_pass=report)
+    print(f"postprocess: {before / 1024 / 1024:.2f} MB → {after / 1024 / 1024:.2f} MB")
+
+
+def compress_meshopt(path, options):
+    before, after = compression.compress_meshopt(path, options)
+    print(f"meshopt: {before / 1024 / 1024:.2f} MB → {after / 1024 / 1024:.2f} MB")
+
+
+def referenced_files():
+    """読み込んだシーンが参照している外部ファイル（テクスチャ・ライブラリ）"""
+    files = set()
+    for image in bpy.data.images:
+        if image.packed_file is None and image.source in ('FILE', 'SEQUENCE', 'TILED') and image.filepath:
+            files.add(os.path.normpath(bpy.path.abspath(image.filepath, library=image.library)))
+    for library in bpy.data.libraries:
+        files.add(os.path.normpath(bpy.path.abspath(library.filepath)))
+    return sorted(files)
+
+
+def save_checkpoint(path):
+    """前処理済みのシーンを .blend として保存（キャッシュ用）"""
+    bpy.ops.wm.save_as_mainfile(filepath=path, copy=True, compress=False)
+
+
+def output_steps(job, path, options, geometry):
+    """path へのエクスポートと、その GLB に対するエクスポート後の処理"""
+    from avatar_pipeline.postprocess import check_passes
+    # 検証でビット数が変わることがあるので、オプションは実行時に組み立てる
+    steps = [('export', lambda: export_glb(path, {**options, **compression.export_options(geometry)}))]
+    passes = post_passes(job)
+    check_passes(passes)
+    if passes:
+        steps.append(('postprocess', lambda: postprocess(path, passes, job)))
+    if geometry['profile'] == 'meshopt':
+        steps.append(('meshopt', lambda: compress_meshopt(path, geometry)))
+    return steps
+
+
+def export_with_compression(path, options, profile=None):
+    """
+    マニフェストを使わないスクリプト用: 圧縮プロファイルを適用して path へエクスポートする
+
+    ジョブと同じく、誤差の検証 → エクスポート（draco）→ quantize パス / gltfpack（meshopt）
+    の順に実行する。profile は compression.merge_compression_options に渡す形。
+    """
+    geometry = compression.merge_compression_options(profile)
+    if geometry['profile'] != 'none':
+        validate_compression(geometry)
+    for _, func in output_steps({'compression': geometry}, path, options, geometry):
+        func()
+    return os.path.getsize(path)
+
+
+def make_lod(level, ratio):
+    """シーンを直前のレベルから ratio 倍に間引く"""
+    from avatar_pipeline.decimate import build_lod
+    report = build_lod(ratio, level.get('lipsync_only', False))
+    before, after = report['faces']
+    print(f"LOD{level['level']}: 面 {before:,} → {after:,}")
+    if report['removed_keys']:
+        print(f"LOD{level['level']}: リップシンク以外のシェイプキーを {report['removed_keys']} 個削除")
+
+
+def run_job(job):
+    """ジョブを実行し、出力ファイルのサイズを返す"""
+    if job.get('checkpoint_in'):
+        # 前処理済みのチェックポイントがあれば読み込みと前処理を省略する
+        steps = [('checkpoint', lambda: bpy.ops.wm.open_mainfile(filepath=job['checkpoint_in']))]
+    else:
+        def load():
+            load_input(job['input'], job.get('import_scale', 1.0))
+            emit('deps', files=referenced_files())
+
+        steps = [('load', load)]
+        for name in job.get('stages', []):
+            if name not in STAGES:
+                raise ValueError(f"未知のステージ: {name}")
+            steps.append((name, lambda stage=STAGES[name]: stage(job)))
+        if job.get('checkpoint_out'):
+            steps.append(('checkpoint', lambda: save_checkpoint(job['checkpoint_out'])))
+    options = dict(job.get('export', {}))
+    textures = job.get('textures', {})
+    if 'optimize_textures' in job.get('stages', []):
+        options.update(texture_export_options(textures))
+    geometry = dict(job.get('compression') or compression.merge_compression_options())
+    if geometry['profile'] != 'none':
+        steps.append(('validate_compression', lambda: validate_compression(geometry)))
+    steps += output_steps(job, job['output'], options, geometry)
+    previous = 1.0
+    for level in job.get('lods', []):
+        prefix = f"lod{level['level']}"
+        steps.append((prefix, lambda level=level, ratio=level['ratio'] / previous: make_lod(level, ratio)))
+        previous = level['ratio']
+        lod_options = {**options, **level.get('export', {})}
+        steps += [(f"{prefix}/{name}", func)
+                  for name, func in output_steps(job, level['output'], lod_options, geometry)]
+
+    for name, func in steps:
+        emit('stage', stage=name)
+        start = time.time()
+        func()
+        emit('stage_done', stage=name, elapsed=time.time() - start)
+    for level in job.get('lods', []):
+        emit('lod', level=level['level'], output=level['output'], size=os.path.getsize(level['output']))
+
+    return os.path.getsize(job['output'])
+
+
+def main():
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    if len(argv) != 1:
+        print("Usage: blender --background --python worker.py -- job.json")
+        sys.exit(2)
+
+    with open(argv[0], encoding='utf-8') as f:
+        job = json.load(f)
+
+    try:
+        size = run_job(job)
+    except Exception as e:
+        traceback.print_exc()
+        emit('failed', error=f"{type(e).__name__}: {e}")
+        sys.exit(1)
+    emit('done', output=job['output'], size=size)
+
+
+if __name__ == '__main__':
+    main()
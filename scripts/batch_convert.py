@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+アバターの一括GLB変換
+
+マニフェストに列挙したアセットを blender --background のワーカープールで
+並列に変換する。同時実行数の既定値は CPU コア数。
+入力・参照テクスチャ・スクリプト・オプションが前回から変わっていない
+アセットはキャッシュを使い、Blender を起動しない。
+
+    python3 scripts/batch_convert.py scripts/avatars.manifest.json
+    python3 scripts/batch_convert.py scripts/avatars.manifest.json --only adult-male boy -j 2
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from avatar_pipeline.cache import ExportCache
+from avatar_pipeline.lods import LODError, write_lod_index
+from avatar_pipeline.manifest import ManifestError, load_manifest, select_jobs
+from avatar_pipeline.runner import BatchRunner
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_print_lock = threading.Lock()
+
+
+def log(message):
+    with _print_lock:
+        print(message, flush=True)
+
+
+def format_size(size):
+    return f"{size / 1024 / 1024:.2f} MB"
+
+
+def print_event(name, event):
+    """ワーカーの進捗を1行ずつ表示"""
+    kind = event.get('event')
+    if kind == 'start' and event.get('attempt', 1) > 1:
+        log(f"[{name}] 再試行 {event['attempt']} 回目")
+    elif kind == 'stage':
+        log(f"[{name}] {event['stage']} ...")
+    elif kind == 'stage_done':
+        log(f"[{name}] {event['stage']} 完了 ({event.get('elapsed', 0):.1f}s)")
+    elif kind == 'draw_calls':
+        before, after = event['before'], event['after']
+        log(f"[{name}] ドローコール {before['draw_calls']} → {after['draw_calls']}"
+            f"（マテリアル {before['materials']} → {after['materials']}）")
+    elif kind == 'post_pass':
+        delta = event['after'] - event['before']
+        log(f"[{name}] {event['pass']}: {delta / 1024:+,.0f} KB ({event['elapsed']:.2f}s)")
+    elif kind == 'lod':
+        log(f"[{name}] LOD{event['level']}: {os.path.basename(event['output'])} {format_size(event['size'])}")
+    elif kind == 'retry':
+        log(f"[{name}] ⚠️  失敗: {event['error']}（{event['delay']}秒後に再試行）")
+    elif kind == 'finished':
+        if event['ok']:
+            log(f"[{name}] ✓ 完了 {format_size(event['size'])} ({event['elapsed']:.1f}s)")
+        else:
+            log(f"[{name}] ❌ 失敗: {event['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="アバターを並列にGLBへ変換")
+    parser.add_argument('manifest', help="変換マニフェスト（JSON）")
+    parser.add_argument('--only', nargs='+', metavar='NAME', help="指定したアセットだけを変換")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="同時に起動する Blender の数（既定: CPUコア数）")
+    parser.add_argument('--retries', type=int, default=1, help="失敗時の再試行回数")
+    parser.add_argument('--timeout', type=float, default=None, help="1ジョブのタイムアウト秒数")
+    parser.add_argument('--blender', default=os.environ.get('BLENDER', 'blender'), help="Blender の実行ファイル")
+    parser.add_argument('--log-dir', default=None, help="ワーカーのログ出力先（既定: logs/blender）")
+    parser.add_argument('--cache-dir', default=os.path.join(REPO_DIR, '.cache', 'avatar_pipeline'),
+                        help="エクスポートキャッシュの保存先")
+    parser.add_argument('--no-cache', action='store_true', help="キャッシュを使わずにすべて変換")
+    parser.add_argument('--force', action='store_true', help="すべて変換し直してキャッシュを更新")
+    args = parser.parse_args()
+
+    try:
+        jobs = select_jobs(load_manifest(args.manifest), args.only)
+    except (OSError, ManifestError) as e:
+        print(f"エラー: {e}")
+        sys.exit(2)
+
+    missing = [job for job in jobs if not os.path.exists(job.input)]
+    for job in missing:
+        print(f"⚠️  入力ファイルが見つかりません: {job.name} ({job.input})")
+    jobs = [job for job in jobs if job not in missing]
+    if not jobs:
+        print("エラー: 変換できるアセットがありません")
+        sys.exit(1)
+
+    start = time.time()
+
+    # キャッシュで済むアセットを除外し、残りだけをワーカーへ渡す
+    cache = None if args.no_cache else ExportCache(args.cache_dir)
+    plans = {}
+    pending = []
+    for job in jobs:
+        if cache is None:
+            pending.append(job)
+            continue
+        plan = cache.plan(job)
+        if args.force:
+            plan.action = 'full'
+        plans[job.name] = plan
+        if plan.action == 'up_to_date':
+            print(f"[{job.name}] ✓ 変更なし（スキップ）")
+        elif plan.action == 'restore':
+            cache.restore(job, plan)
+            print(f"[{job.name}] ✓ キャッシュから復元")
+        else:
+            if plan.action == 'export':
+                print(f"[{job.name}] 前処理済みのチェックポイントからエクスポート")
+            pending.append(cache.worker_job(job, plan))
+
+    log_dir = args.log_dir or os.path.join(REPO_DIR, 'logs', 'blender')
+    runner = BatchRunner(blender=args.blender, workers=args.jobs, retries=args.retries,
+                         timeout=args.timeout, log_dir=log_dir, on_event=print_event)
+
+    if pending:
+        print(f"\n=== {len(pending)}件のアセットを変換（ワーカー {min(runner.workers, len(pending))}） ===\n")
+    results = runner.run(pending)
+
+    if cache is not None:
+        for job, result in zip(pending, results):
+            if result.ok:
+                cache.record(job, plans[job.name], result.deps)
+        cache.save()
+    wall = time.time() - start
+
+    # フロントエンドが LOD を選ぶための索引を更新する
+    failed_names = {result.name for result in results if not result.ok}
+    lod_jobs = [job for job in jobs if job.lods and job.name not in failed_names]
+    for index_path in sorted({job.lod_index for job in lod_jobs}):
+        try:
+            write_lod_index([job for job in lod_jobs if job.lod_index == index_path], index_path)
+            print(f"✓ LOD 索引を更新: {index_path}")
+        except (OSError, ValueError, LODError) as e:
+            print(f"⚠️  LOD 索引を書き出せません: {e}")
+
+    print("\n=== 結果 ===")
+    for result in results:
+        status = "✓" if result.ok else "❌"
+        detail = format_size(result.size) if result.ok else result.error
+        print(f"{status} {result.name}: {detail} ({result.elapsed:.1f}s, 試行 {result.attempts}回)")
+        if not result.ok and result.log_path:
+            print(f"   ログ: {result.log_path}")
+
+    skipped = len(jobs) - len(pending)
+    if skipped:
+        print(f"キャッシュ済み: {skipped}件")
+
+    serial = sum(r.elapsed for r in results)
+    print(f"\n合計時間: {wall:.1f}s（直列実行なら {serial:.1f}s）")
+
+    failed = len(missing) + sum(not r.ok for r in results)
+    if failed:
+        print(f"❌ {failed}件が失敗しました")
+        sys.exit(1)
+    print("✅ すべて完了しました")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,13 +4,21 @@
 echo "Converting Man Grey Suit avatar from FBX to GLB format..."
 
 # Check if Blender is installed
-if ! command -v blender &> /dev/null; then
+if ! command -v "${BLENDER:-blender}" &> /dev/null; then
     echo "Error: Blender is not installed or not in PATH"
     echo "Please install Blender from https://www.blender.org/download/"
     exit 1
 fi
 
-# Run the conversion script
-blender --background --python ../blender/convert_fbx_to_glb.py
+# Source assets live outside the repository
+if [ -z "$AVATAR_SOURCE_DIR" ]; then
+    echo "Error: AVATAR_SOURCE_DIR is not set"
+    echo "Set it to the directory that contains the source .blend/.fbx files"
+    exit 1
+fi
+
+# Run the conversion through the batch converter (see scripts/avatars.manifest.json)
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
+python3 "$SCRIPT_DIR/batch_convert.py" "$SCRIPT_DIR/avatars.manifest.json" --only man-grey-suit "$@"
 
-echo "Conversion process completed!"
\ No newline at end of file
+echo "Conversion process completed!"
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+テクスチャの重複を調べて内容ハッシュの索引を作る
+
+public/models 以下のテクスチャフォルダ（Max / Maya などのコピーを含む）を
+走査し、同じ内容の画像をまとめて正規のファイルを決める。索引は
+batch_convert.py の dedup_textures ステージが読み、マテリアルの画像参照を
+正規のファイルに付け替える。
+
+    python3 scripts/dedup_textures.py
+    python3 scripts/dedup_textures.py public/models/成人男性textures --top 20 --map dedup_map.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from avatar_pipeline.texture_index import TextureIndex
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_INDEX = os.path.join(REPO_DIR, '.cache', 'avatar_pipeline', 'texture_index.json')
+
+
+def format_size(size):
+    return f"{size / 1024 / 1024:.2f} MB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="テクスチャの重複を調べる")
+    parser.add_argument('roots', nargs='*', default=[os.path.join(REPO_DIR, 'public', 'models')],
+                        help="走査するフォルダ（既定: public/models）")
+    parser.add_argument('--index', default=DEFAULT_INDEX, help="索引の保存先")
+    parser.add_argument('--top', type=int, default=10, help="削減量の大きい重複グループを表示する件数")
+    parser.add_argument('--map', metavar='PATH', help="重複ファイル → 正規ファイルの対応を JSON で書き出す")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="ハッシュ計算の並列数")
+    args = parser.parse_args()
+
+    for root in args.roots:
+        if not os.path.isdir(root):
+            print(f"エラー: フォルダが見つかりません: {root}")
+            sys.exit(2)
+
+    start = time.time()
+    index = TextureIndex(args.index)
+    count = index.scan(args.roots, workers=args.jobs)
+    index.save()
+    print(f"✓ {count}件の画像を走査 ({time.time() - start:.1f}s)")
+
+    groups = sorted(index.groups().values(),
+                    key=lambda paths: index.files[paths[0]]['size'] * (len(paths) - 1), reverse=True)
+    if groups and args.top:
+        print(f"\n=== 重複の大きいグループ（上位 {min(args.top, len(groups))}件） ===")
+        for paths in groups[:args.top]:
+            size = index.files[paths[0]]['size']
+            print(f"\n{format_size(size * (len(paths) - 1))} 削減 ({len(paths)}件 × {format_size(size)})")
+            print(f"  正規: {os.path.relpath(paths[0], REPO_DIR)}")
+            for path in paths[1:]:
+                print(f"  重複: {os.path.relpath(path, REPO_DIR)}")
+
+    if args.map:
+        mapping = {os.path.relpath(dup, REPO_DIR): os.path.relpath(canonical, REPO_DIR)
+                   for dup, canonical in sorted(index.canonical_map().items())}
+        with open(args.map, 'w', encoding='utf-8') as f:
+            json.dump(mapping, f, ensure_ascii=False, indent=2)
+        print(f"\n✓ 対応表を保存: {args.map}")
+
+    summary = index.summary()
+    print("\n=== 結果 ===")
+    print(f"画像: {summary['files']}件（ユニーク {summary['unique']}件）")
+    print(f"重複: {summary['duplicates']}件 / {summary['groups']}グループ")
+    print(f"合計: {format_size(summary['total_bytes'])}")
+    print(f"削減できる容量: {format_size(summary['reclaimed_bytes'])}")
+    print(f"索引: {args.index}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,49 +1,33 @@
 #!/usr/bin/env python3
 """
 Blenderファイルをglb形式にエクスポートするスクリプト
+
+複数のアバターをまとめて変換する場合は batch_convert.py を使用する。
 """
 
-import bpy
-import sys
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from avatar_pipeline.export_options import merge_export_options
+from avatar_pipeline.worker import export_glb, load_input
 
 def export_avatar_to_glb():
-    # 引数からBlenderファイルのパスを取得
-    if len(sys.argv) < 6:
+    # 引数（-- 以降）からBlenderファイルと出力先のパスを取得
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    if len(argv) < 2:
         print("Usage: blender --background --python export_blender_avatar.py -- input.blend output.glb")
         sys.exit(1)
     
-    input_path = sys.argv[5]
-    output_path = sys.argv[6]
+    input_path, output_path = argv[0], argv[1]
     
     # Blenderファイルを開く
-    bpy.ops.wm.open_mainfile(filepath=input_path)
-    
-    # シーン内のすべてのオブジェクトを選択
-    bpy.ops.object.select_all(action='SELECT')
+    load_input(input_path)
     
-    # GLB形式でエクスポート
-    bpy.ops.export_scene.gltf(
-        filepath=output_path,
-        export_format='GLB',
-        export_selected=False,
-        export_apply=True,
-        export_animations=True,
-        export_morph=True,
-        export_skins=True,
-        export_materials='EXPORT',
-        export_colors=True,
-        export_cameras=False,
-        export_lights=False,
-        export_extras=True,
-        export_yup=True,
-        export_tangents=True,
-        export_normals=True,
-        export_draco_mesh_compression_enable=False,
-        export_optimize_animation_size=True
-    )
+    # GLB形式でエクスポート（シーン内のすべてのオブジェクト）
+    export_glb(output_path, merge_export_options())
     
     print(f"Successfully exported {input_path} to {output_path}")
 
 if __name__ == "__main__":
-    export_avatar_to_glb()
\ No newline at end of file
+    export_avatar_to_glb()
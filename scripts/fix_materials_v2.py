@@ -1,10 +1,26 @@
 #!/usr/bin/env python3
 """
 ClassicMan.blendのマテリアルを修正してGLBエクスポート（Blender 4.x対応）
+
+    blender ClassicMan.blend --background --python scripts/fix_materials_v2.py -- --compression meshopt
 """
 
 import bpy
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from avatar_pipeline.export_options import merge_export_options
+from avatar_pipeline.worker import export_with_compression
+
+
+def compression_profile():
+    """`-- --compression プロファイル` で指定した圧縮プロファイル（なければ既定）"""
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    if '--compression' in argv[:-1]:
+        return argv[argv.index('--compression') + 1]
+    return None
+
 
 def fix_and_export():
     """マテリアルを修正してエクスポート"""
@@ -172,23 +188,10 @@ def fix_and_export():
     
     print(f"\nエクスポート先: {output_path}")
     
-    # GLBエクスポート
+    # GLBエクスポート（--compression で圧縮プロファイルを選べる）
     try:
-        bpy.ops.export_scene.gltf(
-            filepath=output_path,
-            export_format='GLB',
-            export_keep_originals=False,
-            export_texcoords=True,
-            export_normals=True,
-            export_tangents=True,
-            export_materials='EXPORT',
-            export_image_format='AUTO',
-            export_animations=True,
-            export_morph=True,
-            export_skins=True,
-            export_apply=True,
-            export_yup=True
-        )
+        options = merge_export_options({'export_keep_originals': False})
+        export_with_compression(output_path, options, compression_profile())
         print(f"✅ エクスポート成功!")
         return True
     except Exception as e:
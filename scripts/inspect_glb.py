@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+GLB の解析（Blender・ブラウザ不要）
+
+GLB をメモリマップで開き、メッシュ・モーフターゲット・スキンの概要を表示する。
+--json で app/api/analyze-avatar や scripts/analyze-shape-keys.js と同じ形の
+JSON（public/models/*モーフターゲット.json など）を書き出す。
+
+    python3 scripts/inspect_glb.py public/models/adult-male.glb
+    python3 scripts/inspect_glb.py public/models/*.glb --json analysis.json --require mouthOpen jawOpen
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from avatar_pipeline.glb import GLBError
+from avatar_pipeline.glb_reader import MappedGLB, analyze
+
+
+def format_size(size):
+    return f"{size / 1024 / 1024:.2f} MB"
+
+
+def print_report(path, report, verbose=False):
+    summary = report['summary']
+    print(f"\n=== {os.path.basename(path)} ({format_size(os.path.getsize(path))}) ===")
+    print(f"メッシュ: {summary['totalMeshes']}（シェイプキーあり {summary['meshesWithShapeKeys']}）")
+    print(f"頂点: {summary['totalVertices']:,} / 三角形: {summary['totalFaces']:,}")
+    print(f"シェイプキー: {summary['totalUniqueShapeKeys']}種類 / ジョイント: {summary['totalJoints']}")
+    for mesh in report['meshes']:
+        keys = f"、シェイプキー {len(mesh['shapeKeys'])}" if mesh['shapeKeys'] else ''
+        print(f"  {mesh['name']} ({mesh['type']}): {mesh['vertexCount']:,}頂点 / {mesh['faceCount']:,}面{keys}")
+        if verbose:
+            for name, stats in mesh.get('morphStats', {}).items():
+                print(f"    {name}: 最大 {stats['maxDisplacement'] * 1000:.2f} mm、{stats['affectedVertices']}頂点")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GLB のメッシュ・モーフターゲット・スキンを解析する")
+    parser.add_argument('files', nargs='+', help="GLB ファイル")
+    parser.add_argument('--json', metavar='PATH', help="解析結果を JSON で書き出す")
+    parser.add_argument('--no-morph-stats', action='store_true', help="モーフターゲットの変位を計算しない")
+    parser.add_argument('--require', nargs='+', metavar='KEY', default=[],
+                        help="必須のシェイプキー（どれかが無ければ終了コード 1）")
+    parser.add_argument('-v', '--verbose', action='store_true', help="モーフターゲットごとの変位を表示")
+    args = parser.parse_args()
+
+    results = {}
+    failed = False
+    for path in args.files:
+        start = time.time()
+        try:
+            with MappedGLB.open(path) as glb:
+                report = analyze(glb, with_morph_stats=not args.no_morph_stats)
+        except (OSError, GLBError, KeyError, IndexError, ValueError) as e:
+            print(f"❌ {path}: 読み込めません: {e}")
+            failed = True
+            continue
+        report['path'] = path
+        report['elapsed'] = time.time() - start
+        results[path] = report
+        print_report(path, report, args.verbose)
+        print(f"解析時間: {report['elapsed'] * 1000:.0f} ms")
+
+        missing = [key for key in args.require if key not in report['allShapeKeys']]
+        if missing:
+            print(f"❌ 必須のシェイプキーがありません: {', '.join(missing)}")
+            failed = True
+
+    if args.json:
+        data = next(iter(results.values())) if len(results) == 1 and len(args.files) == 1 else results
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f"\n✓ 解析結果を保存: {args.json}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
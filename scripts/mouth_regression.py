@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+口の形の回帰テスト
+
+スイート設定（既定: scripts/mouth_regression.json）のアバターごとにシェイプキーを
+レンダリングし、ゴールデン画像との知覚的な差分と頂点変位のずれを調べる。
+メッシュが変わっていないアバターはキャッシュ済みのレンダリングを使う。
+失敗したキーがあれば終了コード 1 で終わる。
+
+    python3 scripts/mouth_regression.py
+    python3 scripts/mouth_regression.py --avatars boy mother
+    # 意図した変更のあと、今回の結果をゴールデンとして保存
+    python3 scripts/mouth_regression.py --avatars boy --update
+"""
+import argparse
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from avatar_pipeline.regression import (CACHE_DIR, REPORT_NAME, RegressionError,  # noqa: E402
+                                        RegressionSuite, load_suite)
+
+DEFAULT_SUITE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mouth_regression.json')
+
+STATUS_MARKS = {'pass': '✓', 'fail': '❌', 'new': '⚠️', 'missing': '❌'}
+
+_print_lock = threading.Lock()
+
+
+def log(message):
+    with _print_lock:
+        print(message, flush=True)
+
+
+def print_avatar(result, verbose=False):
+    counts = result['counts']
+    mark = '❌' if counts['fail'] or counts['missing'] else '✅'
+    log(f"\n{mark} {result['name']} ({result['object']}): "
+        f"合格 {counts['pass']} / 失敗 {counts['fail']} / 新規 {counts['new']} / 欠落 {counts['missing']}")
+    for note in result['notes']:
+        log(f"   ⚠️ {note}")
+    for key in result['keys']:
+        if key['status'] == 'pass' and not verbose:
+            continue
+        log(f"   {STATUS_MARKS[key['status']]} {key['key']}")
+        for reason in key['reasons']:
+            log(f"      - {reason}")
+        for view, diff in key['views'].items():
+            if diff.get('diff') and key['status'] == 'fail':
+                log(f"      差分 ({view}): {diff['diff']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="シェイプキーのレンダリングをゴールデン画像と比べる")
+    parser.add_argument('suite', nargs='?', default=DEFAULT_SUITE, help="スイート設定の JSON")
+    parser.add_argument('--avatars', nargs='+', help="対象のアバター名（既定: すべて）")
+    parser.add_argument('--update', action='store_true', help="今回の結果をゴールデンとして保存する")
+    parser.add_argument('--force', action='store_true', help="キャッシュを使わずにレンダリングし直す")
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help="レンダリングのキャッシュ先")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="同時に起動する Blender の数（既定: CPUコア数）")
+    parser.add_argument('--blender', default=os.environ.get('BLENDER', 'blender'), help="Blender 実行ファイル")
+    parser.add_argument('-v', '--verbose', action='store_true', help="合格したキーも表示する")
+    args = parser.parse_args()
+
+    try:
+        suite = load_suite(args.suite)
+        runner = RegressionSuite(suite, cache_dir=args.cache_dir, blender=args.blender,
+                                 workers=args.jobs, force=args.force, log=log)
+        report = runner.run(names=args.avatars, update=args.update)
+    except RegressionError as e:
+        log(f"❌ {e}")
+        sys.exit(1)
+
+    for result in report['avatars']:
+        print_avatar(result, args.verbose)
+
+    counts = report['counts']
+    log(f"\n合格 {counts['pass']} / 失敗 {counts['fail']} / 新規 {counts['new']} / 欠落 {counts['missing']}"
+        f"（{report['elapsed']:.1f}s）")
+    log(f"   レポート: {os.path.join(args.cache_dir, REPORT_NAME)}")
+    if args.update:
+        log(f"✅ ゴールデンを更新しました: {suite.golden_dir}")
+        return
+    if counts['new']:
+        log("⚠️ ゴールデンのないキーがあります（--update で保存してください）")
+    if counts['fail'] or counts['missing']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
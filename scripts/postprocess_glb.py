@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+既存の GLB にエクスポート後の処理（post_stages）を適用する
+
+Blender で書き出し直さずに、avatar_pipeline.postprocess のパスを順に適用する。
+GLB は 1 回だけ読み（メモリマップ）、1 回で書き出す。
+
+    python3 scripts/postprocess_glb.py public/models/adult-male.glb --passes sparse_morphs
+    python3 scripts/postprocess_glb.py in.glb -o out.glb --passes sparse_morphs ktx2 --ktx2-quality 192
+    python3 scripts/postprocess_glb.py in.glb -o out.glb --passes sparse_morphs quantize
+    python3 scripts/postprocess_glb.py in.glb --passes prune_morph_normals sparse_morphs --normal-threshold 2
+    python3 scripts/postprocess_glb.py conversation.glb --passes simplify_animation --weights-tolerance 0.005
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from avatar_pipeline.animation import AnimationError
+from avatar_pipeline.glb import GLBError
+from avatar_pipeline.ktx2 import KTX2Error
+from avatar_pipeline.postprocess import PASSES, run_passes
+
+
+def format_size(size):
+    return f"{size / 1024 / 1024:.2f} MB"
+
+
+def print_pass(report):
+    delta = report['after'] - report['before']
+    message = f" {report['message']}" if report['message'] else ''
+    print(f"✓ {report['pass']}:{message}（{delta / 1024:+,.0f} KB、{report['elapsed']:.2f}s）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GLB にエクスポート後の処理を適用する")
+    parser.add_argument('input', help="GLB ファイル")
+    parser.add_argument('-o', '--output', help="出力先（既定: 上書き）")
+    parser.add_argument('--passes', nargs='+', required=True, choices=sorted(PASSES), help="適用する処理（この順に実行）")
+    parser.add_argument('--max-error', type=float, default=None,
+                        help="quantize: リップシンク用シェイプキーの許容誤差（mm、既定: 0.2）")
+    parser.add_argument('--normal-threshold', type=float, default=None,
+                        help="prune_morph_normals: 法線・接線の差分を残す向きの変化（度、既定: 1.0）")
+    parser.add_argument('--weights-tolerance', type=float, default=None,
+                        help="simplify_animation: シェイプキーの値の許容誤差（既定: 0.002）")
+    parser.add_argument('--rotation-tolerance', type=float, default=None,
+                        help="simplify_animation: ボーンの回転の許容誤差（度、既定: 0.05）")
+    parser.add_argument('--ktx2-quality', type=int, default=128, help="KTX2（ETC1S）の品質 1〜255")
+    args = parser.parse_args()
+
+    options = {'textures': {'ktx2_quality': args.ktx2_quality}}
+    if args.normal_threshold is not None:
+        options['morphs'] = {'normal_threshold': args.normal_threshold, 'tangent_threshold': args.normal_threshold}
+    animation = {key: value for key, value in (('weights_tolerance', args.weights_tolerance),
+                                               ('rotation_tolerance', args.rotation_tolerance))
+                 if value is not None}
+    if animation:
+        options['animation'] = animation
+    if args.max_error is not None:
+        options['compression'] = {'max_error': args.max_error / 1000}
+    try:
+        reports, before, after = run_passes(args.input, args.passes, options, args.output, on_pass=print_pass)
+    except (OSError, GLBError, KTX2Error, AnimationError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    elapsed = sum(report['elapsed'] for report in reports)
+    print(f"\n{format_size(before)} → {format_size(after)}（{elapsed:.2f}s）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+シェイプキーの検証レンダリング
+
+.blend のシェイプキーを 1 つずつ値 1.0 にして正面・側面・口元アップを
+レンダリングし、1 枚のコンタクトシートにまとめる。キーは複数の
+blender --background に分けて並列にレンダリングする（既定は CPU コア数）。
+
+    python3 scripts/render_shape_keys.py avatar.blend
+    python3 scripts/render_shape_keys.py avatar.blend --keys Vowel_A_Talk Vowel_I_Talk -j 2 --engine eevee
+"""
+import argparse
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from avatar_pipeline.renders import DEFAULT_VIEWS, INDEX_NAME, RenderError, render_shape_keys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUT = os.path.join(REPO_DIR, '.cache', 'shape_key_renders')
+
+_print_lock = threading.Lock()
+
+
+def log(message):
+    with _print_lock:
+        print(message, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="シェイプキーを並列にレンダリングしてコンタクトシートを作る")
+    parser.add_argument('blend', help="入力の .blend")
+    parser.add_argument('--object', help="シェイプキーを持つオブジェクト（既定: シェイプキーが最も多いメッシュ）")
+    parser.add_argument('--keys', nargs='+', help="レンダリングするキー（既定: Basis と全キー）")
+    parser.add_argument('--views', nargs='+', default=list(DEFAULT_VIEWS), help="front / side / closeup")
+    parser.add_argument('--engine', default='workbench', choices=['workbench', 'eevee'])
+    parser.add_argument('--resolution', type=int, default=384, help="タイルの解像度（正方形）")
+    parser.add_argument('--out', default=None, help="出力先（既定: .cache/shape_key_renders/<blend名>）")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="同時に起動する Blender の数（既定: CPUコア数）")
+    parser.add_argument('--blender', default=os.environ.get('BLENDER', 'blender'), help="Blender 実行ファイル")
+    parser.add_argument('--no-sheet', action='store_true', help="コンタクトシートを作らない")
+    args = parser.parse_args()
+
+    out_dir = args.out or os.path.join(DEFAULT_OUT, os.path.splitext(os.path.basename(args.blend))[0])
+
+    def on_event(worker, event):
+        if event.get('event') == 'tile':
+            log(f"[worker{worker}] ✓ {event['key']} ({event.get('elapsed', 0):.1f}s)")
+
+    try:
+        index = render_shape_keys(args.blend, out_dir, obj_name=args.object, keys=args.keys,
+                                  views=args.views, engine=args.engine, resolution=args.resolution,
+                                  workers=args.jobs, blender=args.blender,
+                                  sheet=not args.no_sheet, on_event=on_event)
+    except RenderError as e:
+        log(f"❌ レンダリングに失敗: {e}（ログ: {os.path.join(out_dir, 'logs')}）")
+        sys.exit(1)
+
+    log(f"\n✅ {len(index['rows'])}キー × {len(index['views'])}ビュー"
+        f"（{index['workers']}ワーカー、{index['elapsed']:.1f}s）")
+    if index['sheet']:
+        log(f"   コンタクトシート: {os.path.join(out_dir, index['sheet'])}")
+    log(f"   索引: {os.path.join(out_dir, INDEX_NAME)}")
+
+
+if __name__ == '__main__':
+    main()